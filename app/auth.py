@@ -6,7 +6,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 import os
-from . import database, models
+from . import database, models, metricas, trazas
 
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
@@ -16,13 +16,15 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with metricas.BCRYPT.labels("verify").time(), trazas.span("bcrypt verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     # Bcrypt has a 72-byte limit, truncate if necessary
     if isinstance(password, str):
         password = password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    return pwd_context.hash(password)
+    with metricas.BCRYPT.labels("hash").time(), trazas.span("bcrypt hash"):
+        return pwd_context.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
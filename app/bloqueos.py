@@ -0,0 +1,143 @@
+"""
+Event loop blocking detector.
+
+`async def` endpoints run on the event loop, so a blocking call inside one
+(a sync SQLAlchemy session, boto3, bcrypt, file I/O) stalls every request in
+the worker until it returns. A heartbeat task on the loop wakes up every
+BUCLE_LATIDO_MS and measures how late it woke (the loop lag), and a watchdog
+thread checks that it did: once the heartbeat is BUCLE_UMBRAL_MS late, the
+watchdog captures the loop thread's stack, i.e. the code that is blocking
+it, and the route of the request that stack belongs to.
+
+When the loop recovers the block is logged with its stack, observed in
+event_loop_block_duration_seconds{route} and added to the per-route ranking
+of GET /diagnostico/bloqueos; those routes are the ones to move to `def`
+(threadpool) endpoints or async drivers first. Every heartbeat feeds
+event_loop_lag_seconds. Normal requests pay nothing. Figures are per worker.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from . import instrumentacion, metricas
+
+logger = logging.getLogger(__name__)
+
+# A stall of the loop longer than this is a block; 0 disables the detector
+BUCLE_UMBRAL_MS = float(os.getenv("BUCLE_UMBRAL_MS", 100))
+BUCLE_LATIDO_MS = float(os.getenv("BUCLE_LATIDO_MS", 50))
+
+_APP = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+_lock = threading.Lock()
+_rutas = {}
+# Heartbeat due time (perf_counter) and the block captured while waiting for it
+_despertar = None
+_captura = None
+_hilo_loop = None
+_tarea = None
+_detener = threading.Event()
+_hilo = None
+
+def _ruta(marco) -> str:
+    """Route of the request whose stack this is: the innermost frame holding an HTTP scope."""
+    while marco is not None:
+        scope = marco.f_locals.get("scope")
+        if isinstance(scope, dict) and scope.get("type") == "http":
+            return instrumentacion.ruta_de(scope)
+        marco = marco.f_back
+    return "-"
+
+def _pila(marco) -> str:
+    """The app's frames (not its middlewares) and the innermost library frames, where the time goes."""
+    pila = traceback.extract_stack(marco)
+    ultimos = len(pila) - 3
+    return "".join(traceback.format_list([
+        f for i, f in enumerate(pila)
+        if i >= ultimos or (f.filename.startswith(_APP) and f.name != "__call__")
+    ]))
+
+def _vigilar():
+    """Watchdog thread: captures the loop's stack once per block, while it is still blocked."""
+    global _captura
+    while not _detener.wait(BUCLE_UMBRAL_MS / 4000):
+        despertar = _despertar
+        if despertar is None or (_captura is not None and _captura[0] == despertar):
+            continue
+        if (time.perf_counter() - despertar) * 1000 < BUCLE_UMBRAL_MS:
+            continue
+        marco = sys._current_frames().get(_hilo_loop)
+        if marco is not None:
+            _captura = (despertar, _ruta(marco), _pila(marco))
+
+def _registrar(ruta: str, duracion: float, pila: str):
+    metricas.BUCLE_BLOQUEO.labels(ruta).observe(duracion)
+    logger.warning("Event loop blocked for %.0f ms in %s\n%s", duracion * 1000, ruta, pila or "(stack not captured)")
+    with _lock:
+        datos = _rutas.get(ruta)
+        if datos is None:
+            datos = _rutas[ruta] = {"bloqueos": 0, "tiempo": 0.0, "maximo": 0.0, "pila": None}
+        datos["bloqueos"] += 1
+        datos["tiempo"] += duracion
+        if duracion >= datos["maximo"]:
+            datos["maximo"] = duracion
+            datos["pila"] = pila
+
+async def _latir():
+    global _despertar
+    intervalo = BUCLE_LATIDO_MS / 1000
+    while True:
+        _despertar = time.perf_counter() + intervalo
+        await asyncio.sleep(intervalo)
+        despertar = _despertar
+        retraso = max(time.perf_counter() - despertar, 0.0)
+        metricas.BUCLE_RETRASO.observe(retraso)
+        if retraso * 1000 >= BUCLE_UMBRAL_MS:
+            captura = _captura
+            if captura is not None and captura[0] == despertar:
+                _registrar(captura[1], retraso, captura[2])
+            else:
+                _registrar("-", retraso, None)
+
+def resumen_rutas() -> list:
+    """Blocks per route, the routes that held the loop the longest first."""
+    with _lock:
+        filas = [
+            {
+                "ruta": ruta,
+                "bloqueos": d["bloqueos"],
+                "tiempo_ms": round(d["tiempo"] * 1000, 1),
+                "maximo_ms": round(d["maximo"] * 1000, 1),
+                "pila": d["pila"],
+            }
+            for ruta, d in _rutas.items()
+        ]
+    return sorted(filas, key=lambda f: f["tiempo_ms"], reverse=True)
+
+def reiniciar():
+    with _lock:
+        _rutas.clear()
+
+def iniciar():
+    """Starts the heartbeat on the running event loop and the watchdog thread (startup event)."""
+    global _hilo_loop, _tarea, _hilo
+    if BUCLE_UMBRAL_MS <= 0 or (_hilo is not None and _hilo.is_alive()):
+        return
+    _hilo_loop = threading.get_ident()
+    _tarea = asyncio.get_running_loop().create_task(_latir())
+    _detener.clear()
+    _hilo = threading.Thread(target=_vigilar, name="bloqueos", daemon=True)
+    _hilo.start()
+
+def detener():
+    global _despertar
+    _detener.set()
+    if _tarea is not None:
+        _tarea.cancel()
+    if _hilo is not None:
+        _hilo.join(timeout=10)
+    _despertar = None
@@ -0,0 +1,112 @@
+"""
+Lazy-load check for the movilización responses.
+
+Creates a small movilización (two instalaciones, two bovinos, one event)
+inside a transaction that is rolled back, loads it through each function
+below and validates the result with the endpoint's response schema, the way
+FastAPI serializes it. Relationship lazy loads fired on the way are counted:
+every relationship the schema reads must come from the query's load
+options, otherwise each returned row costs extra SELECTs (N+1).
+
+    docker exec union_ganadera_backend python -m app.cargas
+
+Exits with status 1 when a response lazy-loads, for CI.
+"""
+import sys
+import uuid
+from collections import Counter
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import crud, crud_movilizaciones, database, models, schemas
+
+def _datos(db: Session) -> dict:
+    """Inserts the sample movilización and returns its ids."""
+    sufijo = uuid.uuid4().hex[:8]
+    usuario = models.Usuario(curp=f"CARGAS{sufijo}", contrasena="-", rol=models.RolEnum.usuario)
+    db.add(usuario)
+    db.flush()
+    instalaciones = [
+        models.Instalacion(usuario_id=usuario.id, nombre=f"Cargas {n}", facility_type=models.FacilityTypeEnum.UPP,
+                           estado="-", municipio="-", license_number=f"CARGAS-{sufijo}-{n}")
+        for n in range(2)
+    ]
+    db.add_all(instalaciones)
+    db.flush()
+    bovinos = [
+        models.Bovino(usuario_id=usuario.id, instalacion_id=instalaciones[0].id,
+                      folio=f"{sufijo[:6]}{n}", arete_barcode=f"CARGAS-{sufijo}-{n}")
+        for n in range(2)
+    ]
+    mov = models.Movilizacion(
+        solicitante_id=usuario.id, origen_id=instalaciones[0].id, destino_id=instalaciones[1].id,
+        tipo=models.TipoMovilizacionEnum.venta, estado=models.EstadoMovilizacionEnum.REQUESTED,
+        transportista_nombre="-", placas_vehiculo="-", bovinos=bovinos,
+        eventos=[models.MovilizacionEvento(estado_nuevo=models.EstadoMovilizacionEnum.REQUESTED, usuario_id=usuario.id)]
+    )
+    db.add(mov)
+    db.flush()
+    return {"usuario": usuario.id, "bovino": bovinos[0].id, "movilizacion": mov.id}
+
+# name -> (loader, response schema of the endpoint that returns it)
+CARGAS = {
+    "movilizaciones_by_user": (
+        lambda db, d: crud_movilizaciones.get_movilizaciones(db, usuario_id=d["usuario"]),
+        List[schemas.MovilizacionResponse],
+    ),
+    "movilizacion": (
+        lambda db, d: crud_movilizaciones.get_movilizacion(db, d["movilizacion"]),
+        schemas.MovilizacionResponse,
+    ),
+    "bovino_mobilizations": (
+        lambda db, d: crud.get_bovino_mobilizations(db, d["bovino"]),
+        List[schemas.MovilizacionResponse],
+    ),
+}
+
+def revisar(nombres: list = None) -> dict:
+    """Returns {load name: Counter of lazy-loaded relationships} for the selected (default: all) CARGAS."""
+    resultado = {}
+    with database.engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            db = Session(bind=conn, join_transaction_mode="create_savepoint")
+            datos = _datos(db)
+            db.commit()  # releases the savepoint; the outer transaction is still rolled back
+            db.close()
+            for nombre in nombres or CARGAS:
+                cargar, esquema = CARGAS[nombre]
+                perezosas = Counter()
+
+                def contar(estado):
+                    if estado.lazy_loaded_from is not None:
+                        perezosas[str(estado.loader_strategy_path[-1])] += 1
+
+                db = Session(bind=conn, join_transaction_mode="create_savepoint")
+                event.listen(db, "do_orm_execute", contar)
+                try:
+                    TypeAdapter(esquema).validate_python(cargar(db, datos), from_attributes=True)
+                finally:
+                    db.close()
+                resultado[nombre] = perezosas
+        finally:
+            trans.rollback()
+    return resultado
+
+def main(argv: list) -> int:
+    desconocidas = [n for n in argv if n not in CARGAS]
+    if desconocidas:
+        print(f"Unknown loads: {', '.join(desconocidas)}", file=sys.stderr)
+        return 2
+    resultado = revisar(argv or None)
+    for nombre, perezosas in resultado.items():
+        print(f"{'FAIL' if perezosas else 'ok  '} {nombre}")
+        for relacion, veces in sorted(perezosas.items()):
+            print(f"       lazy load of {relacion} x{veces}")
+    return 1 if any(resultado.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
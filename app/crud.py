@@ -1,126 +1,103 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, func, and_, or_
+from sqlalchemy.exc import DBAPIError
 from fastapi import UploadFile, HTTPException
 import os
 import uuid as uuid_lib
 import secrets
 import string
-from . import models, schemas, auth
+from datetime import timedelta
+from . import models, schemas, auth, trazas
 from .s3 import s3_client, S3_BUCKET_NAME
 
 def get_user_by_username(db: Session, username: str):
     return db.query(models.Usuario).filter(models.Usuario.curp == username).first()
 
+# registrar_usuario_nuevo, optionally followed in the same statement by the
+# insert into the role table (which selects the new id from `nuevo`)
+_REGISTRAR_USUARIO = """
+    SELECT registrar_usuario_nuevo(
+        :curp,
+        :contrasena,
+        :rol,
+        :nombre,
+        :apellido_p,
+        :apellido_m,
+        :sexo,
+        :fecha_nac,
+        :clave_elector,
+        :idmex
+    ) AS id
+"""
+
+def _registrar_usuario(db: Session, usuario, rol: str, alta_rol: str = None, **params):
+    """
+    Registers the user (and its role row, when alta_rol is given) in one round
+    trip and returns the new id. Does not commit: the caller commits once the
+    whole signup is done.
+    """
+    params.update({
+        "curp": usuario.curp,
+        "contrasena": auth.get_password_hash(usuario.contrasena),
+        "rol": rol,
+        "nombre": usuario.nombre,
+        "apellido_p": usuario.apellido_p,
+        "apellido_m": usuario.apellido_m,
+        "sexo": usuario.sexo.value,
+        "fecha_nac": usuario.fecha_nac,
+        "clave_elector": usuario.clave_elector,
+        "idmex": usuario.idmex
+    })
+    if alta_rol:
+        query = f"WITH nuevo AS ({_REGISTRAR_USUARIO}) {alta_rol} RETURNING usuario_id"
+    else:
+        query = _REGISTRAR_USUARIO
+    return db.execute(text(query), params).scalar()
+
 def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = auth.get_password_hash(user.contrasena)
-
-    # Using the stored procedure registrar_usuario_nuevo
-    query = text("""
-        SELECT registrar_usuario_nuevo(
-            :curp,
-            :contrasena,
-            :rol,
-            :nombre,
-            :apellido_p,
-            :apellido_m,
-            :sexo,
-            :fecha_nac,
-            :clave_elector,
-            :idmex
-        )
-    """)
-
-    params = {
-        "curp": user.curp,
-        "contrasena": hashed_password,
-        "rol": "usuario",
-        "nombre": user.nombre,
-        "apellido_p": user.apellido_p,
-        "apellido_m": user.apellido_m,
-        "sexo": user.sexo.value,
-        "fecha_nac": user.fecha_nac,
-        "clave_elector": user.clave_elector,
-        "idmex": user.idmex
-    }
-
-    result = db.execute(query, params)
-    new_user_id = result.scalar()
+    new_user_id = _registrar_usuario(db, user, "usuario")
     db.commit()
 
     return db.query(models.Usuario).filter(models.Usuario.id == new_user_id).first()
 
+@trazas.trazado
 def create_veterinario(db: Session, veterinario: schemas.VeterinarioCreate, cedula_file: UploadFile):
     """
     Create a new veterinario user with cedula number and upload their cedula file.
     - User will have rol='veterinario'
     - Cedula number is saved to veterinarios table
     - Cedula file is stored in S3 and referenced in documentos table
+    The user, veterinario and document rows are committed together.
     """
-    hashed_password = auth.get_password_hash(veterinario.contrasena)
-
-    # Using the stored procedure registrar_usuario_nuevo with rol='veterinario'
-    query = text("""
-        SELECT registrar_usuario_nuevo(
-            :curp,
-            :contrasena,
-            :rol,
-            :nombre,
-            :apellido_p,
-            :apellido_m,
-            :sexo,
-            :fecha_nac,
-            :clave_elector,
-            :idmex
-        )
-    """)
-
-    params = {
-        "curp": veterinario.curp,
-        "contrasena": hashed_password,
-        "rol": "veterinario",
-        "nombre": veterinario.nombre,
-        "apellido_p": veterinario.apellido_p,
-        "apellido_m": veterinario.apellido_m,
-        "sexo": veterinario.sexo.value,
-        "fecha_nac": veterinario.fecha_nac,
-        "clave_elector": veterinario.clave_elector,
-        "idmex": veterinario.idmex
-    }
-
-    result = db.execute(query, params)
-    new_user_id = result.scalar()
-    db.commit()
+    new_user_id = _registrar_usuario(
+        db, veterinario, "veterinario",
+        "INSERT INTO veterinarios (usuario_id, cedula) SELECT id, :cedula FROM nuevo",
+        cedula=veterinario.cedula
+    )
 
     # Upload cedula file to S3
     file_extension = os.path.splitext(cedula_file.filename)[1]
     storage_key = f"{new_user_id}/cedula_veterinario/{uuid_lib.uuid4()}{file_extension}"
 
     try:
-        s3_client.upload_fileobj(
-            cedula_file.file,
-            S3_BUCKET_NAME,
-            storage_key
-        )
+        with trazas.span("s3 upload_fileobj", **{"aws.key": storage_key}):
+            s3_client.upload_fileobj(
+                cedula_file.file,
+                S3_BUCKET_NAME,
+                storage_key
+            )
     except Exception as e:
         # Rollback user creation if file upload fails
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Could not upload cedula file: {str(e)}")
 
-    # Save document metadata
-    doc_data = {
-        "usuario_id": new_user_id,
-        "doc_type": "cedula_veterinario",
-        "storage_key": storage_key,
-        "original_filename": cedula_file.filename
-    }
-    create_documento(db=db, documento_data=doc_data)
-
-    # Save cedula number to veterinarios table
-    vet_query = text("""
-        INSERT INTO veterinarios (usuario_id, cedula)
-        VALUES (:usuario_id, :cedula)
-    """)
-    db.execute(vet_query, {"usuario_id": new_user_id, "cedula": veterinario.cedula})
+    # Save document metadata (inserted by the commit)
+    db.add(models.Documento(
+        usuario_id=new_user_id,
+        doc_type="cedula_veterinario",
+        storage_key=storage_key,
+        original_filename=cedula_file.filename
+    ))
     db.commit()
 
     return db.query(models.Usuario).filter(models.Usuario.id == new_user_id).first()
@@ -131,47 +108,11 @@ def create_administrador(db: Session, administrador: schemas.AdministradorCreate
     - User will have rol='administrador'
     - Set created_by_user_id to track who created this admin
     """
-    hashed_password = auth.get_password_hash(administrador.contrasena)
-
-    # Using the stored procedure registrar_usuario_nuevo with rol='administrador'
-    query = text("""
-        SELECT registrar_usuario_nuevo(
-            :curp,
-            :contrasena,
-            :rol,
-            :nombre,
-            :apellido_p,
-            :apellido_m,
-            :sexo,
-            :fecha_nac,
-            :clave_elector,
-            :idmex
-        )
-    """)
-
-    params = {
-        "curp": administrador.curp,
-        "contrasena": hashed_password,
-        "rol": "administrador",
-        "nombre": administrador.nombre,
-        "apellido_p": administrador.apellido_p,
-        "apellido_m": administrador.apellido_m,
-        "sexo": administrador.sexo.value,
-        "fecha_nac": administrador.fecha_nac,
-        "clave_elector": administrador.clave_elector,
-        "idmex": administrador.idmex
-    }
-
-    result = db.execute(query, params)
-    new_user_id = result.scalar()
-    db.commit()
-
-    # Save to administradores table
-    admin_query = text("""
-        INSERT INTO administradores (usuario_id, creado_por_id)
-        VALUES (:usuario_id, :creado_por_id)
-    """)
-    db.execute(admin_query, {"usuario_id": new_user_id, "creado_por_id": created_by_user_id})
+    new_user_id = _registrar_usuario(
+        db, administrador, "administrador",
+        "INSERT INTO administradores (usuario_id, creado_por_id) SELECT id, :creado_por_id FROM nuevo",
+        creado_por_id=created_by_user_id
+    )
     db.commit()
 
     return db.query(models.Usuario).filter(models.Usuario.id == new_user_id).first()
@@ -182,56 +123,22 @@ def create_inspector(db: Session, inspector: schemas.InspectorCreate, created_by
     - User will have rol='inspector'
     - Set created_by_user_id to track who created this inspector
     """
-    hashed_password = auth.get_password_hash(inspector.contrasena)
-
-    # Using the stored procedure registrar_usuario_nuevo with rol='inspector'
-    query = text("""
-        SELECT registrar_usuario_nuevo(
-            :curp,
-            :contrasena,
-            :rol,
-            :nombre,
-            :apellido_p,
-            :apellido_m,
-            :sexo,
-            :fecha_nac,
-            :clave_elector,
-            :idmex
-        )
-    """)
-
-    params = {
-        "curp": inspector.curp,
-        "contrasena": hashed_password,
-        "rol": "inspector",
-        "nombre": inspector.nombre,
-        "apellido_p": inspector.apellido_p,
-        "apellido_m": inspector.apellido_m,
-        "sexo": inspector.sexo.value,
-        "fecha_nac": inspector.fecha_nac,
-        "clave_elector": inspector.clave_elector,
-        "idmex": inspector.idmex
-    }
-
-    result = db.execute(query, params)
-    new_user_id = result.scalar()
-    db.commit()
-
-    # Save to inspectores table
-    inspector_query = text("""
-        INSERT INTO inspectores (usuario_id, creado_por_id)
-        VALUES (:usuario_id, :creado_por_id)
-    """)
-    db.execute(inspector_query, {"usuario_id": new_user_id, "creado_por_id": created_by_user_id})
+    new_user_id = _registrar_usuario(
+        db, inspector, "inspector",
+        "INSERT INTO inspectores (usuario_id, creado_por_id) SELECT id, :creado_por_id FROM nuevo",
+        creado_por_id=created_by_user_id
+    )
     db.commit()
 
     return db.query(models.Usuario).filter(models.Usuario.id == new_user_id).first()
 
 def get_bovinos(db: Session, user_id: str = None, skip: int = 0, limit: int = 100, 
                 instalacion_id: str = None, owner_curp: str = None, status: str = None,
-                search_term: str = None):
+                search_term: str = None, resumen: bool = False):
     from sqlalchemy.orm import joinedload
     query = db.query(models.Bovino).options(joinedload(models.Bovino.instalacion))
+    if resumen:
+        query = query.options(joinedload(models.Bovino.resumen))
     
     if user_id:
         query = query.filter(models.Bovino.usuario_id == user_id)
@@ -277,13 +184,16 @@ def search_bovino(db: Session, arete_barcode: str = None, arete_rfid: str = None
 
     return None
 
-def get_bovino(db: Session, bovino_id: str):
+def get_bovino(db: Session, bovino_id: str, resumen: bool = False):
     from sqlalchemy.orm import joinedload
-    return db.query(models.Bovino).options(
+    query = db.query(models.Bovino).options(
         joinedload(models.Bovino.instalacion),
         joinedload(models.Bovino.madre),
         joinedload(models.Bovino.padre)
-    ).filter(models.Bovino.id == bovino_id).first()
+    )
+    if resumen:
+        query = query.options(joinedload(models.Bovino.resumen))
+    return query.filter(models.Bovino.id == bovino_id).first()
 
 _FOLIO_ALPHABET = string.ascii_uppercase + string.digits
 
@@ -297,9 +207,10 @@ def create_bovino(db: Session, bovino: schemas.BovinoCreate, user_id: str):
             break
     db_bovino = models.Bovino(**bovino.dict(), usuario_id=user_id, usuario_original_id=user_id, folio=folio)
     db.add(db_bovino)
+    db.flush()
+    bovino_id = db_bovino.id  # read before the commit expires it
     db.commit()
-    db.refresh(db_bovino)
-    return db_bovino
+    return get_bovino(db, bovino_id)
 
 def update_bovino(db: Session, bovino_id: str, bovino: schemas.BovinoCreate):
     db_bovino = db.query(models.Bovino).filter(models.Bovino.id == bovino_id).first()
@@ -307,7 +218,7 @@ def update_bovino(db: Session, bovino_id: str, bovino: schemas.BovinoCreate):
         for key, value in bovino.dict(exclude_unset=True).items():
             setattr(db_bovino, key, value)
         db.commit()
-        db.refresh(db_bovino)
+        return get_bovino(db, bovino_id)
     return db_bovino
 
 def delete_bovino(db: Session, bovino_id: str):
@@ -318,51 +229,52 @@ def delete_bovino(db: Session, bovino_id: str):
     return db_bovino
 
 def create_evento(db: Session, evento_request: schemas.EventoCreateRequest):
+    """
+    Registers one event through its registrar_* function, which returns the
+    evento row with its detail columns, and commits once. Returns the
+    matching *DetailResponse (EventoResponse for generic events).
+    """
     etype = evento_request.type
     data = evento_request.data
 
     # Extract common fields
     bovino_id = data.get('bovino_id')
     observaciones = data.get('observaciones', '')
+    # Client-supplied timestamp for events queued offline; None -> NOW()
+    fecha = data.get('fecha')
 
-    eid = None
+    params = {"bid": bovino_id, "uid": data.get('usuario_id'), "obs": observaciones, "fecha": fecha}
 
     if etype == 'peso':
         # registrar_peso(_bovino_id, _peso_nuevo, _fecha DEFAULT NOW(), _observaciones)
-        peso_nuevo = data.get('peso_nuevo')
-        q = text("SELECT registrar_peso(:bid, :pn, NOW(), :obs)")
-        eid = db.execute(q, {"bid": bovino_id, "pn": peso_nuevo, "obs": observaciones}).scalar()
+        q = "registrar_peso(:bid, :pn"
+        params["pn"] = data.get('peso_nuevo')
+        schema = schemas.PesoDetailResponse
 
     elif etype == 'dieta':
         # registrar_dieta(_bovino_id, _alimento, _fecha, _observaciones)
-        alimento = data.get('alimento')
-        q = text("SELECT registrar_dieta(:bid, :ali, NOW(), :obs)")
-        eid = db.execute(q, {"bid": bovino_id, "ali": alimento, "obs": observaciones}).scalar()
+        q = "registrar_dieta(:bid, :ali"
+        params["ali"] = data.get('alimento')
+        schema = schemas.DietaDetailResponse
 
     elif etype == 'vacunacion':
         # registrar_vacunacion(_bovino_id, _usuario_id, _tipo, _lote, _laboratorio, _fecha_prox, _fecha, _observaciones)
-        q = text("SELECT registrar_vacunacion(:bid, :uid, :tipo, :lote, :lab, :fprox, NOW(), :obs)")
-        eid = db.execute(q, {
-            "bid": bovino_id, "uid": data.get('usuario_id'), "tipo": data.get('tipo'),
-            "lote": data.get('lote'), "lab": data.get('laboratorio'), "fprox": data.get('fecha_prox'),
-            "obs": observaciones
-        }).scalar()
+        q = "registrar_vacunacion(:bid, :uid, :tipo, :lote, :lab, :fprox"
+        params.update(tipo=data.get('tipo'), lote=data.get('lote'), lab=data.get('laboratorio'),
+                      fprox=data.get('fecha_prox'))
+        schema = schemas.VacunacionDetailResponse
 
     elif etype == 'desparasitacion':
         # registrar_desparasitacion(_bovino_id, _usuario_id, _medicamento, _dosis, _fecha_prox, _fecha, _observaciones)
-        q = text("SELECT registrar_desparasitacion(:bid, :uid, :med, :dosis, :fprox, NOW(), :obs)")
-        eid = db.execute(q, {
-            "bid": bovino_id, "uid": data.get('usuario_id'), "med": data.get('medicamento'),
-            "dosis": data.get('dosis'), "fprox": data.get('fecha_prox'), "obs": observaciones
-        }).scalar()
+        q = "registrar_desparasitacion(:bid, :uid, :med, :dosis, :fprox"
+        params.update(med=data.get('medicamento'), dosis=data.get('dosis'), fprox=data.get('fecha_prox'))
+        schema = schemas.DesparasitacionDetailResponse
 
     elif etype == 'laboratorio':
         # registrar_laboratorio(_bovino_id, _usuario_id, _tipo, _resultado, _fecha, _observaciones)
-        q = text("SELECT registrar_laboratorio(:bid, :uid, :tipo, :resultado, NOW(), :obs)")
-        eid = db.execute(q, {
-            "bid": bovino_id, "uid": data.get('usuario_id'), "tipo": data.get('tipo'),
-            "resultado": data.get('resultado'), "obs": observaciones
-        }).scalar()
+        q = "registrar_laboratorio(:bid, :uid, :tipo, :resultado"
+        params.update(tipo=data.get('tipo'), resultado=data.get('resultado'))
+        schema = schemas.LaboratorioDetailResponse
 
     elif etype == 'compraventa':
         raise HTTPException(
@@ -378,67 +290,121 @@ def create_evento(db: Session, evento_request: schemas.EventoCreateRequest):
 
     elif etype == 'enfermedad':
         # registrar_enfermedad(_bovino_id, _usuario_id, _tipo, _fecha, _observaciones)
-        # NOTE: This returns enfermedad_id, not evento_id
-        q = text("SELECT registrar_enfermedad(:bid, :uid, :tipo, NOW(), :obs)")
-        enfermedad_id = db.execute(q, {
-            "bid": bovino_id, "uid": data.get('usuario_id'),
-            "tipo": data.get('tipo'), "obs": observaciones
-        }).scalar()
-        db.commit()
-        # Get the evento_id from the enfermedad record
-        eid = db.execute(text("SELECT evento_id FROM enfermedades WHERE id = :eid"),
-                       {"eid": enfermedad_id}).scalar()
+        # The row carries enfermedad_id so the client can link a treatment to it
+        q = "registrar_enfermedad(:bid, :uid, :tipo"
+        params["tipo"] = data.get('tipo')
+        schema = schemas.EnfermedadDetailResponse
 
     elif etype == 'tratamiento':
-        # Validate that the referenced enfermedad belongs to the same bovino
-        enfermedad_id_param = data.get('enfermedad_id')
-        if enfermedad_id_param:
-            enf_bovino = db.execute(
-                text("SELECT bovino_id FROM eventos WHERE id = (SELECT evento_id FROM enfermedades WHERE id = :eid)"),
-                {"eid": enfermedad_id_param}
-            ).scalar()
-            if enf_bovino and str(enf_bovino) != str(bovino_id):
-                raise HTTPException(status_code=400, detail="La enfermedad no pertenece al mismo bovino")
         # registrar_tratamiento(_bovino_id, _enfermedad_id, _usuario_id, _medicamento, _dosis, _periodo, _fecha, _observaciones)
-        q = text("SELECT registrar_tratamiento(:bid, :eid, :uid, :med, :dosis, :periodo, NOW(), :obs)")
-        eid = db.execute(q, {
-            "bid": bovino_id, "eid": enfermedad_id_param, "uid": data.get('usuario_id'),
-            "med": data.get('medicamento'), "dosis": data.get('dosis'),
-            "periodo": data.get('periodo'), "obs": observaciones
-        }).scalar()
+        # The function rejects an enfermedad of another bovino (check_violation)
+        q = "registrar_tratamiento(:bid, :eid, :uid, :med, :dosis, :periodo"
+        params.update(eid=data.get('enfermedad_id'), med=data.get('medicamento'), dosis=data.get('dosis'),
+                      periodo=data.get('periodo'))
+        schema = schemas.TratamientoDetailResponse
 
     elif etype == 'remision':
-        # Validate that the referenced enfermedad belongs to the same bovino
-        enfermedad_id_param = data.get('enfermedad_id')
-        if enfermedad_id_param:
-            enf_bovino = db.execute(
-                text("SELECT bovino_id FROM eventos WHERE id = (SELECT evento_id FROM enfermedades WHERE id = :eid)"),
-                {"eid": enfermedad_id_param}
-            ).scalar()
-            if enf_bovino and str(enf_bovino) != str(bovino_id):
-                raise HTTPException(status_code=400, detail="La enfermedad no pertenece al mismo bovino")
         # registrar_remision(_bovino_id, _enfermedad_id, _usuario_id, _fecha, _observaciones)
-        q = text("SELECT registrar_remision(:bid, :eid, :uid, NOW(), :obs)")
-        eid = db.execute(q, {
-            "bid": bovino_id, "eid": enfermedad_id_param, "uid": data.get('usuario_id'),
-            "obs": observaciones
-        }).scalar()
+        q = "registrar_remision(:bid, :eid, :uid"
+        params["eid"] = data.get('enfermedad_id')
+        schema = schemas.RemisionDetailResponse
 
     # fallback to generic if no match or 'general'
     else:
         db_evento = models.Evento(bovino_id=bovino_id, observaciones=observaciones)
+        if fecha:
+            db_evento.fecha = fecha
         db.add(db_evento)
         db.commit()
         db.refresh(db_evento)
-        eid = db_evento.id
+        return schemas.EventoResponse.model_validate(db_evento)
+
+    try:
+        row = db.execute(
+            text(f"SELECT * FROM {q}, COALESCE(CAST(:fecha AS TIMESTAMPTZ), NOW()), :obs)"), params
+        ).mappings().one()
+        db.commit()
+    except DBAPIError as e:
+        db.rollback()
+        if getattr(e.orig, "pgcode", None) == "23514":  # check_violation
+            raise HTTPException(status_code=400, detail=e.orig.diag.message_primary)
+        raise
+    return schema(**row)
+
+# Required data fields per event type accepted by POST /eventos/lote
+EVENTOS_LOTE_CAMPOS = {
+    'peso': ('peso_nuevo',),
+    'dieta': ('alimento',),
+    'vacunacion': ('tipo', 'lote', 'laboratorio', 'fecha_prox'),
+    'desparasitacion': ('medicamento', 'dosis', 'fecha_prox'),
+    'laboratorio': ('tipo', 'resultado'),
+}
+
+def get_bovinos_para_eventos(db: Session, bovino_ids: list):
+    """Owner and facility status for many bovinos in one query, keyed by bovino id."""
+    rows = db.query(
+        models.Bovino.id, models.Bovino.usuario_id, models.Bovino.instalacion_id,
+        models.Instalacion.active, models.Instalacion.facility_type, models.Instalacion.fecha_vencimiento
+    ).outerjoin(
+        models.Instalacion, models.Bovino.instalacion_id == models.Instalacion.id
+    ).filter(models.Bovino.id.in_(bovino_ids)).all()
+    return {r.id: r for r in rows}
+
+def create_eventos_lote(db: Session, items_por_tipo: dict, usuario_id: str):
+    """
+    Inserts already-validated events with one registrar_*_lote call per type and a single commit.
+    items_por_tipo maps type -> list of (index, bovino_id, data); returns {index: evento_id}.
+    """
+    def col(items, campo):
+        return [data.get(campo) for _, _, data in items]
 
-    # Commit if we used a raw SQL function (which returns a UUID scalar)
-    supported_types = ['peso', 'dieta', 'vacunacion', 'desparasitacion', 'laboratorio',
-                      'compraventa', 'traslado', 'enfermedad', 'tratamiento', 'remision']
-    if etype in supported_types:
-         db.commit()
+    evento_ids = {}
+    try:
+        for etype, items in items_por_tipo.items():
+            if not items:
+                continue
+            params = {
+                "uid": usuario_id,
+                "bids": [str(bid) for _, bid, _ in items],
+                "fechas": [data.get('fecha') for _, _, data in items],
+                "obs": [data.get('observaciones') or '' for _, _, data in items],
+            }
+            if etype == 'peso':
+                q = text("""SELECT registrar_pesos_lote(CAST(:bids AS UUID[]), CAST(:pesos AS DECIMAL[]),
+                            CAST(:fechas AS TIMESTAMPTZ[]), CAST(:obs AS TEXT[]))""")
+                params["pesos"] = col(items, 'peso_nuevo')
+            elif etype == 'dieta':
+                q = text("""SELECT registrar_dietas_lote(CAST(:bids AS UUID[]), CAST(:alimentos AS VARCHAR[]),
+                            CAST(:fechas AS TIMESTAMPTZ[]), CAST(:obs AS TEXT[]))""")
+                params["alimentos"] = col(items, 'alimento')
+            elif etype == 'vacunacion':
+                q = text("""SELECT registrar_vacunaciones_lote(:uid, CAST(:bids AS UUID[]), CAST(:tipos AS VARCHAR[]),
+                            CAST(:lotes AS VARCHAR[]), CAST(:labs AS VARCHAR[]), CAST(:fprox AS DATE[]),
+                            CAST(:fechas AS TIMESTAMPTZ[]), CAST(:obs AS TEXT[]))""")
+                params.update(tipos=col(items, 'tipo'), lotes=col(items, 'lote'),
+                              labs=col(items, 'laboratorio'), fprox=col(items, 'fecha_prox'))
+            elif etype == 'desparasitacion':
+                q = text("""SELECT registrar_desparasitaciones_lote(:uid, CAST(:bids AS UUID[]), CAST(:meds AS VARCHAR[]),
+                            CAST(:dosis AS VARCHAR[]), CAST(:fprox AS DATE[]),
+                            CAST(:fechas AS TIMESTAMPTZ[]), CAST(:obs AS TEXT[]))""")
+                params.update(meds=col(items, 'medicamento'), dosis=col(items, 'dosis'),
+                              fprox=col(items, 'fecha_prox'))
+            elif etype == 'laboratorio':
+                q = text("""SELECT registrar_laboratorios_lote(:uid, CAST(:bids AS UUID[]), CAST(:tipos AS VARCHAR[]),
+                            CAST(:resultados AS TEXT[]), CAST(:fechas AS TIMESTAMPTZ[]), CAST(:obs AS TEXT[]))""")
+                params.update(tipos=col(items, 'tipo'), resultados=col(items, 'resultado'))
+            else:
+                continue
+
+            ids = db.execute(q, params).scalar()
+            for (index, _, _), eid in zip(items, ids):
+                evento_ids[index] = eid
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
 
-    return db.query(models.Evento).filter(models.Evento.id == eid).first()
+    return evento_ids
 
 def get_evento(db: Session, evento_id: str):
     return db.query(models.Evento).filter(models.Evento.id == evento_id).first()
@@ -463,21 +429,21 @@ def get_bovino_full_history(db: Session, bovino_id: str):
         }
         
         # Check for specific details in each table
-        peso = db.query(models.Peso).filter(models.Peso.evento_id == e.id).first()
+        peso = db.query(models.Peso).filter(models.Peso.evento_id == e.id, models.Peso.evento_fecha == e.fecha).first()
         if peso:
             item["tipo"] = "peso"
             item["detalles"] = {"peso_actual": peso.peso_actual, "peso_nuevo": peso.peso_nuevo}
             history.append(item)
             continue
             
-        dieta = db.query(models.Dieta).filter(models.Dieta.evento_id == e.id).first()
+        dieta = db.query(models.Dieta).filter(models.Dieta.evento_id == e.id, models.Dieta.evento_fecha == e.fecha).first()
         if dieta:
             item["tipo"] = "dieta"
             item["detalles"] = {"alimento": dieta.alimento}
             history.append(item)
             continue
             
-        vacuna = db.query(models.Vacunacion).filter(models.Vacunacion.evento_id == e.id).first()
+        vacuna = db.query(models.Vacunacion).filter(models.Vacunacion.evento_id == e.id, models.Vacunacion.evento_fecha == e.fecha).first()
         if vacuna:
             item["tipo"] = "vacunacion"
             item["detalles"] = {
@@ -490,7 +456,7 @@ def get_bovino_full_history(db: Session, bovino_id: str):
             history.append(item)
             continue
             
-        desp = db.query(models.Desparasitacion).filter(models.Desparasitacion.evento_id == e.id).first()
+        desp = db.query(models.Desparasitacion).filter(models.Desparasitacion.evento_id == e.id, models.Desparasitacion.evento_fecha == e.fecha).first()
         if desp:
             item["tipo"] = "desparasitacion"
             item["detalles"] = {
@@ -502,7 +468,7 @@ def get_bovino_full_history(db: Session, bovino_id: str):
             history.append(item)
             continue
             
-        lab = db.query(models.Laboratorio).filter(models.Laboratorio.evento_id == e.id).first()
+        lab = db.query(models.Laboratorio).filter(models.Laboratorio.evento_id == e.id, models.Laboratorio.evento_fecha == e.fecha).first()
         if lab:
             item["tipo"] = "laboratorio"
             item["detalles"] = {
@@ -513,7 +479,7 @@ def get_bovino_full_history(db: Session, bovino_id: str):
             history.append(item)
             continue
             
-        env = db.query(models.Enfermedad).filter(models.Enfermedad.evento_id == e.id).first()
+        env = db.query(models.Enfermedad).filter(models.Enfermedad.evento_id == e.id, models.Enfermedad.evento_fecha == e.fecha).first()
         if env:
             item["tipo"] = "enfermedad"
             item["detalles"] = {"tipo_enfermedad": env.tipo, "veterinario_id": env.veterinario_id}
@@ -526,7 +492,7 @@ def get_bovino_full_history(db: Session, bovino_id: str):
             history.append(item)
             continue
             
-        trat = db.query(models.Tratamiento).filter(models.Tratamiento.evento_id == e.id).first()
+        trat = db.query(models.Tratamiento).filter(models.Tratamiento.evento_id == e.id, models.Tratamiento.evento_fecha == e.fecha).first()
         if trat:
             item["tipo"] = "tratamiento"
             item["detalles"] = {
@@ -538,21 +504,22 @@ def get_bovino_full_history(db: Session, bovino_id: str):
             history.append(item)
             continue
             
-        rem = db.query(models.Remision).filter(models.Remision.evento_id == e.id).first()
+        rem = db.query(models.Remision).filter(models.Remision.evento_id == e.id, models.Remision.evento_fecha == e.fecha).first()
         if rem:
             item["tipo"] = "remision"
             item["detalles"] = {"veterinario_id": rem.veterinario_id}
             history.append(item)
             continue
 
-        cv = db.query(models.Compraventa).filter(models.Compraventa.evento_id == e.id).first()
+        cv = db.query(models.Compraventa).filter(models.Compraventa.evento_id == e.id, models.Compraventa.evento_fecha == e.fecha).first()
         if cv:
             item["tipo"] = "compraventa"
-            item["detalles"] = {"comprador_curp": cv.comprador_curp, "vendedor_curp": cv.vendedor_curp}
+            item["detalles"] = {"comprador_curp": cv.comprador_curp, "vendedor_curp": cv.vendedor_curp,
+                                "comprador_id": cv.comprador_id, "vendedor_id": cv.vendedor_id}
             history.append(item)
             continue
             
-        trans = db.query(models.Traslado).filter(models.Traslado.evento_id == e.id).first()
+        trans = db.query(models.Traslado).filter(models.Traslado.evento_id == e.id, models.Traslado.evento_fecha == e.fecha).first()
         if trans:
             item["tipo"] = "traslado"
             item["detalles"] = {"predio_anterior_id": trans.predio_anterior_id, "predio_nuevo_id": trans.predio_nuevo_id}
@@ -568,21 +535,22 @@ def get_bovino_mobilizations(db: Session, bovino_id: str):
     """
     Get all mobilizations for a bovino.
     """
-    return db.query(models.Movilizacion).join(
+    from .crud_movilizaciones import CARGA_MOVILIZACION
+    return db.query(models.Movilizacion).options(*CARGA_MOVILIZACION).join(
         models.MovilizacionBovino, models.Movilizacion.id == models.MovilizacionBovino.movilizacion_id
     ).filter(
         models.MovilizacionBovino.bovino_id == bovino_id
     ).order_by(models.Movilizacion.fecha_solicitud.desc()).all()
 
 def get_eventos_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    # Get all eventos for all bovinos owned by the user
-    return db.query(models.Evento).join(
+    # Get the eventos of the bovinos owned by the user, since they acquired each one
+    return _paginar_recientes(db, db.query(models.Evento).join(
         models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(
         models.Bovino.usuario_id == user_id
-    ).order_by(
-        models.Evento.fecha.desc()
-    ).offset(skip).limit(limit).all()
+    ), None, skip, limit)
 
 def create_documento(db: Session, documento_data: dict):
     db_documento = models.Documento(**documento_data)
@@ -730,31 +698,92 @@ def delete_predio(db: Session, predio_id: str):
     return db_predio
 
 # Event detail CRUD functions with joined data
-def get_pesos_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Peso).join(
-        models.Peso, models.Evento.id == models.Peso.evento_id
+def _join_evento(detalle):
+    # Joining on the partition key too lets the planner prune detail partitions
+    return and_(models.Evento.id == detalle.evento_id, models.Evento.fecha == detalle.evento_fecha)
+
+def _en_propiedad(user_id):
+    # Per-owner listings only show events dated within one of the user's
+    # ownership periods of the bovino (since they bought it)
+    return and_(
+        models.BovinoPropiedad.bovino_id == models.Evento.bovino_id,
+        models.BovinoPropiedad.usuario_id == user_id,
+        models.BovinoPropiedad.periodo.contains(models.Evento.fecha)
+    )
+
+def _filtrar_fecha(query, detalle, desde=None, hasta=None):
+    """
+    Limits an event query to [desde, hasta) so only those monthly partitions
+    are scanned. The planner does not carry the range across the join, so it
+    is applied to the detail table's evento_fecha as well (if there is one).
+    """
+    if desde:
+        query = query.filter(models.Evento.fecha >= desde)
+        if detalle is not None:
+            query = query.filter(detalle.evento_fecha >= desde)
+    if hasta:
+        query = query.filter(models.Evento.fecha < hasta)
+        if detalle is not None:
+            query = query.filter(detalle.evento_fecha < hasta)
+    return query
+
+def _paginar_recientes(db: Session, query, detalle, skip: int, limit: int, desde=None, hasta=None):
+    """
+    Page of an event listing, newest first, read in date windows walking back
+    from the newest event: one day, then four times longer each time. Over the
+    whole history the planner underestimates the (evento_id, evento_fecha) and
+    ownership joins, so it joins every matching event in every partition and
+    sorts them all; within a window only its partitions are scanned and the
+    work grows with the page, not with the history. Windows before the page
+    are only counted, to consume `skip`.
+    """
+    limites = _filtrar_fecha(db.query(func.min(models.Evento.fecha), func.max(models.Evento.fecha)), None, desde, hasta)
+    primero, ultimo = limites.one()
+    rows = []
+    if primero is None:
+        return rows
+    fin = ultimo + timedelta(microseconds=1)
+    ventana = timedelta(days=1)
+    while fin > primero and len(rows) < limit:
+        inicio = max(fin - ventana, primero)
+        en_ventana = _filtrar_fecha(query, detalle, inicio, fin)
+        fin, ventana = inicio, ventana * 4
+        if skip:
+            total = en_ventana.count()
+            if total <= skip:
+                skip -= total
+                continue
+        rows += en_ventana.order_by(models.Evento.fecha.desc()).offset(skip).limit(limit - len(rows)).all()
+        skip = 0
+    return rows
+
+def get_pesos_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Peso).join(
+        models.Peso, _join_evento(models.Peso)
     ).join(
         models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(
         models.Bovino.usuario_id == user_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Peso, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "peso_actual": p.peso_actual, "peso_nuevo": p.peso_nuevo} for e, p in results]
 
-def get_pesos_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Peso).join(
-        models.Peso, models.Evento.id == models.Peso.evento_id
+def get_pesos_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _filtrar_fecha(db.query(models.Evento, models.Peso).join(
+        models.Peso, _join_evento(models.Peso)
     ).filter(
         models.Evento.bovino_id == bovino_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Peso, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "peso_actual": p.peso_actual, "peso_nuevo": p.peso_nuevo} for e, p in results]
 
 def get_peso_detail(db: Session, evento_id: str):
     result = db.query(models.Evento, models.Peso).join(
-        models.Peso, models.Evento.id == models.Peso.evento_id
+        models.Peso, _join_evento(models.Peso)
     ).filter(models.Evento.id == evento_id).first()
 
     if not result:
@@ -763,31 +792,33 @@ def get_peso_detail(db: Session, evento_id: str):
     return {"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
             "peso_actual": p.peso_actual, "peso_nuevo": p.peso_nuevo}
 
-def get_dietas_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Dieta).join(
-        models.Dieta, models.Evento.id == models.Dieta.evento_id
+def get_dietas_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Dieta).join(
+        models.Dieta, _join_evento(models.Dieta)
     ).join(
         models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(
         models.Bovino.usuario_id == user_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Dieta, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "alimento": d.alimento} for e, d in results]
 
-def get_dietas_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Dieta).join(
-        models.Dieta, models.Evento.id == models.Dieta.evento_id
+def get_dietas_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _filtrar_fecha(db.query(models.Evento, models.Dieta).join(
+        models.Dieta, _join_evento(models.Dieta)
     ).filter(
         models.Evento.bovino_id == bovino_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Dieta, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "alimento": d.alimento} for e, d in results]
 
 def get_dieta_detail(db: Session, evento_id: str):
     result = db.query(models.Evento, models.Dieta).join(
-        models.Dieta, models.Evento.id == models.Dieta.evento_id
+        models.Dieta, _join_evento(models.Dieta)
     ).filter(models.Evento.id == evento_id).first()
 
     if not result:
@@ -796,129 +827,135 @@ def get_dieta_detail(db: Session, evento_id: str):
     return {"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
             "alimento": d.alimento}
 
-def get_vacunaciones_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Vacunacion).join(
-        models.Vacunacion, models.Evento.id == models.Vacunacion.evento_id
+def get_vacunaciones_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Vacunacion).join(
+        models.Vacunacion, _join_evento(models.Vacunacion)
     ).join(
         models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(
         models.Bovino.usuario_id == user_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Vacunacion, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "veterinario_id": v.veterinario_id, "tipo": v.tipo, "lote": v.lote,
-             "laboratorio": v.laboratorio, "fecha_prox": v.fecha_prox} for e, v in results]
+             "veterinario_id": v.veterinario_id, "tipo": v.tipo, "tipo_id": v.tipo_id, "lote": v.lote,
+             "laboratorio": v.laboratorio, "laboratorio_id": v.laboratorio_id, "fecha_prox": v.fecha_prox} for e, v in results]
 
-def get_vacunaciones_all(db: Session, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Vacunacion).join(
-        models.Vacunacion, models.Evento.id == models.Vacunacion.evento_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+def get_vacunaciones_all(db: Session, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Vacunacion).join(
+        models.Vacunacion, _join_evento(models.Vacunacion)
+    ), models.Vacunacion, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "veterinario_id": v.veterinario_id, "tipo": v.tipo, "lote": v.lote,
-             "laboratorio": v.laboratorio, "fecha_prox": v.fecha_prox} for e, v in results]
+             "veterinario_id": v.veterinario_id, "tipo": v.tipo, "tipo_id": v.tipo_id, "lote": v.lote,
+             "laboratorio": v.laboratorio, "laboratorio_id": v.laboratorio_id, "fecha_prox": v.fecha_prox} for e, v in results]
 
-def get_vacunaciones_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Vacunacion).join(
-        models.Vacunacion, models.Evento.id == models.Vacunacion.evento_id
+def get_vacunaciones_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _filtrar_fecha(db.query(models.Evento, models.Vacunacion).join(
+        models.Vacunacion, _join_evento(models.Vacunacion)
     ).filter(
         models.Evento.bovino_id == bovino_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Vacunacion, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "veterinario_id": v.veterinario_id, "tipo": v.tipo, "lote": v.lote,
-             "laboratorio": v.laboratorio, "fecha_prox": v.fecha_prox} for e, v in results]
+             "veterinario_id": v.veterinario_id, "tipo": v.tipo, "tipo_id": v.tipo_id, "lote": v.lote,
+             "laboratorio": v.laboratorio, "laboratorio_id": v.laboratorio_id, "fecha_prox": v.fecha_prox} for e, v in results]
 
 def get_vacunacion_detail(db: Session, evento_id: str):
     result = db.query(models.Evento, models.Vacunacion).join(
-        models.Vacunacion, models.Evento.id == models.Vacunacion.evento_id
+        models.Vacunacion, _join_evento(models.Vacunacion)
     ).filter(models.Evento.id == evento_id).first()
 
     if not result:
         return None
     e, v = result
     return {"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-            "veterinario_id": v.veterinario_id, "tipo": v.tipo, "lote": v.lote,
-            "laboratorio": v.laboratorio, "fecha_prox": v.fecha_prox}
+            "veterinario_id": v.veterinario_id, "tipo": v.tipo, "tipo_id": v.tipo_id, "lote": v.lote,
+            "laboratorio": v.laboratorio, "laboratorio_id": v.laboratorio_id, "fecha_prox": v.fecha_prox}
 
-def get_desparasitaciones_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Desparasitacion).join(
-        models.Desparasitacion, models.Evento.id == models.Desparasitacion.evento_id
+def get_desparasitaciones_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Desparasitacion).join(
+        models.Desparasitacion, _join_evento(models.Desparasitacion)
     ).join(
         models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(
         models.Bovino.usuario_id == user_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Desparasitacion, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "veterinario_id": d.veterinario_id, "medicamento": d.medicamento,
+             "veterinario_id": d.veterinario_id, "medicamento": d.medicamento, "medicamento_id": d.medicamento_id,
              "dosis_admin": d.dosis_admin, "fecha_prox": d.fecha_prox} for e, d in results]
 
-def get_desparasitaciones_all(db: Session, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Desparasitacion).join(
-        models.Desparasitacion, models.Evento.id == models.Desparasitacion.evento_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+def get_desparasitaciones_all(db: Session, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Desparasitacion).join(
+        models.Desparasitacion, _join_evento(models.Desparasitacion)
+    ), models.Desparasitacion, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "veterinario_id": d.veterinario_id, "medicamento": d.medicamento,
+             "veterinario_id": d.veterinario_id, "medicamento": d.medicamento, "medicamento_id": d.medicamento_id,
              "dosis_admin": d.dosis_admin, "fecha_prox": d.fecha_prox} for e, d in results]
 
-def get_desparasitaciones_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Desparasitacion).join(
-        models.Desparasitacion, models.Evento.id == models.Desparasitacion.evento_id
+def get_desparasitaciones_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _filtrar_fecha(db.query(models.Evento, models.Desparasitacion).join(
+        models.Desparasitacion, _join_evento(models.Desparasitacion)
     ).filter(
         models.Evento.bovino_id == bovino_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Desparasitacion, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "veterinario_id": d.veterinario_id, "medicamento": d.medicamento,
+             "veterinario_id": d.veterinario_id, "medicamento": d.medicamento, "medicamento_id": d.medicamento_id,
              "dosis_admin": d.dosis_admin, "fecha_prox": d.fecha_prox} for e, d in results]
 
 def get_desparasitacion_detail(db: Session, evento_id: str):
     result = db.query(models.Evento, models.Desparasitacion).join(
-        models.Desparasitacion, models.Evento.id == models.Desparasitacion.evento_id
+        models.Desparasitacion, _join_evento(models.Desparasitacion)
     ).filter(models.Evento.id == evento_id).first()
 
     if not result:
         return None
     e, d = result
     return {"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-            "veterinario_id": d.veterinario_id, "medicamento": d.medicamento,
+            "veterinario_id": d.veterinario_id, "medicamento": d.medicamento, "medicamento_id": d.medicamento_id,
             "dosis_admin": d.dosis_admin, "fecha_prox": d.fecha_prox}
 
-def get_laboratorios_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Laboratorio).join(
-        models.Laboratorio, models.Evento.id == models.Laboratorio.evento_id
+def get_laboratorios_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Laboratorio).join(
+        models.Laboratorio, _join_evento(models.Laboratorio)
     ).join(
         models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(
         models.Bovino.usuario_id == user_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Laboratorio, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "veterinario_id": l.veterinario_id, "tipo": l.tipo, "resultado": l.resultado} for e, l in results]
 
-def get_laboratorios_all(db: Session, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Laboratorio).join(
-        models.Laboratorio, models.Evento.id == models.Laboratorio.evento_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+def get_laboratorios_all(db: Session, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Laboratorio).join(
+        models.Laboratorio, _join_evento(models.Laboratorio)
+    ), models.Laboratorio, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "veterinario_id": l.veterinario_id, "tipo": l.tipo, "resultado": l.resultado} for e, l in results]
 
-def get_laboratorios_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Laboratorio).join(
-        models.Laboratorio, models.Evento.id == models.Laboratorio.evento_id
+def get_laboratorios_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _filtrar_fecha(db.query(models.Evento, models.Laboratorio).join(
+        models.Laboratorio, _join_evento(models.Laboratorio)
     ).filter(
         models.Evento.bovino_id == bovino_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Laboratorio, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "veterinario_id": l.veterinario_id, "tipo": l.tipo, "resultado": l.resultado} for e, l in results]
 
 def get_laboratorio_detail(db: Session, evento_id: str):
     result = db.query(models.Evento, models.Laboratorio).join(
-        models.Laboratorio, models.Evento.id == models.Laboratorio.evento_id
+        models.Laboratorio, _join_evento(models.Laboratorio)
     ).filter(models.Evento.id == evento_id).first()
 
     if not result:
@@ -927,192 +964,243 @@ def get_laboratorio_detail(db: Session, evento_id: str):
     return {"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
             "veterinario_id": l.veterinario_id, "tipo": l.tipo, "resultado": l.resultado}
 
-def get_compraventas_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Compraventa).join(
-        models.Compraventa, models.Evento.id == models.Compraventa.evento_id
+def get_compraventas_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Compraventa).join(
+        models.Compraventa, _join_evento(models.Compraventa)
     ).join(
         models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(
         models.Bovino.usuario_id == user_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Compraventa, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "comprador_curp": c.comprador_curp, "vendedor_curp": c.vendedor_curp} for e, c in results]
+             "comprador_curp": c.comprador_curp, "vendedor_curp": c.vendedor_curp,
+             "comprador_id": c.comprador_id, "vendedor_id": c.vendedor_id} for e, c in results]
 
-def get_compraventas_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Compraventa).join(
-        models.Compraventa, models.Evento.id == models.Compraventa.evento_id
+def get_compraventas_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _filtrar_fecha(db.query(models.Evento, models.Compraventa).join(
+        models.Compraventa, _join_evento(models.Compraventa)
     ).filter(
         models.Evento.bovino_id == bovino_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Compraventa, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "comprador_curp": c.comprador_curp, "vendedor_curp": c.vendedor_curp} for e, c in results]
+             "comprador_curp": c.comprador_curp, "vendedor_curp": c.vendedor_curp,
+             "comprador_id": c.comprador_id, "vendedor_id": c.vendedor_id} for e, c in results]
 
 def get_compraventa_detail(db: Session, evento_id: str):
     result = db.query(models.Evento, models.Compraventa).join(
-        models.Compraventa, models.Evento.id == models.Compraventa.evento_id
+        models.Compraventa, _join_evento(models.Compraventa)
     ).filter(models.Evento.id == evento_id).first()
 
     if not result:
         return None
     e, c = result
     return {"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-            "comprador_curp": c.comprador_curp, "vendedor_curp": c.vendedor_curp}
-
-def _get_acquisition_date(db: Session, bovino_id: str, user_id: str):
-    """Return the fecha of the most recent compraventa where this user became owner of the bovino.
-    Returns None if the user is the original owner (no acquisition compraventa on record)."""
-    return db.execute(
-        text("""
-            SELECT e.fecha FROM eventos e
-            JOIN compraventas c ON c.evento_id = e.id
-            JOIN usuarios u ON u.curp = c.comprador_curp
-            WHERE e.bovino_id = :bovino_id AND u.id = :user_id
-            ORDER BY e.fecha DESC
-            LIMIT 1
-        """),
-        {"bovino_id": bovino_id, "user_id": user_id}
-    ).scalar()
+            "comprador_curp": c.comprador_curp, "vendedor_curp": c.vendedor_curp,
+            "comprador_id": c.comprador_id, "vendedor_id": c.vendedor_id}
+
+def get_historial_compraventas(db: Session, user_id: str, rol: str = None, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    """Compraventas where the user was the buyer ('compra'), the seller ('venta') or either."""
+    if rol == "compra":
+        condicion = models.Compraventa.comprador_id == user_id
+    elif rol == "venta":
+        condicion = models.Compraventa.vendedor_id == user_id
+    else:
+        condicion = or_(models.Compraventa.comprador_id == user_id, models.Compraventa.vendedor_id == user_id)
+    results = _filtrar_fecha(db.query(models.Evento, models.Compraventa).join(
+        models.Compraventa, _join_evento(models.Compraventa)
+    ).filter(condicion), models.Compraventa, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
-def get_traslados_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    # Only return traslados that occurred after this user acquired each bovino.
-    # The correlated subquery resolves the acquisition date per bovino; COALESCE
-    # to '-infinity' covers original owners who never bought via compraventa.
-    rows = db.execute(
-        text("""
-            SELECT e.id, e.bovino_id, e.fecha, e.observaciones,
-                   t.predio_anterior_id, t.predio_nuevo_id
-            FROM eventos e
-            JOIN traslado t ON t.evento_id = e.id
-            JOIN bovinos b ON e.bovino_id = b.id
-            WHERE b.usuario_id = :user_id
-              AND e.fecha >= COALESCE(
-                  (SELECT e2.fecha FROM eventos e2
-                   JOIN compraventas c2 ON c2.evento_id = e2.id
-                   JOIN usuarios u2 ON u2.curp = c2.comprador_curp
-                   WHERE e2.bovino_id = e.bovino_id AND u2.id = :user_id
-                   ORDER BY e2.fecha DESC LIMIT 1),
-                  '-infinity'::timestamptz
-              )
-            ORDER BY e.fecha DESC
-            LIMIT :limit OFFSET :skip
-        """),
-        {"user_id": user_id, "limit": limit, "skip": skip}
-    ).fetchall()
-
-    return [{"id": r.id, "bovino_id": r.bovino_id, "fecha": r.fecha, "observaciones": r.observaciones,
-             "predio_anterior_id": r.predio_anterior_id, "predio_nuevo_id": r.predio_nuevo_id} for r in rows]
-
-def get_traslados_by_bovino(db: Session, bovino_id: str, user_id: str, skip: int = 0, limit: int = 100):
-    acquisition_date = _get_acquisition_date(db, bovino_id, user_id)
+    return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
+             "comprador_curp": c.comprador_curp, "vendedor_curp": c.vendedor_curp,
+             "comprador_id": c.comprador_id, "vendedor_id": c.vendedor_id} for e, c in results]
 
+def get_resumen_compraventas(db: Session, user_id: str, desde=None, hasta=None):
+    """
+    Head bought and sold by the user, per counterparty and per month. Each
+    compraventa is one bovino, so the counts are the traded volume.
+    """
+    movimientos = """
+        WITH mov AS (
+            SELECT evento_fecha, 1 AS compra, 0 AS venta, vendedor_id AS contraparte
+            FROM compraventas
+            WHERE comprador_id = :uid
+              AND evento_fecha >= COALESCE(CAST(:desde AS TIMESTAMPTZ), '-infinity')
+              AND evento_fecha < COALESCE(CAST(:hasta AS TIMESTAMPTZ), 'infinity')
+            UNION ALL
+            SELECT evento_fecha, 0, 1, comprador_id
+            FROM compraventas
+            WHERE vendedor_id = :uid
+              AND evento_fecha >= COALESCE(CAST(:desde AS TIMESTAMPTZ), '-infinity')
+              AND evento_fecha < COALESCE(CAST(:hasta AS TIMESTAMPTZ), 'infinity')
+        )
+    """
+    params = {"uid": user_id, "desde": desde, "hasta": hasta}
+    contrapartes = db.execute(text(movimientos + """
+        SELECT m.contraparte AS usuario_id, u.curp,
+               SUM(m.compra)::int AS compras, SUM(m.venta)::int AS ventas,
+               MAX(m.evento_fecha) AS ultima_fecha
+        FROM mov m
+        LEFT JOIN usuarios u ON u.id = m.contraparte
+        GROUP BY m.contraparte, u.curp
+        ORDER BY COUNT(*) DESC, MAX(m.evento_fecha) DESC
+    """), params).mappings().all()
+    por_mes = db.execute(text(movimientos + """
+        SELECT date_trunc('month', evento_fecha)::date AS mes,
+               SUM(compra)::int AS compras, SUM(venta)::int AS ventas
+        FROM mov
+        GROUP BY 1
+        ORDER BY 1
+    """), params).mappings().all()
+
+    return {"compras": sum(m["compras"] for m in por_mes), "ventas": sum(m["ventas"] for m in por_mes),
+            "contrapartes": contrapartes, "por_mes": por_mes}
+
+def get_propiedad_bovino(db: Session, bovino_id: str, fecha=None):
+    """Ownership periods of a bovino, newest first; only the one containing `fecha` when given."""
+    return db.execute(text("""
+        SELECT usuario_id, NULLIF(lower(periodo), '-infinity') AS desde, upper(periodo) AS hasta, evento_id
+        FROM bovino_propiedad
+        WHERE bovino_id = :bid
+          AND (CAST(:fecha AS TIMESTAMPTZ) IS NULL OR periodo @> CAST(:fecha AS TIMESTAMPTZ))
+        ORDER BY lower(periodo) DESC
+    """), {"bid": bovino_id, "fecha": fecha}).mappings().all()
+
+def get_propietario(db: Session, bovino_id: str, fecha) -> str | None:
+    """Id of the user who owned the bovino at `fecha`, or None."""
+    periodos = get_propiedad_bovino(db, bovino_id, fecha)
+    return str(periodos[0]["usuario_id"]) if periodos else None
+
+def get_traslados_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    # Only return traslados that occurred while this user owned each bovino
+    results = _paginar_recientes(db, db.query(models.Evento, models.Traslado).join(
+        models.Traslado, _join_evento(models.Traslado)
+    ).join(
+        models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
+    ).filter(
+        models.Bovino.usuario_id == user_id
+    ), models.Traslado, skip, limit, desde, hasta)
+
+    return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
+             "predio_anterior_id": t.predio_anterior_id, "predio_nuevo_id": t.predio_nuevo_id} for e, t in results]
+
+def get_traslados_by_bovino(db: Session, bovino_id: str, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
     query = db.query(models.Evento, models.Traslado).join(
-        models.Traslado, models.Evento.id == models.Traslado.evento_id
+        models.Traslado, _join_evento(models.Traslado)
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(models.Evento.bovino_id == bovino_id)
 
-    if acquisition_date:
-        query = query.filter(models.Evento.fecha >= acquisition_date)
-
-    results = query.order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    results = _filtrar_fecha(query, models.Traslado, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "predio_anterior_id": t.predio_anterior_id, "predio_nuevo_id": t.predio_nuevo_id} for e, t in results]
 
 def get_traslado_detail(db: Session, evento_id: str, user_id: str):
     result = db.query(models.Evento, models.Traslado).join(
-        models.Traslado, models.Evento.id == models.Traslado.evento_id
+        models.Traslado, _join_evento(models.Traslado)
     ).filter(models.Evento.id == evento_id).first()
 
     if not result:
         return None
     e, t = result
 
-    # Check the event is not before this user's acquisition of the bovino
-    acquisition_date = _get_acquisition_date(db, str(e.bovino_id), user_id)
-    if acquisition_date and e.fecha < acquisition_date:
+    # Check the event happened while this user owned the bovino
+    if get_propietario(db, str(e.bovino_id), e.fecha) != user_id:
         return None
 
     return {"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
             "predio_anterior_id": t.predio_anterior_id, "predio_nuevo_id": t.predio_nuevo_id}
 
-def get_enfermedades_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Enfermedad).join(
-        models.Enfermedad, models.Evento.id == models.Enfermedad.evento_id
+def get_enfermedades_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Enfermedad).join(
+        models.Enfermedad, _join_evento(models.Enfermedad)
     ).join(
         models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(
         models.Bovino.usuario_id == user_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Enfermedad, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "enfermedad_id": enf.id, "veterinario_id": enf.veterinario_id, "tipo": enf.tipo} for e, enf in results]
+             "enfermedad_id": enf.id, "veterinario_id": enf.veterinario_id, "tipo": enf.tipo, "tipo_id": enf.tipo_id} for e, enf in results]
 
-def get_enfermedades_all(db: Session, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Enfermedad).join(
-        models.Enfermedad, models.Evento.id == models.Enfermedad.evento_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+def get_enfermedades_all(db: Session, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Enfermedad).join(
+        models.Enfermedad, _join_evento(models.Enfermedad)
+    ), models.Enfermedad, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "enfermedad_id": enf.id, "veterinario_id": enf.veterinario_id, "tipo": enf.tipo} for e, enf in results]
+             "enfermedad_id": enf.id, "veterinario_id": enf.veterinario_id, "tipo": enf.tipo, "tipo_id": enf.tipo_id} for e, enf in results]
 
-def get_enfermedades_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Enfermedad).join(
-        models.Enfermedad, models.Evento.id == models.Enfermedad.evento_id
+def get_enfermedades_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _filtrar_fecha(db.query(models.Evento, models.Enfermedad).join(
+        models.Enfermedad, _join_evento(models.Enfermedad)
     ).filter(
         models.Evento.bovino_id == bovino_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Enfermedad, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-             "enfermedad_id": enf.id, "veterinario_id": enf.veterinario_id, "tipo": enf.tipo} for e, enf in results]
+             "enfermedad_id": enf.id, "veterinario_id": enf.veterinario_id, "tipo": enf.tipo, "tipo_id": enf.tipo_id} for e, enf in results]
 
 def get_enfermedad_detail(db: Session, evento_id: str):
     result = db.query(models.Evento, models.Enfermedad).join(
-        models.Enfermedad, models.Evento.id == models.Enfermedad.evento_id
+        models.Enfermedad, _join_evento(models.Enfermedad)
     ).filter(models.Evento.id == evento_id).first()
 
     if not result:
         return None
     e, enf = result
     return {"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
-            "enfermedad_id": enf.id, "veterinario_id": enf.veterinario_id, "tipo": enf.tipo}
+            "enfermedad_id": enf.id, "veterinario_id": enf.veterinario_id, "tipo": enf.tipo, "tipo_id": enf.tipo_id}
 
-def get_tratamientos_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Tratamiento).join(
-        models.Tratamiento, models.Evento.id == models.Tratamiento.evento_id
+def get_tratamientos_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Tratamiento).join(
+        models.Tratamiento, _join_evento(models.Tratamiento)
     ).join(
         models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(
         models.Bovino.usuario_id == user_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Tratamiento, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "enfermedad_id": t.enfermedad_id, "veterinario_id": t.veterinario_id,
-             "medicamento": t.medicamento, "dosis": t.dosis, "periodo": t.periodo} for e, t in results]
+             "medicamento": t.medicamento, "medicamento_id": t.medicamento_id,
+             "dosis": t.dosis, "periodo": t.periodo} for e, t in results]
 
-def get_tratamientos_all(db: Session, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Tratamiento).join(
-        models.Tratamiento, models.Evento.id == models.Tratamiento.evento_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+def get_tratamientos_all(db: Session, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Tratamiento).join(
+        models.Tratamiento, _join_evento(models.Tratamiento)
+    ), models.Tratamiento, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "enfermedad_id": t.enfermedad_id, "veterinario_id": t.veterinario_id,
-             "medicamento": t.medicamento, "dosis": t.dosis, "periodo": t.periodo} for e, t in results]
+             "medicamento": t.medicamento, "medicamento_id": t.medicamento_id,
+             "dosis": t.dosis, "periodo": t.periodo} for e, t in results]
 
-def get_tratamientos_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Tratamiento).join(
-        models.Tratamiento, models.Evento.id == models.Tratamiento.evento_id
+def get_tratamientos_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _filtrar_fecha(db.query(models.Evento, models.Tratamiento).join(
+        models.Tratamiento, _join_evento(models.Tratamiento)
     ).filter(
         models.Evento.bovino_id == bovino_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Tratamiento, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "enfermedad_id": t.enfermedad_id, "veterinario_id": t.veterinario_id,
-             "medicamento": t.medicamento, "dosis": t.dosis, "periodo": t.periodo} for e, t in results]
+             "medicamento": t.medicamento, "medicamento_id": t.medicamento_id,
+             "dosis": t.dosis, "periodo": t.periodo} for e, t in results]
 
 def get_tratamiento_detail(db: Session, evento_id: str):
     result = db.query(models.Evento, models.Tratamiento).join(
-        models.Tratamiento, models.Evento.id == models.Tratamiento.evento_id
+        models.Tratamiento, _join_evento(models.Tratamiento)
     ).filter(models.Evento.id == evento_id).first()
 
     if not result:
@@ -1120,52 +1208,56 @@ def get_tratamiento_detail(db: Session, evento_id: str):
     e, t = result
     return {"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
             "enfermedad_id": t.enfermedad_id, "veterinario_id": t.veterinario_id,
-            "medicamento": t.medicamento, "dosis": t.dosis, "periodo": t.periodo}
+            "medicamento": t.medicamento, "medicamento_id": t.medicamento_id,
+            "dosis": t.dosis, "periodo": t.periodo}
 
 def get_tratamientos_by_enfermedad(db: Session, enfermedad_id: str, skip: int = 0, limit: int = 100):
     results = db.query(models.Evento, models.Tratamiento).join(
-        models.Tratamiento, models.Evento.id == models.Tratamiento.evento_id
+        models.Tratamiento, _join_evento(models.Tratamiento)
     ).filter(
         models.Tratamiento.enfermedad_id == enfermedad_id
     ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "enfermedad_id": t.enfermedad_id, "veterinario_id": t.veterinario_id,
-             "medicamento": t.medicamento, "dosis": t.dosis, "periodo": t.periodo} for e, t in results]
+             "medicamento": t.medicamento, "medicamento_id": t.medicamento_id,
+             "dosis": t.dosis, "periodo": t.periodo} for e, t in results]
 
-def get_remisiones_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Remision).join(
-        models.Remision, models.Evento.id == models.Remision.evento_id
+def get_remisiones_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Remision).join(
+        models.Remision, _join_evento(models.Remision)
     ).join(
         models.Bovino, models.Evento.bovino_id == models.Bovino.id
+    ).join(
+        models.BovinoPropiedad, _en_propiedad(user_id)
     ).filter(
         models.Bovino.usuario_id == user_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Remision, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "enfermedad_id": r.enfermedad_id, "veterinario_id": r.veterinario_id} for e, r in results]
 
-def get_remisiones_all(db: Session, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Remision).join(
-        models.Remision, models.Evento.id == models.Remision.evento_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+def get_remisiones_all(db: Session, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _paginar_recientes(db, db.query(models.Evento, models.Remision).join(
+        models.Remision, _join_evento(models.Remision)
+    ), models.Remision, skip, limit, desde, hasta)
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "enfermedad_id": r.enfermedad_id, "veterinario_id": r.veterinario_id} for e, r in results]
 
-def get_remisiones_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100):
-    results = db.query(models.Evento, models.Remision).join(
-        models.Remision, models.Evento.id == models.Remision.evento_id
+def get_remisiones_by_bovino(db: Session, bovino_id: str, skip: int = 0, limit: int = 100, desde=None, hasta=None):
+    results = _filtrar_fecha(db.query(models.Evento, models.Remision).join(
+        models.Remision, _join_evento(models.Remision)
     ).filter(
         models.Evento.bovino_id == bovino_id
-    ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
+    ), models.Remision, desde, hasta).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "enfermedad_id": r.enfermedad_id, "veterinario_id": r.veterinario_id} for e, r in results]
 
 def get_remision_detail(db: Session, evento_id: str):
     result = db.query(models.Evento, models.Remision).join(
-        models.Remision, models.Evento.id == models.Remision.evento_id
+        models.Remision, _join_evento(models.Remision)
     ).filter(models.Evento.id == evento_id).first()
 
     if not result:
@@ -1176,10 +1268,70 @@ def get_remision_detail(db: Session, evento_id: str):
 
 def get_remisiones_by_enfermedad(db: Session, enfermedad_id: str, skip: int = 0, limit: int = 100):
     results = db.query(models.Evento, models.Remision).join(
-        models.Remision, models.Evento.id == models.Remision.evento_id
+        models.Remision, _join_evento(models.Remision)
     ).filter(
         models.Remision.enfermedad_id == enfermedad_id
     ).order_by(models.Evento.fecha.desc()).offset(skip).limit(limit).all()
 
     return [{"id": e.id, "bovino_id": e.bovino_id, "fecha": e.fecha, "observaciones": e.observaciones,
              "enfermedad_id": r.enfermedad_id, "veterinario_id": r.veterinario_id} for e, r in results]
+
+# ==================== CATALOGOS ====================
+
+# Integer catalog columns per tipo; medicamento is shared by desparasitaciones and tratamientos
+_CATALOGO_COLUMNAS = {
+    models.CatalogoTipoEnum.vacuna: [models.Vacunacion.tipo_id],
+    models.CatalogoTipoEnum.laboratorio: [models.Vacunacion.laboratorio_id],
+    models.CatalogoTipoEnum.medicamento: [models.Desparasitacion.medicamento_id, models.Tratamiento.medicamento_id],
+    models.CatalogoTipoEnum.enfermedad: [models.Enfermedad.tipo_id],
+}
+
+def get_catalogos(db: Session, tipo: models.CatalogoTipoEnum, q: str = None, skip: int = 0, limit: int = 100):
+    query = db.query(models.Catalogo).filter(models.Catalogo.tipo == tipo)
+    if q:
+        # Match against any registered alias, so "aftosa" finds "Fiebre Aftosa".
+        # strpos rather than LIKE: "%" and "_" in the search are plain characters.
+        alias_match = db.query(models.CatalogoAlias.catalogo_id).filter(
+            models.CatalogoAlias.tipo == tipo,
+            func.strpos(models.CatalogoAlias.alias, func.normalizar_catalogo(q)) > 0
+        )
+        query = query.filter(models.Catalogo.id.in_(alias_match))
+    return query.order_by(models.Catalogo.nombre.asc()).offset(skip).limit(limit).all()
+
+def get_catalogo(db: Session, catalogo_id: int):
+    return db.query(models.Catalogo).filter(models.Catalogo.id == catalogo_id).first()
+
+def asignar_alias_catalogo(db: Session, tipo: models.CatalogoTipoEnum, alias: str, catalogo_id: int) -> int:
+    """Points an alias at a catalog entry and re-links the detail rows that used it."""
+    actualizados = db.execute(
+        text("SELECT asignar_alias_catalogo(CAST(:tipo AS catalogo_tipo_enum), :alias, :cid)"),
+        {"tipo": tipo.value, "alias": alias, "cid": catalogo_id}
+    ).scalar()
+    db.commit()
+    return actualizados
+
+def get_conteos_catalogo(db: Session, tipo: models.CatalogoTipoEnum, desde=None, hasta=None, limit: int = 100):
+    """Counts per catalog entry, grouped on the integer id columns instead of free text."""
+    if tipo == models.CatalogoTipoEnum.raza:
+        ids = db.query(models.Bovino.raza_id.label("catalogo_id")).filter(
+            models.Bovino.raza_id.isnot(None), models.Bovino.status == "activo"
+        )
+    else:
+        partes = []
+        for columna in _CATALOGO_COLUMNAS[tipo]:
+            parte = db.query(columna.label("catalogo_id")).join(
+                models.Evento, _join_evento(columna.class_)
+            ).filter(columna.isnot(None))
+            partes.append(_filtrar_fecha(parte, columna.class_, desde, hasta))
+        ids = partes[0].union_all(*partes[1:]) if len(partes) > 1 else partes[0]
+
+    ids = ids.subquery()
+    conteos = db.query(
+        ids.c.catalogo_id, func.count().label("total")
+    ).group_by(ids.c.catalogo_id).subquery()
+
+    results = db.query(models.Catalogo.id, models.Catalogo.nombre, conteos.c.total).join(
+        conteos, conteos.c.catalogo_id == models.Catalogo.id
+    ).order_by(conteos.c.total.desc()).limit(limit).all()
+
+    return [{"catalogo_id": cid, "nombre": nombre, "total": total} for cid, nombre, total in results]
@@ -0,0 +1,51 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+
+# Reads only agenda_sanitaria (one row per bovino and product, latest dose);
+# the due-date window uses idx_agenda_sanitaria_fecha / _veterinario
+_AGENDA = """
+    FROM agenda_sanitaria a
+    JOIN bovinos b ON b.id = a.bovino_id
+    JOIN catalogos c ON c.id = a.producto_id
+    LEFT JOIN instalaciones i ON i.id = b.instalacion_id
+    WHERE a.fecha_prox IS NOT NULL
+      AND a.fecha_prox BETWEEN CURRENT_DATE - :vencidos_dias AND CURRENT_DATE + :dias
+      AND b.status NOT IN ('sacrificado', 'muerto', 'exportado')
+"""
+
+_FILTROS = {
+    "usuario_id": " AND b.usuario_id = :usuario_id",
+    "veterinario_id": " AND a.veterinario_id = :veterinario_id",
+    "instalacion_id": " AND b.instalacion_id = :instalacion_id",
+    "tipo": " AND a.tipo = CAST(:tipo AS campana_tipo_enum)",
+}
+
+def get_agenda(db: Session, dias: int = 7, vencidos_dias: int = 90, skip: int = 0, limit: int = 100, **filtros):
+    """
+    Booster dates due in the next `dias` days or overdue up to `vencidos_dias`,
+    for the latest dose of each product per bovino still in a herd. Filters: usuario_id
+    (owner), veterinario_id (who applied the dose), instalacion_id, tipo.
+    """
+    params = {k: str(v) for k, v in filtros.items() if v is not None}
+    params.update({"dias": dias, "vencidos_dias": vencidos_dias})
+    where = _AGENDA + "".join(_FILTROS[k] for k in filtros if filtros[k] is not None)
+
+    conteo = db.execute(text(
+        "SELECT count(*) FILTER (WHERE a.fecha_prox < CURRENT_DATE) AS vencidos, "
+        "count(*) FILTER (WHERE a.fecha_prox >= CURRENT_DATE) AS proximos " + where
+    ), params).one()
+    rows = db.execute(text("""
+        SELECT a.bovino_id, b.folio, b.nombre, b.arete_barcode, b.usuario_id,
+               b.instalacion_id, i.nombre AS instalacion_nombre,
+               a.tipo, a.producto_id, c.nombre AS producto, a.evento_id, a.veterinario_id,
+               a.fecha_aplicacion, a.fecha_prox, a.fecha_prox - CURRENT_DATE AS dias
+    """ + where + """
+        ORDER BY a.fecha_prox, b.folio
+        OFFSET :skip LIMIT :limit
+    """), {**params, "skip": skip, "limit": limit}).mappings().all()
+
+    return {
+        "vencidos": conteo.vencidos,
+        "proximos": conteo.proximos,
+        "items": [dict(r, vencido=r["dias"] < 0) for r in rows],
+    }
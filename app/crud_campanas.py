@@ -0,0 +1,139 @@
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import text, or_
+from fastapi import HTTPException
+from datetime import date
+import os
+
+from . import models, schemas
+
+# Hours during which an application can be undone with POST /campanas/{id}/revertir
+CAMPANA_VENTANA_REVERSION_HORAS = int(os.getenv("CAMPANA_VENTANA_REVERSION_HORAS", 24))
+
+def _validar_instalacion(instalacion: models.Instalacion):
+    if not instalacion.active:
+        raise HTTPException(status_code=409, detail="La instalación no está activa")
+    if instalacion.facility_type in [models.FacilityTypeEnum.UPP, models.FacilityTypeEnum.PSG]:
+        if instalacion.fecha_vencimiento and instalacion.fecha_vencimiento < date.today():
+            raise HTTPException(status_code=409, detail="La licencia de la instalación (UPP/PSG) ha expirado")
+
+def create_campana(db: Session, campana: schemas.CampanaCreate, usuario_id: str):
+    veterinario = db.query(models.Veterinario).filter(models.Veterinario.usuario_id == usuario_id).first()
+    if not veterinario:
+        raise HTTPException(status_code=403, detail="No veterinarian profile found for this user")
+
+    if not campana.instalacion_id and not campana.filtro_usuario_id:
+        raise HTTPException(status_code=400, detail="Debe indicar instalacion_id o filtro_usuario_id")
+
+    # Same required fields as the single vacunacion/desparasitacion events
+    if campana.tipo == schemas.CampanaTipoEnum.vacunacion:
+        faltantes = [c for c in ('lote', 'laboratorio', 'fecha_prox') if not getattr(campana, c)]
+    else:
+        faltantes = [c for c in ('dosis', 'fecha_prox') if not getattr(campana, c)]
+    if faltantes:
+        raise HTTPException(status_code=422, detail=f"Missing fields: {', '.join(faltantes)}")
+
+    if campana.instalacion_id:
+        instalacion = db.query(models.Instalacion).filter(models.Instalacion.id == campana.instalacion_id).first()
+        if not instalacion:
+            raise HTTPException(status_code=404, detail="Instalacion no encontrada")
+        _validar_instalacion(instalacion)
+
+    producto_tipo = 'vacuna' if campana.tipo == schemas.CampanaTipoEnum.vacunacion else 'medicamento'
+    producto_id = db.execute(
+        text("SELECT resolver_catalogo(CAST(:tipo AS catalogo_tipo_enum), :nombre)"),
+        {"tipo": producto_tipo, "nombre": campana.producto}
+    ).scalar()
+    laboratorio_id = None
+    if campana.laboratorio:
+        laboratorio_id = db.execute(
+            text("SELECT resolver_catalogo('laboratorio', :nombre)"), {"nombre": campana.laboratorio}
+        ).scalar()
+
+    db_campana = models.Campana(
+        **campana.model_dump(),
+        creado_por_id=usuario_id,
+        veterinario_id=veterinario.id,
+        producto_id=producto_id,
+        laboratorio_id=laboratorio_id
+    )
+    db.add(db_campana)
+    db.commit()
+    db.refresh(db_campana)
+    return db_campana
+
+def get_campanas(db: Session, skip: int = 0, limit: int = 100, veterinario_usuario_id: str = None,
+                 propietario_id: str = None, instalacion_id: str = None, estado: str = None):
+    query = db.query(models.Campana)
+    if veterinario_usuario_id:
+        query = query.join(models.Veterinario, models.Campana.veterinario_id == models.Veterinario.id).filter(
+            models.Veterinario.usuario_id == veterinario_usuario_id
+        )
+    if propietario_id:
+        # Owners see campaigns aimed at their facilities or at their herd
+        query = query.outerjoin(models.Instalacion, models.Campana.instalacion_id == models.Instalacion.id).filter(
+            or_(models.Instalacion.usuario_id == propietario_id, models.Campana.filtro_usuario_id == propietario_id)
+        )
+    if instalacion_id:
+        query = query.filter(models.Campana.instalacion_id == instalacion_id)
+    if estado:
+        query = query.filter(models.Campana.estado == estado)
+    return query.order_by(models.Campana.created_at.desc()).offset(skip).limit(limit).all()
+
+def get_campana(db: Session, campana_id: str):
+    return db.query(models.Campana).options(joinedload(models.Campana.instalacion)) \
+        .filter(models.Campana.id == campana_id).first()
+
+def count_pendientes(db: Session, campana_id) -> int:
+    return db.execute(
+        text("SELECT count(*) FROM campana_pendientes(:cid)"), {"cid": str(campana_id)}
+    ).scalar()
+
+def with_cobertura(db: Session, campana: models.Campana) -> schemas.CampanaResponse:
+    """Adds pending count and coverage; reads campana_bovinos via the counter, never vacunaciones."""
+    response = schemas.CampanaResponse.model_validate(campana)
+    response.pendientes = count_pendientes(db, campana.id)
+    elegibles = campana.total_aplicados + response.pendientes
+    response.cobertura = round(campana.total_aplicados / elegibles, 4) if elegibles else None
+    return response
+
+def aplicar_campana(db: Session, campana: models.Campana, bovino_ids: list = None) -> int:
+    if campana.estado == models.CampanaEstadoEnum.cerrada:
+        raise HTTPException(status_code=409, detail="La campaña está cerrada")
+    if campana.instalacion_id:
+        _validar_instalacion(campana.instalacion)
+
+    aplicados = db.execute(
+        text("SELECT aplicar_campana(:cid, CAST(:bids AS UUID[]))"),
+        {"cid": str(campana.id), "bids": [str(b) for b in bovino_ids] if bovino_ids is not None else None}
+    ).scalar()
+    db.commit()
+    db.refresh(campana)
+    return aplicados
+
+def revertir_campana(db: Session, campana: models.Campana) -> int:
+    revertidos = db.execute(
+        text("SELECT revertir_campana(:cid, make_interval(hours => :horas))"),
+        {"cid": str(campana.id), "horas": CAMPANA_VENTANA_REVERSION_HORAS}
+    ).scalar()
+    db.commit()
+    db.refresh(campana)
+    return revertidos
+
+def cerrar_campana(db: Session, campana: models.Campana):
+    campana.estado = models.CampanaEstadoEnum.cerrada
+    db.commit()
+    db.refresh(campana)
+    return campana
+
+def get_campana_bovinos(db: Session, campana_id: str, pendientes: bool = False, skip: int = 0, limit: int = 100):
+    """Bovinos already covered by the campaign, or the ones still pending."""
+    if pendientes:
+        ids = text("SELECT bovino_id FROM campana_pendientes(:cid)").bindparams(cid=str(campana_id)) \
+            .columns(bovino_id=models.Bovino.id.type).subquery()
+        query = db.query(models.Bovino).filter(models.Bovino.id.in_(db.query(ids.c.bovino_id)))
+    else:
+        query = db.query(models.Bovino).join(
+            models.CampanaBovino, models.CampanaBovino.bovino_id == models.Bovino.id
+        ).filter(models.CampanaBovino.campana_id == campana_id)
+    return query.options(joinedload(models.Bovino.instalacion)) \
+        .order_by(models.Bovino.folio.asc()).offset(skip).limit(limit).all()
@@ -0,0 +1,428 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+import itertools
+import threading
+import os
+
+import numpy as np
+
+from . import metricas
+
+# Target weight used for the projected market date when the client sends none
+CRECIMIENTO_PESO_MERCADO_KG = float(os.getenv("CRECIMIENTO_PESO_MERCADO_KG", 450))
+# Robust z-score (median/MAD) above which a daily gain is flagged as an outlier
+CRECIMIENTO_UMBRAL_ATIPICO = float(os.getenv("CRECIMIENTO_UMBRAL_ATIPICO", 3.5))
+# Analyses kept in memory (one per herd/instalación/bovino and parameters)
+CRECIMIENTO_CACHE_MAX = int(os.getenv("CRECIMIENTO_CACHE_MAX", 256))
+
+DIAS_MES = 30.4375
+PERCENTILES_CURVA = (10, 25, 50, 75, 90)
+MIN_ANIMALES_CURVA = 3
+_EPOCA = date(1970, 1, 1)
+_SEXO_CODIGO = {'M': 1, 'F': 2, 'X': 3}
+
+# Scope filters over bovinos b; herds only include active animals
+_SCOPES = {
+    "usuario": "b.usuario_id = :sid AND b.status = 'activo'",
+    "instalacion": "b.instalacion_id = :sid AND b.status = 'activo'",
+    "bovino": "b.id = :sid",
+}
+
+# Any new peso bumps bovinos.updated_at (peso_actual trigger); the counts catch
+# animals leaving the scope and deleted weighings
+_VERSION = """
+    SELECT (SELECT count(*) FROM bovinos b WHERE {f}),
+           (SELECT max(b.updated_at) FROM bovinos b WHERE {f}),
+           (SELECT count(*) FROM bovinos b JOIN eventos e ON e.bovino_id = b.id
+                JOIN pesos p ON p.evento_id = e.id AND p.evento_fecha = e.fecha WHERE {f})
+"""
+
+# One bulk fetch: a row per animal in scope with its weighings as date-ordered
+# arrays (epoch days and kg), so the client receives a few columns, not a row
+# per weighing
+_DATOS = """
+    SELECT b.id, b.folio, CAST(b.sexo AS TEXT) AS sexo,
+           COALESCE(CAST(b.fecha_nac - DATE '1970-01-01' AS FLOAT8), 'NaN') AS nac,
+           COALESCE(CAST(b.peso_nac AS FLOAT8), 'NaN') AS peso_nac,
+           array_agg(CAST(EXTRACT(EPOCH FROM e.fecha) AS FLOAT8) / 86400 ORDER BY e.fecha, e.id)
+               FILTER (WHERE p.peso_nuevo IS NOT NULL) AS fechas,
+           array_agg(CAST(p.peso_nuevo AS FLOAT8) ORDER BY e.fecha, e.id)
+               FILTER (WHERE p.peso_nuevo IS NOT NULL) AS pesos
+    FROM bovinos b
+    LEFT JOIN (eventos e JOIN pesos p ON p.evento_id = e.id AND p.evento_fecha = e.fecha) ON e.bovino_id = b.id
+    WHERE {f}
+    GROUP BY b.id
+    ORDER BY b.id
+"""
+
+# Evento ids of the flagged weighings, by position in the same ordering as _DATOS
+_EVENTOS_POSICION = """
+    SELECT x.bovino_id, x.pos, x.id
+    FROM (
+        SELECT e.bovino_id, e.id, row_number() OVER (PARTITION BY e.bovino_id ORDER BY e.fecha, e.id) AS pos
+        FROM eventos e JOIN pesos p ON p.evento_id = e.id AND p.evento_fecha = e.fecha
+        WHERE e.bovino_id = ANY(CAST(:bids AS UUID[])) AND p.peso_nuevo IS NOT NULL
+    ) x
+    JOIN unnest(CAST(:bids AS UUID[]), CAST(:pos AS BIGINT[])) AS f(bovino_id, pos)
+      ON f.bovino_id = x.bovino_id AND f.pos = x.pos
+"""
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _fechas(dias: np.ndarray) -> list:
+    """Epoch days -> list of dates (None where NaN), converted in one pass."""
+    fechas = np.full(dias.shape, np.datetime64('NaT'), dtype='datetime64[D]')
+    finitos = np.isfinite(dias)
+    fechas[finitos] = np.floor(dias[finitos]).astype(np.int64).astype('datetime64[D]')
+    return fechas.tolist()
+
+def _valores(valores: np.ndarray, decimales: int) -> list:
+    """Rounded floats as a list, None where NaN."""
+    return [None if v != v else v for v in np.round(valores, decimales).tolist()]
+
+def _robust_z(x: np.ndarray) -> np.ndarray:
+    if x.size < 3:
+        return np.zeros_like(x)
+    mediana = np.median(x)
+    mad = np.median(np.abs(x - mediana)) * 1.4826
+    if mad == 0:
+        return np.zeros_like(x)
+    return (x - mediana) / mad
+
+def _percentiles_por_grupo(claves: np.ndarray, valores: np.ndarray):
+    """
+    Percentile rank (0-100) of each value within its group, plus the
+    PERCENTILES_CURVA of every group with enough animals. Fully vectorized:
+    one lexsort, then index arithmetic on the group boundaries.
+    """
+    orden = np.lexsort((valores, claves))
+    claves_ord, valores_ord = claves[orden], valores[orden]
+    grupos, inicio, conteo = np.unique(claves_ord, return_index=True, return_counts=True)
+    grupo_de = np.repeat(np.arange(grupos.size), conteo)
+
+    rango = np.arange(claves_ord.size) - inicio[grupo_de]
+    n = conteo[grupo_de]
+    pct_ord = np.where(n > 1, 100.0 * rango / np.maximum(n - 1, 1), np.nan)
+    pct = np.empty_like(pct_ord)
+    pct[orden] = pct_ord
+
+    posiciones = inicio[:, None] + np.array(PERCENTILES_CURVA) / 100.0 * (conteo[:, None] - 1)
+    bajo = np.floor(posiciones).astype(int)
+    alto = np.ceil(posiciones).astype(int)
+    frac = posiciones - bajo
+    curva = valores_ord[bajo] * (1 - frac) + valores_ord[alto] * frac
+    return pct, grupos, conteo, curva
+
+def _vacio(total: int = 0) -> dict:
+    return {"total_bovinos": total, "con_pesos": 0, "adg_promedio": None, "adg_mediana": None,
+            "curva": [], "bovinos": [], "indice": {}}
+
+def _analizar(rows, peso_mercado: float, umbral: float) -> dict:
+    """
+    Vectorized analysis: weighings of all animals are concatenated into flat
+    arrays with a group index g, and per-animal figures come from grouped
+    sums (bincount) and boundary indexes instead of Python loops.
+    Outlier weighings are returned as positions; see _resolver_atipicos.
+    """
+    total = len(rows)
+    if not total:
+        return _vacio()
+
+    ids, folios, sexos, nac, peso_nac, ts, ws = zip(*rows)
+    nac_b = np.array(nac, dtype=np.float64)
+    peso_nac_b = np.array(peso_nac, dtype=np.float64)
+    n = np.fromiter((len(x) if x else 0 for x in ts), dtype=np.int64, count=total)
+    m = int(n.sum())
+    if not m:
+        return _vacio(total)
+    tv = np.fromiter(itertools.chain.from_iterable(x for x in ts if x), dtype=np.float64, count=m)
+    wv = np.fromiter(itertools.chain.from_iterable(x for x in ws if x), dtype=np.float64, count=m)
+    gv = np.repeat(np.arange(total), n)
+    con_pesos = n > 0
+
+    fin = np.cumsum(n)
+    inicio = fin - n
+    ultimo = np.clip(fin - 1, 0, m - 1)
+    t0 = tv[np.minimum(inicio, m - 1)]
+
+    # ADG: least-squares slope of weight over time per bovino (grouped sums)
+    tc = tv - t0[gv]
+    st, sw = np.bincount(gv, tc, total), np.bincount(gv, wv, total)
+    stt, stw = np.bincount(gv, tc * tc, total), np.bincount(gv, tc * wv, total)
+    denominador = n * stt - st * st
+    with np.errstate(divide='ignore', invalid='ignore'):
+        adg = np.where((n >= 2) & (denominador > 1e-9), (n * stw - st * sw) / denominador, np.nan)
+
+    t_ult = np.where(con_pesos, tv[ultimo], np.nan)
+    w_ult = np.where(con_pesos, wv[ultimo], np.nan)
+    previo = np.maximum(ultimo - 1, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dt_ult = t_ult - tv[previo]
+        adg_reciente = np.where((n >= 2) & (dt_ult > 0), (w_ult - wv[previo]) / dt_ult, np.nan)
+        adg_vida = np.where(t_ult > nac_b, (w_ult - peso_nac_b) / (t_ult - nac_b), np.nan)
+    edad = t_ult - nac_b
+
+    # Outlier weighings: daily gain between consecutive weighings, robust z over the whole scope
+    mismo = gv[1:] == gv[:-1]
+    dt = np.diff(tv)
+    intervalo = np.flatnonzero(mismo & (dt >= 0.5))
+    ganancia = (wv[intervalo + 1] - wv[intervalo]) / dt[intervalo]
+    fila_atipica = intervalo[np.abs(_robust_z(ganancia)) > umbral] + 1
+
+    # Outlier animals: ADG far from the scope's median
+    adg_atipico = np.zeros(total, dtype=bool)
+    con_adg = np.flatnonzero(np.isfinite(adg))
+    adg_atipico[con_adg] = np.abs(_robust_z(adg[con_adg])) > umbral
+
+    # Weight-for-age percentile within sex and age in months
+    percentil = np.full(total, np.nan)
+    curva = []
+    con_edad = np.flatnonzero(np.isfinite(edad) & (edad >= 0))
+    if con_edad.size:
+        sexo_b = np.array([_SEXO_CODIGO.get(sexos[i], 0) for i in con_edad.tolist()], dtype=np.int64)
+        meses = np.floor(edad[con_edad] / DIAS_MES).astype(np.int64)
+        pct, grupos, conteo, valores = _percentiles_por_grupo(sexo_b * 10000 + meses, w_ult[con_edad])
+        percentil[con_edad] = pct
+        sexo_nombre = {v: k for k, v in _SEXO_CODIGO.items()}
+        for clave, c, fila in zip(grupos.tolist(), conteo.tolist(), valores.tolist()):
+            if c >= MIN_ANIMALES_CURVA:
+                punto = {"sexo": sexo_nombre.get(clave // 10000), "edad_meses": clave % 10000, "n": c}
+                punto.update({f"p{q}": round(v, 2) for q, v in zip(PERCENTILES_CURVA, fila)})
+                curva.append(punto)
+
+    # Projected date for the market weight (regression ADG, lifetime ADG as fallback)
+    adg_proyeccion = np.where(np.isfinite(adg) & (adg > 0), adg, adg_vida)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dias_mercado = np.where(
+            w_ult >= peso_mercado, 0.0,
+            np.where(adg_proyeccion > 0, (peso_mercado - w_ult) / adg_proyeccion, np.nan)
+        )
+    fecha_mercado = t_ult + dias_mercado
+
+    # 1-based position of each flagged weighing within its animal
+    atipicos_por_bovino = {}
+    for i, pos in zip(gv[fila_atipica].tolist(), (fila_atipica - inicio[gv[fila_atipica]] + 1).tolist()):
+        atipicos_por_bovino.setdefault(i, []).append(pos)
+
+    # Columns are converted to Python lists once; the loop only assembles dicts
+    col_adg, col_reciente, col_vida = _valores(adg, 3), _valores(adg_reciente, 3), _valores(adg_vida, 3)
+    col_percentil, col_peso = _valores(percentil, 1), _valores(w_ult, 2)
+    col_fecha, col_mercado = _fechas(t_ult), _fechas(fecha_mercado)
+    col_edad = [None if v != v else int(v) for v in edad.tolist()]
+    col_n, col_atipico = n.tolist(), adg_atipico.tolist()
+    col_alcanzado = (w_ult >= peso_mercado).tolist()
+
+    bovinos = []
+    for i in np.flatnonzero(con_pesos).tolist():
+        bovinos.append({
+            "bovino_id": ids[i],
+            "folio": folios[i],
+            "sexo": sexos[i],
+            "pesajes": col_n[i],
+            "ultimo_peso": col_peso[i],
+            "fecha_ultimo_peso": col_fecha[i],
+            "edad_dias": col_edad[i],
+            "adg": col_adg[i],
+            "adg_reciente": col_reciente[i],
+            "adg_vida": col_vida[i],
+            "percentil_peso_edad": col_percentil[i],
+            "adg_atipico": col_atipico[i],
+            "pesajes_atipicos": atipicos_por_bovino.get(i, []),
+            "fecha_mercado_estimada": col_mercado[i],
+            "peso_mercado_alcanzado": col_alcanzado[i],
+        })
+    bovinos.sort(key=lambda b: (b["adg"] is None, -(b["adg"] or 0)))
+
+    adg_validos = adg[con_adg]
+    return {
+        "total_bovinos": total,
+        "con_pesos": int(con_pesos.sum()),
+        "adg_promedio": round(float(adg_validos.mean()), 3) if adg_validos.size else None,
+        "adg_mediana": round(float(np.median(adg_validos)), 3) if adg_validos.size else None,
+        "curva": curva,
+        "bovinos": bovinos,
+        "indice": {str(b["bovino_id"]): b for b in bovinos},
+    }
+
+def _resolver_atipicos(db: Session, bovinos: list):
+    """Replaces the positions of flagged weighings with their evento ids (one query)."""
+    marcados = [(str(b["bovino_id"]), pos) for b in bovinos for pos in b["pesajes_atipicos"]]
+    if not marcados:
+        return
+    bids, posiciones = zip(*marcados)
+    eventos = {
+        (str(r.bovino_id), r.pos): r.id
+        for r in db.execute(text(_EVENTOS_POSICION), {"bids": list(bids), "pos": list(posiciones)})
+    }
+    for b in bovinos:
+        if b["pesajes_atipicos"]:
+            b["pesajes_atipicos"] = [eventos[(str(b["bovino_id"]), pos)] for pos in b["pesajes_atipicos"]
+                                     if (str(b["bovino_id"]), pos) in eventos]
+
+def _cacheado(db: Session, scope: str, scope_id, clave: tuple, calcular):
+    """
+    Runs calcular(rows of _DATOS) for the scope, or returns the cached result
+    while the scope's version is unchanged (no new peso, same animals).
+    """
+    filtro = _SCOPES[scope]
+    params = {"sid": str(scope_id)}
+
+    version = tuple(db.execute(text(_VERSION.format(f=filtro)), params).one())
+    clave = (scope, str(scope_id)) + clave
+    with _cache_lock:
+        entrada = _cache.get(clave)
+        if entrada and entrada[0] == version:
+            _cache.move_to_end(clave)
+            metricas.cache("crecimiento", True)
+            return entrada[1]
+    metricas.cache("crecimiento", False)
+
+    resultado = calcular(db.execute(text(_DATOS.format(f=filtro)), params).all())
+
+    with _cache_lock:
+        _cache[clave] = (version, resultado)
+        _cache.move_to_end(clave)
+        while len(_cache) > CRECIMIENTO_CACHE_MAX:
+            _cache.popitem(last=False)
+    return resultado
+
+def get_analisis(db: Session, scope: str, scope_id, peso_mercado: float = None, umbral: float = None) -> dict:
+    """
+    Growth analysis of every animal in the scope ('usuario', 'instalacion' or
+    'bovino'). Results are cached per scope and parameters and reused until a
+    new peso (or an animal entering/leaving the scope) changes the version.
+    """
+    peso_mercado = peso_mercado or CRECIMIENTO_PESO_MERCADO_KG
+    umbral = umbral or CRECIMIENTO_UMBRAL_ATIPICO
+
+    def calcular(rows):
+        analisis = _analizar(rows, peso_mercado, umbral)
+        _resolver_atipicos(db, analisis["bovinos"])
+        analisis["peso_mercado"] = peso_mercado
+        return analisis
+
+    return _cacheado(db, scope, scope_id, ("analisis", peso_mercado, umbral), calcular)
+
+def get_crecimiento_bovino(db: Session, bovino, peso_mercado: float = None, umbral: float = None):
+    """
+    One animal's metrics, ranked against its owner's active herd (percentiles
+    and outliers need the herd). Inactive animals are analyzed on their own.
+    """
+    analisis = get_analisis(db, "usuario", bovino.usuario_id, peso_mercado, umbral)
+    resultado = analisis["indice"].get(str(bovino.id))
+    if resultado is None:
+        resultado = get_analisis(db, "bovino", bovino.id, peso_mercado, umbral)["indice"].get(str(bovino.id))
+    return resultado
+
+def resumen_hato(analisis: dict, skip: int = 0, limit: int = 100, solo_atipicos: bool = False) -> dict:
+    bovinos = analisis["bovinos"]
+    if solo_atipicos:
+        bovinos = [b for b in bovinos if b["adg_atipico"] or b["pesajes_atipicos"]]
+    return {
+        "total_bovinos": analisis["total_bovinos"],
+        "con_pesos": analisis["con_pesos"],
+        "adg_promedio": analisis["adg_promedio"],
+        "adg_mediana": analisis["adg_mediana"],
+        "peso_mercado": analisis["peso_mercado"],
+        "atipicos": sum(1 for b in analisis["bovinos"] if b["adg_atipico"] or b["pesajes_atipicos"]),
+        "curva": analisis["curva"],
+        "bovinos": bovinos[skip:skip + limit],
+    }
+
+# --- Weight charts ---
+
+# Weighings of one animal as two date-ordered arrays (epoch seconds, kg)
+_SERIE_BOVINO = """
+    SELECT array_agg(CAST(EXTRACT(EPOCH FROM e.fecha) AS FLOAT8) ORDER BY e.fecha, e.id) AS fechas,
+           array_agg(CAST(p.peso_nuevo AS FLOAT8) ORDER BY e.fecha, e.id) AS pesos
+    FROM eventos e JOIN pesos p ON p.evento_id = e.id AND p.evento_fecha = e.fecha
+    WHERE e.bovino_id = :bid AND p.peso_nuevo IS NOT NULL
+      AND (CAST(:desde AS DATE) IS NULL OR e.fecha >= CAST(:desde AS DATE))
+      AND (CAST(:hasta AS DATE) IS NULL OR e.fecha < CAST(:hasta AS DATE) + 1)
+"""
+
+def lttb(x: np.ndarray, y: np.ndarray, puntos: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indexes of `puntos` samples that keep the
+    visual shape of the series. First and last points are always kept; each
+    bucket keeps the point forming the largest triangle with the previous
+    pick and the next bucket's average. The loop is per bucket, not per point.
+    """
+    n = x.size
+    if puntos >= n or puntos < 3:
+        return np.arange(n)
+
+    cortes = np.floor(np.arange(puntos - 1) * (n - 2) / (puntos - 2)).astype(np.int64) + 1
+    cortes[-1] = n - 1
+    elegidos = np.empty(puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(puntos - 2):
+        inicio, fin = cortes[i], cortes[i + 1]
+        sig_fin = cortes[i + 2] if i + 2 < puntos - 1 else n
+        sig_x, sig_y = x[fin:sig_fin].mean(), y[fin:sig_fin].mean()
+        area = np.abs((x[a] - sig_x) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (sig_y - y[a]))
+        a = inicio + int(np.argmax(area))
+        elegidos[i + 1] = a
+    return elegidos
+
+def get_grafica_bovino(db: Session, bovino_id, puntos: int, desde=None, hasta=None) -> dict:
+    """(fecha, peso) series of one animal downsampled with LTTB to at most `puntos`."""
+    fila = db.execute(text(_SERIE_BOVINO), {"bid": str(bovino_id), "desde": desde, "hasta": hasta}).one()
+    if not fila.fechas:
+        return {"bovino_id": bovino_id, "total_pesajes": 0, "puntos": []}
+    t = np.array(fila.fechas, dtype=np.float64)
+    w = np.array(fila.pesos, dtype=np.float64)
+    elegidos = lttb(t, w, puntos)
+    return {
+        "bovino_id": bovino_id,
+        "total_pesajes": int(t.size),
+        "puntos": [
+            {"fecha": datetime.fromtimestamp(ts, timezone.utc), "peso": round(peso, 2)}
+            for ts, peso in zip(t[elegidos].tolist(), w[elegidos].tolist())
+        ],
+    }
+
+def _serie_scope(rows) -> dict:
+    """Every weighing of the scope flattened into (t, w) arrays, for the bands."""
+    ts = [r.fechas for r in rows if r.fechas]
+    ws = [r.pesos for r in rows if r.pesos]
+    m = sum(map(len, ts))
+    return {
+        "total_bovinos": len(rows),
+        "t": np.fromiter(itertools.chain.from_iterable(ts), dtype=np.float64, count=m),
+        "w": np.fromiter(itertools.chain.from_iterable(ws), dtype=np.float64, count=m),
+    }
+
+def get_bandas(db: Session, scope: str, scope_id, puntos: int, desde=None, hasta=None) -> dict:
+    """
+    Percentile bands (p10-p90) of the weights of a whole herd or instalación:
+    the date range is split into at most `puntos` equal buckets and each bucket
+    gets the percentiles of the weighings that fall in it.
+    """
+    serie = _cacheado(db, scope, scope_id, ("serie",), _serie_scope)
+    t, w = serie["t"], serie["w"]
+    if desde is not None:
+        filtro = t >= (desde - _EPOCA).days
+        t, w = t[filtro], w[filtro]
+    if hasta is not None:
+        filtro = t < (hasta - _EPOCA).days + 1
+        t, w = t[filtro], w[filtro]
+
+    respuesta = {"total_bovinos": serie["total_bovinos"], "total_pesajes": int(t.size), "bandas": []}
+    if not t.size:
+        return respuesta
+
+    t_min, t_max = t.min(), t.max()
+    ancho = max((t_max - t_min) / puntos, 1.0)  # at least one day per bucket
+    cubeta = np.minimum(((t - t_min) / ancho).astype(np.int64), puntos - 1)
+    _, cubetas, conteo, valores = _percentiles_por_grupo(cubeta, w)
+    centros = _fechas(t_min + (cubetas + 0.5) * ancho)
+    for fecha, c, fila in zip(centros, conteo.tolist(), valores.tolist()):
+        banda = {"fecha": fecha, "n": c}
+        banda.update({f"p{q}": round(v, 2) for q, v in zip(PERCENTILES_CURVA, fila)})
+        respuesta["bandas"].append(banda)
+    return respuesta
@@ -1,20 +1,31 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import text
 from fastapi import HTTPException
 import uuid as uuid_lib
 import string
 import secrets
 from datetime import datetime, timezone
 
-from . import models, schemas
+from . import models, schemas, trazas
 
 _REEMO_ALPHABET = string.digits
 
+# Movilizaciones that transfer ownership to the destination's owner on completion
+_TIPOS_VENTA = (models.TipoMovilizacionEnum.venta, models.TipoMovilizacionEnum.subasta_venta)
+
 def _generate_reemo() -> str:
     """Generate a random 10-digit string for the REEMO."""
     return ''.join(secrets.choice(_REEMO_ALPHABET) for _ in range(10))
 
+# Everything MovilizacionResponse reads: the bovinos (with the instalación
+# behind BovinoListResponse.instalacion_nombre) and the event log, one query each
+CARGA_MOVILIZACION = (
+    selectinload(models.Movilizacion.bovinos).joinedload(models.Bovino.instalacion),
+    selectinload(models.Movilizacion.eventos),
+)
+
 def get_movilizaciones(db: Session, skip: int = 0, limit: int = 100, usuario_id: str = None, estado: str = None):
-    query = db.query(models.Movilizacion)
+    query = db.query(models.Movilizacion).options(*CARGA_MOVILIZACION)
     if usuario_id:
         query = query.filter(models.Movilizacion.solicitante_id == usuario_id)
     if estado:
@@ -22,12 +33,18 @@ def get_movilizaciones(db: Session, skip: int = 0, limit: int = 100, usuario_id:
     return query.order_by(models.Movilizacion.fecha_solicitud.desc()).offset(skip).limit(limit).all()
 
 def get_movilizacion(db: Session, movilizacion_id: str):
-    return db.query(models.Movilizacion).filter(models.Movilizacion.id == movilizacion_id).first()
+    return db.query(models.Movilizacion).options(*CARGA_MOVILIZACION).filter(models.Movilizacion.id == movilizacion_id).first()
 
+@trazas.trazado
 def create_movilizacion(db: Session, movilizacion: schemas.MovilizacionCreate, usuario_id: str):
-    # Validar instalaciones
-    origen = db.query(models.Instalacion).filter(models.Instalacion.id == movilizacion.origen_id).first()
-    destino = db.query(models.Instalacion).filter(models.Instalacion.id == movilizacion.destino_id).first()
+    # Validar instalaciones (origen y destino en una sola consulta)
+    instalaciones = {
+        i.id: i for i in db.query(models.Instalacion).filter(
+            models.Instalacion.id.in_([movilizacion.origen_id, movilizacion.destino_id])
+        )
+    }
+    origen = instalaciones.get(movilizacion.origen_id)
+    destino = instalaciones.get(movilizacion.destino_id)
 
     if not origen or not destino:
         raise HTTPException(status_code=404, detail="Instalacion origen o destino no encontrada")
@@ -54,7 +71,8 @@ def create_movilizacion(db: Session, movilizacion: schemas.MovilizacionCreate, u
         if not b.arete_barcode and not b.arete_rfid:
              raise HTTPException(status_code=400, detail=f"Bovino {b.id} no cuenta con arete identificador")
 
-    # Create Movilizacion
+    # Create Movilizacion with its bovinos and first event; the flush sends
+    # them as three inserts (the links go in one batch)
     db_mov = models.Movilizacion(
         solicitante_id=usuario_id,
         origen_id=movilizacion.origen_id,
@@ -63,29 +81,19 @@ def create_movilizacion(db: Session, movilizacion: schemas.MovilizacionCreate, u
         estado=models.EstadoMovilizacionEnum.REQUESTED,
         transportista_nombre=movilizacion.transportista_nombre,
         placas_vehiculo=movilizacion.placas_vehiculo,
-        observaciones=movilizacion.observaciones
+        observaciones=movilizacion.observaciones,
+        bovinos=bovinos,
+        eventos=[models.MovilizacionEvento(
+            estado_nuevo=models.EstadoMovilizacionEnum.REQUESTED,
+            usuario_id=usuario_id,
+            observaciones="Solicitud creada"
+        )]
     )
     db.add(db_mov)
+    db.flush()
+    mov_id = db_mov.id  # read before the commit expires it
     db.commit()
-    db.refresh(db_mov)
-
-    # Link bovinos
-    for b in bovinos:
-        db_mb = models.MovilizacionBovino(movilizacion_id=db_mov.id, bovino_id=b.id)
-        db.add(db_mb)
-
-    # Log event
-    db_event = models.MovilizacionEvento(
-        movilizacion_id=db_mov.id,
-        estado_nuevo=models.EstadoMovilizacionEnum.REQUESTED,
-        usuario_id=usuario_id,
-        observaciones="Solicitud creada"
-    )
-    db.add(db_event)
-    
-    db.commit()
-    db.refresh(db_mov)
-    return db_mov
+    return get_movilizacion(db, mov_id)
 
 
 def _log_evento(db: Session, mov_id: str, old_state, new_state, user_id, obs):
@@ -99,6 +107,7 @@ def _log_evento(db: Session, mov_id: str, old_state, new_state, user_id, obs):
     db.add(db_event)
 
 
+@trazas.trazado
 def approve_movilizacion(db: Session, mov_id: str, admin_id: str, obs: str = None):
     db_mov = get_movilizacion(db, mov_id)
     if not db_mov:
@@ -119,8 +128,7 @@ def approve_movilizacion(db: Session, mov_id: str, admin_id: str, obs: str = Non
 
     _log_evento(db, mov_id, models.EstadoMovilizacionEnum.REQUESTED, models.EstadoMovilizacionEnum.APPROVED, admin_id, obs)
     db.commit()
-    db.refresh(db_mov)
-    return db_mov
+    return get_movilizacion(db, mov_id)
 
 
 def load_movilizacion(db: Session, mov_id: str, caller_id: str, data: schemas.MovilizacionLoad):
@@ -139,8 +147,7 @@ def load_movilizacion(db: Session, mov_id: str, caller_id: str, data: schemas.Mo
 
     _log_evento(db, mov_id, old_state, models.EstadoMovilizacionEnum.LOADED, caller_id, data.observaciones)
     db.commit()
-    db.refresh(db_mov)
-    return db_mov
+    return get_movilizacion(db, mov_id)
 
 
 def inspect_movilizacion(db: Session, mov_id: str, inspector_id: str, data: schemas.MovilizacionInspect):
@@ -161,8 +168,7 @@ def inspect_movilizacion(db: Session, mov_id: str, inspector_id: str, data: sche
 
     _log_evento(db, mov_id, old_state, db_mov.estado, inspector_id, data.observaciones)
     db.commit()
-    db.refresh(db_mov)
-    return db_mov
+    return get_movilizacion(db, mov_id)
 
 
 def arrive_movilizacion(db: Session, mov_id: str, caller_id: str, data: schemas.MovilizacionArrive):
@@ -180,8 +186,7 @@ def arrive_movilizacion(db: Session, mov_id: str, caller_id: str, data: schemas.
 
     _log_evento(db, mov_id, old_state, models.EstadoMovilizacionEnum.ARRIVED, caller_id, data.observaciones)
     db.commit()
-    db.refresh(db_mov)
-    return db_mov
+    return get_movilizacion(db, mov_id)
 
 
 def complete_movilizacion(db: Session, mov_id: str, admin_id: str, data: schemas.MovilizacionComplete):
@@ -196,13 +201,19 @@ def complete_movilizacion(db: Session, mov_id: str, admin_id: str, data: schemas
     db_mov.estado = models.EstadoMovilizacionEnum.COMPLETED
 
     _log_evento(db, mov_id, old_state, models.EstadoMovilizacionEnum.COMPLETED, admin_id, data.observaciones)
-    
-    # Aquí el trigger handle_movilizacion_completed en la BD tomará acción
-    # y actualizará los dueños / status de los bovinos.
-    
+
+    # The cattle now stand at the destination; sales also hand them to its
+    # owner (the bovinos trigger records the new ownership periods)
+    db.execute(text("""
+        UPDATE bovinos b
+        SET instalacion_id = i.id,
+            usuario_id = CASE WHEN :transfiere THEN i.usuario_id ELSE b.usuario_id END
+        FROM movilizacion_bovinos mb, instalaciones i
+        WHERE mb.movilizacion_id = :mov AND b.id = mb.bovino_id AND i.id = :destino
+    """), {"mov": mov_id, "destino": db_mov.destino_id, "transfiere": db_mov.tipo in _TIPOS_VENTA})
+
     db.commit()
-    db.refresh(db_mov)
-    return db_mov
+    return get_movilizacion(db, mov_id)
 
 def cancel_movilizacion(db: Session, mov_id: str, admin_id: str, observaciones: str = None):
     db_mov = get_movilizacion(db, mov_id)
@@ -218,8 +229,7 @@ def cancel_movilizacion(db: Session, mov_id: str, admin_id: str, observaciones:
     _log_evento(db, mov_id, old_state, models.EstadoMovilizacionEnum.CANCELLED, admin_id, observaciones)
     
     db.commit()
-    db.refresh(db_mov)
-    return db_mov
+    return get_movilizacion(db, mov_id)
 
 def vincular_documento_movilizacion(db: Session, mov_id: str, doc_id: str, doc_type: str, user_id: str):
     db_mov = get_movilizacion(db, mov_id)
@@ -250,8 +260,7 @@ def vincular_documento_movilizacion(db: Session, mov_id: str, doc_id: str, doc_t
 
     setattr(db_mov, column_map[doc_type], doc_id)
     db.commit()
-    db.refresh(db_mov)
-    return db_mov
+    return get_movilizacion(db, mov_id)
 
 def get_required_docs_for_mov(tipo: models.TipoMovilizacionEnum):
     """Returns a list of (doc_type, description, is_required)"""
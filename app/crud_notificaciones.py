@@ -0,0 +1,93 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+import os
+
+# How many days ahead boosters and UPP/PSG license expiry dates are announced
+RECORDATORIOS_DIAS_REFUERZO = int(os.getenv("RECORDATORIOS_DIAS_REFUERZO", 7))
+RECORDATORIOS_DIAS_VENCIMIENTO = int(os.getenv("RECORDATORIOS_DIAS_VENCIMIENTO", 30))
+# Rows changed in the last few seconds are left for the next run, so a
+# transaction that started earlier but commits later is not skipped
+RECORDATORIOS_MARGEN_SEGUNDOS = int(os.getenv("RECORDATORIOS_MARGEN_SEGUNDOS", 5))
+# Notifications claimed per delivery batch
+NOTIFICACIONES_LOTE = int(os.getenv("NOTIFICACIONES_LOTE", 500))
+# Failed deliveries are retried with exponential backoff up to this many attempts
+NOTIFICACIONES_MAX_INTENTOS = int(os.getenv("NOTIFICACIONES_MAX_INTENTOS", 5))
+NOTIFICACIONES_REINTENTO_SEGUNDOS = int(os.getenv("NOTIFICACIONES_REINTENTO_SEGUNDOS", 60))
+# A claimed batch that is never marked (worker crashed) is delivered again after this
+NOTIFICACIONES_BLOQUEO_SEGUNDOS = int(os.getenv("NOTIFICACIONES_BLOQUEO_SEGUNDOS", 300))
+# Delivered and failed notifications are purged after this many days
+NOTIFICACIONES_RETENCION_DIAS = int(os.getenv("NOTIFICACIONES_RETENCION_DIAS", 90))
+NOTIFICACIONES_PURGA_LOTE = 1000
+
+def generar_recordatorios(db: Session) -> int:
+    """Writes the reminders that became due since the last run to the outbox."""
+    generadas = db.execute(
+        text("SELECT generar_recordatorios(:dr, :dv, make_interval(secs => :m))"),
+        {"dr": RECORDATORIOS_DIAS_REFUERZO, "dv": RECORDATORIOS_DIAS_VENCIMIENTO, "m": RECORDATORIOS_MARGEN_SEGUNDOS}
+    ).scalar()
+    db.execute(
+        text("SELECT purgar_notificaciones(make_interval(days => :dias), :n)"),
+        {"dias": NOTIFICACIONES_RETENCION_DIAS, "n": NOTIFICACIONES_PURGA_LOTE}
+    )
+    db.commit()
+    return generadas
+
+def reclamar_lote(db: Session, limite: int = NOTIFICACIONES_LOTE) -> list:
+    """
+    Claims up to `limite` pending notifications for delivery. The claim is a
+    lease (siguiente_intento moves forward), committed right away so no row
+    locks are held while the channels are called; workers skip rows claimed
+    by others.
+    """
+    filas = db.execute(text("""
+        UPDATE notificaciones n
+        SET intentos = n.intentos + 1,
+            siguiente_intento = NOW() + make_interval(secs => :bloqueo)
+        FROM (
+            SELECT id FROM notificaciones
+            WHERE estado = 'pendiente' AND siguiente_intento <= NOW()
+            ORDER BY siguiente_intento, id
+            LIMIT :lim
+            FOR UPDATE SKIP LOCKED
+        ) s
+        WHERE n.id = s.id
+        RETURNING n.id, n.usuario_id, n.tipo, n.referencia_id, n.titulo, n.mensaje, n.datos, n.creado_en
+    """), {"lim": limite, "bloqueo": NOTIFICACIONES_BLOQUEO_SEGUNDOS}).mappings().all()
+    db.commit()
+    return sorted(filas, key=lambda f: f["id"])
+
+def marcar_enviadas(db: Session, ids: list):
+    if not ids:
+        return
+    db.execute(text("""
+        UPDATE notificaciones SET estado = 'enviada', enviado_en = NOW(), error = NULL
+        WHERE id = ANY(CAST(:ids AS BIGINT[]))
+    """), {"ids": ids})
+    db.commit()
+
+def marcar_fallidas(db: Session, errores: dict):
+    """`errores` maps notification id to the channel error. Retries back off exponentially."""
+    if not errores:
+        return
+    db.execute(text("""
+        UPDATE notificaciones n
+        SET estado = CASE WHEN n.intentos >= :max THEN 'fallida' ELSE 'pendiente' END,
+            siguiente_intento = NOW() + make_interval(secs => :base * power(2, n.intentos - 1)),
+            error = f.error
+        FROM unnest(CAST(:ids AS BIGINT[]), CAST(:errores AS TEXT[])) AS f(id, error)
+        WHERE n.id = f.id
+    """), {
+        "ids": list(errores.keys()), "errores": list(errores.values()),
+        "max": NOTIFICACIONES_MAX_INTENTOS, "base": NOTIFICACIONES_REINTENTO_SEGUNDOS
+    })
+    db.commit()
+
+def get_notificaciones(db: Session, usuario_id: str, tipo: str = None, skip: int = 0, limit: int = 100):
+    filtro = " AND tipo = :tipo" if tipo else ""
+    return db.execute(text("""
+        SELECT id, tipo, referencia_id, titulo, mensaje, datos, estado, intentos, creado_en, enviado_en
+        FROM notificaciones
+        WHERE usuario_id = :uid""" + filtro + """
+        ORDER BY creado_en DESC, id DESC
+        OFFSET :skip LIMIT :limit
+    """), {"uid": usuario_id, "tipo": tipo, "skip": skip, "limit": limit}).mappings().all()
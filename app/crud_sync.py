@@ -0,0 +1,173 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from fastapi import HTTPException
+from datetime import datetime, timedelta, timezone
+import base64
+import json
+import os
+
+# Rows written in the last few seconds are left for the next sync, so a
+# transaction that started earlier but commits later is not skipped
+SYNC_MARGEN_SEGUNDOS = int(os.getenv("SYNC_MARGEN_SEGUNDOS", 5))
+# Tombstones older than this are purged; older tokens require a full resync
+SYNC_RETENCION_DIAS = int(os.getenv("SYNC_RETENCION_DIAS", 90))
+# Limits for client-supplied event timestamps (offline queues)
+EVENTO_TOLERANCIA_FUTURO_MINUTOS = int(os.getenv("EVENTO_TOLERANCIA_FUTURO_MINUTOS", 5))
+EVENTO_MAX_ATRASO_DIAS = int(os.getenv("EVENTO_MAX_ATRASO_DIAS", 365))
+
+_UUID_MIN = "00000000-0000-0000-0000-000000000000"
+_UUID_MAX = "ffffffff-ffff-ffff-ffff-ffffffffffff"
+_BIGINT_MAX = "9223372036854775807"
+
+_DETALLE_EVENTO = """
+    LEFT JOIN LATERAL (
+        SELECT 'peso' AS tipo, to_jsonb(t) - 'evento_id' - 'evento_fecha' AS detalle FROM pesos t WHERE t.evento_id = x.id AND t.evento_fecha = x.fecha
+        UNION ALL SELECT 'dieta', to_jsonb(t) - 'evento_id' - 'evento_fecha' FROM dietas t WHERE t.evento_id = x.id AND t.evento_fecha = x.fecha
+        UNION ALL SELECT 'vacunacion', to_jsonb(t) - 'evento_id' - 'evento_fecha' FROM vacunaciones t WHERE t.evento_id = x.id AND t.evento_fecha = x.fecha
+        UNION ALL SELECT 'desparasitacion', to_jsonb(t) - 'evento_id' - 'evento_fecha' FROM desparasitaciones t WHERE t.evento_id = x.id AND t.evento_fecha = x.fecha
+        UNION ALL SELECT 'laboratorio', to_jsonb(t) - 'evento_id' - 'evento_fecha' FROM laboratorios t WHERE t.evento_id = x.id AND t.evento_fecha = x.fecha
+        UNION ALL SELECT 'compraventa', to_jsonb(t) - 'evento_id' - 'evento_fecha' FROM compraventas t WHERE t.evento_id = x.id AND t.evento_fecha = x.fecha
+        UNION ALL SELECT 'traslado', to_jsonb(t) - 'evento_id' - 'evento_fecha' FROM traslado t WHERE t.evento_id = x.id AND t.evento_fecha = x.fecha
+        UNION ALL SELECT 'enfermedad', to_jsonb(t) - 'evento_id' - 'evento_fecha' FROM enfermedades t WHERE t.evento_id = x.id AND t.evento_fecha = x.fecha
+        UNION ALL SELECT 'tratamiento', to_jsonb(t) - 'evento_id' - 'evento_fecha' FROM tratamientos t WHERE t.evento_id = x.id AND t.evento_fecha = x.fecha
+        UNION ALL SELECT 'remision', to_jsonb(t) - 'evento_id' - 'evento_fecha' FROM remisiones t WHERE t.evento_id = x.id AND t.evento_fecha = x.fecha
+        LIMIT 1
+    ) d ON TRUE
+"""
+
+# Feed order: parents before children so clients can apply pages as they arrive
+_SECCIONES = [
+    ("instalaciones", "SELECT x.id, x.updated_at, to_jsonb(x) AS datos FROM instalaciones x WHERE x.usuario_id = :uid"),
+    ("predios", "SELECT x.id, x.updated_at, to_jsonb(x) AS datos FROM predios x WHERE x.usuario_id = :uid"),
+    ("bovinos", "SELECT x.id, x.updated_at, to_jsonb(x) AS datos FROM bovinos x WHERE x.usuario_id = :uid"),
+    ("eventos", "SELECT x.id, x.updated_at, to_jsonb(x) || jsonb_build_object('tipo', d.tipo, 'detalle', d.detalle) AS datos "
+                "FROM eventos x JOIN bovinos b ON b.id = x.bovino_id" + _DETALLE_EVENTO + "WHERE b.usuario_id = :uid"),
+    ("documentos", "SELECT x.id, x.updated_at, to_jsonb(x) AS datos FROM documentos x WHERE x.usuario_id = :uid"),
+]
+_KEYSET = """
+      AND x.updated_at <= :hasta
+      AND (x.updated_at, x.id) > (CAST(:cu AS TIMESTAMPTZ), CAST(:ck AS UUID))
+    ORDER BY x.updated_at, x.id
+    LIMIT :lim
+"""
+_TOMBSTONES = """
+    SELECT t.id, t.entidad, t.entidad_id, t.eliminado_en
+    FROM sync_tombstones t
+    WHERE t.usuario_id = :uid
+      AND t.eliminado_en <= :hasta
+      AND (t.eliminado_en, t.id) > (CAST(:cu AS TIMESTAMPTZ), CAST(:ck AS BIGINT))
+      -- bovinos that came back to this owner are already in the upserts
+      AND NOT (t.entidad = 'bovinos' AND EXISTS (
+          SELECT 1 FROM bovinos b WHERE b.id = t.entidad_id AND b.usuario_id = t.usuario_id
+      ))
+    ORDER BY t.eliminado_en, t.id
+    LIMIT :lim
+"""
+
+def parse_fecha_cliente(value):
+    """Validates a client-supplied event timestamp; None means 'use server time'."""
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        fecha = value
+    else:
+        try:
+            fecha = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError("fecha must be an ISO 8601 timestamp")
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    ahora = datetime.now(timezone.utc)
+    if fecha > ahora + timedelta(minutes=EVENTO_TOLERANCIA_FUTURO_MINUTOS):
+        raise ValueError("fecha cannot be in the future")
+    if fecha < ahora - timedelta(days=EVENTO_MAX_ATRASO_DIAS):
+        raise ValueError(f"fecha cannot be older than {EVENTO_MAX_ATRASO_DIAS} days")
+    return fecha
+
+def _encode_token(estado: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(estado, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def _decode_token(token: str) -> dict:
+    try:
+        estado = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if not isinstance(estado, dict) or 'h' not in estado and 'd' not in estado:
+            raise ValueError
+        return estado
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Token de sincronización inválido")
+
+def _inicio_seccion(desde, seccion: int):
+    """Cursor that skips everything already delivered up to `desde` (inclusive)."""
+    es_tombstone = seccion == len(_SECCIONES)
+    if desde is None:
+        return "-infinity", "0" if es_tombstone else _UUID_MIN
+    return desde, _BIGINT_MAX if es_tombstone else _UUID_MAX
+
+def get_cambios(db: Session, usuario_id: str, token: str = None, limit: int = 500):
+    """
+    Change feed for the mobile client. Without a token it returns the full
+    data set; with a token only rows changed or deleted since it was issued.
+    Pages are keyset-paginated on (updated_at, id) inside a fixed [desde, hasta]
+    window; the last page returns a token whose `desde` is that window's end.
+    """
+    estado = _decode_token(token) if token else {}
+    desde = estado.get('d')
+
+    if desde and 'h' not in estado:
+        expirado = db.execute(
+            text("SELECT CAST(:d AS TIMESTAMPTZ) < NOW() - make_interval(days => :dias)"),
+            {"d": desde, "dias": SYNC_RETENCION_DIAS}
+        ).scalar()
+        if expirado:
+            raise HTTPException(status_code=410, detail="Token de sincronización expirado; se requiere sincronización completa")
+
+    if 'h' in estado:
+        hasta, seccion, cu, ck = estado['h'], estado['s'], estado['u'], estado['k']
+    else:
+        hasta = db.execute(
+            text("SELECT NOW() - make_interval(secs => :m)"), {"m": SYNC_MARGEN_SEGUNDOS}
+        ).scalar().isoformat()
+        seccion = 0
+        cu, ck = _inicio_seccion(desde, 0)
+
+    cambios = []
+    while seccion <= len(_SECCIONES) and len(cambios) < limit:
+        params = {"uid": usuario_id, "hasta": hasta, "cu": cu, "ck": ck, "lim": limit - len(cambios)}
+        if seccion < len(_SECCIONES):
+            entidad, base = _SECCIONES[seccion]
+            rows = db.execute(text(base + _KEYSET), params).all()
+            for r in rows:
+                cambios.append({"entidad": entidad, "id": r.id, "op": "upsert", "fecha": r.updated_at, "datos": r.datos})
+        else:
+            rows = db.execute(text(_TOMBSTONES), params).all()
+            for r in rows:
+                cambios.append({"entidad": r.entidad, "id": r.entidad_id, "op": "delete", "fecha": r.eliminado_en, "datos": None})
+
+        if len(rows) < params["lim"]:
+            # Section exhausted, continue with the next one
+            seccion += 1
+            cu, ck = _inicio_seccion(desde, seccion)
+        else:
+            ultimo = rows[-1]
+            cu = (ultimo.eliminado_en if seccion == len(_SECCIONES) else ultimo.updated_at).isoformat()
+            ck = str(ultimo.id)
+
+    completo = seccion > len(_SECCIONES)
+    if completo:
+        siguiente = {"d": hasta}
+    else:
+        siguiente = {"d": desde, "h": hasta, "s": seccion, "u": cu, "k": ck}
+
+    return {
+        "cambios": cambios,
+        "token": _encode_token(siguiente),
+        "completo": completo,
+        "hasta": hasta
+    }
+
+def purgar_tombstones(db: Session) -> int:
+    borrados = db.execute(
+        text("SELECT purgar_sync_tombstones(make_interval(days => :dias))"), {"dias": SYNC_RETENCION_DIAS}
+    ).scalar()
+    db.commit()
+    return borrados
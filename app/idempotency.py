@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import itertools
+import os
+import zlib
+
+from jose import JWTError, jwt
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+
+from . import auth, database
+
+# How long a completed response is replayed for the same key
+IDEMPOTENCY_TTL_HORAS = int(os.getenv("IDEMPOTENCY_TTL_HORAS", 24))
+# A claim older than this is considered abandoned (worker crashed) and can be retaken
+IDEMPOTENCY_BLOQUEO_SEGUNDOS = int(os.getenv("IDEMPOTENCY_BLOQUEO_SEGUNDOS", 300))
+# How long a duplicate waits for the original request before answering 409
+IDEMPOTENCY_ESPERA_SEGUNDOS = float(os.getenv("IDEMPOTENCY_ESPERA_SEGUNDOS", 30))
+# Compressed responses above this size are not stored (the key is released)
+IDEMPOTENCY_MAX_RESPUESTA_KB = int(os.getenv("IDEMPOTENCY_MAX_RESPUESTA_KB", 256))
+# Expired keys are evicted in small batches every N claims
+IDEMPOTENCY_PURGA_CADA = int(os.getenv("IDEMPOTENCY_PURGA_CADA", 100))
+IDEMPOTENCY_PURGA_LOTE = 500
+
+HEADER = b"idempotency-key"
+METODOS = {"POST", "PUT", "PATCH", "DELETE"}
+COMPLETADA = 1  # idempotency_keys.estado (0 = in progress)
+
+_contador_claims = itertools.count(1)
+
+def _scope_usuario(headers: dict) -> str:
+    """Keys are per user (JWT subject); anonymous flows such as signup share one scope."""
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if authorization.lower().startswith("bearer "):
+        try:
+            sub = jwt.decode(authorization[7:], auth.SECRET_KEY, algorithms=[auth.ALGORITHM]).get("sub")
+            if sub:
+                return sub
+        except JWTError:
+            pass
+    return "anon"
+
+def _huella_peticion(scope: dict, headers: dict, body: bytes) -> bytes:
+    content_type = headers.get(b"content-type", b"")
+    if b"boundary=" in content_type:
+        # Multipart boundaries are random per attempt; the payload is what must match
+        boundary = content_type.split(b"boundary=", 1)[1].split(b";", 1)[0].strip(b'"')
+        body = body.replace(boundary, b"")
+    h = hashlib.sha256()
+    h.update(scope.get("query_string", b""))
+    h.update(b"\0")
+    h.update(body)
+    return h.digest()
+
+# --- Storage (sync, run in the threadpool with their own short transactions) ---
+
+def _reclamar(clave: bytes, peticion: bytes):
+    """Inserts an in-progress claim. Returns None if claimed, else the existing row."""
+    db = database.SessionLocal()
+    try:
+        while True:
+            reclamada = db.execute(text("""
+                INSERT INTO idempotency_keys (clave, peticion, estado, expira_en)
+                VALUES (:c, :p, 0, NOW() + make_interval(secs => :bloqueo))
+                ON CONFLICT (clave) DO UPDATE
+                    SET peticion = EXCLUDED.peticion, estado = 0, status_code = NULL,
+                        content_type = NULL, respuesta = NULL, creado_en = NOW(), expira_en = EXCLUDED.expira_en
+                    WHERE idempotency_keys.expira_en < NOW()
+                RETURNING clave
+            """), {"c": clave, "p": peticion, "bloqueo": IDEMPOTENCY_BLOQUEO_SEGUNDOS}).first()
+            if reclamada:
+                if next(_contador_claims) % IDEMPOTENCY_PURGA_CADA == 0:
+                    db.execute(text("SELECT purgar_idempotency_keys(:n)"), {"n": IDEMPOTENCY_PURGA_LOTE})
+                db.commit()
+                return None
+            db.rollback()
+            fila = _leer(db, clave)
+            if fila is not None:
+                return fila
+            # Released or evicted in between: try to claim it again
+    finally:
+        db.close()
+
+def _leer(db, clave: bytes):
+    return db.execute(text("""
+        SELECT peticion, estado, status_code, content_type, respuesta
+        FROM idempotency_keys WHERE clave = :c AND expira_en >= NOW()
+    """), {"c": clave}).first()
+
+def _consultar(clave: bytes):
+    db = database.SessionLocal()
+    try:
+        return _leer(db, clave)
+    finally:
+        db.close()
+
+def _guardar(clave: bytes, status_code: int, content_type: str, respuesta: bytes):
+    db = database.SessionLocal()
+    try:
+        db.execute(text("""
+            UPDATE idempotency_keys
+            SET estado = 1, status_code = :s, content_type = :ct, respuesta = :r,
+                expira_en = NOW() + make_interval(hours => :ttl)
+            WHERE clave = :c
+        """), {"c": clave, "s": status_code, "ct": content_type, "r": respuesta, "ttl": IDEMPOTENCY_TTL_HORAS})
+        db.commit()
+    finally:
+        db.close()
+
+def _liberar(clave: bytes):
+    db = database.SessionLocal()
+    try:
+        db.execute(text("DELETE FROM idempotency_keys WHERE clave = :c AND estado = 0"), {"c": clave})
+        db.commit()
+    finally:
+        db.close()
+
+# --- Middleware ---
+
+def _reproducir(fila) -> Response:
+    return Response(
+        content=zlib.decompress(fila.respuesta) if fila.respuesta else b"",
+        status_code=fila.status_code,
+        media_type=fila.content_type,
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+class IdempotencyMiddleware:
+    """
+    Write requests (POST/PUT/PATCH/DELETE) carrying an `Idempotency-Key` header
+    run at most once per user and key. The first request claims the key; a
+    duplicate arriving meanwhile waits for it, and later retries get the stored
+    response without reaching the endpoint (no SQL functions, no uploads).
+    Only 2xx responses are stored: on errors the key is released so the client
+    can retry with the same key.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METODOS:
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        llave = headers.get(HEADER)
+        if llave is None:
+            return await self.app(scope, receive, send)
+        if not 0 < len(llave) <= 255:
+            return await JSONResponse({"detail": "Idempotency-Key must be 1-255 characters"}, status_code=400)(scope, receive, send)
+
+        # The request body is buffered to fingerprint it, then replayed to the app
+        partes = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            partes.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(partes)
+
+        clave = hashlib.sha256(b"\0".join([
+            _scope_usuario(headers).encode(), scope["method"].encode(), scope["path"].encode(), llave
+        ])).digest()
+        peticion = _huella_peticion(scope, headers, body)
+
+        while True:
+            existente = await run_in_threadpool(_reclamar, clave, peticion)
+            if existente is None:
+                break
+            respuesta = await self._esperar(clave, peticion, existente)
+            if respuesta is not None:
+                return await respuesta(scope, receive, send)
+            # The original failed and released the key: this request runs instead
+
+        body_enviado = False
+
+        async def receive_replay():
+            nonlocal body_enviado
+            if not body_enviado:
+                body_enviado = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        inicio = {}
+        cuerpo = []
+
+        async def send_captura(message):
+            if message["type"] == "http.response.start":
+                inicio.update(message)
+            elif message["type"] == "http.response.body":
+                cuerpo.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_replay, send_captura)
+        except BaseException:
+            await run_in_threadpool(_liberar, clave)
+            raise
+
+        status_code = inicio.get("status", 500)
+        comprimido = zlib.compress(b"".join(cuerpo))
+        if 200 <= status_code < 300 and len(comprimido) <= IDEMPOTENCY_MAX_RESPUESTA_KB * 1024:
+            content_type = dict(inicio.get("headers", [])).get(b"content-type", b"").decode("latin-1") or None
+            await run_in_threadpool(_guardar, clave, status_code, content_type, comprimido)
+        else:
+            await run_in_threadpool(_liberar, clave)
+
+    async def _esperar(self, clave: bytes, peticion: bytes, fila):
+        """
+        Serializes duplicates: polls until the original request stores its
+        response. Returns None if the key was released in the meantime.
+        """
+        espera, transcurrido = 0.05, 0.0
+        while fila is not None:
+            if bytes(fila.peticion) != peticion:
+                return JSONResponse(
+                    {"detail": "Idempotency-Key ya usada con una petición distinta"}, status_code=422
+                )
+            if fila.estado == COMPLETADA:
+                return _reproducir(fila)
+            if transcurrido >= IDEMPOTENCY_ESPERA_SEGUNDOS:
+                return JSONResponse(
+                    {"detail": "Una petición con esta Idempotency-Key sigue en proceso"}, status_code=409
+                )
+            await asyncio.sleep(espera)
+            transcurrido += espera
+            espera = min(espera * 2, 0.5)
+            fila = await run_in_threadpool(_consultar, clave)
+        return None
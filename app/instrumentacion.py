@@ -0,0 +1,197 @@
+"""
+Per-request SQL instrumentation.
+
+Cursor hooks on the engine count the statements each HTTP request sends and
+the time spent in them. Statements are grouped by fingerprint (the SQL with
+parameters and literals folded), so the same lookup repeated once per row,
+the N+1 signature, shows up as one fingerprint executed many times.
+
+Every response carries the numbers in a Server-Timing header:
+
+    Server-Timing: db;dur=12.4;desc="9 queries", n1;desc="1 repeated x5+", app;dur=31.0
+
+and SQLMiddleware aggregates them per route template for
+GET /diagnostico/sql. A sample (SQL_MUESTREO_LENTAS) of the requests keeps
+its statement list; the ones slower than SQL_LENTA_MS are stored, newest
+first, for GET /diagnostico/sql/lentas. The figures are per worker process.
+"""
+import contextvars
+import functools
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from . import database
+
+# A fingerprint executed this many times in one request counts as N+1
+SQL_REPETICIONES_N1 = int(os.getenv("SQL_REPETICIONES_N1", 5))
+SQL_LENTA_MS = float(os.getenv("SQL_LENTA_MS", 500))
+SQL_MUESTREO_LENTAS = float(os.getenv("SQL_MUESTREO_LENTAS", 0.1))
+SQL_LENTAS_MAX = int(os.getenv("SQL_LENTAS_MAX", 50))
+
+# Statements kept per sampled request
+_SENTENCIAS_MAX = 500
+
+_peticion = contextvars.ContextVar("sql_peticion", default=None)
+
+_lock = threading.Lock()
+_rutas = {}
+_lentas = deque(maxlen=SQL_LENTAS_MAX)
+
+_LITERALES = [
+    (re.compile(r"%\(\w+\)s|%s"), "?"),             # psycopg2 placeholders
+    (re.compile(r"'(?:[^']|'')*'"), "?"),           # string literals
+    (re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b"), "?"),  # numbers, not digits inside names (eventos_2024_01)
+    (re.compile(r"\?(?:\s*,\s*\?)+"), "?, ..."),    # expanded IN lists of any length
+    (re.compile(r"\s+"), " "),
+]
+
+# SQLAlchemy's compiled cache sends a bounded set of statement texts, so each
+# one is folded once and the hot path is a dict lookup
+@functools.lru_cache(maxsize=4096)
+def huella(sql: str) -> str:
+    """The statement with parameters and literals folded, for grouping repeats."""
+    for patron, reemplazo in _LITERALES:
+        sql = patron.sub(reemplazo, sql)
+    return sql.strip()
+
+class _Peticion:
+    """Statements sent while serving one request."""
+
+    def __init__(self, muestreada: bool):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.huellas = Counter()
+        self.sentencias = [] if muestreada else None
+
+    def repetidas(self) -> dict:
+        return {h: n for h, n in self.huellas.items() if n >= SQL_REPETICIONES_N1}
+
+@event.listens_for(database.engine, "before_cursor_execute")
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    if _peticion.get() is not None:
+        context._sql_inicio = time.perf_counter()
+
+@event.listens_for(database.engine, "after_cursor_execute")
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    peticion = _peticion.get()
+    inicio = getattr(context, "_sql_inicio", None)
+    if peticion is None or inicio is None:
+        return
+    duracion = time.perf_counter() - inicio
+    peticion.consultas += 1
+    peticion.tiempo_db += duracion
+    peticion.huellas[huella(statement)] += 1
+    if peticion.sentencias is not None and len(peticion.sentencias) < _SENTENCIAS_MAX:
+        peticion.sentencias.append({"sql": statement, "ms": round(duracion * 1000, 2)})
+
+def capturar_sentencias() -> list:
+    """Keeps the statement list of the current request (None outside one), as for a sampled one."""
+    peticion = _peticion.get()
+    if peticion is None:
+        return None
+    if peticion.sentencias is None:
+        peticion.sentencias = []
+    return peticion.sentencias
+
+def ruta_de(scope: dict) -> str:
+    """'GET /bovinos/{bovino_id}'; '-' when no route matched (404s, replayed responses)."""
+    ruta = scope.get("route")
+    return f"{scope['method']} {ruta.path}" if ruta is not None else "-"
+
+def _server_timing(peticion: _Peticion, total: float) -> bytes:
+    partes = [f'db;dur={peticion.tiempo_db * 1000:.1f};desc="{peticion.consultas} queries"']
+    repetidas = peticion.repetidas()
+    if repetidas:
+        partes.append(f'n1;desc="{len(repetidas)} repeated x{SQL_REPETICIONES_N1}+"')
+    partes.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(partes).encode("latin-1")
+
+def _registrar(scope: dict, peticion: _Peticion, total: float):
+    ruta = ruta_de(scope)
+    repetidas = peticion.repetidas()
+    with _lock:
+        datos = _rutas.get(ruta)
+        if datos is None:
+            datos = _rutas[ruta] = {
+                "peticiones": 0, "consultas": 0, "consultas_max": 0, "tiempo_db": 0.0,
+                "tiempo": 0.0, "peticiones_n1": 0, "repetidas": Counter(),
+            }
+        datos["peticiones"] += 1
+        datos["consultas"] += peticion.consultas
+        datos["consultas_max"] = max(datos["consultas_max"], peticion.consultas)
+        datos["tiempo_db"] += peticion.tiempo_db
+        datos["tiempo"] += total
+        if repetidas:
+            datos["peticiones_n1"] += 1
+            datos["repetidas"].update(repetidas.keys())
+        if peticion.sentencias is not None and total * 1000 >= SQL_LENTA_MS:
+            _lentas.appendleft({
+                "ruta": ruta,
+                "path": scope["path"],
+                "fecha": datetime.now(timezone.utc),
+                "tiempo_ms": round(total * 1000, 1),
+                "tiempo_db_ms": round(peticion.tiempo_db * 1000, 1),
+                "consultas": peticion.consultas,
+                "sentencias": peticion.sentencias,
+            })
+
+def resumen_rutas() -> list:
+    """Per-route totals and averages, the routes with the most DB time first."""
+    with _lock:
+        filas = [
+            {
+                "ruta": ruta,
+                "peticiones": d["peticiones"],
+                "consultas_promedio": round(d["consultas"] / d["peticiones"], 1),
+                "consultas_max": d["consultas_max"],
+                "tiempo_db_ms": round(d["tiempo_db"] * 1000, 1),
+                "tiempo_db_promedio_ms": round(d["tiempo_db"] * 1000 / d["peticiones"], 2),
+                "tiempo_promedio_ms": round(d["tiempo"] * 1000 / d["peticiones"], 2),
+                "peticiones_n1": d["peticiones_n1"],
+                "repetidas": [{"sql": h, "peticiones": n} for h, n in d["repetidas"].most_common(5)],
+            }
+            for ruta, d in _rutas.items()
+        ]
+    return sorted(filas, key=lambda f: f["tiempo_db_ms"], reverse=True)
+
+def lentas() -> list:
+    with _lock:
+        return list(_lentas)
+
+def reiniciar():
+    with _lock:
+        _rutas.clear()
+        _lentas.clear()
+
+class SQLMiddleware:
+    """Tracks the statements of each HTTP request and adds the Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        peticion = _Peticion(muestreada=random.random() < SQL_MUESTREO_LENTAS)
+        token = _peticion.set(peticion)
+        inicio = time.perf_counter()
+
+        async def send_timing(message):
+            if message["type"] == "http.response.start":
+                valor = _server_timing(peticion, time.perf_counter() - inicio)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", valor)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timing)
+        finally:
+            _peticion.reset(token)
+            _registrar(scope, peticion, time.perf_counter() - inicio)
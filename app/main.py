@@ -1,17 +1,37 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import os
-from .routers import users, bovinos, files, domicilios, predios, instalaciones, movilizaciones, sanidad
+from .routers import users, bovinos, files, domicilios, predios, instalaciones, movilizaciones, sanidad, catalogos, campanas, sync, crecimiento, notificaciones, diagnostico
 from .routers import eventos_main
 from .routers.eventos import pesos, dietas, vacunaciones, desparasitaciones, laboratorios, compraventas, traslados, enfermedades, tratamientos, remisiones
 from .database import engine
-from . import models
+from . import models, idempotency, recordatorios, particiones, perezosas, instrumentacion, metricas, trazas, perfilador, bloqueos, memoria
 
 # Create tables (if they don't exist, though docker-compose init script should handle it)
 models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="Union Ganadera API")
 
+# Lazy loads are reported (or rejected, CARGAS_PEREZOSAS=raise) with the endpoint
+app.add_middleware(perezosas.EndpointMiddleware)
+
+# Replays stored responses for retried writes (Idempotency-Key header).
+# Added before CORS so replayed responses still get CORS headers.
+app.add_middleware(idempotency.IdempotencyMiddleware)
+
+# X-Perfilar: 1 from a superadministrador profiles that request (GET /diagnostico/perfiles)
+app.add_middleware(perfilador.PerfiladorMiddleware)
+
+# Query count and DB time per request (Server-Timing header, GET /diagnostico/sql).
+# Outside the idempotency middleware so its key lookups are counted too.
+app.add_middleware(instrumentacion.SQLMiddleware)
+
+# Prometheus latency per route and requests in flight (GET /metrics)
+app.add_middleware(metricas.MetricasMiddleware)
+
+# Trace ids for every request, span trees for a TRAZAS_MUESTREO sample
+app.add_middleware(trazas.TrazasMiddleware)
+
 # Configure CORS for development and production
 # Development: Allow all origins. Production: Use CORS_ORIGINS env var with specific origins
 cors_origins_env = os.getenv("CORS_ORIGINS", "")
@@ -47,7 +67,66 @@ app.include_router(predios.router)
 app.include_router(instalaciones.router)
 app.include_router(movilizaciones.router)
 app.include_router(sanidad.router)
+app.include_router(catalogos.router)
+app.include_router(campanas.router)
+app.include_router(sync.router)
+app.include_router(crecimiento.router)
+app.include_router(notificaciones.router)
+app.include_router(diagnostico.router)
+
+# Sync endpoints register their threadpool thread with the profiler
+perfilador.instalar(app)
+
+# Reminder scheduler (RECORDATORIOS_ACTIVOS, every RECORDATORIOS_INTERVALO_SEGUNDOS)
+@app.on_event("startup")
+def iniciar_recordatorios():
+    recordatorios.iniciar()
+
+@app.on_event("startup")
+def iniciar_particiones():
+    particiones.iniciar()
+
+@app.on_event("startup")
+def iniciar_trazas():
+    trazas.iniciar()
+
+@app.on_event("startup")
+def iniciar_bloqueos():
+    bloqueos.iniciar()
+
+@app.on_event("startup")
+def iniciar_memoria():
+    memoria.iniciar()
+
+@app.on_event("shutdown")
+def detener_recordatorios():
+    recordatorios.detener()
+
+@app.on_event("shutdown")
+def detener_particiones():
+    particiones.detener()
+
+@app.on_event("shutdown")
+def detener_metricas():
+    metricas.detener()
+
+@app.on_event("shutdown")
+def detener_trazas():
+    trazas.detener()
+
+@app.on_event("shutdown")
+def detener_bloqueos():
+    bloqueos.detener()
+
+@app.on_event("shutdown")
+def detener_memoria():
+    memoria.detener()
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Union Ganadera API"}
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    cuerpo, content_type = metricas.exponer()
+    return Response(content=cuerpo, media_type=content_type)
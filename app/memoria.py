@@ -0,0 +1,160 @@
+"""
+Memory diagnostics for the worker process.
+
+A background thread sets, every MEMORIA_INTERVALO_SEGUNDOS, the gauges of
+the worker's resident memory, the objects tracked by the garbage collector
+and the collections per generation (GET /metrics), so RSS growth can be
+matched with the traffic that caused it.
+
+To find what is allocating, a superadministrador starts tracemalloc
+(POST /diagnostico/memoria/tracemalloc), takes snapshots before and after
+the suspected requests (POST /diagnostico/memoria/snapshots) and compares
+them (GET /diagnostico/memoria/snapshots/{id}?base={id}): the sites whose
+allocations grew the most come first. tracemalloc slows every allocation
+and stores its own traces, so it is meant to be stopped once done; only the
+last MEMORIA_SNAPSHOTS_MAX snapshots are kept. Everything is per worker.
+"""
+import gc
+import itertools
+import logging
+import os
+import threading
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from . import metricas
+
+logger = logging.getLogger(__name__)
+
+MEMORIA_INTERVALO_SEGUNDOS = int(os.getenv("MEMORIA_INTERVALO_SEGUNDOS", 15))
+MEMORIA_SNAPSHOTS_MAX = int(os.getenv("MEMORIA_SNAPSHOTS_MAX", 4))
+
+# tracemalloc's own bookkeeping and the import machinery are noise in the top sites
+_FILTROS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_snapshots = OrderedDict()
+_detener = threading.Event()
+_hilo = None
+
+def rss() -> int:
+    """Resident memory of this process in bytes (None outside Linux)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def estado() -> dict:
+    actual, pico = tracemalloc.get_traced_memory()
+    with _lock:
+        snapshots = [_resumen(i, s) for i, s in _snapshots.items()]
+    return {
+        "rss_bytes": rss(),
+        "gc_objetos": len(gc.get_objects()),
+        "gc_generaciones": list(gc.get_count()),
+        "gc_colecciones": [g["collections"] for g in gc.get_stats()],
+        "tracemalloc": tracemalloc.is_tracing(),
+        "tracemalloc_marcos": tracemalloc.get_traceback_limit(),
+        "traced_bytes": actual,
+        "traced_pico_bytes": pico,
+        "snapshots": snapshots,
+    }
+
+def _actualizar():
+    metricas.MEMORIA_RSS.set(rss() or 0)
+    metricas.GC_OBJETOS.set(len(gc.get_objects()))
+    for generacion, (pendientes, stats) in enumerate(zip(gc.get_count(), gc.get_stats())):
+        metricas.GC_GENERACION.labels(str(generacion)).set(pendientes)
+        metricas.GC_COLECCIONES.labels(str(generacion)).set(stats["collections"])
+
+def _bucle():
+    while not _detener.wait(MEMORIA_INTERVALO_SEGUNDOS):
+        try:
+            _actualizar()
+        except Exception:
+            logger.exception("Memory gauges update failed")
+
+def iniciar():
+    global _hilo
+    if MEMORIA_INTERVALO_SEGUNDOS <= 0 or (_hilo is not None and _hilo.is_alive()):
+        return
+    _actualizar()
+    _detener.clear()
+    _hilo = threading.Thread(target=_bucle, name="memoria", daemon=True)
+    _hilo.start()
+
+def detener():
+    _detener.set()
+    if _hilo is not None:
+        _hilo.join(timeout=10)
+
+# --- tracemalloc ---
+
+def trazando() -> bool:
+    return tracemalloc.is_tracing()
+
+def iniciar_trazado(marcos: int):
+    """Starts tracemalloc keeping `marcos` frames per allocation (1 = the allocating line)."""
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    tracemalloc.start(marcos)
+
+def detener_trazado():
+    """Stops tracemalloc, which frees its traces, and drops the snapshots."""
+    tracemalloc.stop()
+    with _lock:
+        _snapshots.clear()
+
+def _resumen(snapshot_id: int, guardado: dict) -> dict:
+    return {"id": snapshot_id, "fecha": guardado["fecha"], "traced_bytes": guardado["traced_bytes"]}
+
+def tomar_snapshot() -> int:
+    snapshot = tracemalloc.take_snapshot().filter_traces(_FILTROS)
+    guardado = {
+        "fecha": datetime.now(timezone.utc),
+        "traced_bytes": tracemalloc.get_traced_memory()[0],
+        "snapshot": snapshot,
+    }
+    snapshot_id = next(_ids)
+    with _lock:
+        _snapshots[snapshot_id] = guardado
+        while len(_snapshots) > MEMORIA_SNAPSHOTS_MAX:
+            _snapshots.popitem(last=False)
+    return snapshot_id
+
+def _sitio(traceback) -> str:
+    return "\n".join(f"{marco.filename}:{marco.lineno}" for marco in traceback)
+
+def asignaciones(snapshot_id: int, base_id: int = None, top: int = 20) -> dict:
+    """
+    Top allocation sites of a snapshot or, with a base, the sites whose
+    allocations changed the most since it. None when a snapshot is gone.
+    """
+    with _lock:
+        guardado = _snapshots.get(snapshot_id)
+        base = _snapshots.get(base_id) if base_id is not None else None
+    if guardado is None or (base_id is not None and base is None):
+        return None
+    agrupar = "traceback" if guardado["snapshot"].traceback_limit > 1 else "lineno"
+    if base is None:
+        filas = [
+            {"sitio": _sitio(s.traceback), "tamano_bytes": s.size, "bloques": s.count}
+            for s in guardado["snapshot"].statistics(agrupar)[:top]
+        ]
+    else:
+        filas = [
+            {
+                "sitio": _sitio(s.traceback), "tamano_bytes": s.size, "bloques": s.count,
+                "diferencia_bytes": s.size_diff, "diferencia_bloques": s.count_diff,
+            }
+            for s in guardado["snapshot"].compare_to(base["snapshot"], agrupar)[:top]
+        ]
+    return {**_resumen(snapshot_id, guardado), "base_id": base_id, "asignaciones": filas}
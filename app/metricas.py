@@ -0,0 +1,179 @@
+"""
+Prometheus metrics, exposed at GET /metrics.
+
+- http_request_duration_seconds: latency per route template, method and status
+- http_requests_in_flight: requests being served
+- db_pool_connections: pool connections in use, idle, overflow and size
+- db_query_duration_seconds: every statement sent, by kind (SELECT, INSERT...)
+- s3_request_duration_seconds / s3_request_errors_total: S3 calls by operation
+- bcrypt_duration_seconds: password hashing and verification
+- cache_requests_total: cache lookups by cache and result (hit/miss)
+- event_loop_lag_seconds / event_loop_block_duration_seconds: event loop lag and
+  blocks longer than BUCLE_UMBRAL_MS by route (app/bloqueos.py)
+- worker_resident_memory_bytes, worker_gc_objects, worker_gc_pending_objects,
+  worker_gc_collections: per worker, every MEMORIA_INTERVALO_SEGUNDOS (app/memoria.py)
+
+With several Uvicorn workers set PROMETHEUS_MULTIPROC_DIR to a directory
+emptied before the server starts: each worker writes its values there and
+/metrics adds them up for all workers (gauges count live workers only).
+"""
+import os
+import time
+
+# Multiprocess mode is chosen when the first metric is created
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+
+from . import database
+from .s3 import s3_client
+
+_BUCKETS_DB = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+_BUCKETS_BCRYPT = (.05, .1, .2, .3, .5, .75, 1, 2)
+_BUCKETS_BUCLE = (.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+
+HTTP_DURACION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+HTTP_EN_CURSO = Gauge(
+    "http_requests_in_flight", "HTTP requests being served", multiprocess_mode="livesum",
+)
+DB_POOL = Gauge(
+    "db_pool_connections", "Database pool connections by state", ["state"], multiprocess_mode="livesum",
+)
+DB_CONSULTA = Histogram(
+    "db_query_duration_seconds", "Duration of the statements sent to the database", ["kind"],
+    buckets=_BUCKETS_DB,
+)
+S3_DURACION = Histogram(
+    "s3_request_duration_seconds", "S3 call latency by operation", ["operation"],
+)
+S3_ERRORES = Counter(
+    "s3_request_errors_total", "S3 calls that failed (connection errors or HTTP error status)", ["operation"],
+)
+BCRYPT = Histogram(
+    "bcrypt_duration_seconds", "Password hashing (hash) and verification (verify)", ["operation"],
+    buckets=_BUCKETS_BCRYPT,
+)
+CACHE = Counter(
+    "cache_requests_total", "Cache lookups by result; hit ratio = hit / (hit + miss)", ["cache", "result"],
+)
+BUCLE_RETRASO = Histogram(
+    "event_loop_lag_seconds", "How late the event loop heartbeat ran", buckets=_BUCKETS_BUCLE,
+)
+BUCLE_BLOQUEO = Histogram(
+    "event_loop_block_duration_seconds", "Event loop blocks by the route that held the loop", ["route"],
+    buckets=_BUCKETS_BUCLE,
+)
+# One series per worker (pid label in multiprocess mode): a leak shows up in one worker first
+MEMORIA_RSS = Gauge(
+    "worker_resident_memory_bytes", "Resident memory of the worker process", multiprocess_mode="liveall",
+)
+GC_OBJETOS = Gauge(
+    "worker_gc_objects", "Objects tracked by the garbage collector", multiprocess_mode="liveall",
+)
+GC_GENERACION = Gauge(
+    "worker_gc_pending_objects", "Allocations pending collection by generation", ["generation"],
+    multiprocess_mode="liveall",
+)
+GC_COLECCIONES = Gauge(
+    "worker_gc_collections", "Garbage collections run by generation since the worker started", ["generation"],
+    multiprocess_mode="liveall",
+)
+
+def cache(nombre: str, acierto: bool):
+    CACHE.labels(nombre, "hit" if acierto else "miss").inc()
+
+# --- Database ---
+
+_TIPOS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+@event.listens_for(database.engine, "before_cursor_execute")
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    context._metricas_inicio = time.perf_counter()
+
+@event.listens_for(database.engine, "after_cursor_execute")
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_metricas_inicio", None)
+    if inicio is None:
+        return
+    tipo = statement.lstrip()[:6].upper()
+    DB_CONSULTA.labels(tipo if tipo in _TIPOS else "OTHER").observe(time.perf_counter() - inicio)
+
+@event.listens_for(database.engine, "checkout")
+@event.listens_for(database.engine, "checkin")
+def _pool(*args):
+    pool = database.engine.pool
+    DB_POOL.labels("in_use").set(pool.checkedout())
+    DB_POOL.labels("idle").set(pool.checkedin())
+    DB_POOL.labels("overflow").set(max(pool.overflow(), 0))
+    DB_POOL.labels("size").set(pool.size())
+
+# --- S3 (server-side client; presigned URLs make no calls) ---
+
+def _s3_antes(model, context, **kwargs):
+    context["metricas_inicio"] = time.perf_counter()
+    context["metricas_operacion"] = model.name
+
+def _s3_despues(http_response, model, context, **kwargs):
+    S3_DURACION.labels(model.name).observe(time.perf_counter() - context["metricas_inicio"])
+    if http_response.status_code >= 400:
+        S3_ERRORES.labels(model.name).inc()
+
+def _s3_error(context, **kwargs):
+    operacion = context.get("metricas_operacion", "unknown")
+    S3_DURACION.labels(operacion).observe(time.perf_counter() - context.get("metricas_inicio", time.perf_counter()))
+    S3_ERRORES.labels(operacion).inc()
+
+s3_client.meta.events.register("before-call.s3", _s3_antes)
+s3_client.meta.events.register("after-call.s3", _s3_despues)
+s3_client.meta.events.register("after-call-error.s3", _s3_error)
+
+# --- Exposition ---
+
+def exponer() -> tuple:
+    """(body, content type) of the /metrics response, summed over the workers in multiprocess mode."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
+
+def detener():
+    """Drops this worker's live gauges (in-flight requests, pool) on shutdown."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+class MetricasMiddleware:
+    """Request latency per route template and requests in flight."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        estado = {"status": 500}
+
+        async def send_estado(message):
+            if message["type"] == "http.response.start":
+                estado["status"] = message["status"]
+            await send(message)
+
+        HTTP_EN_CURSO.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_estado)
+        finally:
+            HTTP_EN_CURSO.dec()
+            # Unmatched paths (404s) share one label instead of one series per URL
+            ruta = getattr(scope.get("route"), "path", "-")
+            HTTP_DURACION.labels(scope["method"], ruta, str(estado["status"])).observe(time.perf_counter() - inicio)
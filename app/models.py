@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Enum, Date, Numeric, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, ForeignKeyConstraint, Enum, Date, Numeric, Text, Integer, BigInteger, SmallInteger, LargeBinary, UniqueConstraint, CheckConstraint, Index, DDL, event
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSTZRANGE, ExcludeConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -91,6 +91,22 @@ class InstalacionStatusEnum(str, enum.Enum):
     activa = "activa"
     inactiva = "inactiva"
 
+class CatalogoTipoEnum(str, enum.Enum):
+    vacuna = "vacuna"
+    laboratorio = "laboratorio"
+    medicamento = "medicamento"
+    enfermedad = "enfermedad"
+    raza = "raza"
+
+class CampanaTipoEnum(str, enum.Enum):
+    vacunacion = "vacunacion"
+    desparasitacion = "desparasitacion"
+
+class CampanaEstadoEnum(str, enum.Enum):
+    programada = "programada"
+    en_curso = "en_curso"
+    cerrada = "cerrada"
+
 class Usuario(Base):
     __tablename__ = "usuarios"
 
@@ -194,6 +210,7 @@ class Bovino(Base):
     nombre = Column(String, nullable=True)
 
     raza_dominante = Column(String)
+    raza_id = Column(Integer, ForeignKey("catalogos.id"), nullable=True)
     fecha_nac = Column(Date)
     sexo = Column(Enum(SexoEnum))
     peso_nac = Column(Numeric(6, 2))
@@ -201,18 +218,55 @@ class Bovino(Base):
     imc = Column(Numeric(4, 2))
     proposito = Column(String)
     status = Column(String, default="activo")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     usuario = relationship("Usuario", back_populates="bovinos", foreign_keys=[usuario_id])
-    eventos = relationship("Evento", back_populates="bovino")
+    # eventos.bovino_id is ON DELETE CASCADE: deleting a bovino leaves its events to
+    # the database instead of loading them to null a NOT NULL column
+    eventos = relationship("Evento", back_populates="bovino", passive_deletes=True)
     instalacion = relationship("Instalacion", back_populates="bovinos")
 
     madre = relationship("Bovino", remote_side=[id], foreign_keys=[madre_id])
     padre = relationship("Bovino", remote_side=[id], foreign_keys=[padre_id])
+    resumen = relationship("BovinoResumen", uselist=False, viewonly=True)
 
     @property
     def instalacion_nombre(self):
         return self.instalacion.nombre if self.instalacion else None
 
+class BovinoPropiedad(Base):
+    """Ownership period of a bovino; the open period (no upper bound) is the current owner."""
+    __tablename__ = "bovino_propiedad"
+    __table_args__ = (
+        ExcludeConstraint(("bovino_id", "="), ("periodo", "&&"), using="gist"),
+        Index("idx_bovino_propiedad_usuario", "usuario_id", "bovino_id"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    bovino_id = Column(UUID(as_uuid=True), ForeignKey("bovinos.id", ondelete="CASCADE"), nullable=False)
+    usuario_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False)
+    periodo = Column(TSTZRANGE, nullable=False)
+    evento_id = Column(UUID(as_uuid=True))
+
+class BovinoResumen(Base):
+    """Current state of a bovino, kept by the bovino_resumen triggers (read-only here)."""
+    __tablename__ = "bovino_resumen"
+
+    bovino_id = Column(UUID(as_uuid=True), ForeignKey("bovinos.id", ondelete="CASCADE"), primary_key=True)
+    ultimo_peso = Column(Numeric(6, 2))
+    ultimo_peso_fecha = Column(DateTime(timezone=True))
+    ultima_vacunacion_tipo = Column(String(100))
+    ultima_vacunacion_fecha = Column(DateTime(timezone=True))
+    proxima_vacunacion = Column(Date)
+    enfermedades_abiertas = Column(Integer, nullable=False, server_default="0")
+    enfermedad_abierta_tipo = Column(String(100))
+    enfermedad_abierta_fecha = Column(DateTime(timezone=True))
+    ultima_movilizacion_id = Column(UUID(as_uuid=True))
+    ultima_movilizacion_estado = Column(String(20))
+    ultima_movilizacion_fecha = Column(DateTime(timezone=True))
+    propietario_desde = Column(DateTime(timezone=True))
+    actualizado_en = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
 class Predio(Base):
     __tablename__ = "predios"
 
@@ -222,109 +276,279 @@ class Predio(Base):
     superficie_total = Column(Numeric(10, 2))
     latitud = Column(Numeric(9, 6))
     longitud = Column(Numeric(9, 6))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     usuario = relationship("Usuario", back_populates="predios")
     instalaciones = relationship("InstalacionPredio", back_populates="predio", cascade="all, delete-orphan")
 
+class Catalogo(Base):
+    __tablename__ = "catalogos"
+    __table_args__ = (UniqueConstraint("tipo", "nombre"),)
+
+    id = Column(Integer, primary_key=True)
+    tipo = Column(Enum(CatalogoTipoEnum, name="catalogo_tipo_enum"), nullable=False)
+    nombre = Column(String(100), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class CatalogoAlias(Base):
+    __tablename__ = "catalogo_alias"
+
+    tipo = Column(Enum(CatalogoTipoEnum, name="catalogo_tipo_enum"), primary_key=True)
+    alias = Column(String(100), primary_key=True)
+    catalogo_id = Column(Integer, ForeignKey("catalogos.id", ondelete="CASCADE"), nullable=False)
+
 class Evento(Base):
     __tablename__ = "eventos"
+    # Partitioned by month (see crear_particiones_eventos in db_schema.sql)
+    __table_args__ = {"postgresql_partition_by": "RANGE (fecha)"}
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     bovino_id = Column(UUID(as_uuid=True), ForeignKey("bovinos.id"))
-    fecha = Column(DateTime(timezone=True), server_default=func.now())
+    fecha = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     observaciones = Column(Text)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     bovino = relationship("Bovino", back_populates="eventos")
 
 # Event Detail Models
 class Peso(Base):
     __tablename__ = "pesos"
+    __table_args__ = (
+        ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], ondelete="CASCADE", onupdate="CASCADE"),
+        {"postgresql_partition_by": "RANGE (evento_fecha)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    evento_id = Column(UUID(as_uuid=True), ForeignKey("eventos.id"))
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), primary_key=True)
     peso_actual = Column(Numeric(6, 2))
     peso_nuevo = Column(Numeric(6, 2))
 
 class Dieta(Base):
     __tablename__ = "dietas"
+    __table_args__ = (
+        ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], ondelete="CASCADE", onupdate="CASCADE"),
+        {"postgresql_partition_by": "RANGE (evento_fecha)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    evento_id = Column(UUID(as_uuid=True), ForeignKey("eventos.id"))
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), primary_key=True)
     alimento = Column(String(100), nullable=False)
 
 class Vacunacion(Base):
     __tablename__ = "vacunaciones"
+    __table_args__ = (
+        ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], ondelete="CASCADE", onupdate="CASCADE"),
+        {"postgresql_partition_by": "RANGE (evento_fecha)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    evento_id = Column(UUID(as_uuid=True), ForeignKey("eventos.id"))
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), primary_key=True)
     veterinario_id = Column(UUID(as_uuid=True))
     tipo = Column(String(100))
+    tipo_id = Column(Integer, ForeignKey("catalogos.id"), nullable=True)
     lote = Column(String(50))
     laboratorio = Column(String(100))
+    laboratorio_id = Column(Integer, ForeignKey("catalogos.id"), nullable=True)
     fecha_prox = Column(Date)
 
 class Desparasitacion(Base):
     __tablename__ = "desparasitaciones"
+    __table_args__ = (
+        ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], ondelete="CASCADE", onupdate="CASCADE"),
+        {"postgresql_partition_by": "RANGE (evento_fecha)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    evento_id = Column(UUID(as_uuid=True), ForeignKey("eventos.id"))
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), primary_key=True)
     veterinario_id = Column(UUID(as_uuid=True))
     medicamento = Column(String(100))
+    medicamento_id = Column(Integer, ForeignKey("catalogos.id"), nullable=True)
     dosis_admin = Column(String(50))
     fecha_prox = Column(Date)
 
 class Laboratorio(Base):
     __tablename__ = "laboratorios"
+    __table_args__ = (
+        ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], ondelete="CASCADE", onupdate="CASCADE"),
+        {"postgresql_partition_by": "RANGE (evento_fecha)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    evento_id = Column(UUID(as_uuid=True), ForeignKey("eventos.id"))
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), primary_key=True)
     veterinario_id = Column(UUID(as_uuid=True))
     tipo = Column(String(100))
     resultado = Column(Text)
 
 class Compraventa(Base):
     __tablename__ = "compraventas"
+    __table_args__ = (
+        ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], ondelete="CASCADE", onupdate="CASCADE"),
+        {"postgresql_partition_by": "RANGE (evento_fecha)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    evento_id = Column(UUID(as_uuid=True), ForeignKey("eventos.id"))
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), primary_key=True)
     comprador_curp = Column(String(18))
     vendedor_curp = Column(String(18))
+    comprador_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"))
+    vendedor_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"))
 
 class Traslado(Base):
     __tablename__ = "traslado"
+    __table_args__ = (
+        ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], ondelete="CASCADE", onupdate="CASCADE"),
+        {"postgresql_partition_by": "RANGE (evento_fecha)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    evento_id = Column(UUID(as_uuid=True), ForeignKey("eventos.id"))
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), primary_key=True)
     predio_anterior_id = Column(UUID(as_uuid=True))
     predio_nuevo_id = Column(UUID(as_uuid=True))
 
 class Enfermedad(Base):
     __tablename__ = "enfermedades"
+    __table_args__ = (ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], ondelete="CASCADE", onupdate="CASCADE"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    evento_id = Column(UUID(as_uuid=True), ForeignKey("eventos.id"))
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), nullable=False)
     veterinario_id = Column(UUID(as_uuid=True))
     tipo = Column(String(100))
+    tipo_id = Column(Integer, ForeignKey("catalogos.id"), nullable=True)
 
 class Tratamiento(Base):
     __tablename__ = "tratamientos"
+    __table_args__ = (ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], onupdate="CASCADE"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    evento_id = Column(UUID(as_uuid=True), ForeignKey("eventos.id"))
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), nullable=False)
     enfermedad_id = Column(UUID(as_uuid=True), ForeignKey("enfermedades.id"), nullable=True)
     veterinario_id = Column(UUID(as_uuid=True))
     medicamento = Column(String(100))
+    medicamento_id = Column(Integer, ForeignKey("catalogos.id"), nullable=True)
     dosis = Column(String(50))
     periodo = Column(String(50))
 
 class Remision(Base):
     __tablename__ = "remisiones"
+    __table_args__ = (ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], onupdate="CASCADE"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    evento_id = Column(UUID(as_uuid=True), ForeignKey("eventos.id"))
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), nullable=False)
     enfermedad_id = Column(UUID(as_uuid=True), ForeignKey("enfermedades.id"), nullable=True)
     veterinario_id = Column(UUID(as_uuid=True))
 
+class Campana(Base):
+    __tablename__ = "campanas"
+    __table_args__ = (CheckConstraint("instalacion_id IS NOT NULL OR filtro_usuario_id IS NOT NULL"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tipo = Column(Enum(CampanaTipoEnum, name="campana_tipo_enum"), nullable=False)
+    estado = Column(Enum(CampanaEstadoEnum, name="campana_estado_enum"), nullable=False, default=CampanaEstadoEnum.programada)
+    creado_por_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=False)
+    veterinario_id = Column(UUID(as_uuid=True), ForeignKey("veterinarios.id"), nullable=False)
+
+    producto = Column(String(100), nullable=False)
+    producto_id = Column(Integer, ForeignKey("catalogos.id"), nullable=True)
+    lote = Column(String(50))
+    laboratorio = Column(String(100))
+    laboratorio_id = Column(Integer, ForeignKey("catalogos.id"), nullable=True)
+    dosis = Column(String(50))
+    fecha_prox = Column(Date)
+    observaciones = Column(Text, default='')
+
+    instalacion_id = Column(UUID(as_uuid=True), ForeignKey("instalaciones.id"), nullable=True)
+    filtro_usuario_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=True)
+    filtro_sexo = Column(Enum(SexoEnum, name="sexo_enum"), nullable=True)
+    filtro_raza_id = Column(Integer, ForeignKey("catalogos.id"), nullable=True)
+    filtro_nac_desde = Column(Date)
+    filtro_nac_hasta = Column(Date)
+
+    total_aplicados = Column(Integer, nullable=False, default=0)
+    ultima_aplicacion = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    instalacion = relationship("Instalacion")
+
+class CampanaBovino(Base):
+    __tablename__ = "campana_bovinos"
+    __table_args__ = (
+        ForeignKeyConstraint(["evento_id", "evento_fecha"], ["eventos.id", "eventos.fecha"], ondelete="CASCADE", onupdate="CASCADE"),
+    )
+
+    campana_id = Column(UUID(as_uuid=True), ForeignKey("campanas.id", ondelete="CASCADE"), primary_key=True)
+    bovino_id = Column(UUID(as_uuid=True), ForeignKey("bovinos.id", ondelete="CASCADE"), primary_key=True)
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    evento_fecha = Column(DateTime(timezone=True), nullable=False)
+    aplicado_en = Column(DateTime(timezone=True), server_default=func.now())
+
+class AgendaSanitaria(Base):
+    __tablename__ = "agenda_sanitaria"
+
+    bovino_id = Column(UUID(as_uuid=True), ForeignKey("bovinos.id", ondelete="CASCADE"), primary_key=True)
+    tipo = Column(Enum(CampanaTipoEnum, name="campana_tipo_enum"), primary_key=True)
+    producto_id = Column(Integer, ForeignKey("catalogos.id"), primary_key=True)
+    evento_id = Column(UUID(as_uuid=True), nullable=False)
+    veterinario_id = Column(UUID(as_uuid=True))
+    fecha_aplicacion = Column(DateTime(timezone=True), nullable=False)
+    fecha_prox = Column(Date)
+    actualizado_en = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class Notificacion(Base):
+    __tablename__ = "notificaciones"
+
+    id = Column(BigInteger, primary_key=True)
+    usuario_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False)
+    tipo = Column(String(30), nullable=False)
+    referencia_id = Column(UUID(as_uuid=True))
+    clave = Column(Text, nullable=False, unique=True)
+    titulo = Column(String(150), nullable=False)
+    mensaje = Column(Text, nullable=False)
+    datos = Column(JSONB)
+    estado = Column(String(20), nullable=False, default="pendiente")
+    intentos = Column(SmallInteger, nullable=False, default=0)
+    siguiente_intento = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    error = Column(Text)
+    creado_en = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    enviado_en = Column(DateTime(timezone=True))
+
+class RecordatorioCursor(Base):
+    __tablename__ = "recordatorio_cursores"
+
+    fuente = Column(String(30), primary_key=True)
+    procesado_hasta = Column(DateTime(timezone=True), nullable=False)
+    ventana_hasta = Column(Date)
+
+class SyncTombstone(Base):
+    __tablename__ = "sync_tombstones"
+
+    id = Column(BigInteger, primary_key=True)
+    entidad = Column(String(20), nullable=False)
+    entidad_id = Column(UUID(as_uuid=True), nullable=False)
+    usuario_id = Column(UUID(as_uuid=True), nullable=False)
+    eliminado_en = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    clave = Column(LargeBinary, primary_key=True)
+    peticion = Column(LargeBinary, nullable=False)
+    estado = Column(SmallInteger, nullable=False, server_default="0")
+    status_code = Column(SmallInteger)
+    content_type = Column(String(100))
+    respuesta = Column(LargeBinary)
+    creado_en = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expira_en = Column(DateTime(timezone=True), nullable=False)
+
 class Documento(Base):
     __tablename__ = "documentos"
 
@@ -335,6 +559,7 @@ class Documento(Base):
     original_filename = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     authored = Column(Boolean, default=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     usuario = relationship("Usuario", back_populates="documentos")
     revisiones = relationship(
@@ -375,6 +600,7 @@ class Instalacion(Base):
     active = Column(Boolean, default=False)  # Only True when status = "activa" and approved by admin
     fecha_vencimiento = Column(Date, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     usuario = relationship("Usuario", back_populates="instalaciones", foreign_keys=[usuario_id])
     predios = relationship("InstalacionPredio", back_populates="instalacion", cascade="all, delete-orphan")
@@ -432,6 +658,7 @@ class RenovacionUPP(Base):
 
 class Movilizacion(Base):
     __tablename__ = "movilizaciones"
+    __table_args__ = (Index("idx_movilizaciones_solicitante", "solicitante_id", "fecha_solicitud"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     solicitante_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=False)
@@ -473,20 +700,24 @@ class Movilizacion(Base):
     documento_factura = relationship("Documento", foreign_keys=[documento_factura_id])
     documento_compra = relationship("Documento", foreign_keys=[documento_compra_id])
 
-    bovinos = relationship("MovilizacionBovino", back_populates="movilizacion", cascade="all, delete-orphan")
+    # The cattle themselves, through movilizacion_bovinos (what the responses list)
+    bovinos = relationship("Bovino", secondary="movilizacion_bovinos", overlaps="movilizacion,bovino")
     eventos = relationship("MovilizacionEvento", back_populates="movilizacion", cascade="all, delete-orphan")
 
 class MovilizacionBovino(Base):
     __tablename__ = "movilizacion_bovinos"
+    # The primary key leads with movilizacion_id; this serves a bovino's movements
+    __table_args__ = (Index("idx_movilizacion_bovinos_bovino", "bovino_id"),)
 
     movilizacion_id = Column(UUID(as_uuid=True), ForeignKey("movilizaciones.id", ondelete="CASCADE"), primary_key=True)
     bovino_id = Column(UUID(as_uuid=True), ForeignKey("bovinos.id", ondelete="CASCADE"), primary_key=True)
 
-    movilizacion = relationship("Movilizacion", back_populates="bovinos")
-    bovino = relationship("Bovino")
+    movilizacion = relationship("Movilizacion", overlaps="bovinos")
+    bovino = relationship("Bovino", overlaps="bovinos")
 
 class MovilizacionEvento(Base):
     __tablename__ = "movilizacion_eventos"
+    __table_args__ = (Index("idx_movilizacion_eventos_movilizacion", "movilizacion_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     movilizacion_id = Column(UUID(as_uuid=True), ForeignKey("movilizaciones.id", ondelete="CASCADE"), nullable=False)
@@ -498,3 +729,17 @@ class MovilizacionEvento(Base):
 
     movilizacion = relationship("Movilizacion", back_populates="eventos")
     usuario = relationship("Usuario", foreign_keys=[usuario_id])
+
+# bovino_resumen triggers on the movilización tables, which only exist in the
+# ORM; the functions are defined in db_schema.sql (migration 012 adds them to
+# existing tables)
+event.listen(MovilizacionBovino.__table__, "after_create", DDL("""
+    CREATE TRIGGER trg_movilizacion_bovinos_resumen_insert AFTER INSERT ON movilizacion_bovinos
+    REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_movilizacion_bovinos();
+    CREATE TRIGGER trg_movilizacion_bovinos_resumen_delete AFTER DELETE ON movilizacion_bovinos
+    REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_movilizacion_bovinos();
+"""))
+event.listen(Movilizacion.__table__, "after_create", DDL("""
+    CREATE TRIGGER trg_movilizaciones_resumen_update AFTER UPDATE ON movilizaciones
+    REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION resumen_movilizaciones_actualizadas();
+"""))
@@ -0,0 +1,53 @@
+import logging
+import os
+import threading
+
+from sqlalchemy import text
+
+from . import database
+
+logger = logging.getLogger(__name__)
+
+# Monthly partitions of eventos and its detail tables are kept created this
+# many months ahead, checked at startup and then every PARTICIONES_INTERVALO_HORAS
+PARTICIONES_MESES_ADELANTE = int(os.getenv("PARTICIONES_MESES_ADELANTE", 3))
+PARTICIONES_INTERVALO_HORAS = float(os.getenv("PARTICIONES_INTERVALO_HORAS", 24))
+
+_detener = threading.Event()
+_hilo = None
+
+def crear_particiones() -> int:
+    """Creates the missing monthly partitions up to PARTICIONES_MESES_ADELANTE ahead."""
+    db = database.SessionLocal()
+    try:
+        creadas = db.execute(text("""
+            SELECT crear_particiones_eventos(CURRENT_DATE, (CURRENT_DATE + make_interval(months => :m))::DATE)
+        """), {"m": PARTICIONES_MESES_ADELANTE}).scalar()
+        db.commit()
+    finally:
+        db.close()
+    if creadas:
+        logger.info("Created %s event partitions", creadas)
+    return creadas
+
+def _bucle():
+    while True:
+        try:
+            crear_particiones()
+        except Exception:
+            logger.exception("Event partition maintenance failed")
+        if _detener.wait(PARTICIONES_INTERVALO_HORAS * 3600):
+            break
+
+def iniciar():
+    global _hilo
+    if _hilo is not None and _hilo.is_alive():
+        return
+    _detener.clear()
+    _hilo = threading.Thread(target=_bucle, name="particiones", daemon=True)
+    _hilo.start()
+
+def detener():
+    _detener.set()
+    if _hilo is not None:
+        _hilo.join(timeout=10)
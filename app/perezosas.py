@@ -0,0 +1,68 @@
+"""
+Lazy-load policy for ORM relationships (CARGAS_PEREZOSAS).
+
+Responses must get every relationship they read from the query's load
+options (joinedload/selectinload, e.g. crud_movilizaciones.CARGA_MOVILIZACION);
+a relationship left to lazy loading costs one SELECT per returned row.
+Sessions from database.SessionLocal apply the policy the way
+raiseload("*", sql_only=True) would, at every depth of the loaded graph:
+
+- raise: a lazy load that needs SQL raises CargaPerezosaError (CI, development)
+- log:   it runs and is logged with the endpoint that triggered it (production)
+- off:   plain SQLAlchemy behaviour
+
+Lazy loads answered from the identity map (a many-to-one already loaded)
+emit no SQL and are always allowed. `python -m app.cargas` checks the
+response graphs in CI.
+"""
+import contextvars
+import logging
+import os
+
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+
+from . import database
+
+CARGAS_PEREZOSAS = os.getenv("CARGAS_PEREZOSAS", "log").lower()
+
+logger = logging.getLogger(__name__)
+
+# ASGI scope of the request being served; the router adds the matched route to it
+_scope = contextvars.ContextVar("cargas_perezosas_scope", default=None)
+
+class CargaPerezosaError(InvalidRequestError):
+    pass
+
+def endpoint_actual() -> str:
+    """'GET /bovinos/{bovino_id}' for the current request, '-' outside one (scheduler, scripts)."""
+    scope = _scope.get()
+    if scope is None:
+        return "-"
+    ruta = scope.get("route")
+    return f"{scope['method']} {getattr(ruta, 'path', scope['path'])}"
+
+@event.listens_for(database.SessionLocal, "do_orm_execute")
+def _revisar_carga(estado):
+    if CARGAS_PEREZOSAS == "off" or not estado.is_relationship_load or estado.lazy_loaded_from is None:
+        return
+    mensaje = f"Lazy load of {estado.loader_strategy_path[-1]} in {endpoint_actual()}"
+    if CARGAS_PEREZOSAS == "raise":
+        raise CargaPerezosaError(f"{mensaje}; load it in the query options")
+    logger.warning(mensaje)
+
+class EndpointMiddleware:
+    """Makes the request's scope available to the lazy-load check."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _scope.reset(token)
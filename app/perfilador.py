@@ -0,0 +1,259 @@
+"""
+On-demand request profiler for superadministradores.
+
+A request sent by a superadministrador with `X-Perfilar: 1` (or `?perfilar=1`)
+is profiled by sampling: a background thread reads the stacks of the threads
+serving it every PERFIL_INTERVALO_MS and counts them, the way pyinstrument
+does, so the call tree shows wall time including waits on the database or
+S3. Async endpoints run on the event loop thread, which is sampled while it
+is busy (samples from other requests running on it at the same time can
+show up); sync endpoints are sampled in their threadpool thread.
+
+Library frames between the app's own are folded in the call tree. The
+tree and the request's SQL statements are kept in memory, oldest
+dropped beyond PERFILES_MAX_KB, and the response carries `X-Perfil-Id` for
+GET /diagnostico/perfiles/{id}. Requests without the flag only pay a
+header check, plus one context variable lookup in sync endpoints.
+"""
+import contextvars
+import functools
+import inspect
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
+
+from . import auth, database, instrumentacion, models
+
+PERFIL_INTERVALO_MS = float(os.getenv("PERFIL_INTERVALO_MS", 1))
+# Total size of the stored profiles (call trees and SQL text)
+PERFILES_MAX_KB = int(os.getenv("PERFILES_MAX_KB", 4096))
+# Call tree nodes below this share of the samples are folded away
+PERFIL_MIN_PORCENTAJE = float(os.getenv("PERFIL_MIN_PORCENTAJE", 0.5))
+
+HEADER = b"x-perfilar"
+
+_perfil = contextvars.ContextVar("perfil", default=None)
+
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_perfiles = OrderedDict()
+_tamano = 0
+
+_APP = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+class _Perfil:
+    def __init__(self, hilo_loop: int):
+        self.hilo_loop = hilo_loop
+        self.hilos = {hilo_loop}
+        self.muestras = {}
+        self.total = 0
+        self.rondas = 0
+        self.duracion = 0.0
+        self.terminado = threading.Event()
+
+    def muestrear(self):
+        """Runs in its own thread until the request finishes."""
+        propio = threading.get_ident()
+        intervalo = PERFIL_INTERVALO_MS / 1000
+        inicio = time.perf_counter()
+        while not self.terminado.wait(intervalo):
+            self.rondas += 1
+            marcos = sys._current_frames()
+            for hilo in list(self.hilos):
+                marco = marcos.get(hilo)
+                if marco is None or hilo == propio:
+                    continue
+                # The event loop waiting in select() is idle, not serving this request
+                if hilo == self.hilo_loop and marco.f_code.co_filename.endswith("selectors.py"):
+                    continue
+                pila = []
+                while marco is not None:
+                    codigo = marco.f_code
+                    pila.append((codigo.co_name, codigo.co_filename, codigo.co_firstlineno))
+                    marco = marco.f_back
+                pila = tuple(reversed(pila))
+                self.muestras[pila] = self.muestras.get(pila, 0) + 1
+                self.total += 1
+        self.duracion = time.perf_counter() - inicio
+
+    def ms_por_ronda(self) -> float:
+        """Actual time between samples; sleeps overshoot the interval under load."""
+        return self.duracion * 1000 / self.rondas if self.rondas else PERFIL_INTERVALO_MS
+
+def _nombre(funcion, archivo, linea) -> str:
+    archivo = "app/" + archivo[len(_APP):] if archivo.startswith(_APP) else "/".join(archivo.split(os.sep)[-2:])
+    return f"{funcion} ({archivo}:{linea})"
+
+def _plegar(pila: tuple) -> tuple:
+    """
+    Keeps the app's frames, the library call each one makes and the frame the
+    sample landed in (psycopg2, bcrypt, boto3...); server, framework and
+    library internals in between are folded.
+    """
+    propios = [i for i, marco in enumerate(pila) if marco[1].startswith(_APP)]
+    visibles = set(propios) | {i + 1 for i in propios} | {len(pila) - 1}
+    return tuple(marco for i, marco in enumerate(pila) if i in visibles)
+
+def _arbol(muestras: dict, total: int, ms_por_muestra: float) -> str:
+    """Indented call tree, '<ms> <share> <function (file:line)>' per line, heaviest branch first."""
+    raiz = {}
+    for pila, n in muestras.items():
+        nodo = raiz
+        for marco in _plegar(pila):
+            hijo = nodo.setdefault(marco, [0, {}])
+            hijo[0] += n
+            nodo = hijo[1]
+    minimo = total * PERFIL_MIN_PORCENTAJE / 100
+    lineas = []
+
+    def recorrer(nodo, nivel):
+        for marco, (n, hijos) in sorted(nodo.items(), key=lambda e: -e[1][0]):
+            if n < minimo:
+                continue
+            lineas.append(f"{'  ' * nivel}{n * ms_por_muestra:8.1f} ms {100 * n / total:5.1f}%  {_nombre(*marco)}")
+            recorrer(hijos, nivel + 1)
+
+    recorrer(raiz, 0)
+    return "\n".join(lineas)
+
+def _guardar(perfil: dict):
+    global _tamano
+    perfil["tamano"] = len(perfil["arbol"]) + sum(len(s["sql"]) for s in perfil["sentencias"])
+    with _lock:
+        _perfiles[perfil["id"]] = perfil
+        _tamano += perfil["tamano"]
+        while _tamano > PERFILES_MAX_KB * 1024 and len(_perfiles) > 1:
+            _, antiguo = _perfiles.popitem(last=False)
+            _tamano -= antiguo["tamano"]
+
+def perfiles() -> list:
+    """Stored profiles without their call tree and statements, newest first."""
+    with _lock:
+        return [
+            {k: v for k, v in p.items() if k not in ("arbol", "sentencias")}
+            for p in reversed(_perfiles.values())
+        ]
+
+def perfil(perfil_id: int) -> dict:
+    with _lock:
+        return _perfiles.get(perfil_id)
+
+def _superadmin(headers: dict) -> str:
+    """CURP of the bearer when they are a superadministrador, else None."""
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        curp = jwt.decode(authorization[7:], auth.SECRET_KEY, algorithms=[auth.ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+    db = database.SessionLocal()
+    try:
+        rol = db.query(models.Usuario.rol).filter(models.Usuario.curp == curp).scalar()
+    finally:
+        db.close()
+    return curp if rol == models.RolEnum.superadministrador else None
+
+def _pedido(scope: dict, headers: dict) -> bool:
+    if headers.get(HEADER) in (b"1", b"true"):
+        return True
+    return any(p in (b"perfilar=1", b"perfilar=true") for p in scope["query_string"].split(b"&"))
+
+def _envolver(funcion):
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        perfil_actual = _perfil.get()
+        if perfil_actual is None:
+            return funcion(*args, **kwargs)
+        hilo = threading.get_ident()
+        perfil_actual.hilos.add(hilo)
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            perfil_actual.hilos.discard(hilo)
+    return envoltura
+
+def instalar(app):
+    """
+    Makes the threadpool thread of every sync endpoint samplable. Call it
+    after including the routers and before serving: both the endpoint
+    (routes FastAPI still builds from it) and the dependant FastAPI calls are
+    wrapped.
+    """
+    def rutas(lista):
+        for ruta in lista:
+            if hasattr(ruta, "original_router"):
+                yield from rutas(ruta.original_router.routes)
+            elif getattr(ruta, "dependant", None) is not None:
+                yield ruta
+
+    for ruta in rutas(app.routes):
+        if inspect.iscoroutinefunction(ruta.endpoint) or getattr(ruta.endpoint, "_perfilable", False):
+            continue
+        envuelta = _envolver(ruta.endpoint)
+        envuelta._perfilable = True
+        ruta.endpoint = envuelta
+        if ruta.dependant.call is envuelta.__wrapped__:
+            ruta.dependant.call = envuelta
+
+class PerfiladorMiddleware:
+    """Profiles the flagged requests of superadministradores."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not _pedido(scope, headers):
+            await self.app(scope, receive, send)
+            return
+        curp = await run_in_threadpool(_superadmin, headers)
+        if curp is None:
+            await self.app(scope, receive, send)
+            return
+
+        perfil_id = next(_ids)
+        actual = _Perfil(threading.get_ident())
+        token = _perfil.set(actual)
+        sentencias = instrumentacion.capturar_sentencias()
+        muestreador = threading.Thread(target=actual.muestrear, name=f"perfil-{perfil_id}", daemon=True)
+        estado = {"status": 500}
+
+        async def send_perfil(message):
+            if message["type"] == "http.response.start":
+                estado["status"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-perfil-id", str(perfil_id).encode())]}
+            await send(message)
+
+        fecha = datetime.now(timezone.utc)
+        inicio = time.perf_counter()
+        muestreador.start()
+        try:
+            await self.app(scope, receive, send_perfil)
+        finally:
+            actual.terminado.set()
+            muestreador.join()
+            _perfil.reset(token)
+            _guardar({
+                "id": perfil_id,
+                "ruta": instrumentacion.ruta_de(scope),
+                "path": scope["path"],
+                "query": scope["query_string"].decode("latin-1"),
+                "usuario": curp,
+                "fecha": fecha,
+                "status": estado["status"],
+                "tiempo_ms": round((time.perf_counter() - inicio) * 1000, 1),
+                "muestras": actual.total,
+                "arbol": _arbol(actual.muestras, actual.total, actual.ms_por_ronda()) if actual.total else "",
+                "sentencias": list(sentencias or []),
+            })
@@ -0,0 +1,158 @@
+"""
+Index check for the hot crud queries.
+
+Runs each query below against the configured database, captures the SQL it
+sends and EXPLAINs every statement with sequential scans disabled, so the
+planner only falls back to one when no index can serve the query. Data is
+not needed (and nothing is written): a query that still plans a Seq Scan, or
+a full index scan filtering every row, is missing an index.
+
+    docker exec union_ganadera_backend python -m app.planes
+
+Exits with status 1 when a query has no usable index, for CI.
+"""
+import json
+import re
+import sys
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import crud, crud_movilizaciones, database, models
+
+# Fixed ids: the queries only have to be planned, not to find rows
+_USUARIO = str(uuid.UUID(int=1))
+_BOVINO = str(uuid.UUID(int=2))
+_EVENTO = str(uuid.UUID(int=3))
+_ENFERMEDAD = str(uuid.UUID(int=4))
+
+CONSULTAS = {
+    "bovinos_by_user_resumen": lambda db: crud.get_bovinos(db, _USUARIO, resumen=True),
+    "eventos_by_bovino": lambda db: crud.get_eventos_by_bovino(db, _BOVINO),
+    "eventos_by_user": lambda db: crud.get_eventos_by_user(db, _USUARIO),
+    "bovino_full_history": lambda db: crud.get_bovino_full_history(db, _BOVINO),
+    "pesos_by_bovino": lambda db: crud.get_pesos_by_bovino(db, _BOVINO),
+    "dietas_by_bovino": lambda db: crud.get_dietas_by_bovino(db, _BOVINO),
+    "vacunaciones_by_bovino": lambda db: crud.get_vacunaciones_by_bovino(db, _BOVINO),
+    "desparasitaciones_by_bovino": lambda db: crud.get_desparasitaciones_by_bovino(db, _BOVINO),
+    "laboratorios_by_bovino": lambda db: crud.get_laboratorios_by_bovino(db, _BOVINO),
+    "compraventas_by_bovino": lambda db: crud.get_compraventas_by_bovino(db, _BOVINO),
+    "traslados_by_bovino": lambda db: crud.get_traslados_by_bovino(db, _BOVINO, _USUARIO),
+    "enfermedades_by_bovino": lambda db: crud.get_enfermedades_by_bovino(db, _BOVINO),
+    "tratamientos_by_bovino": lambda db: crud.get_tratamientos_by_bovino(db, _BOVINO),
+    "remisiones_by_bovino": lambda db: crud.get_remisiones_by_bovino(db, _BOVINO),
+    "peso_detail": lambda db: crud.get_peso_detail(db, _EVENTO),
+    "dieta_detail": lambda db: crud.get_dieta_detail(db, _EVENTO),
+    "vacunacion_detail": lambda db: crud.get_vacunacion_detail(db, _EVENTO),
+    "desparasitacion_detail": lambda db: crud.get_desparasitacion_detail(db, _EVENTO),
+    "laboratorio_detail": lambda db: crud.get_laboratorio_detail(db, _EVENTO),
+    "historial_compraventas": lambda db: crud.get_historial_compraventas(db, _USUARIO),
+    "resumen_compraventas": lambda db: crud.get_resumen_compraventas(db, _USUARIO),
+    "compraventa_detail": lambda db: crud.get_compraventa_detail(db, _EVENTO),
+    "traslado_detail": lambda db: crud.get_traslado_detail(db, _EVENTO, _USUARIO),
+    "enfermedad_detail": lambda db: crud.get_enfermedad_detail(db, _EVENTO),
+    "tratamiento_detail": lambda db: crud.get_tratamiento_detail(db, _EVENTO),
+    "remision_detail": lambda db: crud.get_remision_detail(db, _EVENTO),
+    "tratamientos_by_enfermedad": lambda db: crud.get_tratamientos_by_enfermedad(db, _ENFERMEDAD),
+    "remisiones_by_enfermedad": lambda db: crud.get_remisiones_by_enfermedad(db, _ENFERMEDAD),
+    "documento_by_user_and_type": lambda db: crud.get_documento_by_user_and_type(db, _USUARIO, models.DocTypeEnum.fierro),
+    "documento_by_storage_prefix": lambda db: crud.get_documento_by_storage_prefix(db, f"{_USUARIO}/comprobante_domicilio/"),
+    "documentos_by_user": lambda db: crud.get_documentos_by_user(db, _USUARIO),
+    "documentos_pendientes": lambda db: crud.get_documentos_pendientes(db),
+    "movilizaciones_by_user": lambda db: crud_movilizaciones.get_movilizaciones(db, usuario_id=_USUARIO),
+    "bovino_mobilizations": lambda db: crud.get_bovino_mobilizations(db, _BOVINO),
+}
+
+def _nodos(plan: dict):
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from _nodos(hijo)
+
+def _columna_inicial(cursor, indice: str) -> str:
+    cursor.execute("""
+        SELECT a.attname FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indexrelid = to_regclass(%s)
+    """, (indice,))
+    fila = cursor.fetchone()
+    return fila[0] if fila else None
+
+def _problemas(cursor, plan: dict) -> list:
+    """
+    Scans that read a whole table or index: Seq Scans, and index scans whose
+    condition does not constrain the index's leading column (a condition on
+    a later column still walks the whole index) while filtering rows.
+    """
+    problemas = []
+    for nodo in _nodos(plan):
+        tipo = nodo["Node Type"]
+        if tipo == "Seq Scan":
+            problemas.append(f"Seq Scan on {nodo['Relation Name']}")
+        elif tipo in ("Index Scan", "Index Only Scan", "Bitmap Index Scan"):
+            condicion = nodo.get("Index Cond")
+            if condicion is None:
+                # Whole-index scans are fine when they only provide the order
+                if "Filter" in nodo:
+                    problemas.append(f"{tipo} using {nodo['Index Name']} without a condition (Filter: {nodo['Filter']})")
+                continue
+            columna = _columna_inicial(cursor, nodo["Index Name"])
+            if columna and not re.search(rf"\b{re.escape(columna)}\b", condicion):
+                problemas.append(f"{tipo} using {nodo['Index Name']} does not constrain {columna} (Index Cond: {condicion})")
+    return problemas
+
+def _capturar(conn, consulta) -> list:
+    """Runs a query inside the open transaction and returns its statements with the parameters inlined."""
+    sentencias = []
+
+    def antes(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(cursor.mogrify(statement, parameters).decode())
+
+    db = Session(bind=conn)
+    event.listen(conn, "before_cursor_execute", antes)
+    try:
+        consulta(db)
+    except HTTPException:
+        pass  # not-found checks after the lookups were already sent
+    finally:
+        event.remove(conn, "before_cursor_execute", antes)
+        db.close()
+    return sentencias
+
+def revisar(nombres: list = None) -> dict:
+    """Returns {query name: [problems]} for the selected (default: all) CONSULTAS."""
+    resultado = {}
+    with database.engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            cursor = conn.connection.cursor()
+            for nombre in nombres or CONSULTAS:
+                problemas = []
+                for sql in _capturar(conn, CONSULTAS[nombre]):
+                    cursor.execute("EXPLAIN (FORMAT JSON) " + sql)
+                    plan = cursor.fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    problemas += _problemas(cursor, plan[0]["Plan"])
+                resultado[nombre] = problemas
+        finally:
+            trans.rollback()
+    return resultado
+
+def main(argv: list) -> int:
+    desconocidas = [n for n in argv if n not in CONSULTAS]
+    if desconocidas:
+        print(f"Unknown queries: {', '.join(desconocidas)}", file=sys.stderr)
+        return 2
+    resultado = revisar(argv or None)
+    for nombre, problemas in resultado.items():
+        print(f"{'FAIL' if problemas else 'ok  '} {nombre}")
+        # One line per table instead of one per monthly partition
+        for p in sorted({re.sub(r"_(\d{4}_\d{2}|default)(?=_|\b)", "_*", p) for p in problemas}):
+            print(f"       {p}")
+    return 1 if any(resultado.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
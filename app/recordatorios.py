@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+import threading
+import urllib.request
+
+from . import database, crud_notificaciones
+
+logger = logging.getLogger(__name__)
+
+# Background job that generates reminders and delivers the outbox
+RECORDATORIOS_ACTIVOS = os.getenv("RECORDATORIOS_ACTIVOS", "true").lower() in ("1", "true", "yes")
+RECORDATORIOS_INTERVALO_SEGUNDOS = int(os.getenv("RECORDATORIOS_INTERVALO_SEGUNDOS", 300))
+# Comma-separated delivery channels (see CANALES): log, webhook, fcm
+NOTIFICACIONES_CANALES = os.getenv("NOTIFICACIONES_CANALES", "log")
+NOTIFICACIONES_WEBHOOK_URL = os.getenv("NOTIFICACIONES_WEBHOOK_URL", "")
+NOTIFICACIONES_TIMEOUT_SEGUNDOS = float(os.getenv("NOTIFICACIONES_TIMEOUT_SEGUNDOS", 10))
+
+# --- Channels ---
+
+class Canal:
+    """
+    A delivery channel. `enviar` receives one coalesced message per user and
+    returns {usuario_id: error} for the users it could not reach; raising
+    fails the whole batch.
+    """
+    nombre = None
+
+    def enviar(self, mensajes: list) -> dict:
+        raise NotImplementedError
+
+class CanalLog(Canal):
+    nombre = "log"
+
+    def enviar(self, mensajes: list) -> dict:
+        for m in mensajes:
+            logger.info("Notificación para %s: %s\n%s", m["usuario_id"], m["titulo"], m["mensaje"])
+        return {}
+
+class CanalWebhook(Canal):
+    """POSTs the whole batch as JSON to NOTIFICACIONES_WEBHOOK_URL; any non-2xx fails it."""
+    nombre = "webhook"
+
+    def __init__(self, url: str = None):
+        self.url = url or NOTIFICACIONES_WEBHOOK_URL
+        if not self.url:
+            raise ValueError("NOTIFICACIONES_WEBHOOK_URL is required for the webhook channel")
+
+    def enviar(self, mensajes: list) -> dict:
+        peticion = urllib.request.Request(
+            self.url,
+            data=json.dumps({"mensajes": mensajes}, default=str).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(peticion, timeout=NOTIFICACIONES_TIMEOUT_SEGUNDOS):
+            pass  # urlopen raises on 4xx/5xx
+        return {}
+
+class CanalFCM(Canal):
+    """
+    Stand-in for Firebase Cloud Messaging: builds the FCM v1 message for each
+    user (topic `usuario-<id>`, subscribed to by the mobile app) and logs it.
+    A real sender only has to override `publicar`.
+    """
+    nombre = "fcm"
+
+    def publicar(self, mensaje: dict):
+        logger.info("FCM %s", json.dumps(mensaje, default=str))
+
+    def enviar(self, mensajes: list) -> dict:
+        fallidos = {}
+        for m in mensajes:
+            try:
+                self.publicar({"message": {
+                    "topic": f"usuario-{m['usuario_id']}",
+                    "notification": {"title": m["titulo"], "body": m["mensaje"]},
+                    "data": {"ids": ",".join(str(n["id"]) for n in m["notificaciones"])},
+                }})
+            except Exception as exc:
+                fallidos[m["usuario_id"]] = str(exc)
+        return fallidos
+
+CANALES = {c.nombre: c for c in (CanalLog, CanalWebhook, CanalFCM)}
+
+def registrar_canal(clase):
+    """Makes a Canal subclass selectable through NOTIFICACIONES_CANALES."""
+    CANALES[clase.nombre] = clase
+    return clase
+
+def _crear_canales() -> list:
+    nombres = [n.strip() for n in NOTIFICACIONES_CANALES.split(",") if n.strip()]
+    desconocidos = [n for n in nombres if n not in CANALES]
+    if desconocidos:
+        raise ValueError(f"Unknown notification channels: {', '.join(desconocidos)}")
+    return [CANALES[n]() for n in nombres]
+
+# --- Delivery ---
+
+def _agrupar(filas) -> list:
+    """Coalesces the batch into one message per user."""
+    por_usuario = {}
+    for f in filas:
+        por_usuario.setdefault(str(f["usuario_id"]), []).append(f)
+    mensajes = []
+    for usuario_id, notificaciones in por_usuario.items():
+        mensajes.append({
+            "usuario_id": usuario_id,
+            "titulo": notificaciones[0]["titulo"] if len(notificaciones) == 1 else f"{len(notificaciones)} recordatorios",
+            "mensaje": "\n".join(n["mensaje"] for n in notificaciones),
+            "notificaciones": [dict(n, usuario_id=usuario_id) for n in notificaciones],
+        })
+    return mensajes
+
+def despachar(db, canales: list) -> tuple:
+    """
+    Delivers pending notifications batch by batch until none are due. A
+    notification is sent once every channel accepted its user's message;
+    otherwise it is retried later (channels may see it again).
+    """
+    enviadas = fallidas = 0
+    while True:
+        filas = crud_notificaciones.reclamar_lote(db)
+        if not filas:
+            break
+        mensajes = _agrupar(filas)
+        errores = {}
+        for canal in canales:
+            try:
+                fallos = canal.enviar(mensajes)
+            except Exception as exc:
+                fallos = {m["usuario_id"]: str(exc) for m in mensajes}
+            for usuario_id, error in fallos.items():
+                errores.setdefault(usuario_id, f"{canal.nombre}: {error}"[:500])
+
+        ok, ko = [], {}
+        for m in mensajes:
+            for n in m["notificaciones"]:
+                if m["usuario_id"] in errores:
+                    ko[n["id"]] = errores[m["usuario_id"]]
+                else:
+                    ok.append(n["id"])
+        crud_notificaciones.marcar_enviadas(db, ok)
+        crud_notificaciones.marcar_fallidas(db, ko)
+        enviadas += len(ok)
+        fallidas += len(ko)
+        if len(filas) < crud_notificaciones.NOTIFICACIONES_LOTE:
+            break
+    return enviadas, fallidas
+
+# --- Scheduler ---
+
+_canales = None
+_detener = threading.Event()
+_hilo = None
+
+def ejecutar_ciclo() -> dict:
+    """One run: generate due reminders, then deliver the outbox."""
+    global _canales
+    if _canales is None:
+        _canales = _crear_canales()
+    db = database.SessionLocal()
+    try:
+        generadas = crud_notificaciones.generar_recordatorios(db)
+        enviadas, fallidas = despachar(db, _canales)
+    finally:
+        db.close()
+    return {"generadas": generadas, "enviadas": enviadas, "fallidas": fallidas}
+
+def _bucle():
+    while True:
+        try:
+            ejecutar_ciclo()
+        except Exception:
+            logger.exception("Reminder run failed")
+        if _detener.wait(RECORDATORIOS_INTERVALO_SEGUNDOS):
+            break
+
+def iniciar():
+    """Starts the scheduler thread (one per worker process; runs do not overlap in the database)."""
+    global _hilo, _canales
+    if not RECORDATORIOS_ACTIVOS or (_hilo is not None and _hilo.is_alive()):
+        return
+    _canales = _crear_canales()  # fail at startup on a bad NOTIFICACIONES_CANALES
+    _detener.clear()
+    _hilo = threading.Thread(target=_bucle, name="recordatorios", daemon=True)
+    _hilo.start()
+
+def detener():
+    _detener.set()
+    if _hilo is not None:
+        _hilo.join(timeout=10)
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
 from sqlalchemy.orm import Session
-from typing import List, Annotated
-from datetime import date
+from typing import List, Annotated, Optional
+from datetime import date, datetime
 import os
 import uuid as uuid_lib
-from .. import crud, models, schemas, auth, database
+from .. import crud, models, schemas, auth, database, trazas
 from ..s3 import s3_client, s3_public_client, S3_BUCKET_NAME
 
 router = APIRouter(
@@ -13,14 +13,18 @@ router = APIRouter(
     dependencies=[Depends(auth.get_current_user)]
 )
 
-def _with_nariz_url(bovino: models.Bovino) -> dict:
-    """Convert a Bovino ORM object to a dict with a presigned nariz_url. No parent resolution."""
+def _with_nariz_url(bovino: models.Bovino, resumen: bool = False) -> dict:
+    """Convert a Bovino ORM object to a dict with a presigned nariz_url. No parent resolution.
+
+    With resumen=True the bovino_resumen row (loaded by the query) is included.
+    """
     # Ensure properties like instalacion_nombre are included
     data = {c.name: getattr(bovino, c.name) for c in bovino.__table__.columns}
     data["instalacion_nombre"] = bovino.instalacion_nombre
     data["nariz_url"] = None
     data["madre"] = None
     data["padre"] = None
+    data["resumen"] = bovino.resumen if resumen else None
     if bovino.nariz_storage_key:
         try:
             data["nariz_url"] = s3_public_client.generate_presigned_url(
@@ -58,9 +62,9 @@ def _resolve_parent(db: Session, parent_id, current_user_id) -> dict | None:
     }
 
 
-def _with_parents(bovino: models.Bovino, db: Session, current_user_id) -> dict:
+def _with_parents(bovino: models.Bovino, db: Session, current_user_id, resumen: bool = False) -> dict:
     """Full detail response: nariz_url + resolved madre/padre projections."""
-    data = _with_nariz_url(bovino)
+    data = _with_nariz_url(bovino, resumen)
     data["madre"] = _resolve_parent(db, bovino.madre_id, current_user_id)
     data["padre"] = _resolve_parent(db, bovino.padre_id, current_user_id)
     return data
@@ -71,12 +75,15 @@ async def read_bovinos(skip: int = 0, limit: int = 100,
                        owner_curp: str = None,
                        status: str = None,
                        search: str = None,
+                       resumen: bool = False,
                        current_user: models.Usuario = Depends(auth.get_current_user),
                        db: Session = Depends(database.get_db)):
     """
     Read bovinos with advanced filtering.
     - If user is admin/superadmin/inspector, they can see everything or filter by owner.
     - Regular users only see their own bovinos.
+    - resumen=true adds each bovino's current state (last weight and vaccination,
+      next booster, open diseases, last movilización) in the same query.
     """
     is_admin = current_user.rol in [models.RolEnum.administrador, models.RolEnum.superadministrador, models.RolEnum.inspector]
     
@@ -98,9 +105,10 @@ async def read_bovinos(skip: int = 0, limit: int = 100,
         instalacion_id=instalacion_id,
         owner_curp=owner_curp,
         status=status,
-        search_term=search
+        search_term=search,
+        resumen=resumen
     )
-    return [_with_nariz_url(b) for b in bovinos]
+    return [_with_nariz_url(b, resumen) for b in bovinos]
 
 @router.get("/search", response_model=schemas.BovinoResponse)
 async def search_bovino(
@@ -142,15 +150,15 @@ async def search_bovino(
     return _with_nariz_url(bovino)
 
 @router.get("/{bovino_id}", response_model=schemas.BovinoResponse)
-async def read_bovino(bovino_id: str,
+async def read_bovino(bovino_id: str, resumen: bool = False,
                       current_user: models.Usuario = Depends(auth.get_current_user),
                       db: Session = Depends(database.get_db)):
-    db_bovino = crud.get_bovino(db, bovino_id=bovino_id)
+    db_bovino = crud.get_bovino(db, bovino_id=bovino_id, resumen=resumen)
     if db_bovino is None:
         raise HTTPException(status_code=404, detail="Bovino not found")
     if db_bovino.usuario_id != current_user.id and current_user.rol not in [models.RolEnum.administrador, models.RolEnum.superadministrador, models.RolEnum.inspector]:
         raise HTTPException(status_code=403, detail="Not authorized to view this bovino")
-    return _with_parents(db_bovino, db, current_user.id)
+    return _with_parents(db_bovino, db, current_user.id, resumen)
 
 @router.post("/", response_model=schemas.BovinoResponse)
 async def create_bovino(bovino: schemas.BovinoCreate,
@@ -212,7 +220,7 @@ async def delete_bovino(bovino_id: str,
         raise HTTPException(status_code=404, detail="Bovino not found")
     if db_bovino.usuario_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this bovino")
-    return crud.delete_bovino(db=db, bovino_id=bovino_id)
+    return _with_nariz_url(crud.delete_bovino(db=db, bovino_id=bovino_id))
 
 @router.post("/{bovino_id}/upload-nose-photo", response_model=schemas.BovinoResponse)
 async def upload_nose_photo(
@@ -241,20 +249,20 @@ async def upload_nose_photo(
 
     # Upload to S3
     try:
-        s3_client.upload_fileobj(
-            file.file,
-            S3_BUCKET_NAME,
-            storage_key
-        )
+        with trazas.span("s3 upload_fileobj", **{"aws.key": storage_key}):
+            s3_client.upload_fileobj(
+                file.file,
+                S3_BUCKET_NAME,
+                storage_key
+            )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not upload file: {str(e)}")
 
     # Update bovino with storage key
     db_bovino.nariz_storage_key = storage_key
     db.commit()
-    db.refresh(db_bovino)
 
-    return db_bovino
+    return _with_nariz_url(crud.get_bovino(db, bovino_id=bovino_id))
 
 @router.get("/{bovino_id}/historial")
 async def read_bovino_historial(
@@ -275,6 +283,27 @@ async def read_bovino_historial(
         
     return crud.get_bovino_full_history(db, bovino_id=bovino_id)
 
+@router.get("/{bovino_id}/propietarios", response_model=List[schemas.BovinoPropiedadResponse])
+async def read_bovino_propietarios(
+    bovino_id: str,
+    fecha: Optional[datetime] = None,
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Ownership history of a bovino, newest first. With `fecha`, only the
+    period covering that instant (who owned it then).
+    """
+    db_bovino = crud.get_bovino(db, bovino_id=bovino_id)
+    if db_bovino is None:
+        raise HTTPException(status_code=404, detail="Bovino not found")
+
+    is_admin = current_user.rol in [models.RolEnum.administrador, models.RolEnum.superadministrador, models.RolEnum.inspector]
+    if db_bovino.usuario_id != current_user.id and not is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to view this bovino's owners")
+
+    return crud.get_propiedad_bovino(db, bovino_id=bovino_id, fecha=fecha)
+
 @router.get("/{bovino_id}/movilizaciones", response_model=List[schemas.MovilizacionResponse])
 async def read_bovino_movilizaciones(
     bovino_id: str,
@@ -0,0 +1,115 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+
+from .. import schemas, database, auth, models
+from .. import crud_campanas
+
+router = APIRouter(
+    prefix="/campanas",
+    tags=["campanas"],
+    dependencies=[Depends(auth.get_current_user)]
+)
+
+ADMIN_ROLES = [models.RolEnum.administrador, models.RolEnum.superadministrador]
+
+def _get_campana_or_404(db: Session, campana_id: str) -> models.Campana:
+    campana = crud_campanas.get_campana(db, campana_id)
+    if not campana:
+        raise HTTPException(status_code=404, detail="Campaña no encontrada")
+    return campana
+
+def _check_responsable(campana: models.Campana, current_user: models.Usuario, permitir_admin: bool = False):
+    if campana.creado_por_id == current_user.id:
+        return
+    if permitir_admin and current_user.rol in ADMIN_ROLES:
+        return
+    raise HTTPException(status_code=403, detail="Solo el veterinario responsable puede modificar esta campaña")
+
+@router.post("/", response_model=schemas.CampanaResponse)
+def create_campana(
+    campana: schemas.CampanaCreate,
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Crear una campaña de vacunación o desparasitación (solo veterinarios)."""
+    if current_user.rol != 'veterinario':
+        raise HTTPException(status_code=403, detail="Only users with role 'veterinario' can create campaigns")
+    db_campana = crud_campanas.create_campana(db, campana, str(current_user.id))
+    return crud_campanas.with_cobertura(db, db_campana)
+
+@router.get("/", response_model=List[schemas.CampanaResponse])
+def read_campanas(
+    skip: int = 0, limit: int = 100,
+    instalacion_id: str = None,
+    estado: schemas.CampanaEstadoEnum = None,
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Veterinarios ven sus campañas, usuarios las dirigidas a sus instalaciones o ganado, admins todas."""
+    filtros = {}
+    if current_user.rol == 'veterinario':
+        filtros["veterinario_usuario_id"] = str(current_user.id)
+    elif current_user.rol not in ADMIN_ROLES:
+        filtros["propietario_id"] = str(current_user.id)
+    return crud_campanas.get_campanas(db, skip=skip, limit=limit, instalacion_id=instalacion_id,
+                                      estado=estado.value if estado else None, **filtros)
+
+@router.get("/{campana_id}", response_model=schemas.CampanaResponse)
+def read_campana(campana_id: str, db: Session = Depends(database.get_db)):
+    """Detalle con avance: aplicados, pendientes y cobertura (0-1)."""
+    return crud_campanas.with_cobertura(db, _get_campana_or_404(db, campana_id))
+
+@router.get("/{campana_id}/bovinos", response_model=List[schemas.BovinoListResponse])
+def read_campana_bovinos(
+    campana_id: str,
+    pendientes: bool = False,
+    skip: int = 0, limit: int = 100,
+    db: Session = Depends(database.get_db)
+):
+    """Bovinos ya cubiertos por la campaña, o los pendientes con `pendientes=true`."""
+    _get_campana_or_404(db, campana_id)
+    return crud_campanas.get_campana_bovinos(db, campana_id, pendientes=pendientes, skip=skip, limit=limit)
+
+@router.post("/{campana_id}/aplicar", response_model=schemas.CampanaAplicacionResponse)
+def aplicar_campana(
+    campana_id: str,
+    aplicacion: schemas.CampanaAplicar = schemas.CampanaAplicar(),
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Registra el evento para todos los bovinos pendientes (o solo `bovino_ids`) en una sola operación.
+    Puede llamarse varias veces; los bovinos ya cubiertos se omiten.
+    """
+    campana = _get_campana_or_404(db, campana_id)
+    _check_responsable(campana, current_user)
+    aplicados = crud_campanas.aplicar_campana(db, campana, aplicacion.bovino_ids)
+    return {
+        "campana_id": campana.id,
+        "aplicados": aplicados,
+        "total_aplicados": campana.total_aplicados,
+        "pendientes": crud_campanas.count_pendientes(db, campana.id)
+    }
+
+@router.post("/{campana_id}/revertir", response_model=schemas.CampanaReversionResponse)
+def revertir_campana(
+    campana_id: str,
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Deshace las aplicaciones hechas dentro de la ventana de reversión (CAMPANA_VENTANA_REVERSION_HORAS)."""
+    campana = _get_campana_or_404(db, campana_id)
+    _check_responsable(campana, current_user, permitir_admin=True)
+    revertidos = crud_campanas.revertir_campana(db, campana)
+    return {"campana_id": campana.id, "revertidos": revertidos, "total_aplicados": campana.total_aplicados}
+
+@router.post("/{campana_id}/cerrar", response_model=schemas.CampanaResponse)
+def cerrar_campana(
+    campana_id: str,
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    campana = _get_campana_or_404(db, campana_id)
+    _check_responsable(campana, current_user, permitir_admin=True)
+    return crud_campanas.with_cobertura(db, crud_campanas.cerrar_campana(db, campana))
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+from .. import crud, models, schemas, auth, database
+
+router = APIRouter(
+    prefix="/catalogos",
+    tags=["catalogos"],
+    dependencies=[Depends(auth.get_current_user)]
+)
+
+@router.get("/{tipo}", response_model=List[schemas.CatalogoResponse])
+def read_catalogos(
+    tipo: schemas.CatalogoTipoEnum,
+    q: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(database.get_db)
+):
+    """Lists catalog entries of a type. `q` searches every registered alias (accents and case ignored)."""
+    return crud.get_catalogos(db, models.CatalogoTipoEnum(tipo.value), q=q, skip=skip, limit=limit)
+
+@router.get("/{tipo}/conteos", response_model=List[schemas.CatalogoConteoResponse])
+def read_conteos_catalogo(
+    tipo: schemas.CatalogoTipoEnum,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    limit: int = 100,
+    db: Session = Depends(database.get_db)
+):
+    """Events per catalog entry in the date range (active bovinos per breed for `raza`)."""
+    return crud.get_conteos_catalogo(db, models.CatalogoTipoEnum(tipo.value), desde=desde, hasta=hasta, limit=limit)
+
+@router.post("/{tipo}/alias", response_model=schemas.CatalogoAliasResponse)
+def create_alias_catalogo(
+    tipo: schemas.CatalogoTipoEnum,
+    alias: schemas.CatalogoAliasCreate,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.require_admin)
+):
+    """Merges a spelling into an existing entry, e.g. "Aftosa" -> "Fiebre Aftosa"."""
+    catalogo = crud.get_catalogo(db, alias.catalogo_id)
+    if not catalogo or catalogo.tipo.value != tipo.value:
+        raise HTTPException(status_code=404, detail="Catalog entry not found")
+    if not alias.alias.strip():
+        raise HTTPException(status_code=400, detail="Alias vacío")
+
+    actualizados = crud.asignar_alias_catalogo(db, models.CatalogoTipoEnum(tipo.value), alias.alias, alias.catalogo_id)
+    return {
+        "tipo": tipo,
+        "alias": alias.alias,
+        "catalogo_id": alias.catalogo_id,
+        "registros_actualizados": actualizados
+    }
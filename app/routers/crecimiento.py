@@ -0,0 +1,121 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date
+
+from .. import schemas, database, auth, models, crud
+from .. import crud_crecimiento
+
+router = APIRouter(
+    prefix="/crecimiento",
+    tags=["crecimiento"],
+    dependencies=[Depends(auth.get_current_user)]
+)
+
+ADMIN_ROLES = [models.RolEnum.administrador, models.RolEnum.superadministrador, models.RolEnum.inspector]
+# Upper bound for chart points/buckets, so payloads stay small whatever the history length
+MAX_PUNTOS_GRAFICA = 1000
+
+def _get_instalacion_autorizada(db: Session, instalacion_id: str, current_user: models.Usuario):
+    db_instalacion = db.query(models.Instalacion).filter(models.Instalacion.id == instalacion_id).first()
+    if db_instalacion is None:
+        raise HTTPException(status_code=404, detail="Instalacion not found")
+    if db_instalacion.usuario_id != current_user.id and current_user.rol not in ADMIN_ROLES:
+        raise HTTPException(status_code=403, detail="Not authorized to view this instalacion")
+    return db_instalacion
+
+def _get_bovino_autorizado(db: Session, bovino_id: str, current_user: models.Usuario):
+    db_bovino = crud.get_bovino(db, bovino_id=bovino_id)
+    if db_bovino is None:
+        raise HTTPException(status_code=404, detail="Bovino not found")
+    if db_bovino.usuario_id != current_user.id and current_user.rol not in ADMIN_ROLES:
+        raise HTTPException(status_code=403, detail="Not authorized to view this bovino")
+    return db_bovino
+
+@router.get("/", response_model=schemas.CrecimientoHatoResponse)
+def read_crecimiento_hato(
+    usuario_id: Optional[str] = None,
+    peso_mercado: Optional[float] = Query(None, gt=0),
+    solo_atipicos: bool = False,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Crecimiento del hato activo del usuario: ADG, percentiles de peso por edad,
+    atípicos y fecha estimada para `peso_mercado` (kg). Admins pueden indicar `usuario_id`.
+    """
+    if usuario_id and current_user.rol not in ADMIN_ROLES:
+        raise HTTPException(status_code=403, detail="Not authorized to view other users' herds")
+    analisis = crud_crecimiento.get_analisis(db, "usuario", usuario_id or current_user.id, peso_mercado)
+    return crud_crecimiento.resumen_hato(analisis, skip=skip, limit=limit, solo_atipicos=solo_atipicos)
+
+@router.get("/instalacion/{instalacion_id}", response_model=schemas.CrecimientoHatoResponse)
+def read_crecimiento_instalacion(
+    instalacion_id: str,
+    peso_mercado: Optional[float] = Query(None, gt=0),
+    solo_atipicos: bool = False,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Crecimiento de los bovinos activos de una instalación."""
+    _get_instalacion_autorizada(db, instalacion_id, current_user)
+    analisis = crud_crecimiento.get_analisis(db, "instalacion", instalacion_id, peso_mercado)
+    return crud_crecimiento.resumen_hato(analisis, skip=skip, limit=limit, solo_atipicos=solo_atipicos)
+
+@router.get("/bovino/{bovino_id}", response_model=schemas.CrecimientoBovinoResponse)
+def read_crecimiento_bovino(
+    bovino_id: str,
+    peso_mercado: Optional[float] = Query(None, gt=0),
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Métricas de un bovino; percentil y atípicos se calculan contra el hato de su dueño."""
+    db_bovino = _get_bovino_autorizado(db, bovino_id, current_user)
+    resultado = crud_crecimiento.get_crecimiento_bovino(db, db_bovino, peso_mercado)
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="El bovino no tiene pesajes registrados")
+    return resultado
+
+@router.get("/bovino/{bovino_id}/grafica", response_model=schemas.GraficaPesoResponse)
+def read_grafica_bovino(
+    bovino_id: str,
+    puntos: int = Query(200, ge=3, le=MAX_PUNTOS_GRAFICA),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Serie (fecha, peso) reducida con LTTB a como máximo `puntos`, conservando picos y caídas."""
+    _get_bovino_autorizado(db, bovino_id, current_user)
+    return crud_crecimiento.get_grafica_bovino(db, bovino_id, puntos, desde=desde, hasta=hasta)
+
+@router.get("/bandas", response_model=schemas.BandasPesoResponse)
+def read_bandas_hato(
+    usuario_id: Optional[str] = None,
+    puntos: int = Query(100, ge=1, le=MAX_PUNTOS_GRAFICA),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Bandas de percentiles (p10-p90) del peso del hato activo a lo largo del tiempo."""
+    if usuario_id and current_user.rol not in ADMIN_ROLES:
+        raise HTTPException(status_code=403, detail="Not authorized to view other users' herds")
+    return crud_crecimiento.get_bandas(db, "usuario", usuario_id or current_user.id, puntos, desde=desde, hasta=hasta)
+
+@router.get("/instalacion/{instalacion_id}/bandas", response_model=schemas.BandasPesoResponse)
+def read_bandas_instalacion(
+    instalacion_id: str,
+    puntos: int = Query(100, ge=1, le=MAX_PUNTOS_GRAFICA),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Bandas de percentiles del peso de los bovinos activos de una instalación (corral)."""
+    _get_instalacion_autorizada(db, instalacion_id, current_user)
+    return crud_crecimiento.get_bandas(db, "instalacion", instalacion_id, puntos, desde=desde, hasta=hasta)
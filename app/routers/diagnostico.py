@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Optional
+
+from .. import schemas, auth, instrumentacion, perfilador, bloqueos, memoria
+
+router = APIRouter(
+    prefix="/diagnostico",
+    tags=["diagnostico"],
+    dependencies=[Depends(auth.require_admin)]
+)
+
+@router.get("/sql", response_model=List[schemas.RutaSqlResponse])
+def read_sql_por_ruta():
+    """Consultas y tiempo de base de datos por ruta (este proceso), con las sentencias repetidas (N+1) más frecuentes."""
+    return instrumentacion.resumen_rutas()
+
+@router.get("/sql/lentas", response_model=List[schemas.PeticionLentaResponse])
+def read_peticiones_lentas():
+    """Peticiones muestreadas que superaron SQL_LENTA_MS, con sus sentencias, más recientes primero."""
+    return instrumentacion.lentas()
+
+@router.delete("/sql", status_code=status.HTTP_204_NO_CONTENT)
+def reiniciar_sql():
+    """Reinicia los contadores por ruta y la lista de peticiones lentas."""
+    instrumentacion.reiniciar()
+
+@router.get("/bloqueos", response_model=List[schemas.BloqueoRutaResponse])
+def read_bloqueos():
+    """Bloqueos del event loop por ruta (este proceso), las que más lo retuvieron primero, con la pila del más largo."""
+    return bloqueos.resumen_rutas()
+
+@router.delete("/bloqueos", status_code=status.HTTP_204_NO_CONTENT)
+def reiniciar_bloqueos():
+    """Reinicia el ranking de bloqueos por ruta."""
+    bloqueos.reiniciar()
+
+@router.get("/perfiles", response_model=List[schemas.PerfilResumenResponse],
+            dependencies=[Depends(auth.require_super_admin)])
+def read_perfiles():
+    """Peticiones perfiladas con X-Perfilar: 1 (este proceso), más recientes primero."""
+    return perfilador.perfiles()
+
+@router.get("/perfiles/{perfil_id}", response_model=schemas.PerfilResponse,
+            dependencies=[Depends(auth.require_super_admin)])
+def read_perfil(perfil_id: int):
+    """Árbol de llamadas muestreado y sentencias SQL de una petición perfilada (header X-Perfil-Id)."""
+    perfil = perfilador.perfil(perfil_id)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil not found")
+    return perfil
+
+@router.get("/memoria", response_model=schemas.MemoriaResponse,
+            dependencies=[Depends(auth.require_super_admin)])
+def read_memoria():
+    """Memoria residente, recolector de basura y estado de tracemalloc de este proceso."""
+    return memoria.estado()
+
+@router.post("/memoria/tracemalloc", response_model=schemas.MemoriaResponse,
+             dependencies=[Depends(auth.require_super_admin)])
+def iniciar_tracemalloc(marcos: int = Query(1, ge=1, le=50)):
+    """Inicia tracemalloc guardando `marcos` niveles de pila por asignación. Ralentiza el proceso mientras está activo."""
+    memoria.iniciar_trazado(marcos)
+    return memoria.estado()
+
+@router.delete("/memoria/tracemalloc", status_code=status.HTTP_204_NO_CONTENT,
+               dependencies=[Depends(auth.require_super_admin)])
+def detener_tracemalloc():
+    """Detiene tracemalloc y descarta los snapshots."""
+    memoria.detener_trazado()
+
+@router.post("/memoria/snapshots", response_model=schemas.SnapshotResponse,
+             dependencies=[Depends(auth.require_super_admin)])
+def tomar_snapshot(top: int = Query(20, ge=1, le=200)):
+    """Toma un snapshot de las asignaciones y devuelve los sitios que más memoria retienen."""
+    if not memoria.trazando():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="tracemalloc is not running")
+    return memoria.asignaciones(memoria.tomar_snapshot(), top=top)
+
+@router.get("/memoria/snapshots/{snapshot_id}", response_model=schemas.SnapshotResponse,
+            dependencies=[Depends(auth.require_super_admin)])
+def read_snapshot(snapshot_id: int, base: Optional[int] = None, top: int = Query(20, ge=1, le=200)):
+    """Sitios que más memoria retienen en el snapshot o, con `base`, los que más crecieron desde ese snapshot."""
+    resultado = memoria.asignaciones(snapshot_id, base_id=base, top=top)
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return resultado
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 import os
 import uuid as uuid_lib
-from .. import crud, models, schemas, auth, database
+from .. import crud, models, schemas, auth, database, trazas
 from ..s3 import s3_client, S3_BUCKET_NAME
 
 router = APIRouter(
@@ -84,7 +84,8 @@ async def upload_domicilio_document(
     storage_key = f"{current_user.id}/comprobante_domicilio/{domicilio_id}/{uuid_lib.uuid4()}{file_extension}"
 
     try:
-        s3_client.upload_fileobj(file.file, S3_BUCKET_NAME, storage_key)
+        with trazas.span("s3 upload_fileobj", **{"aws.key": storage_key}):
+            s3_client.upload_fileobj(file.file, S3_BUCKET_NAME, storage_key)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not upload file: {str(e)}")
 
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date
 from ... import crud, models, schemas, auth, database
 
 router = APIRouter(
@@ -11,12 +12,30 @@ router = APIRouter(
 
 @router.get("/", response_model=List[schemas.CompraventaDetailResponse])
 async def get_compraventas(skip: int = 0, limit: int = 100,
+                           desde: Optional[date] = None, hasta: Optional[date] = None,
                            current_user: models.Usuario = Depends(auth.get_current_user),
                            db: Session = Depends(database.get_db)):
-    return crud.get_compraventas_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+    return crud.get_compraventas_by_user(db, user_id=current_user.id, skip=skip, limit=limit, desde=desde, hasta=hasta)
+
+@router.get("/historial", response_model=List[schemas.CompraventaDetailResponse])
+async def get_historial_compraventas(rol: Optional[str] = None, skip: int = 0, limit: int = 100,
+                                     desde: Optional[date] = None, hasta: Optional[date] = None,
+                                     current_user: models.Usuario = Depends(auth.get_current_user),
+                                     db: Session = Depends(database.get_db)):
+    """Purchases (rol=compra), sales (rol=venta) or both by the current user, including bovinos no longer owned."""
+    if rol not in (None, "compra", "venta"):
+        raise HTTPException(status_code=422, detail="rol must be 'compra' or 'venta'")
+    return crud.get_historial_compraventas(db, user_id=current_user.id, rol=rol, skip=skip, limit=limit, desde=desde, hasta=hasta)
+
+@router.get("/resumen", response_model=schemas.CompraventaResumenResponse)
+async def get_resumen_compraventas(desde: Optional[date] = None, hasta: Optional[date] = None,
+                                   current_user: models.Usuario = Depends(auth.get_current_user),
+                                   db: Session = Depends(database.get_db)):
+    return crud.get_resumen_compraventas(db, user_id=current_user.id, desde=desde, hasta=hasta)
 
 @router.get("/bovino/{bovino_id}", response_model=List[schemas.CompraventaDetailResponse])
 async def get_compraventas_by_bovino(bovino_id: str, skip: int = 0, limit: int = 100,
+                                      desde: Optional[date] = None, hasta: Optional[date] = None,
                                       current_user: models.Usuario = Depends(auth.get_current_user),
                                       db: Session = Depends(database.get_db)):
     db_bovino = crud.get_bovino(db, bovino_id=bovino_id)
@@ -24,7 +43,7 @@ async def get_compraventas_by_bovino(bovino_id: str, skip: int = 0, limit: int =
         raise HTTPException(status_code=404, detail="Bovino not found")
     if db_bovino.usuario_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_compraventas_by_bovino(db, bovino_id=bovino_id, skip=skip, limit=limit)
+    return crud.get_compraventas_by_bovino(db, bovino_id=bovino_id, skip=skip, limit=limit, desde=desde, hasta=hasta)
 
 @router.get("/{evento_id}", response_model=schemas.CompraventaDetailResponse)
 async def get_compraventa(evento_id: str,
@@ -33,7 +52,9 @@ async def get_compraventa(evento_id: str,
     compraventa = crud.get_compraventa_detail(db, evento_id=evento_id)
     if compraventa is None:
         raise HTTPException(status_code=404, detail="Compraventa event not found")
-    db_bovino = crud.get_bovino(db, bovino_id=compraventa["bovino_id"])
-    if db_bovino.usuario_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
+    # The buyer and seller can always see their sale; otherwise only the current owner
+    if current_user.id not in (compraventa["comprador_id"], compraventa["vendedor_id"]):
+        db_bovino = crud.get_bovino(db, bovino_id=compraventa["bovino_id"])
+        if db_bovino.usuario_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized")
     return compraventa
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import List
+from typing import List, Optional
+from datetime import date
 from ... import crud, models, schemas, auth, database
 
 router = APIRouter(
@@ -12,14 +13,16 @@ router = APIRouter(
 
 @router.get("/", response_model=List[schemas.EnfermedadDetailResponse])
 async def get_enfermedades(skip: int = 0, limit: int = 100,
+                           desde: Optional[date] = None, hasta: Optional[date] = None,
                            current_user: models.Usuario = Depends(auth.get_current_user),
                            db: Session = Depends(database.get_db)):
     if current_user.rol == 'veterinario':
-        return crud.get_enfermedades_all(db, skip=skip, limit=limit)
-    return crud.get_enfermedades_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+        return crud.get_enfermedades_all(db, skip=skip, limit=limit, desde=desde, hasta=hasta)
+    return crud.get_enfermedades_by_user(db, user_id=current_user.id, skip=skip, limit=limit, desde=desde, hasta=hasta)
 
 @router.get("/bovino/{bovino_id}", response_model=List[schemas.EnfermedadDetailResponse])
 async def get_enfermedades_by_bovino(bovino_id: str, skip: int = 0, limit: int = 100,
+                                      desde: Optional[date] = None, hasta: Optional[date] = None,
                                       current_user: models.Usuario = Depends(auth.get_current_user),
                                       db: Session = Depends(database.get_db)):
     db_bovino = crud.get_bovino(db, bovino_id=bovino_id)
@@ -27,7 +30,7 @@ async def get_enfermedades_by_bovino(bovino_id: str, skip: int = 0, limit: int =
         raise HTTPException(status_code=404, detail="Bovino not found")
     if current_user.rol != 'veterinario' and db_bovino.usuario_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_enfermedades_by_bovino(db, bovino_id=bovino_id, skip=skip, limit=limit)
+    return crud.get_enfermedades_by_bovino(db, bovino_id=bovino_id, skip=skip, limit=limit, desde=desde, hasta=hasta)
 
 @router.get("/{enfermedad_id}/tratamientos", response_model=List[schemas.TratamientoDetailResponse])
 async def get_tratamientos_by_enfermedad(enfermedad_id: str, skip: int = 0, limit: int = 100,
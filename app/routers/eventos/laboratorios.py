@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date
 from ... import crud, models, schemas, auth, database
 
 router = APIRouter(
@@ -11,14 +12,16 @@ router = APIRouter(
 
 @router.get("/", response_model=List[schemas.LaboratorioDetailResponse])
 async def get_laboratorios(skip: int = 0, limit: int = 100,
+                           desde: Optional[date] = None, hasta: Optional[date] = None,
                            current_user: models.Usuario = Depends(auth.get_current_user),
                            db: Session = Depends(database.get_db)):
     if current_user.rol == 'veterinario':
-        return crud.get_laboratorios_all(db, skip=skip, limit=limit)
-    return crud.get_laboratorios_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+        return crud.get_laboratorios_all(db, skip=skip, limit=limit, desde=desde, hasta=hasta)
+    return crud.get_laboratorios_by_user(db, user_id=current_user.id, skip=skip, limit=limit, desde=desde, hasta=hasta)
 
 @router.get("/bovino/{bovino_id}", response_model=List[schemas.LaboratorioDetailResponse])
 async def get_laboratorios_by_bovino(bovino_id: str, skip: int = 0, limit: int = 100,
+                                      desde: Optional[date] = None, hasta: Optional[date] = None,
                                       current_user: models.Usuario = Depends(auth.get_current_user),
                                       db: Session = Depends(database.get_db)):
     db_bovino = crud.get_bovino(db, bovino_id=bovino_id)
@@ -26,7 +29,7 @@ async def get_laboratorios_by_bovino(bovino_id: str, skip: int = 0, limit: int =
         raise HTTPException(status_code=404, detail="Bovino not found")
     if current_user.rol != 'veterinario' and db_bovino.usuario_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_laboratorios_by_bovino(db, bovino_id=bovino_id, skip=skip, limit=limit)
+    return crud.get_laboratorios_by_bovino(db, bovino_id=bovino_id, skip=skip, limit=limit, desde=desde, hasta=hasta)
 
 @router.get("/{evento_id}", response_model=schemas.LaboratorioDetailResponse)
 async def get_laboratorio(evento_id: str,
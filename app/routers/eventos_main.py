@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Annotated
 from datetime import date
-from .. import crud, models, schemas, auth, database
+from uuid import UUID
+from .. import crud, crud_sync, models, schemas, auth, database
 
 router = APIRouter(
     prefix="/eventos",
@@ -10,7 +11,7 @@ router = APIRouter(
     dependencies=[Depends(auth.get_current_user)]
 )
 
-@router.post("/", response_model=schemas.EventoResponse)
+@router.post("/", response_model=schemas.EventoCreadoResponse)
 async def create_evento(evento: schemas.EventoCreateRequest,
                         current_user: models.Usuario = Depends(auth.get_current_user),
                         db: Session = Depends(database.get_db)):
@@ -20,6 +21,12 @@ async def create_evento(evento: schemas.EventoCreateRequest,
     if db_bovino is None:
         raise HTTPException(status_code=404, detail="Bovino not found")
 
+    # Events queued offline carry the time they actually happened
+    try:
+        evento.data['fecha'] = crud_sync.parse_fecha_cliente(evento.data.get('fecha'))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
     # Define which events require veterinarian credentials
     veterinary_events = ['vacunacion', 'desparasitacion', 'laboratorio', 'enfermedad', 'tratamiento', 'remision']
 
@@ -74,7 +81,102 @@ async def create_evento(evento: schemas.EventoCreateRequest,
                         detail="Cannot create event: Facility license (UPP/PSG) has expired"
                     )
 
-    db_evento = crud.create_evento(db, evento)
-    if db_evento is None:
-        raise HTTPException(status_code=500, detail="Failed to create event")
-    return db_evento
+    return crud.create_evento(db, evento)
+
+MAX_EVENTOS_LOTE = 5000
+
+@router.post("/lote", response_model=schemas.EventoLoteResponse)
+async def create_eventos_lote(lote: schemas.EventoLoteRequest,
+                              current_user: models.Usuario = Depends(auth.get_current_user),
+                              db: Session = Depends(database.get_db)):
+    """
+    Herd-wide ingestion (weighing days, vaccination rounds). Applies the same rules as POST /eventos/
+    to every item; invalid items are reported per index and the valid ones are stored in one transaction.
+    """
+    if len(lote.eventos) > MAX_EVENTOS_LOTE:
+        raise HTTPException(status_code=413, detail=f"Maximum {MAX_EVENTOS_LOTE} events per request")
+
+    veterinary_events = ['vacunacion', 'desparasitacion', 'laboratorio']
+    resultados = []
+    candidatos = []
+
+    # 1. Shape validation, no database access
+    for index, evento in enumerate(lote.eventos):
+        resultado = schemas.EventoLoteItemResult(index=index, type=evento.type)
+        resultados.append(resultado)
+
+        if evento.type not in crud.EVENTOS_LOTE_CAMPOS:
+            resultado.error = f"Event type '{evento.type}' is not supported in bulk; use POST /eventos/"
+            continue
+        try:
+            resultado.bovino_id = UUID(str(evento.data.get('bovino_id')))
+        except ValueError:
+            resultado.error = "bovino_id is missing or invalid"
+            continue
+        faltantes = [c for c in crud.EVENTOS_LOTE_CAMPOS[evento.type] if evento.data.get(c) in (None, '')]
+        if faltantes:
+            resultado.error = f"Missing fields: {', '.join(faltantes)}"
+            continue
+        if evento.type == 'peso':
+            try:
+                if float(evento.data['peso_nuevo']) <= 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                resultado.error = "peso_nuevo must be a positive number"
+                continue
+        if 'fecha_prox' in crud.EVENTOS_LOTE_CAMPOS[evento.type]:
+            try:
+                date.fromisoformat(str(evento.data['fecha_prox']))
+            except ValueError:
+                resultado.error = "fecha_prox must be an ISO date (YYYY-MM-DD)"
+                continue
+        try:
+            evento.data['fecha'] = crud_sync.parse_fecha_cliente(evento.data.get('fecha'))
+        except ValueError as e:
+            resultado.error = str(e)
+            continue
+        if evento.type in veterinary_events and current_user.rol != 'veterinario':
+            resultado.error = f"Only users with role 'veterinario' can create {evento.type} events"
+            continue
+        candidatos.append((index, evento))
+
+    # 2. Ownership and facility status for every referenced bovino in one query
+    bovinos = crud.get_bovinos_para_eventos(db, list({resultados[i].bovino_id for i, _ in candidatos}))
+    hoy = date.today()
+    items_por_tipo = {}
+
+    for index, evento in candidatos:
+        resultado = resultados[index]
+        b = bovinos.get(resultado.bovino_id)
+        if b is None:
+            resultado.error = "Bovino not found"
+            continue
+        if evento.type not in veterinary_events and b.usuario_id != current_user.id:
+            resultado.error = "Not authorized to add events to this bovino. Only the owner can create this event type."
+            continue
+        if b.instalacion_id and b.facility_type is not None:
+            if not b.active:
+                resultado.error = "Cannot create event: Bovino's facility (instalacion) is not active"
+                continue
+            if (b.facility_type in [models.FacilityTypeEnum.UPP, models.FacilityTypeEnum.PSG]
+                    and b.fecha_vencimiento and b.fecha_vencimiento < hoy):
+                resultado.error = "Cannot create event: Facility license (UPP/PSG) has expired"
+                continue
+        items_por_tipo.setdefault(evento.type, []).append((index, resultado.bovino_id, evento.data))
+
+    # 3. Single transaction for everything that passed validation
+    if items_por_tipo:
+        try:
+            evento_ids = crud.create_eventos_lote(db, items_por_tipo, str(current_user.id))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Bulk insert failed, no events were stored: {e}")
+        for index, eid in evento_ids.items():
+            resultados[index].evento_id = eid
+
+    creados = sum(1 for r in resultados if r.evento_id)
+    return {
+        "total": len(resultados),
+        "creados": creados,
+        "fallidos": len(resultados) - creados,
+        "resultados": resultados
+    }
@@ -5,10 +5,14 @@ from typing import Annotated, List
 import os
 import uuid
 import mimetypes
+import logging
+import time
 from io import BytesIO
-from .. import crud, models, schemas, auth, database
+from .. import crud, models, schemas, auth, database, metricas, trazas
 from ..s3 import s3_client, s3_public_client, S3_BUCKET_NAME
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/files",
     tags=["files"],
@@ -44,7 +48,7 @@ def _build_doc_response(doc: models.Documento, db: Session) -> schemas.Documento
             )
         except Exception as e:
             # If we can't create the revision response, just ignore it
-            print(f"[WARNING] Could not create revision response: {e}")
+            logger.warning("Could not create revision response: %s", e)
             ultima_revision = None
 
     try:
@@ -59,10 +63,10 @@ def _build_doc_response(doc: models.Documento, db: Session) -> schemas.Documento
         )
     except Exception as e:
         # If validation fails, provide detailed error info
-        print(f"[ERROR] Failed to create DocumentoResponse: {e}")
-        print(f"[DEBUG] doc.id={doc.id} (type: {type(doc.id)})")
-        print(f"[DEBUG] doc.doc_type={doc.doc_type} (type: {type(doc.doc_type)})")
-        print(f"[DEBUG] doc.created_at={doc.created_at} (type: {type(doc.created_at)})")
+        logger.error(
+            "Failed to create DocumentoResponse: %s (id=%r, doc_type=%r, created_at=%r)",
+            e, doc.id, doc.doc_type, doc.created_at
+        )
         raise
 
 
@@ -106,12 +110,11 @@ def list_documents(
     return [_build_doc_response(doc, db) for doc in docs]
 
 
-@router.get("/health/s3", response_model=dict)
-def check_s3_connection(current_user: models.Usuario = Depends(auth.get_current_user)):
-    """
-    Test S3 connection and return configuration information.
-    Useful for debugging upload and preview issues.
-    """
+# list_buckets is cached so polling the probe does not turn into one S3 call per request
+S3_SALUD_CACHE_SEGUNDOS = float(os.getenv("S3_SALUD_CACHE_SEGUNDOS", 15))
+_salud_s3 = {"expira": 0.0, "resultado": None}
+
+def _probar_s3() -> dict:
     try:
         # Test basic S3 connectivity
         response = s3_client.list_buckets()
@@ -135,6 +138,21 @@ def check_s3_connection(current_user: models.Usuario = Depends(auth.get_current_
             "message": "S3 connection failed - check logs"
         }
 
+@router.get("/health/s3", response_model=dict)
+def check_s3_connection(current_user: models.Usuario = Depends(auth.get_current_user)):
+    """
+    Test S3 connection and return configuration information.
+    Useful for debugging upload and preview issues. The result is reused
+    for S3_SALUD_CACHE_SEGUNDOS.
+    """
+    ahora = time.monotonic()
+    vigente = ahora < _salud_s3["expira"]
+    metricas.cache("salud_s3", vigente)
+    if not vigente:
+        _salud_s3["resultado"] = _probar_s3()
+        _salud_s3["expira"] = ahora + S3_SALUD_CACHE_SEGUNDOS
+    return _salud_s3["resultado"]
+
 
 @router.post("/upload", response_model=schemas.DocumentoResponse)
 async def upload_file(
@@ -167,7 +185,8 @@ async def upload_file(
         storage_key = f"{current_user.id}/{doc_type.value}/{uuid.uuid4()}{file_extension}"
 
         try:
-            s3_client.upload_fileobj(file.file, S3_BUCKET_NAME, storage_key)
+            with trazas.span("s3 upload_fileobj", **{"aws.key": storage_key}):
+                s3_client.upload_fileobj(file.file, S3_BUCKET_NAME, storage_key)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Could not upload file: {str(e)}")
 
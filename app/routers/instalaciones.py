@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import and_
 from datetime import datetime, timedelta, date
 from uuid import UUID
@@ -129,7 +129,8 @@ def obtener_instalacion(
     db: Session = Depends(get_db),
 ):
     """Get a specific facility with all documents and latest renewal status"""
-    instalacion = db.query(Instalacion).filter(Instalacion.id == instalacion_id).first()
+    instalacion = db.query(Instalacion).options(selectinload(Instalacion.documentos)) \
+        .filter(Instalacion.id == instalacion_id).first()
     
     if not instalacion:
         raise HTTPException(
@@ -144,24 +145,22 @@ def obtener_instalacion(
             detail="Not authorized to view this facility"
         )
     
-    # Enrich predios with complete information
-    predios_vinculados = db.query(InstalacionPredio).filter(
-        InstalacionPredio.upp_id == instalacion_id
-    ).all()
+    # Enrich predios with complete information (one query for all linked predios)
+    predios_vinculados = db.query(InstalacionPredio, Predio).join(
+        Predio, Predio.id == InstalacionPredio.predio_id
+    ).filter(InstalacionPredio.upp_id == instalacion_id).all()
     
     predios_completos = []
-    for vinc in predios_vinculados:
-        predio = db.query(Predio).filter(Predio.id == vinc.predio_id).first()
-        if predio:
-            predios_completos.append({
-                "id": predio.id,
-                "usuario_id": predio.usuario_id,
-                "clave_catastral": predio.clave_catastral,
-                "superficie_total": predio.superficie_total,
-                "latitud": predio.latitud,
-                "longitud": predio.longitud,
-                "linked_at": vinc.created_at,
-            })
+    for vinc, predio in predios_vinculados:
+        predios_completos.append({
+            "id": predio.id,
+            "usuario_id": predio.usuario_id,
+            "clave_catastral": predio.clave_catastral,
+            "superficie_total": predio.superficie_total,
+            "latitud": predio.latitud,
+            "longitud": predio.longitud,
+            "linked_at": vinc.created_at,
+        })
     
     # Create response object with enriched predios
     response_data = {
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+
+from .. import schemas, database, auth, models
+from .. import crud_notificaciones, recordatorios
+
+router = APIRouter(
+    prefix="/notificaciones",
+    tags=["notificaciones"],
+    dependencies=[Depends(auth.get_current_user)]
+)
+
+@router.get("/", response_model=List[schemas.NotificacionResponse])
+def read_notificaciones(
+    tipo: Optional[schemas.NotificacionTipoEnum] = None,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Recordatorios del usuario (refuerzos, licencias por vencer, renovaciones por revisar, documentos rechazados), más recientes primero."""
+    return crud_notificaciones.get_notificaciones(
+        db, str(current_user.id), tipo=tipo.value if tipo else None, skip=skip, limit=limit
+    )
+
+@router.post("/ejecutar", response_model=schemas.RecordatoriosEjecucionResponse)
+async def ejecutar_recordatorios(current_user: models.Usuario = Depends(auth.require_super_admin)):
+    """Ejecuta ahora el ciclo programado: genera los recordatorios vencidos y envía la bandeja de salida."""
+    return await run_in_threadpool(recordatorios.ejecutar_ciclo)
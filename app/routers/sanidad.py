@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
 from .. import crud, models, schemas, auth, database
+from .. import crud_agenda
 
 router = APIRouter(
     prefix="/sanidad",
@@ -35,8 +36,7 @@ async def get_sanidad_dashboard(db: Session = Depends(database.get_db)):
     vaccinations_query = text("""
         SELECT COUNT(v.id) 
         FROM vacunaciones v
-        JOIN eventos e ON v.evento_id = e.id
-        WHERE e.fecha >= :thirty_days_ago
+        WHERE v.evento_fecha >= :thirty_days_ago
     """)
     recent_vaccinations = db.execute(vaccinations_query, {"thirty_days_ago": thirty_days_ago}).scalar() or 0
 
@@ -122,3 +122,46 @@ async def get_quarantine_data(db: Session = Depends(database.get_db)):
         fecha_inicio=r.fecha_inicio or datetime.now(),
         motivo=r.motivo or "Bajo observación sanitaria"
     ) for r in rows]
+
+@router.get("/agenda", response_model=schemas.AgendaResponse)
+def get_agenda(
+    dias: int = Query(7, ge=0, le=365),
+    vencidos_dias: int = Query(90, ge=0, le=3650),
+    tipo: Optional[schemas.CampanaTipoEnum] = None,
+    instalacion_id: Optional[str] = None,
+    usuario_id: Optional[str] = None,
+    veterinario_id: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Refuerzos de vacunación/desparasitación que vencen en los próximos `dias` o ya vencidos
+    (hasta `vencidos_dias` atrás). Solo cuenta la última dosis de cada producto por bovino.
+    Usuarios ven su ganado, veterinarios las dosis que aplicaron, admins pueden filtrar
+    por `usuario_id` o `veterinario_id`.
+    """
+    es_admin = current_user.rol in [models.RolEnum.administrador, models.RolEnum.superadministrador, models.RolEnum.inspector]
+    if not es_admin:
+        if usuario_id or veterinario_id:
+            raise HTTPException(status_code=403, detail="Not authorized to view other users' agenda")
+        if current_user.rol == 'veterinario':
+            veterinario = db.query(models.Veterinario).filter(models.Veterinario.usuario_id == current_user.id).first()
+            if not veterinario:
+                raise HTTPException(status_code=403, detail="No veterinarian profile found for this user")
+            veterinario_id = veterinario.id
+        else:
+            usuario_id = current_user.id
+            if instalacion_id:
+                db_instalacion = db.query(models.Instalacion).filter(models.Instalacion.id == instalacion_id).first()
+                if db_instalacion is None:
+                    raise HTTPException(status_code=404, detail="Instalacion not found")
+                if db_instalacion.usuario_id != current_user.id:
+                    raise HTTPException(status_code=403, detail="Not authorized to view this instalacion")
+
+    return crud_agenda.get_agenda(
+        db, dias=dias, vencidos_dias=vencidos_dias, skip=skip, limit=limit,
+        usuario_id=usuario_id, veterinario_id=veterinario_id, instalacion_id=instalacion_id,
+        tipo=tipo.value if tipo else None
+    )
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from .. import schemas, database, auth, models
+from .. import crud_sync
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["sync"],
+    dependencies=[Depends(auth.get_current_user)]
+)
+
+@router.get("/", response_model=schemas.SyncResponse)
+def get_cambios(
+    token: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=2000),
+    current_user: models.Usuario = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Feed de cambios para la app móvil (instalaciones, predios, bovinos, eventos y documentos del usuario).
+    Sin token devuelve todo; con el token de la última respuesta solo lo creado, modificado o eliminado desde entonces.
+    Mientras `completo` sea false hay más páginas: repetir la llamada con el nuevo `token`.
+    Un 410 indica que el token expiró y hay que sincronizar desde cero.
+    """
+    return crud_sync.get_cambios(db, str(current_user.id), token=token, limit=limit)
+
+@router.post("/purgar-tombstones")
+def purgar_tombstones(
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.require_super_admin)
+):
+    """Elimina tombstones más antiguos que SYNC_RETENCION_DIAS."""
+    return {"eliminados": crud_sync.purgar_tombstones(db)}
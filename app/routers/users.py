@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from datetime import timedelta, date
 from typing import Annotated
 import json
@@ -197,7 +197,7 @@ async def get_usuarios_normales_y_veterinarios(
     
     Returns a list of normal users and veterinarians with their basic info and personal data.
     """
-    usuarios = db.query(models.Usuario).filter(
+    usuarios = db.query(models.Usuario).options(joinedload(models.Usuario.datos)).filter(
         models.Usuario.rol.in_([models.RolEnum.usuario, models.RolEnum.veterinario])
     ).all()
     return usuarios
@@ -218,7 +218,13 @@ async def get_usuario_completo(
     
     Only administradores and superadministradores can access this endpoint.
     """
-    usuario = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
+    usuario = db.query(models.Usuario).options(
+        joinedload(models.Usuario.datos),
+        selectinload(models.Usuario.domicilios),
+        selectinload(models.Usuario.documentos),
+        selectinload(models.Usuario.bovinos).joinedload(models.Bovino.instalacion),
+        selectinload(models.Usuario.predios)
+    ).filter(models.Usuario.id == user_id).first()
     
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario not found")
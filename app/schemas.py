@@ -1,5 +1,5 @@
 from pydantic import BaseModel, field_validator
-from typing import Optional
+from typing import Optional, Union
 from datetime import date, datetime
 from uuid import UUID
 from enum import Enum
@@ -82,6 +82,22 @@ class InstalacionStatusEnum(str, Enum):
     activa = "activa"
     inactiva = "inactiva"
 
+class CatalogoTipoEnum(str, Enum):
+    vacuna = "vacuna"
+    laboratorio = "laboratorio"
+    medicamento = "medicamento"
+    enfermedad = "enfermedad"
+    raza = "raza"
+
+class CampanaTipoEnum(str, Enum):
+    vacunacion = "vacunacion"
+    desparasitacion = "desparasitacion"
+
+class CampanaEstadoEnum(str, Enum):
+    programada = "programada"
+    en_curso = "en_curso"
+    cerrada = "cerrada"
+
 # User Schemas
 class UserBase(BaseModel):
     curp: str
@@ -184,6 +200,23 @@ class BovinoParentPublic(BaseModel):
     class Config:
         from_attributes = True
 
+class BovinoResumenResponse(BaseModel):
+    ultimo_peso: Optional[float] = None
+    ultimo_peso_fecha: Optional[datetime] = None
+    ultima_vacunacion_tipo: Optional[str] = None
+    ultima_vacunacion_fecha: Optional[datetime] = None
+    proxima_vacunacion: Optional[date] = None
+    enfermedades_abiertas: int = 0
+    enfermedad_abierta_tipo: Optional[str] = None
+    enfermedad_abierta_fecha: Optional[datetime] = None
+    ultima_movilizacion_id: Optional[UUID] = None
+    ultima_movilizacion_estado: Optional[str] = None
+    ultima_movilizacion_fecha: Optional[datetime] = None
+    propietario_desde: Optional[datetime] = None  # None: first owner
+
+    class Config:
+        from_attributes = True
+
 class BovinoResponse(BovinoBase):
     id: UUID
     usuario_id: UUID
@@ -191,16 +224,25 @@ class BovinoResponse(BovinoBase):
     nariz_storage_key: Optional[str] = None
     nariz_url: Optional[str] = None
     folio: Optional[str] = None
+    raza_id: Optional[int] = None
     status: str
     # Resolved parent projections — None when not requested (list endpoints)
     # Full BovinoResponse if owned by requesting user, BovinoParentPublic otherwise
     madre: Optional[BovinoParentPublic] = None
     padre: Optional[BovinoParentPublic] = None
     instalacion_nombre: Optional[str] = None
+    # Current state from bovino_resumen — None unless requested with ?resumen=true
+    resumen: Optional[BovinoResumenResponse] = None
 
     class Config:
         from_attributes = True
 
+class BovinoPropiedadResponse(BaseModel):
+    usuario_id: UUID
+    desde: Optional[datetime] = None  # None: first owner
+    hasta: Optional[datetime] = None  # None: current owner
+    evento_id: Optional[UUID] = None  # compraventa that started the period
+
 # Event Schemas
 class EventoBase(BaseModel):
     bovino_id: UUID
@@ -259,6 +301,22 @@ class EventoCreateRequest(BaseModel):
     type: str # 'peso', 'dieta', etc.
     data: dict # unstructured for now to avoid strict union issues, or use Union
 
+class EventoLoteRequest(BaseModel):
+    eventos: list[EventoCreateRequest]
+
+class EventoLoteItemResult(BaseModel):
+    index: int
+    type: str
+    bovino_id: Optional[UUID] = None
+    evento_id: Optional[UUID] = None
+    error: Optional[str] = None
+
+class EventoLoteResponse(BaseModel):
+    total: int
+    creados: int
+    fallidos: int
+    resultados: list[EventoLoteItemResult]
+
 class EventoResponse(BaseModel):
     id: UUID
     bovino_id: UUID
@@ -279,13 +337,16 @@ class DietaDetailResponse(EventoResponse):
 class VacunacionDetailResponse(EventoResponse):
     veterinario_id: Optional[UUID] = None
     tipo: Optional[str] = None
+    tipo_id: Optional[int] = None
     lote: Optional[str] = None
     laboratorio: Optional[str] = None
+    laboratorio_id: Optional[int] = None
     fecha_prox: Optional[date] = None
 
 class DesparasitacionDetailResponse(EventoResponse):
     veterinario_id: Optional[UUID] = None
     medicamento: Optional[str] = None
+    medicamento_id: Optional[int] = None
     dosis_admin: Optional[str] = None
     fecha_prox: Optional[date] = None
 
@@ -297,6 +358,26 @@ class LaboratorioDetailResponse(EventoResponse):
 class CompraventaDetailResponse(EventoResponse):
     comprador_curp: Optional[str] = None
     vendedor_curp: Optional[str] = None
+    comprador_id: Optional[UUID] = None
+    vendedor_id: Optional[UUID] = None
+
+class CompraventaContraparteResponse(BaseModel):
+    usuario_id: Optional[UUID] = None
+    curp: Optional[str] = None
+    compras: int  # head bought from this user
+    ventas: int  # head sold to this user
+    ultima_fecha: datetime
+
+class CompraventaVolumenMensual(BaseModel):
+    mes: date
+    compras: int
+    ventas: int
+
+class CompraventaResumenResponse(BaseModel):
+    compras: int
+    ventas: int
+    contrapartes: list[CompraventaContraparteResponse] = []
+    por_mes: list[CompraventaVolumenMensual] = []
 
 class TrasladoDetailResponse(EventoResponse):
     predio_anterior_id: Optional[UUID] = None
@@ -306,11 +387,13 @@ class EnfermedadDetailResponse(EventoResponse):
     enfermedad_id: Optional[UUID] = None
     veterinario_id: Optional[UUID] = None
     tipo: Optional[str] = None
+    tipo_id: Optional[int] = None
 
 class TratamientoDetailResponse(EventoResponse):
     enfermedad_id: Optional[UUID] = None
     veterinario_id: Optional[UUID] = None
     medicamento: Optional[str] = None
+    medicamento_id: Optional[int] = None
     dosis: Optional[str] = None
     periodo: Optional[str] = None
 
@@ -318,6 +401,37 @@ class RemisionDetailResponse(EventoResponse):
     enfermedad_id: Optional[UUID] = None
     veterinario_id: Optional[UUID] = None
 
+# POST /eventos/ answers with the detail schema of the registered type
+EventoCreadoResponse = Union[
+    PesoDetailResponse, DietaDetailResponse, VacunacionDetailResponse, DesparasitacionDetailResponse,
+    LaboratorioDetailResponse, EnfermedadDetailResponse, TratamientoDetailResponse, RemisionDetailResponse,
+    EventoResponse,
+]
+
+# Catalog Schemas
+class CatalogoResponse(BaseModel):
+    id: int
+    tipo: CatalogoTipoEnum
+    nombre: str
+
+    class Config:
+        from_attributes = True
+
+class CatalogoAliasCreate(BaseModel):
+    alias: str
+    catalogo_id: int
+
+class CatalogoAliasResponse(BaseModel):
+    tipo: CatalogoTipoEnum
+    alias: str
+    catalogo_id: int
+    registros_actualizados: int
+
+class CatalogoConteoResponse(BaseModel):
+    catalogo_id: int
+    nombre: str
+    total: int
+
 # Document Schemas
 class DocumentoRevisionCreate(BaseModel):
     status: DocReviewStatusEnum
@@ -410,6 +524,7 @@ class BovinoListResponse(BaseModel):
     nombre: Optional[str] = None
     folio: Optional[str] = None
     raza_dominante: Optional[str] = None
+    raza_id: Optional[int] = None
     fecha_nac: Optional[date] = None
     sexo: Optional[SexoEnum] = None
     peso_actual: Optional[float] = None
@@ -677,6 +792,189 @@ class ValidacionDocumentosMovilizacionResponse(BaseModel):
     documentos_presentes: int
     documentos_faltantes: list[DocumentoStatusMovilizacionResponse]
     validacion_completa: bool
+# Campaign Schemas
+class CampanaCreate(BaseModel):
+    tipo: CampanaTipoEnum
+    producto: str
+    lote: Optional[str] = None
+    laboratorio: Optional[str] = None
+    dosis: Optional[str] = None
+    fecha_prox: Optional[date] = None
+    observaciones: Optional[str] = ''
+    instalacion_id: Optional[UUID] = None
+    filtro_usuario_id: Optional[UUID] = None
+    filtro_sexo: Optional[SexoEnum] = None
+    filtro_raza_id: Optional[int] = None
+    filtro_nac_desde: Optional[date] = None
+    filtro_nac_hasta: Optional[date] = None
+
+class CampanaResponse(BaseModel):
+    id: UUID
+    tipo: CampanaTipoEnum
+    estado: CampanaEstadoEnum
+    creado_por_id: UUID
+    veterinario_id: UUID
+    producto: str
+    producto_id: Optional[int] = None
+    lote: Optional[str] = None
+    laboratorio: Optional[str] = None
+    laboratorio_id: Optional[int] = None
+    dosis: Optional[str] = None
+    fecha_prox: Optional[date] = None
+    observaciones: Optional[str] = None
+    instalacion_id: Optional[UUID] = None
+    filtro_usuario_id: Optional[UUID] = None
+    filtro_sexo: Optional[SexoEnum] = None
+    filtro_raza_id: Optional[int] = None
+    filtro_nac_desde: Optional[date] = None
+    filtro_nac_hasta: Optional[date] = None
+    total_aplicados: int
+    ultima_aplicacion: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    # Only filled on detail/apply responses
+    pendientes: Optional[int] = None
+    cobertura: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+class CampanaAplicar(BaseModel):
+    bovino_ids: Optional[list[UUID]] = None # None = every pending bovino
+
+class CampanaAplicacionResponse(BaseModel):
+    campana_id: UUID
+    aplicados: int
+    total_aplicados: int
+    pendientes: int
+
+class CampanaReversionResponse(BaseModel):
+    campana_id: UUID
+    revertidos: int
+    total_aplicados: int
+
+# Sync Schemas
+class SyncCambio(BaseModel):
+    entidad: str # bovinos, eventos, documentos, instalaciones, predios
+    id: UUID
+    op: str # 'upsert' | 'delete'
+    fecha: datetime
+    datos: Optional[dict] = None
+
+class SyncResponse(BaseModel):
+    cambios: list[SyncCambio]
+    token: str
+    completo: bool # False -> call again with `token` for the next page
+    hasta: datetime
+
+# Crecimiento Schemas
+class CrecimientoBovinoResponse(BaseModel):
+    bovino_id: UUID
+    folio: Optional[str] = None
+    sexo: Optional[str] = None
+    pesajes: int
+    ultimo_peso: float
+    fecha_ultimo_peso: date
+    edad_dias: Optional[int] = None
+    adg: Optional[float] = None # kg/day, regression over all weighings
+    adg_reciente: Optional[float] = None # kg/day between the last two weighings
+    adg_vida: Optional[float] = None # kg/day since birth (peso_nac)
+    percentil_peso_edad: Optional[float] = None # 0-100 within same sex and age in months
+    adg_atipico: bool
+    pesajes_atipicos: list[UUID] = [] # evento ids with an implausible gain
+    fecha_mercado_estimada: Optional[date] = None
+    peso_mercado_alcanzado: bool
+
+class CrecimientoCurvaPunto(BaseModel):
+    sexo: Optional[str] = None
+    edad_meses: int
+    n: int
+    p10: float
+    p25: float
+    p50: float
+    p75: float
+    p90: float
+
+class CrecimientoHatoResponse(BaseModel):
+    total_bovinos: int
+    con_pesos: int
+    adg_promedio: Optional[float] = None
+    adg_mediana: Optional[float] = None
+    peso_mercado: float
+    atipicos: int
+    curva: list[CrecimientoCurvaPunto]
+    bovinos: list[CrecimientoBovinoResponse]
+
+class GraficaPesoPunto(BaseModel):
+    fecha: datetime
+    peso: float
+
+class GraficaPesoResponse(BaseModel):
+    bovino_id: UUID
+    total_pesajes: int # weighings in the range, before downsampling
+    puntos: list[GraficaPesoPunto]
+
+class BandaPesoPunto(BaseModel):
+    fecha: date # bucket center
+    n: int
+    p10: float
+    p25: float
+    p50: float
+    p75: float
+    p90: float
+
+class BandasPesoResponse(BaseModel):
+    total_bovinos: int
+    total_pesajes: int
+    bandas: list[BandaPesoPunto]
+
+# Agenda Schemas
+class AgendaItem(BaseModel):
+    bovino_id: UUID
+    folio: Optional[str] = None
+    nombre: Optional[str] = None
+    arete_barcode: Optional[str] = None
+    usuario_id: Optional[UUID] = None
+    instalacion_id: Optional[UUID] = None
+    instalacion_nombre: Optional[str] = None
+    tipo: CampanaTipoEnum
+    producto_id: int
+    producto: str # catalog name
+    evento_id: UUID # latest dose
+    veterinario_id: Optional[UUID] = None
+    fecha_aplicacion: datetime
+    fecha_prox: date
+    dias: int # days until fecha_prox, negative when overdue
+    vencido: bool
+
+class AgendaResponse(BaseModel):
+    vencidos: int
+    proximos: int
+    items: list[AgendaItem]
+
+# Notificaciones Schemas
+class NotificacionTipoEnum(str, Enum):
+    refuerzo = "refuerzo"
+    vencimiento_upp = "vencimiento_upp"
+    renovacion_pendiente = "renovacion_pendiente"
+    documento_rechazado = "documento_rechazado"
+
+class NotificacionResponse(BaseModel):
+    id: int
+    tipo: NotificacionTipoEnum
+    referencia_id: Optional[UUID] = None
+    titulo: str
+    mensaje: str
+    datos: Optional[dict] = None
+    estado: str # pendiente, enviada, fallida
+    intentos: int
+    creado_en: datetime
+    enviado_en: Optional[datetime] = None
+
+class RecordatoriosEjecucionResponse(BaseModel):
+    generadas: int
+    enviadas: int
+    fallidas: int
+
 # Sanidad Schemas
 class SanidadAlert(BaseModel):
     type: SanidadAlertType
@@ -717,3 +1015,82 @@ class SanidadQuarantineResponse(BaseModel):
     instalacion_nombre: str
     fecha_inicio: datetime
     motivo: str
+
+# Diagnostico Schemas (per-request SQL instrumentation)
+class SentenciaRepetidaResponse(BaseModel):
+    sql: str
+    peticiones: int # requests in which it ran SQL_REPETICIONES_N1+ times
+
+class RutaSqlResponse(BaseModel):
+    ruta: str
+    peticiones: int
+    consultas_promedio: float
+    consultas_max: int
+    tiempo_db_ms: float
+    tiempo_db_promedio_ms: float
+    tiempo_promedio_ms: float
+    peticiones_n1: int
+    repetidas: list[SentenciaRepetidaResponse]
+
+class SentenciaResponse(BaseModel):
+    sql: str
+    ms: float
+
+class PeticionLentaResponse(BaseModel):
+    ruta: str
+    path: str
+    fecha: datetime
+    tiempo_ms: float
+    tiempo_db_ms: float
+    consultas: int
+    sentencias: list[SentenciaResponse]
+
+class BloqueoRutaResponse(BaseModel):
+    ruta: str
+    bloqueos: int
+    tiempo_ms: float
+    maximo_ms: float
+    pila: Optional[str] = None
+
+class PerfilResumenResponse(BaseModel):
+    id: int
+    ruta: str
+    path: str
+    query: str
+    usuario: str
+    fecha: datetime
+    status: int
+    tiempo_ms: float
+    muestras: int
+    tamano: int # bytes counted against PERFILES_MAX_KB
+
+class PerfilResponse(PerfilResumenResponse):
+    arbol: str
+    sentencias: list[SentenciaResponse]
+
+class SnapshotResumenResponse(BaseModel):
+    id: int
+    fecha: datetime
+    traced_bytes: int
+
+class MemoriaResponse(BaseModel):
+    rss_bytes: Optional[int] = None
+    gc_objetos: int
+    gc_generaciones: list[int]
+    gc_colecciones: list[int]
+    tracemalloc: bool
+    tracemalloc_marcos: int
+    traced_bytes: int
+    traced_pico_bytes: int
+    snapshots: list[SnapshotResumenResponse]
+
+class AsignacionResponse(BaseModel):
+    sitio: str # file:line, innermost frame last
+    tamano_bytes: int
+    bloques: int
+    diferencia_bytes: Optional[int] = None
+    diferencia_bloques: Optional[int] = None
+
+class SnapshotResponse(SnapshotResumenResponse):
+    base_id: Optional[int] = None
+    asignaciones: list[AsignacionResponse]
@@ -0,0 +1,313 @@
+"""
+Request tracing with OpenTelemetry-style spans.
+
+Every HTTP request gets a trace id, taken from an incoming W3C `traceparent`
+header or generated, and returned in `traceparent`. A sampled request
+(TRAZAS_MUESTREO, or the caller's sampled flag) records a span tree:
+
+    GET /movilizaciones/{movilizacion_id}/approve
+    ├── crud.approve_movilizacion        (@trazado)
+    │   ├── db SELECT                    (every statement, db.statement attribute)
+    │   └── db registrar_peso            (registrar_* calls are named after the function)
+    ├── s3 PutObject                     (boto3 operations of the server-side client)
+    ├── s3 upload_fileobj                (uploads run in s3transfer threads, so the call
+    │                                     sites open this span themselves)
+    └── bcrypt verify
+
+Finished spans are exported in batches by a background thread, as JSON lines
+to TRAZAS_ARCHIVO or POSTed to TRAZAS_COLECTOR_URL (TRAZAS_EXPORTADOR), so
+requests never wait on I/O; when the queue is full spans are dropped.
+Unsampled requests only get ids. Log records carry `trace_id` and `span_id`
+in every request.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+
+from sqlalchemy import event
+
+from . import database
+from .s3 import s3_client
+
+logger = logging.getLogger(__name__)
+
+# Fraction of requests traced; 0.01 keeps the overhead negligible at full traffic
+TRAZAS_MUESTREO = float(os.getenv("TRAZAS_MUESTREO", 0.01))
+# archivo: JSON lines in TRAZAS_ARCHIVO; colector: POST {"spans": [...]} to TRAZAS_COLECTOR_URL
+TRAZAS_EXPORTADOR = os.getenv("TRAZAS_EXPORTADOR", "archivo")
+TRAZAS_ARCHIVO = os.getenv("TRAZAS_ARCHIVO", "trazas.jsonl")
+TRAZAS_COLECTOR_URL = os.getenv("TRAZAS_COLECTOR_URL", "")
+TRAZAS_COLA_MAX = int(os.getenv("TRAZAS_COLA_MAX", 10000))
+TRAZAS_LOTE = int(os.getenv("TRAZAS_LOTE", 512))
+
+_SQL_MAX = 2000
+
+LOG_FORMATO = "%(asctime)s %(levelname)s %(name)s [trace_id=%(trace_id)s span_id=%(span_id)s] %(message)s"
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_REGISTRAR = re.compile(r"\b(registrar_\w+)\s*\(")
+
+# (trace id, current span or None when the request is not sampled)
+_actual = contextvars.ContextVar("traza_actual", default=None)
+
+_cola = queue.Queue(maxsize=TRAZAS_COLA_MAX)
+_detener = threading.Event()
+_hilo = None
+
+def _id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+class Span:
+    __slots__ = ("traza_id", "span_id", "padre_id", "nombre", "inicio", "atributos", "error")
+
+    def __init__(self, traza_id: str, padre_id: str, nombre: str, **atributos):
+        self.traza_id = traza_id
+        self.span_id = _id(64)
+        self.padre_id = padre_id
+        self.nombre = nombre
+        self.inicio = time.time_ns()
+        self.atributos = atributos
+        self.error = None
+
+    def terminar(self):
+        fin = time.time_ns()
+        try:
+            _cola.put_nowait({
+                "trace_id": self.traza_id,
+                "span_id": self.span_id,
+                "parent_id": self.padre_id,
+                "name": self.nombre,
+                "start_ns": self.inicio,
+                "end_ns": fin,
+                "duration_ms": round((fin - self.inicio) / 1e6, 3),
+                "attributes": self.atributos,
+                "status": "error" if self.error else "ok",
+                "error": self.error,
+            })
+        except queue.Full:
+            pass
+
+def _hijo(nombre: str, **atributos):
+    """A child of the current span, or None when the request is not sampled."""
+    actual = _actual.get()
+    if actual is None or actual[1] is None:
+        return None
+    padre = actual[1]
+    return Span(padre.traza_id, padre.span_id, nombre, **atributos)
+
+class span:
+    """`with trazas.span("nombre", clave=valor):` times a block as a child span when sampled."""
+
+    def __init__(self, nombre: str, **atributos):
+        self.nombre = nombre
+        self.atributos = atributos
+
+    def __enter__(self):
+        self.span = _hijo(self.nombre, **self.atributos)
+        if self.span is not None:
+            self.token = _actual.set((self.span.traza_id, self.span))
+        return self.span
+
+    def __exit__(self, tipo, valor, tb):
+        if self.span is not None:
+            _actual.reset(self.token)
+            if valor is not None:
+                self.span.error = f"{tipo.__name__}: {valor}"
+            self.span.terminar()
+
+def trazado(funcion):
+    """Decorator: the function runs in its own span (e.g. crud.approve_movilizacion)."""
+    nombre = f"{funcion.__module__.rsplit('.', 1)[-1]}.{funcion.__name__}"
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with span(nombre):
+            return funcion(*args, **kwargs)
+    return envoltura
+
+def ids_actuales() -> tuple:
+    """(trace_id, span_id) of the current request, ('-', '-') outside one."""
+    actual = _actual.get()
+    if actual is None:
+        return "-", "-"
+    return actual[0], actual[1].span_id if actual[1] is not None else "-"
+
+# --- Logs ---
+
+_fabrica = logging.getLogRecordFactory()
+
+def _registro(*args, **kwargs):
+    registro = _fabrica(*args, **kwargs)
+    registro.trace_id, registro.span_id = ids_actuales()
+    return registro
+
+logging.setLogRecordFactory(_registro)
+
+# --- Database ---
+
+@functools.lru_cache(maxsize=4096)
+def _nombre_sql(statement: str) -> str:
+    funcion = _REGISTRAR.search(statement)
+    return f"db {funcion.group(1) if funcion else statement.lstrip()[:6].upper()}"
+
+@event.listens_for(database.engine, "before_cursor_execute")
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    # Unsampled requests stop here, before any work on the statement
+    actual = _actual.get()
+    if actual is None or actual[1] is None:
+        context._traza_span = None
+        return
+    context._traza_span = _hijo(
+        _nombre_sql(statement), **{"db.system": "postgresql", "db.statement": statement[:_SQL_MAX]}
+    )
+
+@event.listens_for(database.engine, "after_cursor_execute")
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    span_sql = getattr(context, "_traza_span", None)
+    if span_sql is not None:
+        span_sql.atributos["db.rows"] = cursor.rowcount
+        span_sql.terminar()
+
+@event.listens_for(database.engine, "handle_error")
+def _error(contexto):
+    span_sql = getattr(contexto.execution_context, "_traza_span", None)
+    if span_sql is not None:
+        span_sql.error = f"{type(contexto.original_exception).__name__}: {contexto.original_exception}"
+        span_sql.terminar()
+
+# --- S3 ---
+
+def _s3_antes(model, context, **kwargs):
+    context["traza_span"] = _hijo(f"s3 {model.name}", **{"aws.operation": model.name})
+
+def _s3_despues(http_response, context, **kwargs):
+    span_s3 = context.pop("traza_span", None)
+    if span_s3 is not None:
+        span_s3.atributos["http.status_code"] = http_response.status_code
+        if http_response.status_code >= 400:
+            span_s3.error = f"HTTP {http_response.status_code}"
+        span_s3.terminar()
+
+def _s3_error(exception, context, **kwargs):
+    span_s3 = context.pop("traza_span", None)
+    if span_s3 is not None:
+        span_s3.error = f"{type(exception).__name__}: {exception}"
+        span_s3.terminar()
+
+s3_client.meta.events.register("before-call.s3", _s3_antes)
+s3_client.meta.events.register("after-call.s3", _s3_despues)
+s3_client.meta.events.register("after-call-error.s3", _s3_error)
+
+# --- Export ---
+
+def _exportar(spans: list):
+    if TRAZAS_EXPORTADOR == "colector":
+        peticion = urllib.request.Request(
+            TRAZAS_COLECTOR_URL,
+            data=json.dumps({"spans": spans}, default=str).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(peticion, timeout=10):
+            pass
+    else:
+        with open(TRAZAS_ARCHIVO, "a", encoding="utf-8") as archivo:
+            archivo.writelines(json.dumps(s, default=str) + "\n" for s in spans)
+
+def vaciar():
+    """Exports every queued span now."""
+    while True:
+        spans = []
+        try:
+            while len(spans) < TRAZAS_LOTE:
+                spans.append(_cola.get_nowait())
+        except queue.Empty:
+            pass
+        if not spans:
+            return
+        try:
+            _exportar(spans)
+        except Exception:
+            logger.exception("Could not export %s spans", len(spans))
+
+def _bucle():
+    while not _detener.wait(1):
+        vaciar()
+    vaciar()
+
+def _configurar_logs():
+    """Shows the trace ids in the app's logs unless logging was configured elsewhere."""
+    app_logger = logging.getLogger("app")
+    if not app_logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMATO))
+        app_logger.addHandler(handler)
+
+def iniciar():
+    global _hilo
+    _configurar_logs()
+    if TRAZAS_MUESTREO <= 0 or (_hilo is not None and _hilo.is_alive()):
+        return
+    _detener.clear()
+    _hilo = threading.Thread(target=_bucle, name="trazas", daemon=True)
+    _hilo.start()
+
+def detener():
+    _detener.set()
+    if _hilo is not None:
+        _hilo.join(timeout=10)
+
+class TrazasMiddleware:
+    """Opens the request's trace (W3C traceparent in and out) and its root span when sampled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        entrante = _TRACEPARENT.match(dict(scope["headers"]).get(b"traceparent", b"").decode("latin-1"))
+        if entrante:
+            traza_id, padre_id = entrante.group(1), entrante.group(2)
+            muestreada = entrante.group(3) == "01" or random.random() < TRAZAS_MUESTREO
+        else:
+            traza_id, padre_id = _id(128), None
+            muestreada = random.random() < TRAZAS_MUESTREO
+        raiz = Span(traza_id, padre_id, scope["method"], **{"http.method": scope["method"], "http.target": scope["path"]}) \
+            if muestreada and _hilo is not None else None
+        token = _actual.set((traza_id, raiz))
+        estado = {"status": 500}
+
+        async def send_traza(message):
+            if message["type"] == "http.response.start":
+                estado["status"] = message["status"]
+                span_id = raiz.span_id if raiz is not None else _id(64)
+                valor = f"00-{traza_id}-{span_id}-{'01' if raiz is not None else '00'}".encode()
+                message = {**message, "headers": [*message.get("headers", []), (b"traceparent", valor)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_traza)
+        except Exception as e:
+            if raiz is not None:
+                raiz.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _actual.reset(token)
+            if raiz is not None:
+                ruta = getattr(scope.get("route"), "path", None)
+                raiz.nombre = f"{scope['method']} {ruta or scope['path']}"
+                raiz.atributos["http.route"] = ruta
+                raiz.atributos["http.status_code"] = estado["status"]
+                if estado["status"] >= 500 and raiz.error is None:
+                    raiz.error = f"HTTP {estado['status']}"
+                raiz.terminar()
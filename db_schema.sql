@@ -1,6 +1,8 @@
 -- 1. SETUP & EXTENSIONS
 -- ---------------------------------------------------------
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+-- GiST equality on UUIDs, for the ownership-period exclusion constraint
+CREATE EXTENSION IF NOT EXISTS btree_gist;
 
 -- Enum for Sex ('M' = Male, 'F' = Female, 'X' = Other)
 CREATE TYPE sexo_enum AS ENUM ('M', 'F', 'X');
@@ -17,6 +19,13 @@ CREATE TYPE doc_review_status_enum AS ENUM ('pendiente', 'aprobado', 'rechazado'
 -- Enum for facility types
 CREATE TYPE facility_type_enum AS ENUM ('UPP', 'PSG', 'SUBASTA', 'RASTRO', 'FERIA', 'EXPORT_CENTER', 'QUARANTINE_CENTER', 'CASETA_INSPECCION');
 
+-- Enum for normalized catalog vocabularies
+CREATE TYPE catalogo_tipo_enum AS ENUM ('vacuna', 'laboratorio', 'medicamento', 'enfermedad', 'raza');
+
+-- Enums for sanitary campaigns
+CREATE TYPE campana_tipo_enum AS ENUM ('vacunacion', 'desparasitacion');
+CREATE TYPE campana_estado_enum AS ENUM ('programada', 'en_curso', 'cerrada');
+
 -- 2. BASE TABLES
 -- ---------------------------------------------------------
 
@@ -91,7 +100,8 @@ CREATE TABLE instalaciones (
     license_number VARCHAR(50) NOT NULL UNIQUE,
     active BOOLEAN DEFAULT TRUE,
     fecha_vencimiento DATE,
-    created_at TIMESTAMPTZ DEFAULT NOW()
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 CREATE TABLE predios (
@@ -100,7 +110,8 @@ CREATE TABLE predios (
     clave_catastral VARCHAR(50) UNIQUE,
     superficie_total DECIMAL(10, 2),
     latitud DECIMAL(9, 6),
-    longitud DECIMAL(9, 6)
+    longitud DECIMAL(9, 6),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 -- Junction table for many-to-many relationship between Instalacion and Predio
@@ -119,7 +130,8 @@ CREATE TABLE documentos (
     storage_key TEXT NOT NULL,
     original_filename TEXT,
     created_at TIMESTAMPTZ DEFAULT NOW(),
-    authored BOOLEAN DEFAULT FALSE
+    authored BOOLEAN DEFAULT FALSE,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 CREATE TABLE instalacion_documentos (
@@ -153,6 +165,27 @@ CREATE TABLE renovaciones_upp (
     comentarios TEXT
 );
 
+-- 3b. CATALOGS
+-- ---------------------------------------------------------
+-- One row per canonical term (vaccine, lab, drug, disease, breed). Event and
+-- bovino rows keep the text the user typed and point to the entry via an
+-- integer id, so reports group on compact keys instead of free text.
+CREATE TABLE catalogos (
+    id SERIAL PRIMARY KEY,
+    tipo catalogo_tipo_enum NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (tipo, nombre)
+);
+
+-- Every normalized spelling seen for a term maps to its catalog entry
+CREATE TABLE catalogo_alias (
+    tipo catalogo_tipo_enum NOT NULL,
+    alias VARCHAR(100) NOT NULL, -- normalizar_catalogo() output
+    catalogo_id INTEGER NOT NULL REFERENCES catalogos(id) ON DELETE CASCADE,
+    PRIMARY KEY (tipo, alias)
+);
+
 -- 4. LIVESTOCK CORE
 -- ---------------------------------------------------------
 
@@ -173,13 +206,15 @@ CREATE TABLE bovinos (
     nombre VARCHAR(50),
 
     raza_dominante VARCHAR(50),
+    raza_id INTEGER REFERENCES catalogos(id),
     fecha_nac DATE,
     sexo sexo_enum,
     peso_nac DECIMAL(6, 2),
     peso_actual DECIMAL(6, 2),
     imc DECIMAL(4, 2),
     proposito VARCHAR(50),
-    status VARCHAR(20) DEFAULT 'activo'
+    status VARCHAR(20) DEFAULT 'activo',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 -- 4b. DOCUMENT REVIEW
@@ -193,96 +228,158 @@ CREATE TABLE documento_revisiones (
     fecha TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- 4c. OWNERSHIP HISTORY
+-- ---------------------------------------------------------
+-- One row per period a user owned a bovino; the open period (no upper
+-- bound) is the current owner. The first owner's period starts at
+-- -infinity. Written by registrar_propiedad() from the compraventa and
+-- bovinos triggers, so listings filter events by range containment instead
+-- of looking up the acquisition date per row.
+CREATE TABLE bovino_propiedad (
+    id BIGSERIAL PRIMARY KEY,
+    bovino_id UUID NOT NULL REFERENCES bovinos(id) ON DELETE CASCADE,
+    usuario_id UUID NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    periodo TSTZRANGE NOT NULL,
+    evento_id UUID, -- compraventa that opened the period (NULL: first owner or a change outside compraventas)
+    EXCLUDE USING gist (bovino_id WITH =, periodo WITH &&)
+);
+
 -- 5. EVENTS SYSTEM
 -- ---------------------------------------------------------
+-- eventos and the high-volume detail tables are partitioned by month on the
+-- event date (eventos.fecha, copied to the details as evento_fecha), so
+-- queries bounded by date only touch the matching months and old months can
+-- be detached for archival (archivar_particion_eventos). Monthly partitions
+-- are created ahead of time by crear_particiones_eventos(); rows outside the
+-- existing months land in the *_default partitions.
 CREATE TABLE eventos (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     bovino_id UUID NOT NULL REFERENCES bovinos(id) ON DELETE CASCADE,
-    fecha TIMESTAMPTZ DEFAULT NOW(),
-    observaciones TEXT
-);
+    fecha TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- when it happened (may be client-supplied); partition key
+    observaciones TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- when the server stored/changed it
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
 
 -- 6. EVENT DETAILS
 -- ---------------------------------------------------------
+-- evento_fecha is the parent's fecha: it is part of the foreign key and the
+-- partition key, so a detail row always lives in the same month as its evento.
 
 CREATE TABLE dietas (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    evento_id UUID NOT NULL REFERENCES eventos(id) ON DELETE CASCADE,
-    alimento VARCHAR(100) NOT NULL
-);
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
+    alimento VARCHAR(100) NOT NULL,
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
 
 CREATE TABLE pesos (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    evento_id UUID NOT NULL REFERENCES eventos(id) ON DELETE CASCADE,
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
     peso_actual DECIMAL(6, 2),
-    peso_nuevo DECIMAL(6, 2)
-);
+    peso_nuevo DECIMAL(6, 2),
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
 
 CREATE TABLE vacunaciones (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    evento_id UUID NOT NULL REFERENCES eventos(id) ON DELETE CASCADE,
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
     veterinario_id UUID REFERENCES veterinarios(id),
     tipo VARCHAR(100),
+    tipo_id INTEGER REFERENCES catalogos(id),
     lote VARCHAR(50),
     laboratorio VARCHAR(100),
-    fecha_prox DATE
-);
+    laboratorio_id INTEGER REFERENCES catalogos(id),
+    fecha_prox DATE,
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
 
 CREATE TABLE desparasitaciones (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    evento_id UUID NOT NULL REFERENCES eventos(id) ON DELETE CASCADE,
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
     veterinario_id UUID REFERENCES veterinarios(id),
     medicamento VARCHAR(100),
+    medicamento_id INTEGER REFERENCES catalogos(id),
     dosis_admin VARCHAR(50),
-    fecha_prox DATE
-);
+    fecha_prox DATE,
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
 
 CREATE TABLE laboratorios (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    evento_id UUID NOT NULL REFERENCES eventos(id) ON DELETE CASCADE,
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
     veterinario_id UUID REFERENCES veterinarios(id),
     tipo VARCHAR(100),
-    resultado TEXT
-);
+    resultado TEXT,
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
 
 CREATE TABLE compraventas (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    evento_id UUID NOT NULL REFERENCES eventos(id) ON DELETE CASCADE,
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
     comprador_curp VARCHAR(18) REFERENCES usuarios(curp),
-    vendedor_curp VARCHAR(18) REFERENCES usuarios(curp)
-);
+    vendedor_curp VARCHAR(18) REFERENCES usuarios(curp),
+    comprador_id UUID REFERENCES usuarios(id), -- filled from the CURPs on insert (compraventa_usuarios)
+    vendedor_id UUID REFERENCES usuarios(id),
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
 
 CREATE TABLE traslado (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    evento_id UUID NOT NULL REFERENCES eventos(id) ON DELETE CASCADE,
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
     predio_anterior_id UUID REFERENCES predios(id), -- NULL when bovino had no predio assigned at time of transfer
-    predio_nuevo_id UUID REFERENCES predios(id)
-);
+    predio_nuevo_id UUID REFERENCES predios(id),
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
 
 -- 7. MEDICAL / PATHOLOGY
 -- ---------------------------------------------------------
+-- Low volume and linked to each other by id, so not partitioned; they still
+-- carry evento_fecha for the foreign key to the partitioned eventos.
 CREATE TABLE enfermedades (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    evento_id UUID NOT NULL REFERENCES eventos(id) ON DELETE CASCADE,
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
     veterinario_id UUID REFERENCES veterinarios(id),
-    tipo VARCHAR(100)
+    tipo VARCHAR(100),
+    tipo_id INTEGER REFERENCES catalogos(id),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
 );
 
 CREATE TABLE tratamientos (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    evento_id UUID NOT NULL REFERENCES eventos(id),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
     enfermedad_id UUID REFERENCES enfermedades(id),
     veterinario_id UUID REFERENCES veterinarios(id),
     medicamento VARCHAR(100),
+    medicamento_id INTEGER REFERENCES catalogos(id),
     dosis VARCHAR(50),
-    periodo VARCHAR(50)
+    periodo VARCHAR(50),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON UPDATE CASCADE
 );
 
 CREATE TABLE remisiones (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    evento_id UUID NOT NULL REFERENCES eventos(id),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
     enfermedad_id UUID REFERENCES enfermedades(id),
-    veterinario_id UUID REFERENCES veterinarios(id)
+    veterinario_id UUID REFERENCES veterinarios(id),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON UPDATE CASCADE
 );
 
 -- C. Register Remission (Disease resolved, linked to a specific Disease case)
@@ -291,10 +388,12 @@ CREATE OR REPLACE FUNCTION registrar_remision(
     _enfermedad_id UUID, -- Must link to an existing disease case
     _usuario_id UUID,
     _fecha TIMESTAMPTZ DEFAULT NOW(),
-    _observaciones TEXT DEFAULT ''
-) RETURNS UUID AS $$
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT enfermedad_id UUID, OUT veterinario_id UUID
+) AS $$
+#variable_conflict use_column
 DECLARE
-    _evento_id UUID;
     _vet_id UUID;
 BEGIN
     SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
@@ -302,19 +401,169 @@ BEGIN
         RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
     END IF;
 
+    -- The disease case must belong to the same bovino
+    IF EXISTS (
+        SELECT 1 FROM enfermedades n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        WHERE n.id = _enfermedad_id AND e.bovino_id <> _bovino_id
+    ) THEN
+        RAISE EXCEPTION 'La enfermedad no pertenece al mismo bovino' USING ERRCODE = 'check_violation';
+    END IF;
+
     INSERT INTO eventos (bovino_id, fecha, observaciones)
-    VALUES (_bovino_id, _fecha, _observaciones)
-    RETURNING id INTO _evento_id;
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
 
-    INSERT INTO remisiones (evento_id, enfermedad_id, veterinario_id)
-    VALUES (_evento_id, _enfermedad_id, _vet_id);
+    INSERT INTO remisiones (evento_id, evento_fecha, enfermedad_id, veterinario_id)
+    VALUES (id, fecha, _enfermedad_id, _vet_id)
+    RETURNING remisiones.enfermedad_id, remisiones.veterinario_id
+    INTO enfermedad_id, veterinario_id;
 
     UPDATE bovinos SET status = 'activo' WHERE id = _bovino_id;
-
-    RETURN _evento_id;
 END;
 $$ LANGUAGE plpgsql;
 
+-- 7b. SANITARY CAMPAIGNS
+-- ---------------------------------------------------------
+-- A campaign applies the same vaccine/antiparasitic (lote, laboratorio,
+-- fecha_prox) to every eligible bovino of an instalación and/or filter.
+CREATE TABLE campanas (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    tipo campana_tipo_enum NOT NULL,
+    estado campana_estado_enum NOT NULL DEFAULT 'programada',
+    creado_por_id UUID NOT NULL REFERENCES usuarios(id),
+    veterinario_id UUID NOT NULL REFERENCES veterinarios(id),
+
+    producto VARCHAR(100) NOT NULL, -- vaccine (vacunaciones.tipo) or medicamento
+    producto_id INTEGER REFERENCES catalogos(id),
+    lote VARCHAR(50),
+    laboratorio VARCHAR(100),
+    laboratorio_id INTEGER REFERENCES catalogos(id),
+    dosis VARCHAR(50),
+    fecha_prox DATE,
+    observaciones TEXT DEFAULT '',
+
+    -- Target: all conditions set here must hold for a bovino to be eligible
+    instalacion_id UUID REFERENCES instalaciones(id),
+    filtro_usuario_id UUID REFERENCES usuarios(id),
+    filtro_sexo sexo_enum,
+    filtro_raza_id INTEGER REFERENCES catalogos(id),
+    filtro_nac_desde DATE,
+    filtro_nac_hasta DATE,
+
+    -- Coverage counter, kept by aplicar_campana()/revertir_campana()
+    total_aplicados INTEGER NOT NULL DEFAULT 0,
+    ultima_aplicacion TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    CHECK (instalacion_id IS NOT NULL OR filtro_usuario_id IS NOT NULL)
+);
+
+CREATE TABLE campana_bovinos (
+    campana_id UUID NOT NULL REFERENCES campanas(id) ON DELETE CASCADE,
+    bovino_id UUID NOT NULL REFERENCES bovinos(id) ON DELETE CASCADE,
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
+    aplicado_en TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (campana_id, bovino_id),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- 7c. OFFLINE SYNC
+-- ---------------------------------------------------------
+-- Deletions (and bovinos leaving an owner) for the /sync change feed.
+-- Upserts are found through each table's updated_at instead.
+CREATE TABLE sync_tombstones (
+    id BIGSERIAL PRIMARY KEY,
+    entidad VARCHAR(20) NOT NULL, -- table name: bovinos, eventos, documentos, instalaciones, predios
+    entidad_id UUID NOT NULL,
+    usuario_id UUID NOT NULL, -- owner who must drop the row
+    eliminado_en TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- 7d. IDEMPOTENCY
+-- ---------------------------------------------------------
+-- Responses of write requests sent with an Idempotency-Key header, so a
+-- retried request is answered from here instead of running again.
+CREATE TABLE idempotency_keys (
+    clave BYTEA PRIMARY KEY, -- sha256(user, method, path, Idempotency-Key)
+    peticion BYTEA NOT NULL, -- sha256 of the request (detects a key reused for another payload)
+    estado SMALLINT NOT NULL DEFAULT 0, -- 0 = in progress, 1 = completed
+    status_code SMALLINT,
+    content_type VARCHAR(100),
+    respuesta BYTEA, -- zlib-compressed response body
+    creado_en TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expira_en TIMESTAMPTZ NOT NULL -- claim lease while in progress, retention once completed
+);
+
+-- 7e. SANITARY AGENDA
+-- ---------------------------------------------------------
+-- Latest dose per bovino and product (catalog id) with its booster date.
+-- Maintained by triggers on vacunaciones/desparasitaciones so the agenda
+-- never reads the event history.
+CREATE TABLE agenda_sanitaria (
+    bovino_id UUID NOT NULL REFERENCES bovinos(id) ON DELETE CASCADE,
+    tipo campana_tipo_enum NOT NULL,
+    producto_id INTEGER NOT NULL REFERENCES catalogos(id), -- vacunaciones.tipo_id / desparasitaciones.medicamento_id
+    evento_id UUID NOT NULL,
+    veterinario_id UUID,
+    fecha_aplicacion TIMESTAMPTZ NOT NULL,
+    fecha_prox DATE, -- NULL: the latest dose has no booster scheduled
+    actualizado_en TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- lets the reminder job read only changed rows
+    PRIMARY KEY (bovino_id, tipo, producto_id)
+);
+
+-- 7f. NOTIFICATIONS
+-- ---------------------------------------------------------
+-- Outbox of reminders (boosters due, licenses about to expire, renewals to
+-- review, rejected documents). Rows are written in bulk by
+-- generar_recordatorios() and delivered in batches by the API scheduler.
+CREATE TABLE notificaciones (
+    id BIGSERIAL PRIMARY KEY,
+    usuario_id UUID NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE, -- recipient
+    tipo VARCHAR(30) NOT NULL, -- refuerzo, vencimiento_upp, renovacion_pendiente, documento_rechazado
+    referencia_id UUID, -- bovino, instalacion, renovacion or documento the reminder is about
+    clave TEXT NOT NULL UNIQUE, -- one reminder per source row and due date (reruns are no-ops)
+    titulo VARCHAR(150) NOT NULL,
+    mensaje TEXT NOT NULL,
+    datos JSONB,
+    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente', -- pendiente, enviada, fallida
+    intentos SMALLINT NOT NULL DEFAULT 0,
+    siguiente_intento TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- retry backoff / delivery lease
+    error TEXT,
+    creado_en TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    enviado_en TIMESTAMPTZ
+);
+
+-- Watermarks of generar_recordatorios(), one per reminder source
+CREATE TABLE recordatorio_cursores (
+    fuente VARCHAR(30) PRIMARY KEY,
+    procesado_hasta TIMESTAMPTZ NOT NULL, -- rows created/changed up to here are already handled
+    ventana_hasta DATE -- last due date already covered by the date window
+);
+
+-- 7g. BOVINO SUMMARY
+-- ---------------------------------------------------------
+-- Current state of each bovino (last weight, last vaccination and next
+-- booster, open diseases, last movilización, current owner's start date).
+-- Maintained by statement-level triggers on the event tables so herd lists
+-- read it with a primary-key join instead of each animal's history.
+CREATE TABLE bovino_resumen (
+    bovino_id UUID PRIMARY KEY REFERENCES bovinos(id) ON DELETE CASCADE,
+    ultimo_peso DECIMAL(6, 2),
+    ultimo_peso_fecha TIMESTAMPTZ,
+    ultima_vacunacion_tipo VARCHAR(100),
+    ultima_vacunacion_fecha TIMESTAMPTZ,
+    proxima_vacunacion DATE, -- earliest booster date in agenda_sanitaria
+    enfermedades_abiertas INTEGER NOT NULL DEFAULT 0, -- enfermedades without a remision
+    enfermedad_abierta_tipo VARCHAR(100), -- latest open one
+    enfermedad_abierta_fecha TIMESTAMPTZ,
+    ultima_movilizacion_id UUID,
+    ultima_movilizacion_estado VARCHAR(20),
+    ultima_movilizacion_fecha TIMESTAMPTZ, -- fecha_solicitud
+    propietario_desde TIMESTAMPTZ, -- start of the current owner's period (NULL: first owner)
+    actualizado_en TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
 -- 8. INDEXES
 -- ---------------------------------------------------------
 CREATE INDEX idx_usuarios_rol ON usuarios(rol);
@@ -326,14 +575,64 @@ CREATE INDEX idx_bovinos_usuario ON bovinos(usuario_id);
 CREATE INDEX idx_bovinos_instalacion ON bovinos(instalacion_id);
 CREATE INDEX idx_bovinos_madre ON bovinos(madre_id);
 CREATE INDEX idx_bovinos_padre ON bovinos(padre_id);
+-- (bovino_id, periodo) lookups ("who owned it on date X") use the exclusion constraint's index
+CREATE INDEX idx_bovino_propiedad_usuario ON bovino_propiedad(usuario_id, bovino_id);
 
-CREATE INDEX idx_eventos_bovino ON eventos(bovino_id);
+-- (bovino_id, fecha DESC) serves a bovino's history newest first without a sort
+CREATE INDEX idx_eventos_bovino_fecha ON eventos(bovino_id, fecha DESC);
 CREATE INDEX idx_eventos_fecha ON eventos(fecha);
 
 CREATE INDEX idx_pesos_evento ON pesos(evento_id);
 CREATE INDEX idx_vacunas_evento ON vacunaciones(evento_id);
 CREATE INDEX idx_vacunas_vet ON vacunaciones(veterinario_id);
+CREATE INDEX idx_dietas_evento ON dietas(evento_id);
+CREATE INDEX idx_desparasitaciones_evento ON desparasitaciones(evento_id);
+CREATE INDEX idx_laboratorios_evento ON laboratorios(evento_id);
+CREATE INDEX idx_compraventas_evento ON compraventas(evento_id);
+CREATE INDEX idx_compraventas_comprador ON compraventas(comprador_id, evento_fecha DESC);
+CREATE INDEX idx_compraventas_vendedor ON compraventas(vendedor_id, evento_fecha DESC);
+CREATE INDEX idx_traslado_evento ON traslado(evento_id);
 CREATE INDEX idx_enfermedades_evento ON enfermedades(evento_id);
+CREATE INDEX idx_tratamientos_evento ON tratamientos(evento_id);
+CREATE INDEX idx_tratamientos_enfermedad ON tratamientos(enfermedad_id);
+CREATE INDEX idx_remisiones_evento ON remisiones(evento_id);
+CREATE INDEX idx_remisiones_enfermedad ON remisiones(enfermedad_id);
+
+CREATE INDEX idx_documentos_usuario_tipo ON documentos(usuario_id, doc_type);
+CREATE INDEX idx_documentos_usuario_creado ON documentos(usuario_id, created_at DESC);
+CREATE INDEX idx_documentos_pendientes ON documentos(created_at) WHERE authored = FALSE;
+-- text_pattern_ops lets LIKE 'prefix%' use the index under any collation
+CREATE INDEX idx_documentos_storage_key ON documentos(storage_key text_pattern_ops);
+
+CREATE INDEX idx_catalogo_alias_catalogo ON catalogo_alias(catalogo_id);
+CREATE INDEX idx_bovinos_raza ON bovinos(raza_id);
+CREATE INDEX idx_vacunas_tipo ON vacunaciones(tipo_id);
+CREATE INDEX idx_vacunas_laboratorio ON vacunaciones(laboratorio_id);
+CREATE INDEX idx_desparasitaciones_medicamento ON desparasitaciones(medicamento_id);
+CREATE INDEX idx_tratamientos_medicamento ON tratamientos(medicamento_id);
+CREATE INDEX idx_enfermedades_tipo ON enfermedades(tipo_id);
+
+CREATE INDEX idx_campanas_instalacion ON campanas(instalacion_id);
+CREATE INDEX idx_campanas_veterinario ON campanas(veterinario_id);
+CREATE INDEX idx_campana_bovinos_bovino ON campana_bovinos(bovino_id);
+CREATE INDEX idx_campana_bovinos_aplicado ON campana_bovinos(campana_id, aplicado_en);
+
+CREATE INDEX idx_bovinos_sync ON bovinos(usuario_id, updated_at, id);
+CREATE INDEX idx_eventos_sync ON eventos(updated_at, id);
+CREATE INDEX idx_documentos_sync ON documentos(usuario_id, updated_at, id);
+CREATE INDEX idx_instalaciones_sync ON instalaciones(usuario_id, updated_at, id);
+CREATE INDEX idx_predios_sync ON predios(usuario_id, updated_at, id);
+CREATE INDEX idx_sync_tombstones_usuario ON sync_tombstones(usuario_id, eliminado_en, id);
+CREATE INDEX idx_idempotency_keys_expira ON idempotency_keys(expira_en);
+CREATE INDEX idx_agenda_sanitaria_fecha ON agenda_sanitaria(fecha_prox) WHERE fecha_prox IS NOT NULL;
+CREATE INDEX idx_agenda_sanitaria_veterinario ON agenda_sanitaria(veterinario_id, fecha_prox) WHERE fecha_prox IS NOT NULL;
+CREATE INDEX idx_agenda_sanitaria_actualizado ON agenda_sanitaria(actualizado_en) WHERE fecha_prox IS NOT NULL;
+CREATE INDEX idx_notificaciones_pendientes ON notificaciones(siguiente_intento, id) WHERE estado = 'pendiente';
+CREATE INDEX idx_notificaciones_usuario ON notificaciones(usuario_id, creado_en DESC);
+CREATE INDEX idx_notificaciones_purga ON notificaciones(creado_en) WHERE estado <> 'pendiente';
+CREATE INDEX idx_instalaciones_updated ON instalaciones(updated_at);
+CREATE INDEX idx_renovaciones_upp_solicitud ON renovaciones_upp(fecha_solicitud) WHERE estado = 'pendiente';
+CREATE INDEX idx_documento_revisiones_rechazo ON documento_revisiones(fecha) WHERE status = 'rechazado';
 
 CREATE INDEX idx_instalaciones_usuario ON instalaciones(usuario_id);
 CREATE INDEX idx_instalaciones_facility_type ON instalaciones(facility_type);
@@ -354,77 +653,1022 @@ CREATE INDEX idx_renovaciones_upp_estado ON renovaciones_upp(estado);
 -- 9. TRIGGERS & FUNCTIONS (Automation)
 -- ---------------------------------------------------------
 
--- C. Document Review Automation
--- Automatically syncs documentos.authored when a revision is inserted
-CREATE OR REPLACE FUNCTION sync_documento_authored()
+-- D. Catalog Resolution
+-- Normalizes a free-text term: lowercase, trimmed, single spaces, no accents
+CREATE OR REPLACE FUNCTION normalizar_catalogo(_texto TEXT)
+RETURNS TEXT AS $$
+    SELECT NULLIF(
+        translate(lower(regexp_replace(btrim(_texto), '\s+', ' ', 'g')), 'áéíóúüñ', 'aeiouun'),
+        ''
+    );
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Returns the catalog id for a term, registering unseen spellings as new entries
+CREATE OR REPLACE FUNCTION resolver_catalogo(_tipo catalogo_tipo_enum, _nombre TEXT)
+RETURNS INTEGER AS $$
+DECLARE
+    _alias TEXT := normalizar_catalogo(_nombre);
+    _catalogo_id INTEGER;
+BEGIN
+    IF _alias IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT catalogo_id INTO _catalogo_id FROM catalogo_alias WHERE tipo = _tipo AND alias = _alias;
+    IF _catalogo_id IS NOT NULL THEN
+        RETURN _catalogo_id;
+    END IF;
+
+    INSERT INTO catalogos (tipo, nombre)
+    VALUES (_tipo, regexp_replace(btrim(_nombre), '\s+', ' ', 'g'))
+    ON CONFLICT (tipo, nombre) DO UPDATE SET nombre = EXCLUDED.nombre
+    RETURNING id INTO _catalogo_id;
+
+    -- A concurrent insert may have won the alias; re-read to return its mapping
+    INSERT INTO catalogo_alias (tipo, alias, catalogo_id)
+    VALUES (_tipo, _alias, _catalogo_id)
+    ON CONFLICT (tipo, alias) DO NOTHING;
+
+    SELECT catalogo_id INTO _catalogo_id FROM catalogo_alias WHERE tipo = _tipo AND alias = _alias;
+    RETURN _catalogo_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Maps an alias onto an existing catalog entry and re-points rows already using it.
+-- Returns the number of detail rows that were re-pointed.
+CREATE OR REPLACE FUNCTION asignar_alias_catalogo(_tipo catalogo_tipo_enum, _alias TEXT, _catalogo_id INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    _norm TEXT := normalizar_catalogo(_alias);
+    _total INTEGER := 0;
+    _n INTEGER;
+BEGIN
+    IF _norm IS NULL THEN
+        RAISE EXCEPTION 'Alias vacío';
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM catalogos WHERE id = _catalogo_id AND tipo = _tipo) THEN
+        RAISE EXCEPTION 'Catalog entry % is not of type %', _catalogo_id, _tipo;
+    END IF;
+
+    INSERT INTO catalogo_alias (tipo, alias, catalogo_id)
+    VALUES (_tipo, _norm, _catalogo_id)
+    ON CONFLICT (tipo, alias) DO UPDATE SET catalogo_id = EXCLUDED.catalogo_id;
+
+    IF _tipo = 'vacuna' THEN
+        UPDATE vacunaciones SET tipo_id = _catalogo_id WHERE normalizar_catalogo(tipo) = _norm;
+        GET DIAGNOSTICS _total = ROW_COUNT;
+    ELSIF _tipo = 'laboratorio' THEN
+        UPDATE vacunaciones SET laboratorio_id = _catalogo_id WHERE normalizar_catalogo(laboratorio) = _norm;
+        GET DIAGNOSTICS _total = ROW_COUNT;
+    ELSIF _tipo = 'medicamento' THEN
+        UPDATE desparasitaciones SET medicamento_id = _catalogo_id WHERE normalizar_catalogo(medicamento) = _norm;
+        GET DIAGNOSTICS _total = ROW_COUNT;
+        UPDATE tratamientos SET medicamento_id = _catalogo_id WHERE normalizar_catalogo(medicamento) = _norm;
+        GET DIAGNOSTICS _n = ROW_COUNT;
+        _total := _total + _n;
+    ELSIF _tipo = 'enfermedad' THEN
+        UPDATE enfermedades SET tipo_id = _catalogo_id WHERE normalizar_catalogo(tipo) = _norm;
+        GET DIAGNOSTICS _total = ROW_COUNT;
+    ELSIF _tipo = 'raza' THEN
+        UPDATE bovinos SET raza_id = _catalogo_id WHERE normalizar_catalogo(raza_dominante) = _norm;
+        GET DIAGNOSTICS _total = ROW_COUNT;
+    END IF;
+
+    RETURN _total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Keeps bovinos.raza_id in sync with the free-text breed the owner enters
+CREATE OR REPLACE FUNCTION sync_bovino_raza()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.raza_id := resolver_catalogo('raza', NEW.raza_dominante);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_bovino_raza
+BEFORE INSERT OR UPDATE OF raza_dominante ON bovinos
+FOR EACH ROW
+EXECUTE FUNCTION sync_bovino_raza();
+
+-- E. Offline Sync Change Tracking
+-- Bumps updated_at on every change so the /sync feed can pick the row up
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_bovinos_updated_at BEFORE UPDATE ON bovinos
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER trg_eventos_updated_at BEFORE UPDATE ON eventos
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER trg_documentos_updated_at BEFORE UPDATE ON documentos
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER trg_instalaciones_updated_at BEFORE UPDATE ON instalaciones
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER trg_predios_updated_at BEFORE UPDATE ON predios
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- Tombstones for owner-scoped tables (all have id + usuario_id)
+CREATE OR REPLACE FUNCTION registrar_tombstones()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sync_tombstones (entidad, entidad_id, usuario_id)
+    SELECT TG_TABLE_NAME, id, usuario_id FROM viejos WHERE usuario_id IS NOT NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_bovinos_tombstone AFTER DELETE ON bovinos
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones();
+CREATE TRIGGER trg_documentos_tombstone AFTER DELETE ON documentos
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones();
+CREATE TRIGGER trg_instalaciones_tombstone AFTER DELETE ON instalaciones
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones();
+CREATE TRIGGER trg_predios_tombstone AFTER DELETE ON predios
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones();
+
+-- Eventos are scoped through their bovino (rows cascading from a deleted
+-- bovino are skipped: clients drop them with the bovino)
+CREATE OR REPLACE FUNCTION registrar_tombstones_eventos()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF NEW.status = 'aprobado' THEN
-        UPDATE documentos SET authored = TRUE WHERE id = NEW.documento_id;
+    INSERT INTO sync_tombstones (entidad, entidad_id, usuario_id)
+    SELECT 'eventos', v.id, b.usuario_id
+    FROM viejos v
+    JOIN bovinos b ON b.id = v.bovino_id
+    WHERE b.usuario_id IS NOT NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_eventos_tombstone AFTER DELETE ON eventos
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones_eventos();
+
+-- Ownership change: the previous owner gets a tombstone and the bovino's
+-- history is re-stamped so the new owner's feed includes it
+CREATE OR REPLACE FUNCTION sync_cambio_propietario()
+RETURNS TRIGGER AS $$
+BEGIN
+    WITH cambios AS MATERIALIZED (
+        SELECT v.id, v.usuario_id AS anterior
+        FROM viejos v
+        JOIN nuevos n ON n.id = v.id
+        WHERE v.usuario_id IS DISTINCT FROM n.usuario_id
+    ), tomb AS (
+        INSERT INTO sync_tombstones (entidad, entidad_id, usuario_id)
+        SELECT 'bovinos', id, anterior FROM cambios WHERE anterior IS NOT NULL
+    )
+    UPDATE eventos SET updated_at = NOW()
+    WHERE bovino_id IN (SELECT id FROM cambios);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_bovinos_sync_propietario AFTER UPDATE ON bovinos
+REFERENCING OLD TABLE AS viejos NEW TABLE AS nuevos
+FOR EACH STATEMENT EXECUTE FUNCTION sync_cambio_propietario();
+
+-- Retention: clients whose token is older than this must do a full resync
+CREATE OR REPLACE FUNCTION purgar_sync_tombstones(_retencion INTERVAL)
+RETURNS INTEGER AS $$
+DECLARE
+    _borrados INTEGER;
+BEGIN
+    DELETE FROM sync_tombstones WHERE eliminado_en < NOW() - _retencion;
+    GET DIAGNOSTICS _borrados = ROW_COUNT;
+    RETURN _borrados;
+END;
+$$ LANGUAGE plpgsql;
+
+-- F. Idempotency Key Eviction
+-- Deletes at most _limite expired keys (completed past their TTL or abandoned
+-- claims), so it can run often without long locks
+CREATE OR REPLACE FUNCTION purgar_idempotency_keys(_limite INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    _borrados INTEGER;
+BEGIN
+    DELETE FROM idempotency_keys
+    WHERE clave IN (
+        SELECT clave FROM idempotency_keys
+        WHERE expira_en < NOW()
+        LIMIT _limite
+        FOR UPDATE SKIP LOCKED
+    );
+    GET DIAGNOSTICS _borrados = ROW_COUNT;
+    RETURN _borrados;
+END;
+$$ LANGUAGE plpgsql;
+
+-- G. Sanitary Agenda
+-- Rebuilds the agenda rows of some bovinos from their history (latest dose
+-- per product). Used when doses are deleted or re-pointed to another product.
+CREATE OR REPLACE FUNCTION refrescar_agenda_sanitaria(_tipo campana_tipo_enum, _bovino_ids UUID[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM agenda_sanitaria WHERE tipo = _tipo AND bovino_id = ANY(_bovino_ids);
+
+    IF _tipo = 'vacunacion' THEN
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, v.tipo_id)
+               e.bovino_id, _tipo, v.tipo_id, e.id, v.veterinario_id, e.fecha, v.fecha_prox
+        FROM eventos e JOIN vacunaciones v ON v.evento_id = e.id AND v.evento_fecha = e.fecha
+        WHERE e.bovino_id = ANY(_bovino_ids) AND v.tipo_id IS NOT NULL
+        ORDER BY e.bovino_id, v.tipo_id, e.fecha DESC, e.id DESC;
     ELSE
-        UPDATE documentos SET authored = FALSE WHERE id = NEW.documento_id;
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, d.medicamento_id)
+               e.bovino_id, _tipo, d.medicamento_id, e.id, d.veterinario_id, e.fecha, d.fecha_prox
+        FROM eventos e JOIN desparasitaciones d ON d.evento_id = e.id AND d.evento_fecha = e.fecha
+        WHERE e.bovino_id = ANY(_bovino_ids) AND d.medicamento_id IS NOT NULL
+        ORDER BY e.bovino_id, d.medicamento_id, e.fecha DESC, e.id DESC;
     END IF;
-    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New doses: upsert only the inserted rows; an older dose (e.g. synced late
+-- from an offline device) never replaces a newer one
+CREATE OR REPLACE FUNCTION agenda_dosis_insertadas()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'vacunaciones' THEN
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, n.tipo_id)
+               e.bovino_id, 'vacunacion', n.tipo_id, e.id, n.veterinario_id, e.fecha, n.fecha_prox
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        WHERE n.tipo_id IS NOT NULL
+        ORDER BY e.bovino_id, n.tipo_id, e.fecha DESC, e.id DESC
+        ON CONFLICT (bovino_id, tipo, producto_id) DO UPDATE
+            SET evento_id = EXCLUDED.evento_id, veterinario_id = EXCLUDED.veterinario_id,
+                fecha_aplicacion = EXCLUDED.fecha_aplicacion, fecha_prox = EXCLUDED.fecha_prox,
+                actualizado_en = NOW()
+            WHERE EXCLUDED.fecha_aplicacion >= agenda_sanitaria.fecha_aplicacion;
+    ELSE
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, n.medicamento_id)
+               e.bovino_id, 'desparasitacion', n.medicamento_id, e.id, n.veterinario_id, e.fecha, n.fecha_prox
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        WHERE n.medicamento_id IS NOT NULL
+        ORDER BY e.bovino_id, n.medicamento_id, e.fecha DESC, e.id DESC
+        ON CONFLICT (bovino_id, tipo, producto_id) DO UPDATE
+            SET evento_id = EXCLUDED.evento_id, veterinario_id = EXCLUDED.veterinario_id,
+                fecha_aplicacion = EXCLUDED.fecha_aplicacion, fecha_prox = EXCLUDED.fecha_prox,
+                actualizado_en = NOW()
+            WHERE EXCLUDED.fecha_aplicacion >= agenda_sanitaria.fecha_aplicacion;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Deleted doses (campaign reversal, event deletion): only bovinos whose
+-- agenda row pointed at a deleted dose are rebuilt
+CREATE OR REPLACE FUNCTION agenda_dosis_borradas()
+RETURNS TRIGGER AS $$
+DECLARE
+    _tipo campana_tipo_enum := CASE WHEN TG_TABLE_NAME = 'vacunaciones' THEN 'vacunacion' ELSE 'desparasitacion' END;
+BEGIN
+    PERFORM refrescar_agenda_sanitaria(_tipo, ARRAY(
+        SELECT DISTINCT a.bovino_id FROM agenda_sanitaria a
+        WHERE a.tipo = _tipo AND a.evento_id IN (SELECT evento_id FROM viejos)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updated doses (catalog alias merges re-point tipo_id/medicamento_id)
+CREATE OR REPLACE FUNCTION agenda_dosis_actualizadas()
+RETURNS TRIGGER AS $$
+DECLARE
+    _tipo campana_tipo_enum := CASE WHEN TG_TABLE_NAME = 'vacunaciones' THEN 'vacunacion' ELSE 'desparasitacion' END;
+BEGIN
+    PERFORM refrescar_agenda_sanitaria(_tipo, ARRAY(
+        SELECT DISTINCT e.bovino_id FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_vacunaciones_agenda_insert AFTER INSERT ON vacunaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_insertadas();
+CREATE TRIGGER trg_vacunaciones_agenda_delete AFTER DELETE ON vacunaciones
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_borradas();
+CREATE TRIGGER trg_vacunaciones_agenda_update AFTER UPDATE ON vacunaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_actualizadas();
+
+CREATE TRIGGER trg_desparasitaciones_agenda_insert AFTER INSERT ON desparasitaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_insertadas();
+CREATE TRIGGER trg_desparasitaciones_agenda_delete AFTER DELETE ON desparasitaciones
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_borradas();
+CREATE TRIGGER trg_desparasitaciones_agenda_update AFTER UPDATE ON desparasitaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_actualizadas();
+
+-- H. Reminders
+-- Writes due reminders to the notificaciones outbox in four set-based
+-- INSERT ... SELECTs. Each source is read incrementally from its cursor in
+-- recordatorio_cursores: rows created or changed since the previous run (up
+-- to NOW() - _margen, so transactions committing late are seen next time),
+-- plus, for date windows, only the due dates that entered the window since
+-- then. The UNIQUE clave turns repeated reminders into no-ops.
+CREATE OR REPLACE FUNCTION generar_recordatorios(_dias_refuerzo INTEGER, _dias_vencimiento INTEGER, _margen INTERVAL)
+RETURNS INTEGER AS $$
+DECLARE
+    _hasta TIMESTAMPTZ := NOW() - _margen;
+    _desde TIMESTAMPTZ;
+    _ventana DATE;
+    _total INTEGER := 0;
+    _n INTEGER;
+BEGIN
+    -- One generator at a time; concurrent workers skip this run
+    IF NOT pg_try_advisory_xact_lock(hashtext('generar_recordatorios')) THEN
+        RETURN 0;
+    END IF;
+
+    -- 1. Vaccination/deworming boosters due within _dias_refuerzo (to the owner)
+    SELECT procesado_hasta, ventana_hasta INTO _desde, _ventana
+    FROM recordatorio_cursores WHERE fuente = 'refuerzo';
+    _desde := COALESCE(_desde, _hasta); -- first run: the date window covers everything
+    _ventana := GREATEST(COALESCE(_ventana, CURRENT_DATE - 1), CURRENT_DATE - 1);
+
+    INSERT INTO notificaciones (usuario_id, tipo, referencia_id, clave, titulo, mensaje, datos)
+    SELECT b.usuario_id, 'refuerzo', a.bovino_id,
+           concat_ws(':', 'refuerzo', a.bovino_id, a.tipo, a.producto_id, a.fecha_prox),
+           'Refuerzo próximo',
+           format('%s de %s para el bovino %s el %s',
+                  CASE a.tipo WHEN 'vacunacion' THEN 'Vacunación' ELSE 'Desparasitación' END, c.nombre, b.folio, a.fecha_prox),
+           jsonb_build_object('bovino_id', a.bovino_id, 'folio', b.folio, 'tipo', a.tipo, 'producto', c.nombre,
+                              'evento_id', a.evento_id, 'fecha_prox', a.fecha_prox)
+    FROM agenda_sanitaria a
+    JOIN bovinos b ON b.id = a.bovino_id
+    JOIN catalogos c ON c.id = a.producto_id
+    WHERE (a.bovino_id, a.tipo, a.producto_id) IN (
+            SELECT bovino_id, tipo, producto_id FROM agenda_sanitaria
+            WHERE fecha_prox > _ventana AND fecha_prox <= CURRENT_DATE + _dias_refuerzo
+            UNION
+            SELECT bovino_id, tipo, producto_id FROM agenda_sanitaria
+            WHERE actualizado_en > _desde AND actualizado_en <= _hasta AND fecha_prox IS NOT NULL
+          )
+      AND a.fecha_prox BETWEEN CURRENT_DATE AND CURRENT_DATE + _dias_refuerzo
+      AND b.status NOT IN ('sacrificado', 'muerto', 'exportado')
+    ON CONFLICT (clave) DO NOTHING;
+    GET DIAGNOSTICS _n = ROW_COUNT;
+    _total := _total + _n;
+
+    INSERT INTO recordatorio_cursores (fuente, procesado_hasta, ventana_hasta)
+    VALUES ('refuerzo', _hasta, GREATEST(_ventana, CURRENT_DATE + _dias_refuerzo))
+    ON CONFLICT (fuente) DO UPDATE
+        SET procesado_hasta = EXCLUDED.procesado_hasta, ventana_hasta = EXCLUDED.ventana_hasta;
+
+    -- 2. UPP/PSG licenses expiring within _dias_vencimiento (to the owner)
+    SELECT procesado_hasta, ventana_hasta INTO _desde, _ventana
+    FROM recordatorio_cursores WHERE fuente = 'vencimiento_upp';
+    _desde := COALESCE(_desde, _hasta);
+    _ventana := GREATEST(COALESCE(_ventana, CURRENT_DATE - 1), CURRENT_DATE - 1);
+
+    INSERT INTO notificaciones (usuario_id, tipo, referencia_id, clave, titulo, mensaje, datos)
+    SELECT i.usuario_id, 'vencimiento_upp', i.id,
+           concat_ws(':', 'vencimiento_upp', i.id, i.fecha_vencimiento),
+           'Licencia por vencer',
+           format('La licencia %s de %s (%s) vence el %s', i.facility_type, i.nombre, i.license_number, i.fecha_vencimiento),
+           jsonb_build_object('instalacion_id', i.id, 'nombre', i.nombre, 'facility_type', i.facility_type,
+                              'license_number', i.license_number, 'fecha_vencimiento', i.fecha_vencimiento)
+    FROM instalaciones i
+    WHERE i.id IN (
+            SELECT id FROM instalaciones
+            WHERE fecha_vencimiento > _ventana AND fecha_vencimiento <= CURRENT_DATE + _dias_vencimiento
+            UNION
+            SELECT id FROM instalaciones
+            WHERE updated_at > _desde AND updated_at <= _hasta
+          )
+      AND i.fecha_vencimiento BETWEEN CURRENT_DATE AND CURRENT_DATE + _dias_vencimiento
+      AND i.facility_type IN ('UPP', 'PSG')
+      AND i.active
+    ON CONFLICT (clave) DO NOTHING;
+    GET DIAGNOSTICS _n = ROW_COUNT;
+    _total := _total + _n;
+
+    INSERT INTO recordatorio_cursores (fuente, procesado_hasta, ventana_hasta)
+    VALUES ('vencimiento_upp', _hasta, GREATEST(_ventana, CURRENT_DATE + _dias_vencimiento))
+    ON CONFLICT (fuente) DO UPDATE
+        SET procesado_hasta = EXCLUDED.procesado_hasta, ventana_hasta = EXCLUDED.ventana_hasta;
+
+    -- 3. New renewal requests waiting for review (to every administrator)
+    SELECT procesado_hasta INTO _desde FROM recordatorio_cursores WHERE fuente = 'renovacion_pendiente';
+    _desde := COALESCE(_desde, '-infinity'); -- first run: every renewal still pending
+
+    INSERT INTO notificaciones (usuario_id, tipo, referencia_id, clave, titulo, mensaje, datos)
+    SELECT u.id, 'renovacion_pendiente', r.id,
+           concat_ws(':', 'renovacion_pendiente', r.id, u.id),
+           'Renovación por revisar',
+           format('%s solicitó renovar la licencia de %s (%s)', s.curp, i.nombre, i.license_number),
+           jsonb_build_object('renovacion_id', r.id, 'instalacion_id', i.id, 'nombre', i.nombre,
+                              'solicitada_por', r.solicitada_por, 'fecha_solicitud', r.fecha_solicitud)
+    FROM renovaciones_upp r
+    JOIN instalaciones i ON i.id = r.instalacion_id
+    JOIN usuarios s ON s.id = r.solicitada_por
+    CROSS JOIN usuarios u
+    WHERE r.estado = 'pendiente'
+      AND r.fecha_solicitud > _desde AND r.fecha_solicitud <= _hasta
+      AND u.rol IN ('administrador', 'superadministrador')
+    ON CONFLICT (clave) DO NOTHING;
+    GET DIAGNOSTICS _n = ROW_COUNT;
+    _total := _total + _n;
+
+    INSERT INTO recordatorio_cursores (fuente, procesado_hasta) VALUES ('renovacion_pendiente', _hasta)
+    ON CONFLICT (fuente) DO UPDATE SET procesado_hasta = EXCLUDED.procesado_hasta;
+
+    -- 4. Rejected documents (to the document owner)
+    SELECT procesado_hasta INTO _desde FROM recordatorio_cursores WHERE fuente = 'documento_rechazado';
+    _desde := COALESCE(_desde, _hasta); -- past rejections are not announced on the first run
+
+    INSERT INTO notificaciones (usuario_id, tipo, referencia_id, clave, titulo, mensaje, datos)
+    SELECT d.usuario_id, 'documento_rechazado', d.id,
+           concat_ws(':', 'documento_rechazado', r.id),
+           'Documento rechazado',
+           format('Tu documento %s fue rechazado%s', COALESCE(d.original_filename, d.doc_type::TEXT), ': ' || r.comentario),
+           jsonb_build_object('documento_id', d.id, 'doc_type', d.doc_type, 'revision_id', r.id,
+                              'comentario', r.comentario, 'fecha', r.fecha)
+    FROM documento_revisiones r
+    JOIN documentos d ON d.id = r.documento_id
+    WHERE r.status = 'rechazado'
+      AND r.fecha > _desde AND r.fecha <= _hasta
+      AND d.usuario_id IS NOT NULL
+    ON CONFLICT (clave) DO NOTHING;
+    GET DIAGNOSTICS _n = ROW_COUNT;
+    _total := _total + _n;
+
+    INSERT INTO recordatorio_cursores (fuente, procesado_hasta) VALUES ('documento_rechazado', _hasta)
+    ON CONFLICT (fuente) DO UPDATE SET procesado_hasta = EXCLUDED.procesado_hasta;
+
+    RETURN _total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Deletes at most _limite delivered or failed notifications older than _retencion
+CREATE OR REPLACE FUNCTION purgar_notificaciones(_retencion INTERVAL, _limite INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    _borrados INTEGER;
+BEGIN
+    DELETE FROM notificaciones
+    WHERE id IN (
+        SELECT id FROM notificaciones
+        WHERE estado <> 'pendiente' AND creado_en < NOW() - _retencion
+        LIMIT _limite
+        FOR UPDATE SKIP LOCKED
+    );
+    GET DIAGNOSTICS _borrados = ROW_COUNT;
+    RETURN _borrados;
+END;
+$$ LANGUAGE plpgsql;
+
+-- I. Event Partitions
+-- Tables partitioned by month on the event date. Partitions are named
+-- <table>_YYYY_MM (bounds in UTC) plus a <table>_default safety net.
+-- Detail tables come first so archival can detach them before eventos.
+CREATE OR REPLACE FUNCTION tablas_particionadas_eventos()
+RETURNS TEXT[] AS $$
+    SELECT ARRAY['dietas', 'pesos', 'vacunaciones', 'desparasitaciones', 'laboratorios', 'compraventas', 'traslado', 'eventos'];
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Creates the missing monthly partitions between _desde and _hasta (and the
+-- default partitions). A month that already has rows in eventos_default is
+-- skipped with a warning, since PostgreSQL cannot carve it out of the default
+-- partition. Returns how many partitions were created.
+CREATE OR REPLACE FUNCTION crear_particiones_eventos(_desde DATE, _hasta DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    _mes DATE := date_trunc('month', _desde);
+    _inicio TIMESTAMPTZ;
+    _fin TIMESTAMPTZ;
+    _tabla TEXT;
+    _creadas INTEGER := 0;
+BEGIN
+    -- Several API workers run this at startup
+    PERFORM pg_advisory_xact_lock(hashtext('crear_particiones_eventos'));
+
+    FOREACH _tabla IN ARRAY tablas_particionadas_eventos() LOOP
+        IF to_regclass(_tabla || '_default') IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', _tabla || '_default', _tabla);
+            _creadas := _creadas + 1;
+        END IF;
+    END LOOP;
+
+    WHILE _mes <= _hasta LOOP
+        _inicio := _mes::TIMESTAMP AT TIME ZONE 'UTC';
+        _fin := (_mes + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC';
+        IF EXISTS (SELECT 1 FROM eventos_default WHERE fecha >= _inicio AND fecha < _fin) THEN
+            RAISE WARNING 'eventos_default has rows for %, partition not created', to_char(_mes, 'YYYY-MM');
+        ELSE
+            FOREACH _tabla IN ARRAY tablas_particionadas_eventos() LOOP
+                CONTINUE WHEN to_regclass(_tabla || to_char(_mes, '_YYYY_MM')) IS NOT NULL;
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               _tabla || to_char(_mes, '_YYYY_MM'), _tabla, _inicio, _fin);
+                _creadas := _creadas + 1;
+            END LOOP;
+        END IF;
+        _mes := _mes + INTERVAL '1 month';
+    END LOOP;
+
+    RETURN _creadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detaches one month of eventos and its detail tables for archival (dump and
+-- drop the returned tables afterwards). The detached detail partitions lose
+-- their foreign key to eventos. The non-partitioned rows of that month that
+-- reference eventos (enfermedades, tratamientos, remisiones, campana_bovinos)
+-- are moved with it into <tabla>_YYYY_MM tables, also returned. Raises
+-- before changing anything when a disease case of the month still has
+-- treatments or remissions in other months, or a campaign with applications
+-- in the month is not cerrada, naming the tables and counts.
+CREATE OR REPLACE FUNCTION archivar_particion_eventos(_mes DATE)
+RETURNS TEXT[] AS $$
+DECLARE
+    _inicio TIMESTAMPTZ := date_trunc('month', _mes)::TIMESTAMP AT TIME ZONE 'UTC';
+    _fin TIMESTAMPTZ := (date_trunc('month', _mes) + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC';
+    _tabla TEXT;
+    _particion TEXT;
+    _fk TEXT;
+    _filas BIGINT;
+    _bloqueos TEXT[] := '{}';
+    _archivadas TEXT[] := '{}';
+BEGIN
+    -- Cases opened this month and followed up later cannot be split
+    FOREACH _tabla IN ARRAY ARRAY['tratamientos', 'remisiones'] LOOP
+        EXECUTE format(
+            'SELECT count(*) FROM %I d JOIN enfermedades en ON en.id = d.enfermedad_id
+             WHERE en.evento_fecha >= $1 AND en.evento_fecha < $2
+               AND (d.evento_fecha < $1 OR d.evento_fecha >= $2)', _tabla
+        ) INTO _filas USING _inicio, _fin;
+        IF _filas > 0 THEN
+            _bloqueos := _bloqueos || format('%s in other months (%s)', _tabla, _filas);
+        END IF;
+    END LOOP;
+    -- Without its links an open campaign would count those bovinos as pending
+    -- again (campana_pendientes) and apply them twice
+    SELECT count(*) INTO _filas
+    FROM campana_bovinos cb JOIN campanas c ON c.id = cb.campana_id
+    WHERE cb.evento_fecha >= _inicio AND cb.evento_fecha < _fin AND c.estado <> 'cerrada';
+    IF _filas > 0 THEN
+        _bloqueos := _bloqueos || format('campana_bovinos of campaigns not cerrada (%s)', _filas);
+    END IF;
+    IF cardinality(_bloqueos) > 0 THEN
+        RAISE EXCEPTION 'Cannot archive %: rows still in use: %',
+            to_char(_mes, 'YYYY-MM'), array_to_string(_bloqueos, ', ');
+    END IF;
+
+    -- Dependants first: tratamientos and remisiones reference enfermedades
+    FOREACH _tabla IN ARRAY ARRAY['tratamientos', 'remisiones', 'enfermedades', 'campana_bovinos'] LOOP
+        _particion := _tabla || to_char(_mes, '_YYYY_MM');
+        EXECUTE format('SELECT count(*) FROM %I WHERE evento_fecha >= $1 AND evento_fecha < $2', _tabla)
+            INTO _filas USING _inicio, _fin;
+        CONTINUE WHEN _filas = 0;
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I (LIKE %I)', _particion, _tabla);
+        EXECUTE format('INSERT INTO %I SELECT * FROM %I WHERE evento_fecha >= $1 AND evento_fecha < $2', _particion, _tabla)
+            USING _inicio, _fin;
+        EXECUTE format('DELETE FROM %I WHERE evento_fecha >= $1 AND evento_fecha < $2', _tabla)
+            USING _inicio, _fin;
+        _archivadas := _archivadas || _particion;
+    END LOOP;
+
+    FOREACH _tabla IN ARRAY tablas_particionadas_eventos() LOOP
+        _particion := _tabla || to_char(_mes, '_YYYY_MM');
+        CONTINUE WHEN to_regclass(_particion) IS NULL;
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', _tabla, _particion);
+        FOR _fk IN
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = _particion::REGCLASS AND contype = 'f' AND confrelid = 'eventos'::REGCLASS
+        LOOP
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', _particion, _fk);
+        END LOOP;
+        _archivadas := _archivadas || _particion;
+    END LOOP;
+    RETURN _archivadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- J. Bovino Summary
+-- Rebuilds the summary rows of some bovinos from their history. Used by the
+-- backfill and when events are updated or deleted; inserts only upsert the
+-- new rows. Movilización tables are created by the API (create_all), so
+-- that part is skipped until they exist.
+CREATE OR REPLACE FUNCTION refrescar_bovino_resumen(_bovino_ids UUID[])
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO bovino_resumen (bovino_id, ultimo_peso, ultimo_peso_fecha, ultima_vacunacion_tipo, ultima_vacunacion_fecha,
+                                proxima_vacunacion, enfermedades_abiertas, enfermedad_abierta_tipo, enfermedad_abierta_fecha,
+                                propietario_desde)
+    SELECT b.id, p.peso_nuevo, p.fecha, v.tipo, v.fecha, a.fecha_prox,
+           COALESCE(enf.abiertas, 0), enf.tipo, enf.fecha, NULLIF(lower(bp.periodo), '-infinity')
+    FROM bovinos b
+    LEFT JOIN LATERAL (
+        SELECT p.peso_nuevo, e.fecha
+        FROM eventos e JOIN pesos p ON p.evento_id = e.id AND p.evento_fecha = e.fecha
+        WHERE e.bovino_id = b.id
+        ORDER BY e.fecha DESC, e.id DESC LIMIT 1
+    ) p ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT v.tipo, e.fecha
+        FROM eventos e JOIN vacunaciones v ON v.evento_id = e.id AND v.evento_fecha = e.fecha
+        WHERE e.bovino_id = b.id
+        ORDER BY e.fecha DESC, e.id DESC LIMIT 1
+    ) v ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT MIN(fecha_prox) AS fecha_prox FROM agenda_sanitaria
+        WHERE bovino_id = b.id AND tipo = 'vacunacion'
+    ) a ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT COUNT(*) OVER () AS abiertas, en.tipo, e.fecha
+        FROM eventos e JOIN enfermedades en ON en.evento_id = e.id AND en.evento_fecha = e.fecha
+        WHERE e.bovino_id = b.id
+          AND NOT EXISTS (SELECT 1 FROM remisiones r WHERE r.enfermedad_id = en.id)
+        ORDER BY e.fecha DESC, e.id DESC LIMIT 1
+    ) enf ON TRUE
+    LEFT JOIN bovino_propiedad bp ON bp.bovino_id = b.id AND upper_inf(bp.periodo)
+    WHERE b.id = ANY(_bovino_ids)
+    ON CONFLICT (bovino_id) DO UPDATE
+        SET ultimo_peso = EXCLUDED.ultimo_peso, ultimo_peso_fecha = EXCLUDED.ultimo_peso_fecha,
+            ultima_vacunacion_tipo = EXCLUDED.ultima_vacunacion_tipo, ultima_vacunacion_fecha = EXCLUDED.ultima_vacunacion_fecha,
+            proxima_vacunacion = EXCLUDED.proxima_vacunacion, enfermedades_abiertas = EXCLUDED.enfermedades_abiertas,
+            enfermedad_abierta_tipo = EXCLUDED.enfermedad_abierta_tipo, enfermedad_abierta_fecha = EXCLUDED.enfermedad_abierta_fecha,
+            propietario_desde = EXCLUDED.propietario_desde, actualizado_en = NOW();
+
+    IF to_regclass('movilizacion_bovinos') IS NOT NULL THEN
+        UPDATE bovino_resumen r
+        SET ultima_movilizacion_id = m.id, ultima_movilizacion_estado = m.estado,
+            ultima_movilizacion_fecha = m.fecha_solicitud, actualizado_en = NOW()
+        FROM unnest(_bovino_ids) AS b(id)
+        LEFT JOIN LATERAL (
+            SELECT m.id, m.estado::TEXT AS estado, m.fecha_solicitud
+            FROM movilizacion_bovinos mb JOIN movilizaciones m ON m.id = mb.movilizacion_id
+            WHERE mb.bovino_id = b.id
+            ORDER BY m.fecha_solicitud DESC, m.id DESC LIMIT 1
+        ) m ON TRUE
+        WHERE r.bovino_id = b.id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New bovinos start with an empty summary
+CREATE OR REPLACE FUNCTION resumen_bovinos_nuevos()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO bovino_resumen (bovino_id)
+    SELECT id FROM nuevos
+    ON CONFLICT (bovino_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New weights: the latest inserted weight per bovino, unless the summary
+-- already holds a later one (e.g. an older weighing synced late)
+CREATE OR REPLACE FUNCTION resumen_pesos_insertados()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO bovino_resumen (bovino_id, ultimo_peso, ultimo_peso_fecha)
+    SELECT DISTINCT ON (e.bovino_id) e.bovino_id, n.peso_nuevo, e.fecha
+    FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+    ORDER BY e.bovino_id, e.fecha DESC, e.id DESC
+    ON CONFLICT (bovino_id) DO UPDATE
+        SET ultimo_peso = EXCLUDED.ultimo_peso, ultimo_peso_fecha = EXCLUDED.ultimo_peso_fecha, actualizado_en = NOW()
+        WHERE bovino_resumen.ultimo_peso_fecha IS NULL OR EXCLUDED.ultimo_peso_fecha >= bovino_resumen.ultimo_peso_fecha;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New vaccinations: latest dose as above, and the next booster from the
+-- agenda (triggers fire in name order, so trg_vacunaciones_agenda_insert
+-- has already updated it)
+CREATE OR REPLACE FUNCTION resumen_vacunaciones_insertadas()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO bovino_resumen (bovino_id, ultima_vacunacion_tipo, ultima_vacunacion_fecha)
+    SELECT DISTINCT ON (e.bovino_id) e.bovino_id, n.tipo, e.fecha
+    FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+    ORDER BY e.bovino_id, e.fecha DESC, e.id DESC
+    ON CONFLICT (bovino_id) DO UPDATE
+        SET ultima_vacunacion_tipo = EXCLUDED.ultima_vacunacion_tipo,
+            ultima_vacunacion_fecha = EXCLUDED.ultima_vacunacion_fecha, actualizado_en = NOW()
+        WHERE bovino_resumen.ultima_vacunacion_fecha IS NULL
+           OR EXCLUDED.ultima_vacunacion_fecha >= bovino_resumen.ultima_vacunacion_fecha;
+
+    UPDATE bovino_resumen r
+    SET proxima_vacunacion = (SELECT MIN(a.fecha_prox) FROM agenda_sanitaria a
+                              WHERE a.bovino_id = r.bovino_id AND a.tipo = 'vacunacion')
+    WHERE r.bovino_id IN (SELECT e.bovino_id FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updated or deleted detail rows, and any change to enfermedades/remisiones:
+-- rebuild the bovinos they belong to. The transition table is named filas
+-- for both NEW (insert/update) and OLD (delete) rows.
+CREATE OR REPLACE FUNCTION resumen_detalles_cambiados()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refrescar_bovino_resumen(ARRAY(
+        SELECT DISTINCT e.bovino_id FROM filas f JOIN eventos e ON e.id = f.evento_id AND e.fecha = f.evento_fecha
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Deleted eventos: their detail rows are gone by now (the cascades run as
+-- row triggers, before statement triggers)
+CREATE OR REPLACE FUNCTION resumen_eventos_borrados()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refrescar_bovino_resumen(ARRAY(SELECT DISTINCT bovino_id FROM viejos WHERE bovino_id IS NOT NULL));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New open ownership periods (sales, owner changes)
+CREATE OR REPLACE FUNCTION resumen_propiedad_insertada()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO bovino_resumen (bovino_id, propietario_desde)
+    SELECT bovino_id, NULLIF(lower(periodo), '-infinity') FROM nuevos
+    WHERE upper_inf(periodo)
+    ON CONFLICT (bovino_id) DO UPDATE
+        SET propietario_desde = EXCLUDED.propietario_desde, actualizado_en = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Movilizaciones (triggers created with the tables, see models.py): a new
+-- request becomes the bovinos' last one; state changes update it in place
+CREATE OR REPLACE FUNCTION resumen_movilizacion_bovinos()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO bovino_resumen (bovino_id, ultima_movilizacion_id, ultima_movilizacion_estado, ultima_movilizacion_fecha)
+        SELECT DISTINCT ON (n.bovino_id) n.bovino_id, m.id, m.estado::TEXT, m.fecha_solicitud
+        FROM filas n JOIN movilizaciones m ON m.id = n.movilizacion_id
+        ORDER BY n.bovino_id, m.fecha_solicitud DESC, m.id DESC
+        ON CONFLICT (bovino_id) DO UPDATE
+            SET ultima_movilizacion_id = EXCLUDED.ultima_movilizacion_id,
+                ultima_movilizacion_estado = EXCLUDED.ultima_movilizacion_estado,
+                ultima_movilizacion_fecha = EXCLUDED.ultima_movilizacion_fecha, actualizado_en = NOW()
+            WHERE bovino_resumen.ultima_movilizacion_fecha IS NULL
+               OR EXCLUDED.ultima_movilizacion_fecha >= bovino_resumen.ultima_movilizacion_fecha;
+    ELSE
+        PERFORM refrescar_bovino_resumen(ARRAY(SELECT DISTINCT bovino_id FROM filas));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION resumen_movilizaciones_actualizadas()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE bovino_resumen r
+    SET ultima_movilizacion_estado = n.estado::TEXT, actualizado_en = NOW()
+    FROM nuevos n
+    WHERE r.ultima_movilizacion_id = n.id AND r.ultima_movilizacion_estado IS DISTINCT FROM n.estado::TEXT;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_bovinos_resumen_insert AFTER INSERT ON bovinos
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION resumen_bovinos_nuevos();
+CREATE TRIGGER trg_eventos_resumen_delete AFTER DELETE ON eventos
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION resumen_eventos_borrados();
+CREATE TRIGGER trg_bovino_propiedad_resumen AFTER INSERT ON bovino_propiedad
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION resumen_propiedad_insertada();
+
+CREATE TRIGGER trg_pesos_resumen_insert AFTER INSERT ON pesos
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION resumen_pesos_insertados();
+CREATE TRIGGER trg_pesos_resumen_update AFTER UPDATE ON pesos
+REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+CREATE TRIGGER trg_pesos_resumen_delete AFTER DELETE ON pesos
+REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+
+CREATE TRIGGER trg_vacunaciones_resumen_insert AFTER INSERT ON vacunaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION resumen_vacunaciones_insertadas();
+CREATE TRIGGER trg_vacunaciones_resumen_update AFTER UPDATE ON vacunaciones
+REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+CREATE TRIGGER trg_vacunaciones_resumen_delete AFTER DELETE ON vacunaciones
+REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+
+CREATE TRIGGER trg_enfermedades_resumen_insert AFTER INSERT ON enfermedades
+REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+CREATE TRIGGER trg_enfermedades_resumen_delete AFTER DELETE ON enfermedades
+REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+CREATE TRIGGER trg_remisiones_resumen_insert AFTER INSERT ON remisiones
+REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+CREATE TRIGGER trg_remisiones_resumen_delete AFTER DELETE ON remisiones
+REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+
+-- C. Document Review Automation
+-- Syncs documentos.authored with the latest revision inserted per document
+CREATE OR REPLACE FUNCTION sync_documento_authored()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE documentos d
+    SET authored = (r.status = 'aprobado')
+    FROM (
+        SELECT DISTINCT ON (documento_id) documento_id, status
+        FROM nuevos
+        ORDER BY documento_id, fecha DESC
+    ) r
+    WHERE d.id = r.documento_id
+      AND d.authored IS DISTINCT FROM (r.status = 'aprobado');
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trg_sync_authored
 AFTER INSERT ON documento_revisiones
-FOR EACH ROW
+REFERENCING NEW TABLE AS nuevos
+FOR EACH STATEMENT
 EXECUTE FUNCTION sync_documento_authored();
 
 
 -- A. Weight Automation
--- Automatically updates the cow's current weight when a 'peso' event is added
+-- Sets each bovino's current weight to its latest weighing when 'peso'
+-- events are added: one UPDATE per statement, and an older weighing (e.g.
+-- synced late from an offline device) never replaces a newer one
 CREATE OR REPLACE FUNCTION update_cow_current_weight()
 RETURNS TRIGGER AS $$
 BEGIN
-    UPDATE bovinos
-    SET peso_actual = NEW.peso_nuevo
-    FROM eventos
-    WHERE bovinos.id = eventos.bovino_id
-    AND eventos.id = NEW.evento_id;
-
-    RETURN NEW;
+    UPDATE bovinos b
+    SET peso_actual = u.peso_nuevo
+    FROM (
+        SELECT DISTINCT ON (e.bovino_id) e.bovino_id, e.fecha, n.peso_nuevo
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        ORDER BY e.bovino_id, e.fecha DESC, e.id DESC
+    ) u
+    WHERE b.id = u.bovino_id
+      AND b.peso_actual IS DISTINCT FROM u.peso_nuevo
+      AND NOT EXISTS (
+          SELECT 1 FROM eventos e JOIN pesos p ON p.evento_id = e.id AND p.evento_fecha = e.fecha
+          WHERE e.bovino_id = u.bovino_id AND e.fecha > u.fecha
+      );
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trg_auto_update_weight
 AFTER INSERT ON pesos
-FOR EACH ROW
+REFERENCING NEW TABLE AS nuevos
+FOR EACH STATEMENT
 EXECUTE FUNCTION update_cow_current_weight();
 
 
 -- B. Transfer Ownership Automation (NEW)
--- Automatically changes owner and clears location when a 'compraventa' event is added
+-- Ownership periods (bovino_propiedad): closes each bovino's open period at
+-- _desde and opens one for its new owner (a NULL owner only closes it).
+-- Transfers to the current owner, or dated before the open period started
+-- (a sale synced late from an offline device), leave the history as is.
+-- Returns the ids of the bovinos whose history changed, so callers apply the
+-- owner change only to those.
+CREATE OR REPLACE FUNCTION registrar_propiedad(
+    _bovino_ids UUID[],
+    _usuario_ids UUID[],
+    _desde TIMESTAMPTZ[],
+    _evento_ids UUID[] DEFAULT NULL
+) RETURNS UUID[] AS $$
+DECLARE
+    _b UUID[];
+    _u UUID[];
+    _d TIMESTAMPTZ[];
+    _e UUID[];
+    _abiertos BIGINT[];
+BEGIN
+    SELECT array_agg(c.bovino_id), array_agg(c.usuario_id), array_agg(c.desde), array_agg(c.evento_id), array_agg(p.id)
+    INTO _b, _u, _d, _e, _abiertos
+    FROM (
+        SELECT DISTINCT ON (x.bovino_id) x.*
+        FROM unnest(_bovino_ids, _usuario_ids, _desde, COALESCE(_evento_ids, ARRAY[]::UUID[]))
+             AS x(bovino_id, usuario_id, desde, evento_id)
+        WHERE x.bovino_id IS NOT NULL
+        ORDER BY x.bovino_id, x.desde DESC
+    ) c
+    LEFT JOIN bovino_propiedad p ON p.bovino_id = c.bovino_id AND upper_inf(p.periodo)
+    WHERE p.id IS NULL
+       OR (p.usuario_id IS DISTINCT FROM c.usuario_id AND lower(p.periodo) < c.desde);
+
+    -- Close first: the new period would overlap the open one
+    UPDATE bovino_propiedad p
+    SET periodo = tstzrange(lower(p.periodo), x.desde)
+    FROM unnest(_abiertos, _d) AS x(id, desde)
+    WHERE p.id = x.id;
+
+    INSERT INTO bovino_propiedad (bovino_id, usuario_id, periodo, evento_id)
+    SELECT x.bovino_id, x.usuario_id, tstzrange(x.desde, NULL), x.evento_id
+    FROM unnest(_b, _u, _d, _e) AS x(bovino_id, usuario_id, desde, evento_id)
+    WHERE x.usuario_id IS NOT NULL;
+
+    RETURN COALESCE(_b, ARRAY[]::UUID[]);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Keeps the buyer/seller ids and CURPs of a compraventa in step, whichever
+-- of the two the insert provides, so reports join on the UUID keys.
+CREATE OR REPLACE FUNCTION compraventa_usuarios()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.comprador_id IS NULL THEN
+        SELECT id INTO NEW.comprador_id FROM usuarios WHERE curp = NEW.comprador_curp;
+    ELSIF NEW.comprador_curp IS NULL THEN
+        SELECT curp INTO NEW.comprador_curp FROM usuarios WHERE id = NEW.comprador_id;
+    END IF;
+    IF NEW.vendedor_id IS NULL THEN
+        SELECT id INTO NEW.vendedor_id FROM usuarios WHERE curp = NEW.vendedor_curp;
+    ELSIF NEW.vendedor_curp IS NULL THEN
+        SELECT curp INTO NEW.vendedor_curp FROM usuarios WHERE id = NEW.vendedor_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_compraventa_usuarios
+BEFORE INSERT ON compraventas
+FOR EACH ROW
+EXECUTE FUNCTION compraventa_usuarios();
+
+-- Automatically changes owner and clears location when 'compraventa' events
+-- are added (the latest sale per bovino when a statement has several).
+-- The new ownership period starts at the sale's date. Sales that
+-- registrar_propiedad leaves out (older than the current owner's period,
+-- e.g. synced late, or to the current owner) do not touch the bovino.
 CREATE OR REPLACE FUNCTION handle_compraventa_transfer()
 RETURNS TRIGGER AS $$
 DECLARE
-    _comprador_id UUID;
+    _bovino_ids UUID[];
+    _comprador_ids UUID[];
+    _fechas TIMESTAMPTZ[];
+    _evento_ids UUID[];
+    _aplicados UUID[];
 BEGIN
-    -- Convert comprador CURP to UUID
-    SELECT id INTO _comprador_id FROM usuarios WHERE curp = NEW.comprador_curp;
-
-    -- Update the cow linked to this event:
-    -- 1. Set new owner (comprador_id from CURP)
-    -- 2. Clear the location (predio_id) so the new owner can assign one later
-    UPDATE bovinos
+    SELECT array_agg(bovino_id), array_agg(comprador_id), array_agg(evento_fecha), array_agg(evento_id)
+    INTO _bovino_ids, _comprador_ids, _fechas, _evento_ids
+    FROM (
+        SELECT DISTINCT ON (e.bovino_id) e.bovino_id, n.comprador_id, n.evento_fecha, n.evento_id
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        ORDER BY e.bovino_id, n.evento_fecha DESC, n.evento_id DESC
+    ) v;
+
+    -- Lock the bovinos so concurrent sales of them record their periods one at a time
+    PERFORM 1 FROM bovinos WHERE id = ANY(_bovino_ids) ORDER BY id FOR UPDATE;
+    _aplicados := registrar_propiedad(_bovino_ids, _comprador_ids, _fechas, _evento_ids);
+
+    -- Update the cows whose sale was recorded:
+    -- 1. Set new owner (comprador_id)
+    -- 2. Clear the location (instalacion_id) so the new owner can assign one later
+    UPDATE bovinos b
     SET
-        usuario_id = _comprador_id,
-        predio_id = NULL
-    FROM eventos
-    WHERE bovinos.id = eventos.bovino_id
-    AND eventos.id = NEW.evento_id;
+        usuario_id = v.comprador_id,
+        instalacion_id = NULL
+    FROM unnest(_bovino_ids, _comprador_ids) AS v(bovino_id, comprador_id)
+    WHERE b.id = v.bovino_id AND v.bovino_id = ANY(_aplicados);
 
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trg_transfer_ownership
 AFTER INSERT ON compraventas
-FOR EACH ROW
+REFERENCING NEW TABLE AS nuevos
+FOR EACH STATEMENT
 EXECUTE FUNCTION handle_compraventa_transfer();
 
+-- New bovinos open their first owner's period; owner changes made outside
+-- compraventas (movilización completion, admin edits) are recorded as of now.
+-- Changes already recorded by handle_compraventa_transfer are no-ops here.
+CREATE OR REPLACE FUNCTION propiedad_bovinos_nuevos()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM registrar_propiedad(array_agg(id), array_agg(usuario_id), array_agg('-infinity'::TIMESTAMPTZ))
+    FROM nuevos WHERE usuario_id IS NOT NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_bovinos_propiedad_insert AFTER INSERT ON bovinos
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION propiedad_bovinos_nuevos();
+
+CREATE OR REPLACE FUNCTION propiedad_cambio_propietario()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM registrar_propiedad(array_agg(n.id), array_agg(n.usuario_id), array_agg(NOW()))
+    FROM viejos v
+    JOIN nuevos n ON n.id = v.id
+    WHERE v.usuario_id IS DISTINCT FROM n.usuario_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_bovinos_propiedad_update AFTER UPDATE ON bovinos
+REFERENCING OLD TABLE AS viejos NEW TABLE AS nuevos
+FOR EACH STATEMENT EXECUTE FUNCTION propiedad_cambio_propietario();
+
 CREATE OR REPLACE FUNCTION registrar_usuario_nuevo(
     -- 1. Login Credentials
     _curp VARCHAR,
@@ -478,16 +1722,20 @@ $$ LANGUAGE plpgsql;
 -- ==============================================================================
 -- 1. PRODUCTION EVENTS (Weights, Diets)
 -- ==============================================================================
+-- The registrar_* functions used by the API return the new evento row together
+-- with its detail columns, so the caller can answer without reading it back.
 
 -- A. Register Weight (Auto-updates cow weight via Trigger)
 CREATE OR REPLACE FUNCTION registrar_peso(
     _bovino_id UUID,
     _peso_nuevo DECIMAL,
     _fecha TIMESTAMPTZ DEFAULT NOW(),
-    _observaciones TEXT DEFAULT ''
-) RETURNS UUID AS $$
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT peso_actual DECIMAL, OUT peso_nuevo DECIMAL
+) AS $$
+#variable_conflict use_column
 DECLARE
-    _evento_id UUID;
     _peso_anterior DECIMAL;
 BEGIN
     -- 1. Get current weight for history
@@ -495,14 +1743,15 @@ BEGIN
 
     -- 2. Create Event
     INSERT INTO eventos (bovino_id, fecha, observaciones)
-    VALUES (_bovino_id, _fecha, _observaciones)
-    RETURNING id INTO _evento_id;
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
 
     -- 3. Create Detail
-    INSERT INTO pesos (evento_id, peso_actual, peso_nuevo)
-    VALUES (_evento_id, COALESCE(_peso_anterior, 0), _peso_nuevo);
-
-    RETURN _evento_id;
+    INSERT INTO pesos (evento_id, evento_fecha, peso_actual, peso_nuevo)
+    VALUES (id, fecha, COALESCE(_peso_anterior, 0), _peso_nuevo)
+    RETURNING pesos.peso_actual, pesos.peso_nuevo
+    INTO peso_actual, peso_nuevo;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -512,19 +1761,21 @@ CREATE OR REPLACE FUNCTION registrar_dieta(
     _bovino_id UUID,
     _alimento VARCHAR,
     _fecha TIMESTAMPTZ DEFAULT NOW(),
-    _observaciones TEXT DEFAULT ''
-) RETURNS UUID AS $$
-DECLARE
-    _evento_id UUID;
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT alimento VARCHAR
+) AS $$
+#variable_conflict use_column
 BEGIN
     INSERT INTO eventos (bovino_id, fecha, observaciones)
-    VALUES (_bovino_id, _fecha, _observaciones)
-    RETURNING id INTO _evento_id;
-
-    INSERT INTO dietas (evento_id, alimento)
-    VALUES (_evento_id, _alimento);
-
-    RETURN _evento_id;
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO dietas (evento_id, evento_fecha, alimento)
+    VALUES (id, fecha, _alimento)
+    RETURNING dietas.alimento
+    INTO alimento;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -542,10 +1793,13 @@ CREATE OR REPLACE FUNCTION registrar_vacunacion(
     _laboratorio VARCHAR,
     _fecha_prox DATE,
     _fecha TIMESTAMPTZ DEFAULT NOW(),
-    _observaciones TEXT DEFAULT ''
-) RETURNS UUID AS $$
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT veterinario_id UUID, OUT tipo VARCHAR, OUT tipo_id INTEGER, OUT lote VARCHAR,
+    OUT laboratorio VARCHAR, OUT laboratorio_id INTEGER, OUT fecha_prox DATE
+) AS $$
+#variable_conflict use_column
 DECLARE
-    _evento_id UUID;
     _vet_id UUID;
 BEGIN
     SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
@@ -554,13 +1808,15 @@ BEGIN
     END IF;
 
     INSERT INTO eventos (bovino_id, fecha, observaciones)
-    VALUES (_bovino_id, _fecha, _observaciones)
-    RETURNING id INTO _evento_id;
-
-    INSERT INTO vacunaciones (evento_id, veterinario_id, tipo, lote, laboratorio, fecha_prox)
-    VALUES (_evento_id, _vet_id, _tipo, _lote, _laboratorio, _fecha_prox);
-
-    RETURN _evento_id;
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO vacunaciones (evento_id, evento_fecha, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+    VALUES (id, fecha, _vet_id, _tipo, resolver_catalogo('vacuna', _tipo), _lote,
+            _laboratorio, resolver_catalogo('laboratorio', _laboratorio), _fecha_prox)
+    RETURNING vacunaciones.veterinario_id, vacunaciones.tipo, vacunaciones.tipo_id, vacunaciones.lote, vacunaciones.laboratorio, vacunaciones.laboratorio_id, vacunaciones.fecha_prox
+    INTO veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -573,10 +1829,13 @@ CREATE OR REPLACE FUNCTION registrar_desparasitacion(
     _dosis VARCHAR,
     _fecha_prox DATE,
     _fecha TIMESTAMPTZ DEFAULT NOW(),
-    _observaciones TEXT DEFAULT ''
-) RETURNS UUID AS $$
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT veterinario_id UUID, OUT medicamento VARCHAR, OUT medicamento_id INTEGER,
+    OUT dosis_admin VARCHAR, OUT fecha_prox DATE
+) AS $$
+#variable_conflict use_column
 DECLARE
-    _evento_id UUID;
     _vet_id UUID;
 BEGIN
     SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
@@ -585,13 +1844,14 @@ BEGIN
     END IF;
 
     INSERT INTO eventos (bovino_id, fecha, observaciones)
-    VALUES (_bovino_id, _fecha, _observaciones)
-    RETURNING id INTO _evento_id;
-
-    INSERT INTO desparasitaciones (evento_id, veterinario_id, medicamento, dosis_admin, fecha_prox)
-    VALUES (_evento_id, _vet_id, _medicamento, _dosis, _fecha_prox);
-
-    RETURN _evento_id;
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO desparasitaciones (evento_id, evento_fecha, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+    VALUES (id, fecha, _vet_id, _medicamento, resolver_catalogo('medicamento', _medicamento), _dosis, _fecha_prox)
+    RETURNING desparasitaciones.veterinario_id, desparasitaciones.medicamento, desparasitaciones.medicamento_id, desparasitaciones.dosis_admin, desparasitaciones.fecha_prox
+    INTO veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -603,10 +1863,12 @@ CREATE OR REPLACE FUNCTION registrar_laboratorio(
     _tipo VARCHAR, -- e.g. "Sangre"
     _resultado TEXT,
     _fecha TIMESTAMPTZ DEFAULT NOW(),
-    _observaciones TEXT DEFAULT ''
-) RETURNS UUID AS $$
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT veterinario_id UUID, OUT tipo VARCHAR, OUT resultado TEXT
+) AS $$
+#variable_conflict use_column
 DECLARE
-    _evento_id UUID;
     _vet_id UUID;
 BEGIN
     SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
@@ -615,13 +1877,14 @@ BEGIN
     END IF;
 
     INSERT INTO eventos (bovino_id, fecha, observaciones)
-    VALUES (_bovino_id, _fecha, _observaciones)
-    RETURNING id INTO _evento_id;
-
-    INSERT INTO laboratorios (evento_id, veterinario_id, tipo, resultado)
-    VALUES (_evento_id, _vet_id, _tipo, _resultado);
-
-    RETURN _evento_id;
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO laboratorios (evento_id, evento_fecha, veterinario_id, tipo, resultado)
+    VALUES (id, fecha, _vet_id, _tipo, _resultado)
+    RETURNING laboratorios.veterinario_id, laboratorios.tipo, laboratorios.resultado
+    INTO veterinario_id, tipo, resultado;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -641,17 +1904,19 @@ CREATE OR REPLACE FUNCTION registrar_compraventa(
 DECLARE
     _evento_id UUID;
     _comprador_id UUID;
+    _vendedor_id UUID;
 BEGIN
-    -- Get comprador UUID from CURP
+    -- Get comprador and vendedor UUIDs from CURP
     SELECT id INTO _comprador_id FROM usuarios WHERE curp = _comprador_curp;
+    SELECT id INTO _vendedor_id FROM usuarios WHERE curp = _vendedor_curp;
 
     INSERT INTO eventos (bovino_id, fecha, observaciones)
-    VALUES (_bovino_id, _fecha, _observaciones)
-    RETURNING id INTO _evento_id;
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
 
     -- This INSERT will fire the 'trg_transfer_ownership' trigger
-    INSERT INTO compraventas (evento_id, comprador_curp, vendedor_curp)
-    VALUES (_evento_id, _comprador_curp, _vendedor_curp);
+    INSERT INTO compraventas (evento_id, evento_fecha, comprador_curp, vendedor_curp, comprador_id, vendedor_id)
+    VALUES (_evento_id, _fecha, _comprador_curp, _vendedor_curp, _comprador_id, _vendedor_id);
 
     RETURN _evento_id;
 END;
@@ -674,12 +1939,12 @@ BEGIN
 
     -- 2. Create Event
     INSERT INTO eventos (bovino_id, fecha, observaciones)
-    VALUES (_bovino_id, _fecha, _observaciones)
-    RETURNING id INTO _evento_id;
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
 
     -- 3. Create Detail
-    INSERT INTO traslado (evento_id, predio_anterior_id, predio_nuevo_id)
-    VALUES (_evento_id, _predio_anterior_id, _predio_nuevo_id);
+    INSERT INTO traslado (evento_id, evento_fecha, predio_anterior_id, predio_nuevo_id)
+    VALUES (_evento_id, _fecha, _predio_anterior_id, _predio_nuevo_id);
 
     -- 4. Update the cow's location (Manual update required here, unlike Sales)
     UPDATE bovinos SET predio_id = _predio_nuevo_id WHERE id = _bovino_id;
@@ -699,11 +1964,12 @@ CREATE OR REPLACE FUNCTION registrar_enfermedad(
     _usuario_id UUID,
     _tipo VARCHAR, -- Diagnosis
     _fecha TIMESTAMPTZ DEFAULT NOW(),
-    _observaciones TEXT DEFAULT ''
-) RETURNS UUID AS $$
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT enfermedad_id UUID, OUT veterinario_id UUID, OUT tipo VARCHAR, OUT tipo_id INTEGER
+) AS $$
+#variable_conflict use_column
 DECLARE
-    _evento_id UUID;
-    _enfermedad_id UUID;
     _vet_id UUID;
 BEGIN
     SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
@@ -712,17 +1978,16 @@ BEGIN
     END IF;
 
     INSERT INTO eventos (bovino_id, fecha, observaciones)
-    VALUES (_bovino_id, _fecha, _observaciones)
-    RETURNING id INTO _evento_id;
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
 
-    INSERT INTO enfermedades (evento_id, veterinario_id, tipo)
-    VALUES (_evento_id, _vet_id, _tipo)
-    RETURNING id INTO _enfermedad_id;
+    INSERT INTO enfermedades (evento_id, evento_fecha, veterinario_id, tipo, tipo_id)
+    VALUES (id, fecha, _vet_id, _tipo, resolver_catalogo('enfermedad', _tipo))
+    RETURNING enfermedades.id, enfermedades.veterinario_id, enfermedades.tipo, enfermedades.tipo_id
+    INTO enfermedad_id, veterinario_id, tipo, tipo_id;
 
     UPDATE bovinos SET status = 'enfermo' WHERE id = _bovino_id;
-
-    -- Return Disease ID so the frontend can immediately link a treatment to it
-    RETURN _enfermedad_id;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -736,10 +2001,13 @@ CREATE OR REPLACE FUNCTION registrar_tratamiento(
     _dosis VARCHAR,
     _periodo VARCHAR,
     _fecha TIMESTAMPTZ DEFAULT NOW(),
-    _observaciones TEXT DEFAULT ''
-) RETURNS UUID AS $$
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT enfermedad_id UUID, OUT veterinario_id UUID, OUT medicamento VARCHAR, OUT medicamento_id INTEGER,
+    OUT dosis VARCHAR, OUT periodo VARCHAR
+) AS $$
+#variable_conflict use_column
 DECLARE
-    _evento_id UUID;
     _vet_id UUID;
 BEGIN
     SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
@@ -747,20 +2015,341 @@ BEGIN
         RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
     END IF;
 
+    -- The disease case must belong to the same bovino
+    IF EXISTS (
+        SELECT 1 FROM enfermedades n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        WHERE n.id = _enfermedad_id AND e.bovino_id <> _bovino_id
+    ) THEN
+        RAISE EXCEPTION 'La enfermedad no pertenece al mismo bovino' USING ERRCODE = 'check_violation';
+    END IF;
+
     INSERT INTO eventos (bovino_id, fecha, observaciones)
-    VALUES (_bovino_id, _fecha, _observaciones)
-    RETURNING id INTO _evento_id;
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO tratamientos (evento_id, evento_fecha, enfermedad_id, veterinario_id, medicamento, medicamento_id, dosis, periodo)
+    VALUES (id, fecha, _enfermedad_id, _vet_id, _medicamento, resolver_catalogo('medicamento', _medicamento), _dosis, _periodo)
+    RETURNING tratamientos.enfermedad_id, tratamientos.veterinario_id, tratamientos.medicamento, tratamientos.medicamento_id, tratamientos.dosis, tratamientos.periodo
+    INTO enfermedad_id, veterinario_id, medicamento, medicamento_id, dosis, periodo;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==============================================================================
+-- 5. BULK INGESTION (herd-wide weighing, diets and vaccination rounds)
+-- ==============================================================================
+-- Each function takes parallel arrays (one element per event), inserts every
+-- evento and its detail row in a single statement and returns the new
+-- evento ids in input order. Ownership/role checks happen in the API before
+-- calling these; a NULL fecha element means NOW().
+
+-- A. Bulk Weights (peso_actual chains through earlier weights of the same batch)
+CREATE OR REPLACE FUNCTION registrar_pesos_lote(
+    _bovino_ids UUID[],
+    _pesos DECIMAL[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+BEGIN
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.peso_nuevo, COALESCE(d.fecha, NOW()) AS fecha,
+               COALESCE(d.obs, '') AS obs, gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _pesos, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, peso_nuevo, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO pesos (evento_id, evento_fecha, peso_actual, peso_nuevo)
+        SELECT d.evento_id, d.fecha,
+               COALESCE(lag(d.peso_nuevo) OVER (PARTITION BY d.bovino_id ORDER BY d.fecha, d.ord), b.peso_actual, 0),
+               d.peso_nuevo
+        FROM datos d
+        JOIN bovinos b ON b.id = d.bovino_id
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
 
-    INSERT INTO tratamientos (evento_id, enfermedad_id, veterinario_id, medicamento, dosis, periodo)
-    VALUES (_evento_id, _enfermedad_id, _vet_id, _medicamento, _dosis, _periodo);
 
-    RETURN _evento_id;
+-- B. Bulk Diet Changes
+CREATE OR REPLACE FUNCTION registrar_dietas_lote(
+    _bovino_ids UUID[],
+    _alimentos VARCHAR[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+BEGIN
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.alimento, COALESCE(d.fecha, NOW()) AS fecha,
+               COALESCE(d.obs, '') AS obs, gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _alimentos, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, alimento, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO dietas (evento_id, evento_fecha, alimento)
+        SELECT evento_id, fecha, alimento FROM datos
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- C. Bulk Vaccinations (catalog names resolved once per distinct spelling)
+CREATE OR REPLACE FUNCTION registrar_vacunaciones_lote(
+    _usuario_id UUID,
+    _bovino_ids UUID[],
+    _tipos VARCHAR[],
+    _lotes VARCHAR[],
+    _laboratorios VARCHAR[],
+    _fechas_prox DATE[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    PERFORM resolver_catalogo('vacuna', t) FROM (SELECT DISTINCT unnest(_tipos)) AS x(t);
+    PERFORM resolver_catalogo('laboratorio', l) FROM (SELECT DISTINCT unnest(_laboratorios)) AS x(l);
+
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.tipo, d.lote, d.laboratorio, d.fecha_prox,
+               COALESCE(d.fecha, NOW()) AS fecha, COALESCE(d.obs, '') AS obs,
+               gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _tipos, _lotes, _laboratorios, _fechas_prox, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, tipo, lote, laboratorio, fecha_prox, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO vacunaciones (evento_id, evento_fecha, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+        SELECT d.evento_id, d.fecha, _vet_id, d.tipo, at.catalogo_id, d.lote, d.laboratorio, al.catalogo_id, d.fecha_prox
+        FROM datos d
+        LEFT JOIN catalogo_alias at ON at.tipo = 'vacuna' AND at.alias = normalizar_catalogo(d.tipo)
+        LEFT JOIN catalogo_alias al ON al.tipo = 'laboratorio' AND al.alias = normalizar_catalogo(d.laboratorio)
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- D. Bulk Deworming
+CREATE OR REPLACE FUNCTION registrar_desparasitaciones_lote(
+    _usuario_id UUID,
+    _bovino_ids UUID[],
+    _medicamentos VARCHAR[],
+    _dosis VARCHAR[],
+    _fechas_prox DATE[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    PERFORM resolver_catalogo('medicamento', m) FROM (SELECT DISTINCT unnest(_medicamentos)) AS x(m);
+
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.medicamento, d.dosis, d.fecha_prox,
+               COALESCE(d.fecha, NOW()) AS fecha, COALESCE(d.obs, '') AS obs,
+               gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _medicamentos, _dosis, _fechas_prox, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, medicamento, dosis, fecha_prox, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO desparasitaciones (evento_id, evento_fecha, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+        SELECT d.evento_id, d.fecha, _vet_id, d.medicamento, a.catalogo_id, d.dosis, d.fecha_prox
+        FROM datos d
+        LEFT JOIN catalogo_alias a ON a.tipo = 'medicamento' AND a.alias = normalizar_catalogo(d.medicamento)
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- E. Bulk Lab Tests
+CREATE OR REPLACE FUNCTION registrar_laboratorios_lote(
+    _usuario_id UUID,
+    _bovino_ids UUID[],
+    _tipos VARCHAR[],
+    _resultados TEXT[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.tipo, d.resultado,
+               COALESCE(d.fecha, NOW()) AS fecha, COALESCE(d.obs, '') AS obs,
+               gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _tipos, _resultados, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, tipo, resultado, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO laboratorios (evento_id, evento_fecha, veterinario_id, tipo, resultado)
+        SELECT evento_id, fecha, _vet_id, tipo, resultado FROM datos
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==============================================================================
+-- 6. SANITARY CAMPAIGNS
+-- ==============================================================================
+
+-- A. Eligible bovinos for a campaign that have not received it yet
+CREATE OR REPLACE FUNCTION campana_pendientes(_campana_id UUID)
+RETURNS TABLE (bovino_id UUID) AS $$
+    SELECT b.id
+    FROM campanas c
+    JOIN bovinos b ON (c.instalacion_id IS NULL OR b.instalacion_id = c.instalacion_id)
+                  AND (c.filtro_usuario_id IS NULL OR b.usuario_id = c.filtro_usuario_id)
+    WHERE c.id = _campana_id
+      AND b.status NOT IN ('sacrificado', 'muerto', 'exportado')
+      AND (c.filtro_sexo IS NULL OR b.sexo = c.filtro_sexo)
+      AND (c.filtro_raza_id IS NULL OR b.raza_id = c.filtro_raza_id)
+      AND (c.filtro_nac_desde IS NULL OR b.fecha_nac >= c.filtro_nac_desde)
+      AND (c.filtro_nac_hasta IS NULL OR b.fecha_nac <= c.filtro_nac_hasta)
+      AND NOT EXISTS (
+          SELECT 1 FROM campana_bovinos cb
+          WHERE cb.campana_id = c.id AND cb.bovino_id = b.id
+      );
+$$ LANGUAGE sql STABLE;
+
+
+-- B. Apply a campaign: one INSERT ... SELECT chain creates the eventos, the
+-- detail rows and the campana_bovinos links. _bovino_ids limits the run to
+-- the animals handled today (NULL = every pending bovino).
+CREATE OR REPLACE FUNCTION aplicar_campana(
+    _campana_id UUID,
+    _bovino_ids UUID[] DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+    _c campanas%ROWTYPE;
+    _aplicados INTEGER;
+BEGIN
+    -- Row lock serializes concurrent runs of the same campaign
+    SELECT * INTO _c FROM campanas WHERE id = _campana_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Campaign % not found', _campana_id;
+    END IF;
+    IF _c.estado = 'cerrada' THEN
+        RAISE EXCEPTION 'Campaign % is closed', _campana_id;
+    END IF;
+
+    WITH objetivo AS MATERIALIZED (
+        SELECT p.bovino_id, gen_random_uuid() AS evento_id, NOW() AS fecha
+        FROM campana_pendientes(_campana_id) p
+        WHERE _bovino_ids IS NULL OR p.bovino_id = ANY(_bovino_ids)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, COALESCE(_c.observaciones, '') FROM objetivo
+    ), vac AS (
+        INSERT INTO vacunaciones (evento_id, evento_fecha, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+        SELECT evento_id, fecha, _c.veterinario_id, _c.producto, _c.producto_id, _c.lote,
+               _c.laboratorio, _c.laboratorio_id, _c.fecha_prox
+        FROM objetivo WHERE _c.tipo = 'vacunacion'
+    ), desp AS (
+        INSERT INTO desparasitaciones (evento_id, evento_fecha, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+        SELECT evento_id, fecha, _c.veterinario_id, _c.producto, _c.producto_id, _c.dosis, _c.fecha_prox
+        FROM objetivo WHERE _c.tipo = 'desparasitacion'
+    ), links AS (
+        INSERT INTO campana_bovinos (campana_id, bovino_id, evento_id, evento_fecha)
+        SELECT _campana_id, bovino_id, evento_id, fecha FROM objetivo
+    )
+    SELECT count(*) INTO _aplicados FROM objetivo;
+
+    IF _aplicados > 0 THEN
+        UPDATE campanas
+        SET total_aplicados = total_aplicados + _aplicados,
+            estado = 'en_curso',
+            ultima_aplicacion = NOW()
+        WHERE id = _campana_id;
+    END IF;
+
+    RETURN _aplicados;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- C. Undo applications made within the last _ventana (deletes their eventos;
+-- detail rows and links go with them through ON DELETE CASCADE)
+CREATE OR REPLACE FUNCTION revertir_campana(
+    _campana_id UUID,
+    _ventana INTERVAL
+) RETURNS INTEGER AS $$
+DECLARE
+    _revertidos INTEGER;
+BEGIN
+    PERFORM 1 FROM campanas WHERE id = _campana_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Campaign % not found', _campana_id;
+    END IF;
+
+    WITH borrados AS (
+        DELETE FROM eventos
+        WHERE (id, fecha) IN (
+            SELECT evento_id, evento_fecha FROM campana_bovinos
+            WHERE campana_id = _campana_id AND aplicado_en >= NOW() - _ventana
+        )
+        RETURNING id
+    )
+    SELECT count(*) INTO _revertidos FROM borrados;
+
+    UPDATE campanas
+    SET total_aplicados = total_aplicados - _revertidos,
+        estado = CASE WHEN total_aplicados - _revertidos = 0 THEN 'programada'::campana_estado_enum ELSE estado END
+    WHERE id = _campana_id;
+
+    RETURN _revertidos;
 END;
 $$ LANGUAGE plpgsql;
 
 -- 10. INITIALIZATION DATA
 -- ---------------------------------------------------------
 
+-- Event partitions: the last 12 months (offline events can be backdated up to
+-- a year) and the next 3; the API keeps creating months ahead
+SELECT crear_particiones_eventos((CURRENT_DATE - INTERVAL '12 months')::DATE, (CURRENT_DATE + INTERVAL '3 months')::DATE);
+
 -- Document requirements for each facility type
 INSERT INTO instalacion_documento_requerimientos (facility_type, documentos_requeridos, descripcion) VALUES
 ('UPP', ARRAY['constancia_fiscal', 'certificado_parcelario', 'contrato_arrendamiento', 'clave_catastral'], 'Unidad de Producción Pecuaria - Productor ganadero'),
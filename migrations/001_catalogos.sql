@@ -0,0 +1,297 @@
+-- Migration 001: normalized catalogs for clinical and breed vocabularies
+-- Applies the catalog tables, resolver functions and *_id columns from
+-- db_schema.sql to an existing database, then backfills the ids from the
+-- free-text columns already stored.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/001_catalogos.sql
+
+BEGIN;
+
+DO $$
+BEGIN
+    CREATE TYPE catalogo_tipo_enum AS ENUM ('vacuna', 'laboratorio', 'medicamento', 'enfermedad', 'raza');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+CREATE TABLE IF NOT EXISTS catalogos (
+    id SERIAL PRIMARY KEY,
+    tipo catalogo_tipo_enum NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (tipo, nombre)
+);
+
+CREATE TABLE IF NOT EXISTS catalogo_alias (
+    tipo catalogo_tipo_enum NOT NULL,
+    alias VARCHAR(100) NOT NULL,
+    catalogo_id INTEGER NOT NULL REFERENCES catalogos(id) ON DELETE CASCADE,
+    PRIMARY KEY (tipo, alias)
+);
+
+ALTER TABLE bovinos ADD COLUMN IF NOT EXISTS raza_id INTEGER REFERENCES catalogos(id);
+ALTER TABLE vacunaciones ADD COLUMN IF NOT EXISTS tipo_id INTEGER REFERENCES catalogos(id);
+ALTER TABLE vacunaciones ADD COLUMN IF NOT EXISTS laboratorio_id INTEGER REFERENCES catalogos(id);
+ALTER TABLE desparasitaciones ADD COLUMN IF NOT EXISTS medicamento_id INTEGER REFERENCES catalogos(id);
+ALTER TABLE tratamientos ADD COLUMN IF NOT EXISTS medicamento_id INTEGER REFERENCES catalogos(id);
+ALTER TABLE enfermedades ADD COLUMN IF NOT EXISTS tipo_id INTEGER REFERENCES catalogos(id);
+
+CREATE OR REPLACE FUNCTION normalizar_catalogo(_texto TEXT)
+RETURNS TEXT AS $$
+    SELECT NULLIF(
+        translate(lower(regexp_replace(btrim(_texto), '\s+', ' ', 'g')), 'áéíóúüñ', 'aeiouun'),
+        ''
+    );
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION resolver_catalogo(_tipo catalogo_tipo_enum, _nombre TEXT)
+RETURNS INTEGER AS $$
+DECLARE
+    _alias TEXT := normalizar_catalogo(_nombre);
+    _catalogo_id INTEGER;
+BEGIN
+    IF _alias IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT catalogo_id INTO _catalogo_id FROM catalogo_alias WHERE tipo = _tipo AND alias = _alias;
+    IF _catalogo_id IS NOT NULL THEN
+        RETURN _catalogo_id;
+    END IF;
+
+    INSERT INTO catalogos (tipo, nombre)
+    VALUES (_tipo, regexp_replace(btrim(_nombre), '\s+', ' ', 'g'))
+    ON CONFLICT (tipo, nombre) DO UPDATE SET nombre = EXCLUDED.nombre
+    RETURNING id INTO _catalogo_id;
+
+    -- A concurrent insert may have won the alias; re-read to return its mapping
+    INSERT INTO catalogo_alias (tipo, alias, catalogo_id)
+    VALUES (_tipo, _alias, _catalogo_id)
+    ON CONFLICT (tipo, alias) DO NOTHING;
+
+    SELECT catalogo_id INTO _catalogo_id FROM catalogo_alias WHERE tipo = _tipo AND alias = _alias;
+    RETURN _catalogo_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION asignar_alias_catalogo(_tipo catalogo_tipo_enum, _alias TEXT, _catalogo_id INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    _norm TEXT := normalizar_catalogo(_alias);
+    _total INTEGER := 0;
+    _n INTEGER;
+BEGIN
+    IF _norm IS NULL THEN
+        RAISE EXCEPTION 'Alias vacío';
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM catalogos WHERE id = _catalogo_id AND tipo = _tipo) THEN
+        RAISE EXCEPTION 'Catalog entry % is not of type %', _catalogo_id, _tipo;
+    END IF;
+
+    INSERT INTO catalogo_alias (tipo, alias, catalogo_id)
+    VALUES (_tipo, _norm, _catalogo_id)
+    ON CONFLICT (tipo, alias) DO UPDATE SET catalogo_id = EXCLUDED.catalogo_id;
+
+    IF _tipo = 'vacuna' THEN
+        UPDATE vacunaciones SET tipo_id = _catalogo_id WHERE normalizar_catalogo(tipo) = _norm;
+        GET DIAGNOSTICS _total = ROW_COUNT;
+    ELSIF _tipo = 'laboratorio' THEN
+        UPDATE vacunaciones SET laboratorio_id = _catalogo_id WHERE normalizar_catalogo(laboratorio) = _norm;
+        GET DIAGNOSTICS _total = ROW_COUNT;
+    ELSIF _tipo = 'medicamento' THEN
+        UPDATE desparasitaciones SET medicamento_id = _catalogo_id WHERE normalizar_catalogo(medicamento) = _norm;
+        GET DIAGNOSTICS _total = ROW_COUNT;
+        UPDATE tratamientos SET medicamento_id = _catalogo_id WHERE normalizar_catalogo(medicamento) = _norm;
+        GET DIAGNOSTICS _n = ROW_COUNT;
+        _total := _total + _n;
+    ELSIF _tipo = 'enfermedad' THEN
+        UPDATE enfermedades SET tipo_id = _catalogo_id WHERE normalizar_catalogo(tipo) = _norm;
+        GET DIAGNOSTICS _total = ROW_COUNT;
+    ELSIF _tipo = 'raza' THEN
+        UPDATE bovinos SET raza_id = _catalogo_id WHERE normalizar_catalogo(raza_dominante) = _norm;
+        GET DIAGNOSTICS _total = ROW_COUNT;
+    END IF;
+
+    RETURN _total;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_bovino_raza()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.raza_id := resolver_catalogo('raza', NEW.raza_dominante);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bovino_raza ON bovinos;
+CREATE TRIGGER trg_bovino_raza
+BEFORE INSERT OR UPDATE OF raza_dominante ON bovinos
+FOR EACH ROW
+EXECUTE FUNCTION sync_bovino_raza();
+
+-- registrar_* functions now resolve catalog ids on insert
+CREATE OR REPLACE FUNCTION registrar_vacunacion(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _tipo VARCHAR, -- e.g. "Fiebre Aftosa"
+    _lote VARCHAR,
+    _laboratorio VARCHAR,
+    _fecha_prox DATE,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, _fecha, _observaciones)
+    RETURNING id INTO _evento_id;
+
+    INSERT INTO vacunaciones (evento_id, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+    VALUES (_evento_id, _vet_id, _tipo, resolver_catalogo('vacuna', _tipo), _lote,
+            _laboratorio, resolver_catalogo('laboratorio', _laboratorio), _fecha_prox);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_desparasitacion(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _medicamento VARCHAR,
+    _dosis VARCHAR,
+    _fecha_prox DATE,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, _fecha, _observaciones)
+    RETURNING id INTO _evento_id;
+
+    INSERT INTO desparasitaciones (evento_id, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+    VALUES (_evento_id, _vet_id, _medicamento, resolver_catalogo('medicamento', _medicamento), _dosis, _fecha_prox);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_enfermedad(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _tipo VARCHAR, -- Diagnosis
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _enfermedad_id UUID;
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, _fecha, _observaciones)
+    RETURNING id INTO _evento_id;
+
+    INSERT INTO enfermedades (evento_id, veterinario_id, tipo, tipo_id)
+    VALUES (_evento_id, _vet_id, _tipo, resolver_catalogo('enfermedad', _tipo))
+    RETURNING id INTO _enfermedad_id;
+
+    UPDATE bovinos SET status = 'enfermo' WHERE id = _bovino_id;
+
+    -- Return Disease ID so the frontend can immediately link a treatment to it
+    RETURN _enfermedad_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_tratamiento(
+    _bovino_id UUID,
+    _enfermedad_id UUID, -- Must link to an existing disease case
+    _usuario_id UUID,
+    _medicamento VARCHAR,
+    _dosis VARCHAR,
+    _periodo VARCHAR,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, _fecha, _observaciones)
+    RETURNING id INTO _evento_id;
+
+    INSERT INTO tratamientos (evento_id, enfermedad_id, veterinario_id, medicamento, medicamento_id, dosis, periodo)
+    VALUES (_evento_id, _enfermedad_id, _vet_id, _medicamento, resolver_catalogo('medicamento', _medicamento), _dosis, _periodo);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill: register each distinct spelling once, then join the ids in bulk
+SELECT resolver_catalogo('vacuna', tipo) FROM (SELECT DISTINCT tipo FROM vacunaciones) d;
+SELECT resolver_catalogo('laboratorio', laboratorio) FROM (SELECT DISTINCT laboratorio FROM vacunaciones) d;
+SELECT resolver_catalogo('medicamento', medicamento) FROM (
+    SELECT medicamento FROM desparasitaciones UNION SELECT medicamento FROM tratamientos
+) d;
+SELECT resolver_catalogo('enfermedad', tipo) FROM (SELECT DISTINCT tipo FROM enfermedades) d;
+SELECT resolver_catalogo('raza', raza_dominante) FROM (SELECT DISTINCT raza_dominante FROM bovinos) d;
+
+UPDATE vacunaciones v SET tipo_id = a.catalogo_id
+FROM catalogo_alias a
+WHERE a.tipo = 'vacuna' AND a.alias = normalizar_catalogo(v.tipo) AND v.tipo_id IS NULL;
+
+UPDATE vacunaciones v SET laboratorio_id = a.catalogo_id
+FROM catalogo_alias a
+WHERE a.tipo = 'laboratorio' AND a.alias = normalizar_catalogo(v.laboratorio) AND v.laboratorio_id IS NULL;
+
+UPDATE desparasitaciones d SET medicamento_id = a.catalogo_id
+FROM catalogo_alias a
+WHERE a.tipo = 'medicamento' AND a.alias = normalizar_catalogo(d.medicamento) AND d.medicamento_id IS NULL;
+
+UPDATE tratamientos t SET medicamento_id = a.catalogo_id
+FROM catalogo_alias a
+WHERE a.tipo = 'medicamento' AND a.alias = normalizar_catalogo(t.medicamento) AND t.medicamento_id IS NULL;
+
+UPDATE enfermedades e SET tipo_id = a.catalogo_id
+FROM catalogo_alias a
+WHERE a.tipo = 'enfermedad' AND a.alias = normalizar_catalogo(e.tipo) AND e.tipo_id IS NULL;
+
+-- Plain column update so trg_bovino_raza (UPDATE OF raza_dominante) does not fire per row
+UPDATE bovinos b SET raza_id = a.catalogo_id
+FROM catalogo_alias a
+WHERE a.tipo = 'raza' AND a.alias = normalizar_catalogo(b.raza_dominante) AND b.raza_id IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_catalogo_alias_catalogo ON catalogo_alias(catalogo_id);
+CREATE INDEX IF NOT EXISTS idx_bovinos_raza ON bovinos(raza_id);
+CREATE INDEX IF NOT EXISTS idx_vacunas_tipo ON vacunaciones(tipo_id);
+CREATE INDEX IF NOT EXISTS idx_vacunas_laboratorio ON vacunaciones(laboratorio_id);
+CREATE INDEX IF NOT EXISTS idx_desparasitaciones_medicamento ON desparasitaciones(medicamento_id);
+CREATE INDEX IF NOT EXISTS idx_tratamientos_medicamento ON tratamientos(medicamento_id);
+CREATE INDEX IF NOT EXISTS idx_enfermedades_tipo ON enfermedades(tipo_id);
+
+COMMIT;
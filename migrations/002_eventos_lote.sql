@@ -0,0 +1,196 @@
+-- Migration 002: bulk event ingestion
+-- Array-based registrar_*_lote functions used by POST /eventos/lote.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/002_eventos_lote.sql
+
+BEGIN;
+
+-- A. Bulk Weights (peso_actual chains through earlier weights of the same batch)
+CREATE OR REPLACE FUNCTION registrar_pesos_lote(
+    _bovino_ids UUID[],
+    _pesos DECIMAL[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+BEGIN
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.peso_nuevo, COALESCE(d.fecha, NOW()) AS fecha,
+               COALESCE(d.obs, '') AS obs, gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _pesos, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, peso_nuevo, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO pesos (evento_id, peso_actual, peso_nuevo)
+        SELECT d.evento_id,
+               COALESCE(lag(d.peso_nuevo) OVER (PARTITION BY d.bovino_id ORDER BY d.fecha, d.ord), b.peso_actual, 0),
+               d.peso_nuevo
+        FROM datos d
+        JOIN bovinos b ON b.id = d.bovino_id
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- B. Bulk Diet Changes
+CREATE OR REPLACE FUNCTION registrar_dietas_lote(
+    _bovino_ids UUID[],
+    _alimentos VARCHAR[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+BEGIN
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.alimento, COALESCE(d.fecha, NOW()) AS fecha,
+               COALESCE(d.obs, '') AS obs, gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _alimentos, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, alimento, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO dietas (evento_id, alimento)
+        SELECT evento_id, alimento FROM datos
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- C. Bulk Vaccinations (catalog names resolved once per distinct spelling)
+CREATE OR REPLACE FUNCTION registrar_vacunaciones_lote(
+    _usuario_id UUID,
+    _bovino_ids UUID[],
+    _tipos VARCHAR[],
+    _lotes VARCHAR[],
+    _laboratorios VARCHAR[],
+    _fechas_prox DATE[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    PERFORM resolver_catalogo('vacuna', t) FROM (SELECT DISTINCT unnest(_tipos)) AS x(t);
+    PERFORM resolver_catalogo('laboratorio', l) FROM (SELECT DISTINCT unnest(_laboratorios)) AS x(l);
+
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.tipo, d.lote, d.laboratorio, d.fecha_prox,
+               COALESCE(d.fecha, NOW()) AS fecha, COALESCE(d.obs, '') AS obs,
+               gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _tipos, _lotes, _laboratorios, _fechas_prox, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, tipo, lote, laboratorio, fecha_prox, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO vacunaciones (evento_id, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+        SELECT d.evento_id, _vet_id, d.tipo, at.catalogo_id, d.lote, d.laboratorio, al.catalogo_id, d.fecha_prox
+        FROM datos d
+        LEFT JOIN catalogo_alias at ON at.tipo = 'vacuna' AND at.alias = normalizar_catalogo(d.tipo)
+        LEFT JOIN catalogo_alias al ON al.tipo = 'laboratorio' AND al.alias = normalizar_catalogo(d.laboratorio)
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- D. Bulk Deworming
+CREATE OR REPLACE FUNCTION registrar_desparasitaciones_lote(
+    _usuario_id UUID,
+    _bovino_ids UUID[],
+    _medicamentos VARCHAR[],
+    _dosis VARCHAR[],
+    _fechas_prox DATE[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    PERFORM resolver_catalogo('medicamento', m) FROM (SELECT DISTINCT unnest(_medicamentos)) AS x(m);
+
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.medicamento, d.dosis, d.fecha_prox,
+               COALESCE(d.fecha, NOW()) AS fecha, COALESCE(d.obs, '') AS obs,
+               gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _medicamentos, _dosis, _fechas_prox, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, medicamento, dosis, fecha_prox, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO desparasitaciones (evento_id, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+        SELECT d.evento_id, _vet_id, d.medicamento, a.catalogo_id, d.dosis, d.fecha_prox
+        FROM datos d
+        LEFT JOIN catalogo_alias a ON a.tipo = 'medicamento' AND a.alias = normalizar_catalogo(d.medicamento)
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- E. Bulk Lab Tests
+CREATE OR REPLACE FUNCTION registrar_laboratorios_lote(
+    _usuario_id UUID,
+    _bovino_ids UUID[],
+    _tipos VARCHAR[],
+    _resultados TEXT[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.tipo, d.resultado,
+               COALESCE(d.fecha, NOW()) AS fecha, COALESCE(d.obs, '') AS obs,
+               gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _tipos, _resultados, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, tipo, resultado, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO laboratorios (evento_id, veterinario_id, tipo, resultado)
+        SELECT evento_id, _vet_id, tipo, resultado FROM datos
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
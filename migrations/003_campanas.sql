@@ -0,0 +1,175 @@
+-- Migration 003: sanitary campaigns
+-- Campaign tables and the aplicar_campana()/revertir_campana() functions.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/003_campanas.sql
+
+BEGIN;
+
+-- Enums for sanitary campaigns
+DO $$
+BEGIN
+    CREATE TYPE campana_tipo_enum AS ENUM ('vacunacion', 'desparasitacion');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+DO $$
+BEGIN
+    CREATE TYPE campana_estado_enum AS ENUM ('programada', 'en_curso', 'cerrada');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+-- A campaign applies the same vaccine/antiparasitic (lote, laboratorio,
+-- fecha_prox) to every eligible bovino of an instalación and/or filter.
+CREATE TABLE IF NOT EXISTS campanas (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    tipo campana_tipo_enum NOT NULL,
+    estado campana_estado_enum NOT NULL DEFAULT 'programada',
+    creado_por_id UUID NOT NULL REFERENCES usuarios(id),
+    veterinario_id UUID NOT NULL REFERENCES veterinarios(id),
+
+    producto VARCHAR(100) NOT NULL, -- vaccine (vacunaciones.tipo) or medicamento
+    producto_id INTEGER REFERENCES catalogos(id),
+    lote VARCHAR(50),
+    laboratorio VARCHAR(100),
+    laboratorio_id INTEGER REFERENCES catalogos(id),
+    dosis VARCHAR(50),
+    fecha_prox DATE,
+    observaciones TEXT DEFAULT '',
+
+    -- Target: all conditions set here must hold for a bovino to be eligible
+    instalacion_id UUID REFERENCES instalaciones(id),
+    filtro_usuario_id UUID REFERENCES usuarios(id),
+    filtro_sexo sexo_enum,
+    filtro_raza_id INTEGER REFERENCES catalogos(id),
+    filtro_nac_desde DATE,
+    filtro_nac_hasta DATE,
+
+    -- Coverage counter, kept by aplicar_campana()/revertir_campana()
+    total_aplicados INTEGER NOT NULL DEFAULT 0,
+    ultima_aplicacion TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    CHECK (instalacion_id IS NOT NULL OR filtro_usuario_id IS NOT NULL)
+);
+
+CREATE TABLE IF NOT EXISTS campana_bovinos (
+    campana_id UUID NOT NULL REFERENCES campanas(id) ON DELETE CASCADE,
+    bovino_id UUID NOT NULL REFERENCES bovinos(id) ON DELETE CASCADE,
+    evento_id UUID NOT NULL REFERENCES eventos(id) ON DELETE CASCADE,
+    aplicado_en TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (campana_id, bovino_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_campanas_instalacion ON campanas(instalacion_id);
+CREATE INDEX IF NOT EXISTS idx_campanas_veterinario ON campanas(veterinario_id);
+CREATE INDEX IF NOT EXISTS idx_campana_bovinos_bovino ON campana_bovinos(bovino_id);
+CREATE INDEX IF NOT EXISTS idx_campana_bovinos_aplicado ON campana_bovinos(campana_id, aplicado_en);
+
+-- A. Eligible bovinos for a campaign that have not received it yet
+CREATE OR REPLACE FUNCTION campana_pendientes(_campana_id UUID)
+RETURNS TABLE (bovino_id UUID) AS $$
+    SELECT b.id
+    FROM campanas c
+    JOIN bovinos b ON (c.instalacion_id IS NULL OR b.instalacion_id = c.instalacion_id)
+                  AND (c.filtro_usuario_id IS NULL OR b.usuario_id = c.filtro_usuario_id)
+    WHERE c.id = _campana_id
+      AND b.status NOT IN ('sacrificado', 'muerto', 'exportado')
+      AND (c.filtro_sexo IS NULL OR b.sexo = c.filtro_sexo)
+      AND (c.filtro_raza_id IS NULL OR b.raza_id = c.filtro_raza_id)
+      AND (c.filtro_nac_desde IS NULL OR b.fecha_nac >= c.filtro_nac_desde)
+      AND (c.filtro_nac_hasta IS NULL OR b.fecha_nac <= c.filtro_nac_hasta)
+      AND NOT EXISTS (
+          SELECT 1 FROM campana_bovinos cb
+          WHERE cb.campana_id = c.id AND cb.bovino_id = b.id
+      );
+$$ LANGUAGE sql STABLE;
+
+
+-- B. Apply a campaign: one INSERT ... SELECT chain creates the eventos, the
+-- detail rows and the campana_bovinos links. _bovino_ids limits the run to
+-- the animals handled today (NULL = every pending bovino).
+CREATE OR REPLACE FUNCTION aplicar_campana(
+    _campana_id UUID,
+    _bovino_ids UUID[] DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+    _c campanas%ROWTYPE;
+    _aplicados INTEGER;
+BEGIN
+    -- Row lock serializes concurrent runs of the same campaign
+    SELECT * INTO _c FROM campanas WHERE id = _campana_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Campaign % not found', _campana_id;
+    END IF;
+    IF _c.estado = 'cerrada' THEN
+        RAISE EXCEPTION 'Campaign % is closed', _campana_id;
+    END IF;
+
+    WITH objetivo AS MATERIALIZED (
+        SELECT p.bovino_id, gen_random_uuid() AS evento_id
+        FROM campana_pendientes(_campana_id) p
+        WHERE _bovino_ids IS NULL OR p.bovino_id = ANY(_bovino_ids)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, NOW(), COALESCE(_c.observaciones, '') FROM objetivo
+    ), vac AS (
+        INSERT INTO vacunaciones (evento_id, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+        SELECT evento_id, _c.veterinario_id, _c.producto, _c.producto_id, _c.lote,
+               _c.laboratorio, _c.laboratorio_id, _c.fecha_prox
+        FROM objetivo WHERE _c.tipo = 'vacunacion'
+    ), desp AS (
+        INSERT INTO desparasitaciones (evento_id, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+        SELECT evento_id, _c.veterinario_id, _c.producto, _c.producto_id, _c.dosis, _c.fecha_prox
+        FROM objetivo WHERE _c.tipo = 'desparasitacion'
+    ), links AS (
+        INSERT INTO campana_bovinos (campana_id, bovino_id, evento_id)
+        SELECT _campana_id, bovino_id, evento_id FROM objetivo
+    )
+    SELECT count(*) INTO _aplicados FROM objetivo;
+
+    IF _aplicados > 0 THEN
+        UPDATE campanas
+        SET total_aplicados = total_aplicados + _aplicados,
+            estado = 'en_curso',
+            ultima_aplicacion = NOW()
+        WHERE id = _campana_id;
+    END IF;
+
+    RETURN _aplicados;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- C. Undo applications made within the last _ventana (deletes their eventos;
+-- detail rows and links go with them through ON DELETE CASCADE)
+CREATE OR REPLACE FUNCTION revertir_campana(
+    _campana_id UUID,
+    _ventana INTERVAL
+) RETURNS INTEGER AS $$
+DECLARE
+    _revertidos INTEGER;
+BEGIN
+    PERFORM 1 FROM campanas WHERE id = _campana_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Campaign % not found', _campana_id;
+    END IF;
+
+    WITH borrados AS (
+        DELETE FROM eventos
+        WHERE id IN (
+            SELECT evento_id FROM campana_bovinos
+            WHERE campana_id = _campana_id AND aplicado_en >= NOW() - _ventana
+        )
+        RETURNING id
+    )
+    SELECT count(*) INTO _revertidos FROM borrados;
+
+    UPDATE campanas
+    SET total_aplicados = total_aplicados - _revertidos,
+        estado = CASE WHEN total_aplicados - _revertidos = 0 THEN 'programada'::campana_estado_enum ELSE estado END
+    WHERE id = _campana_id;
+
+    RETURN _revertidos;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,136 @@
+-- Migration 004: offline delta sync
+-- updated_at columns, tombstone log and change-tracking triggers for GET /sync.
+-- Existing rows get updated_at = migration time, so every client's first
+-- sync after this migration is a full one.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/004_sync.sql
+
+BEGIN;
+
+ALTER TABLE bovinos ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE eventos ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE documentos ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE instalaciones ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE predios ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+-- Deletions (and bovinos leaving an owner) for the /sync change feed.
+-- Upserts are found through each table's updated_at instead.
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+    id BIGSERIAL PRIMARY KEY,
+    entidad VARCHAR(20) NOT NULL, -- table name: bovinos, eventos, documentos, instalaciones, predios
+    entidad_id UUID NOT NULL,
+    usuario_id UUID NOT NULL, -- owner who must drop the row
+    eliminado_en TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_bovinos_sync ON bovinos(usuario_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_eventos_sync ON eventos(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_documentos_sync ON documentos(usuario_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_instalaciones_sync ON instalaciones(usuario_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_predios_sync ON predios(usuario_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_sync_tombstones_usuario ON sync_tombstones(usuario_id, eliminado_en, id);
+
+-- Bumps updated_at on every change so the /sync feed can pick the row up
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bovinos_updated_at ON bovinos;
+CREATE TRIGGER trg_bovinos_updated_at BEFORE UPDATE ON bovinos
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS trg_eventos_updated_at ON eventos;
+CREATE TRIGGER trg_eventos_updated_at BEFORE UPDATE ON eventos
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS trg_documentos_updated_at ON documentos;
+CREATE TRIGGER trg_documentos_updated_at BEFORE UPDATE ON documentos
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS trg_instalaciones_updated_at ON instalaciones;
+CREATE TRIGGER trg_instalaciones_updated_at BEFORE UPDATE ON instalaciones
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS trg_predios_updated_at ON predios;
+CREATE TRIGGER trg_predios_updated_at BEFORE UPDATE ON predios
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- Tombstones for owner-scoped tables (all have id + usuario_id)
+CREATE OR REPLACE FUNCTION registrar_tombstones()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sync_tombstones (entidad, entidad_id, usuario_id)
+    SELECT TG_TABLE_NAME, id, usuario_id FROM viejos WHERE usuario_id IS NOT NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bovinos_tombstone ON bovinos;
+CREATE TRIGGER trg_bovinos_tombstone AFTER DELETE ON bovinos
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones();
+DROP TRIGGER IF EXISTS trg_documentos_tombstone ON documentos;
+CREATE TRIGGER trg_documentos_tombstone AFTER DELETE ON documentos
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones();
+DROP TRIGGER IF EXISTS trg_instalaciones_tombstone ON instalaciones;
+CREATE TRIGGER trg_instalaciones_tombstone AFTER DELETE ON instalaciones
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones();
+DROP TRIGGER IF EXISTS trg_predios_tombstone ON predios;
+CREATE TRIGGER trg_predios_tombstone AFTER DELETE ON predios
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones();
+
+-- Eventos are scoped through their bovino (rows cascading from a deleted
+-- bovino are skipped: clients drop them with the bovino)
+CREATE OR REPLACE FUNCTION registrar_tombstones_eventos()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sync_tombstones (entidad, entidad_id, usuario_id)
+    SELECT 'eventos', v.id, b.usuario_id
+    FROM viejos v
+    JOIN bovinos b ON b.id = v.bovino_id
+    WHERE b.usuario_id IS NOT NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_eventos_tombstone ON eventos;
+CREATE TRIGGER trg_eventos_tombstone AFTER DELETE ON eventos
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones_eventos();
+
+-- Ownership change: the previous owner gets a tombstone and the bovino's
+-- history is re-stamped so the new owner's feed includes it
+CREATE OR REPLACE FUNCTION sync_cambio_propietario()
+RETURNS TRIGGER AS $$
+BEGIN
+    WITH cambios AS MATERIALIZED (
+        SELECT v.id, v.usuario_id AS anterior
+        FROM viejos v
+        JOIN nuevos n ON n.id = v.id
+        WHERE v.usuario_id IS DISTINCT FROM n.usuario_id
+    ), tomb AS (
+        INSERT INTO sync_tombstones (entidad, entidad_id, usuario_id)
+        SELECT 'bovinos', id, anterior FROM cambios WHERE anterior IS NOT NULL
+    )
+    UPDATE eventos SET updated_at = NOW()
+    WHERE bovino_id IN (SELECT id FROM cambios);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bovinos_sync_propietario ON bovinos;
+CREATE TRIGGER trg_bovinos_sync_propietario AFTER UPDATE ON bovinos
+REFERENCING OLD TABLE AS viejos NEW TABLE AS nuevos
+FOR EACH STATEMENT EXECUTE FUNCTION sync_cambio_propietario();
+
+-- Retention: clients whose token is older than this must do a full resync
+CREATE OR REPLACE FUNCTION purgar_sync_tombstones(_retencion INTERVAL)
+RETURNS INTEGER AS $$
+DECLARE
+    _borrados INTEGER;
+BEGIN
+    DELETE FROM sync_tombstones WHERE eliminado_en < NOW() - _retencion;
+    GET DIAGNOSTICS _borrados = ROW_COUNT;
+    RETURN _borrados;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,38 @@
+-- Migration 005: idempotency keys
+-- Stored responses for write requests sent with an Idempotency-Key header.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/005_idempotency.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    clave BYTEA PRIMARY KEY, -- sha256(user, method, path, Idempotency-Key)
+    peticion BYTEA NOT NULL, -- sha256 of the request (detects a key reused for another payload)
+    estado SMALLINT NOT NULL DEFAULT 0, -- 0 = in progress, 1 = completed
+    status_code SMALLINT,
+    content_type VARCHAR(100),
+    respuesta BYTEA, -- zlib-compressed response body
+    creado_en TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expira_en TIMESTAMPTZ NOT NULL -- claim lease while in progress, retention once completed
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expira ON idempotency_keys(expira_en);
+
+CREATE OR REPLACE FUNCTION purgar_idempotency_keys(_limite INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    _borrados INTEGER;
+BEGIN
+    DELETE FROM idempotency_keys
+    WHERE clave IN (
+        SELECT clave FROM idempotency_keys
+        WHERE expira_en < NOW()
+        LIMIT _limite
+        FOR UPDATE SKIP LOCKED
+    );
+    GET DIAGNOSTICS _borrados = ROW_COUNT;
+    RETURN _borrados;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,137 @@
+-- Migration 006: sanitary agenda
+-- Precomputed latest dose per bovino and product (agenda_sanitaria), kept up
+-- to date by statement-level triggers, and backfilled from the existing history.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/006_agenda_sanitaria.sql
+
+BEGIN;
+
+-- Latest dose per bovino and product (catalog id) with its booster date.
+-- Maintained by triggers on vacunaciones/desparasitaciones so the agenda
+-- never reads the event history.
+CREATE TABLE IF NOT EXISTS agenda_sanitaria (
+    bovino_id UUID NOT NULL REFERENCES bovinos(id) ON DELETE CASCADE,
+    tipo campana_tipo_enum NOT NULL,
+    producto_id INTEGER NOT NULL REFERENCES catalogos(id), -- vacunaciones.tipo_id / desparasitaciones.medicamento_id
+    evento_id UUID NOT NULL,
+    veterinario_id UUID,
+    fecha_aplicacion TIMESTAMPTZ NOT NULL,
+    fecha_prox DATE, -- NULL: the latest dose has no booster scheduled
+    PRIMARY KEY (bovino_id, tipo, producto_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agenda_sanitaria_fecha ON agenda_sanitaria(fecha_prox) WHERE fecha_prox IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_agenda_sanitaria_veterinario ON agenda_sanitaria(veterinario_id, fecha_prox) WHERE fecha_prox IS NOT NULL;
+
+-- G. Sanitary Agenda
+-- Rebuilds the agenda rows of some bovinos from their history (latest dose
+-- per product). Used when doses are deleted or re-pointed to another product.
+CREATE OR REPLACE FUNCTION refrescar_agenda_sanitaria(_tipo campana_tipo_enum, _bovino_ids UUID[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM agenda_sanitaria WHERE tipo = _tipo AND bovino_id = ANY(_bovino_ids);
+
+    IF _tipo = 'vacunacion' THEN
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, v.tipo_id)
+               e.bovino_id, _tipo, v.tipo_id, e.id, v.veterinario_id, e.fecha, v.fecha_prox
+        FROM eventos e JOIN vacunaciones v ON v.evento_id = e.id
+        WHERE e.bovino_id = ANY(_bovino_ids) AND v.tipo_id IS NOT NULL
+        ORDER BY e.bovino_id, v.tipo_id, e.fecha DESC, e.id DESC;
+    ELSE
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, d.medicamento_id)
+               e.bovino_id, _tipo, d.medicamento_id, e.id, d.veterinario_id, e.fecha, d.fecha_prox
+        FROM eventos e JOIN desparasitaciones d ON d.evento_id = e.id
+        WHERE e.bovino_id = ANY(_bovino_ids) AND d.medicamento_id IS NOT NULL
+        ORDER BY e.bovino_id, d.medicamento_id, e.fecha DESC, e.id DESC;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New doses: upsert only the inserted rows; an older dose (e.g. synced late
+-- from an offline device) never replaces a newer one
+CREATE OR REPLACE FUNCTION agenda_dosis_insertadas()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'vacunaciones' THEN
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, n.tipo_id)
+               e.bovino_id, 'vacunacion', n.tipo_id, e.id, n.veterinario_id, e.fecha, n.fecha_prox
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id
+        WHERE n.tipo_id IS NOT NULL
+        ORDER BY e.bovino_id, n.tipo_id, e.fecha DESC, e.id DESC
+        ON CONFLICT (bovino_id, tipo, producto_id) DO UPDATE
+            SET evento_id = EXCLUDED.evento_id, veterinario_id = EXCLUDED.veterinario_id,
+                fecha_aplicacion = EXCLUDED.fecha_aplicacion, fecha_prox = EXCLUDED.fecha_prox
+            WHERE EXCLUDED.fecha_aplicacion >= agenda_sanitaria.fecha_aplicacion;
+    ELSE
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, n.medicamento_id)
+               e.bovino_id, 'desparasitacion', n.medicamento_id, e.id, n.veterinario_id, e.fecha, n.fecha_prox
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id
+        WHERE n.medicamento_id IS NOT NULL
+        ORDER BY e.bovino_id, n.medicamento_id, e.fecha DESC, e.id DESC
+        ON CONFLICT (bovino_id, tipo, producto_id) DO UPDATE
+            SET evento_id = EXCLUDED.evento_id, veterinario_id = EXCLUDED.veterinario_id,
+                fecha_aplicacion = EXCLUDED.fecha_aplicacion, fecha_prox = EXCLUDED.fecha_prox
+            WHERE EXCLUDED.fecha_aplicacion >= agenda_sanitaria.fecha_aplicacion;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Deleted doses (campaign reversal, event deletion): only bovinos whose
+-- agenda row pointed at a deleted dose are rebuilt
+CREATE OR REPLACE FUNCTION agenda_dosis_borradas()
+RETURNS TRIGGER AS $$
+DECLARE
+    _tipo campana_tipo_enum := CASE WHEN TG_TABLE_NAME = 'vacunaciones' THEN 'vacunacion' ELSE 'desparasitacion' END;
+BEGIN
+    PERFORM refrescar_agenda_sanitaria(_tipo, ARRAY(
+        SELECT DISTINCT a.bovino_id FROM agenda_sanitaria a
+        WHERE a.tipo = _tipo AND a.evento_id IN (SELECT evento_id FROM viejos)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updated doses (catalog alias merges re-point tipo_id/medicamento_id)
+CREATE OR REPLACE FUNCTION agenda_dosis_actualizadas()
+RETURNS TRIGGER AS $$
+DECLARE
+    _tipo campana_tipo_enum := CASE WHEN TG_TABLE_NAME = 'vacunaciones' THEN 'vacunacion' ELSE 'desparasitacion' END;
+BEGIN
+    PERFORM refrescar_agenda_sanitaria(_tipo, ARRAY(
+        SELECT DISTINCT e.bovino_id FROM nuevos n JOIN eventos e ON e.id = n.evento_id
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_vacunaciones_agenda_insert ON vacunaciones;
+CREATE TRIGGER trg_vacunaciones_agenda_insert AFTER INSERT ON vacunaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_insertadas();
+DROP TRIGGER IF EXISTS trg_vacunaciones_agenda_delete ON vacunaciones;
+CREATE TRIGGER trg_vacunaciones_agenda_delete AFTER DELETE ON vacunaciones
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_borradas();
+DROP TRIGGER IF EXISTS trg_vacunaciones_agenda_update ON vacunaciones;
+CREATE TRIGGER trg_vacunaciones_agenda_update AFTER UPDATE ON vacunaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_actualizadas();
+
+DROP TRIGGER IF EXISTS trg_desparasitaciones_agenda_insert ON desparasitaciones;
+CREATE TRIGGER trg_desparasitaciones_agenda_insert AFTER INSERT ON desparasitaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_insertadas();
+DROP TRIGGER IF EXISTS trg_desparasitaciones_agenda_delete ON desparasitaciones;
+CREATE TRIGGER trg_desparasitaciones_agenda_delete AFTER DELETE ON desparasitaciones
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_borradas();
+DROP TRIGGER IF EXISTS trg_desparasitaciones_agenda_update ON desparasitaciones;
+CREATE TRIGGER trg_desparasitaciones_agenda_update AFTER UPDATE ON desparasitaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_actualizadas();
+
+-- Backfill: latest dose per bovino and product from the full history (once)
+TRUNCATE agenda_sanitaria;
+SELECT refrescar_agenda_sanitaria('vacunacion', ARRAY(SELECT id FROM bovinos));
+SELECT refrescar_agenda_sanitaria('desparasitacion', ARRAY(SELECT id FROM bovinos));
+
+COMMIT;
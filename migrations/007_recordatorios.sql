@@ -0,0 +1,242 @@
+-- Migration 007: reminders
+-- Notification outbox (notificaciones) filled by generar_recordatorios() from
+-- the sanitary agenda, UPP/PSG license expiry dates, pending renewals and
+-- rejected documents, with per-source cursors so each run only reads what
+-- changed. agenda_sanitaria gets actualizado_en for that purpose.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/007_recordatorios.sql
+
+BEGIN;
+
+ALTER TABLE agenda_sanitaria ADD COLUMN IF NOT EXISTS actualizado_en TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+-- Outbox of reminders (boosters due, licenses about to expire, renewals to
+-- review, rejected documents). Rows are written in bulk by
+-- generar_recordatorios() and delivered in batches by the API scheduler.
+CREATE TABLE IF NOT EXISTS notificaciones (
+    id BIGSERIAL PRIMARY KEY,
+    usuario_id UUID NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE, -- recipient
+    tipo VARCHAR(30) NOT NULL, -- refuerzo, vencimiento_upp, renovacion_pendiente, documento_rechazado
+    referencia_id UUID, -- bovino, instalacion, renovacion or documento the reminder is about
+    clave TEXT NOT NULL UNIQUE, -- one reminder per source row and due date (reruns are no-ops)
+    titulo VARCHAR(150) NOT NULL,
+    mensaje TEXT NOT NULL,
+    datos JSONB,
+    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente', -- pendiente, enviada, fallida
+    intentos SMALLINT NOT NULL DEFAULT 0,
+    siguiente_intento TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- retry backoff / delivery lease
+    error TEXT,
+    creado_en TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    enviado_en TIMESTAMPTZ
+);
+
+-- Watermarks of generar_recordatorios(), one per reminder source
+CREATE TABLE IF NOT EXISTS recordatorio_cursores (
+    fuente VARCHAR(30) PRIMARY KEY,
+    procesado_hasta TIMESTAMPTZ NOT NULL, -- rows created/changed up to here are already handled
+    ventana_hasta DATE -- last due date already covered by the date window
+);
+
+CREATE INDEX IF NOT EXISTS idx_agenda_sanitaria_actualizado ON agenda_sanitaria(actualizado_en) WHERE fecha_prox IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_notificaciones_pendientes ON notificaciones(siguiente_intento, id) WHERE estado = 'pendiente';
+CREATE INDEX IF NOT EXISTS idx_notificaciones_usuario ON notificaciones(usuario_id, creado_en DESC);
+CREATE INDEX IF NOT EXISTS idx_notificaciones_purga ON notificaciones(creado_en) WHERE estado <> 'pendiente';
+CREATE INDEX IF NOT EXISTS idx_instalaciones_updated ON instalaciones(updated_at);
+CREATE INDEX IF NOT EXISTS idx_renovaciones_upp_solicitud ON renovaciones_upp(fecha_solicitud) WHERE estado = 'pendiente';
+CREATE INDEX IF NOT EXISTS idx_documento_revisiones_rechazo ON documento_revisiones(fecha) WHERE status = 'rechazado';
+
+-- G. Sanitary Agenda (upserts now stamp actualizado_en)
+-- New doses: upsert only the inserted rows; an older dose (e.g. synced late
+-- from an offline device) never replaces a newer one
+CREATE OR REPLACE FUNCTION agenda_dosis_insertadas()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'vacunaciones' THEN
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, n.tipo_id)
+               e.bovino_id, 'vacunacion', n.tipo_id, e.id, n.veterinario_id, e.fecha, n.fecha_prox
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id
+        WHERE n.tipo_id IS NOT NULL
+        ORDER BY e.bovino_id, n.tipo_id, e.fecha DESC, e.id DESC
+        ON CONFLICT (bovino_id, tipo, producto_id) DO UPDATE
+            SET evento_id = EXCLUDED.evento_id, veterinario_id = EXCLUDED.veterinario_id,
+                fecha_aplicacion = EXCLUDED.fecha_aplicacion, fecha_prox = EXCLUDED.fecha_prox,
+                actualizado_en = NOW()
+            WHERE EXCLUDED.fecha_aplicacion >= agenda_sanitaria.fecha_aplicacion;
+    ELSE
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, n.medicamento_id)
+               e.bovino_id, 'desparasitacion', n.medicamento_id, e.id, n.veterinario_id, e.fecha, n.fecha_prox
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id
+        WHERE n.medicamento_id IS NOT NULL
+        ORDER BY e.bovino_id, n.medicamento_id, e.fecha DESC, e.id DESC
+        ON CONFLICT (bovino_id, tipo, producto_id) DO UPDATE
+            SET evento_id = EXCLUDED.evento_id, veterinario_id = EXCLUDED.veterinario_id,
+                fecha_aplicacion = EXCLUDED.fecha_aplicacion, fecha_prox = EXCLUDED.fecha_prox,
+                actualizado_en = NOW()
+            WHERE EXCLUDED.fecha_aplicacion >= agenda_sanitaria.fecha_aplicacion;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- H. Reminders
+-- Writes due reminders to the notificaciones outbox in four set-based
+-- INSERT ... SELECTs. Each source is read incrementally from its cursor in
+-- recordatorio_cursores: rows created or changed since the previous run (up
+-- to NOW() - _margen, so transactions committing late are seen next time),
+-- plus, for date windows, only the due dates that entered the window since
+-- then. The UNIQUE clave turns repeated reminders into no-ops.
+CREATE OR REPLACE FUNCTION generar_recordatorios(_dias_refuerzo INTEGER, _dias_vencimiento INTEGER, _margen INTERVAL)
+RETURNS INTEGER AS $$
+DECLARE
+    _hasta TIMESTAMPTZ := NOW() - _margen;
+    _desde TIMESTAMPTZ;
+    _ventana DATE;
+    _total INTEGER := 0;
+    _n INTEGER;
+BEGIN
+    -- One generator at a time; concurrent workers skip this run
+    IF NOT pg_try_advisory_xact_lock(hashtext('generar_recordatorios')) THEN
+        RETURN 0;
+    END IF;
+
+    -- 1. Vaccination/deworming boosters due within _dias_refuerzo (to the owner)
+    SELECT procesado_hasta, ventana_hasta INTO _desde, _ventana
+    FROM recordatorio_cursores WHERE fuente = 'refuerzo';
+    _desde := COALESCE(_desde, _hasta); -- first run: the date window covers everything
+    _ventana := GREATEST(COALESCE(_ventana, CURRENT_DATE - 1), CURRENT_DATE - 1);
+
+    INSERT INTO notificaciones (usuario_id, tipo, referencia_id, clave, titulo, mensaje, datos)
+    SELECT b.usuario_id, 'refuerzo', a.bovino_id,
+           concat_ws(':', 'refuerzo', a.bovino_id, a.tipo, a.producto_id, a.fecha_prox),
+           'Refuerzo próximo',
+           format('%s de %s para el bovino %s el %s',
+                  CASE a.tipo WHEN 'vacunacion' THEN 'Vacunación' ELSE 'Desparasitación' END, c.nombre, b.folio, a.fecha_prox),
+           jsonb_build_object('bovino_id', a.bovino_id, 'folio', b.folio, 'tipo', a.tipo, 'producto', c.nombre,
+                              'evento_id', a.evento_id, 'fecha_prox', a.fecha_prox)
+    FROM agenda_sanitaria a
+    JOIN bovinos b ON b.id = a.bovino_id
+    JOIN catalogos c ON c.id = a.producto_id
+    WHERE (a.bovino_id, a.tipo, a.producto_id) IN (
+            SELECT bovino_id, tipo, producto_id FROM agenda_sanitaria
+            WHERE fecha_prox > _ventana AND fecha_prox <= CURRENT_DATE + _dias_refuerzo
+            UNION
+            SELECT bovino_id, tipo, producto_id FROM agenda_sanitaria
+            WHERE actualizado_en > _desde AND actualizado_en <= _hasta AND fecha_prox IS NOT NULL
+          )
+      AND a.fecha_prox BETWEEN CURRENT_DATE AND CURRENT_DATE + _dias_refuerzo
+      AND b.status NOT IN ('sacrificado', 'muerto', 'exportado')
+    ON CONFLICT (clave) DO NOTHING;
+    GET DIAGNOSTICS _n = ROW_COUNT;
+    _total := _total + _n;
+
+    INSERT INTO recordatorio_cursores (fuente, procesado_hasta, ventana_hasta)
+    VALUES ('refuerzo', _hasta, GREATEST(_ventana, CURRENT_DATE + _dias_refuerzo))
+    ON CONFLICT (fuente) DO UPDATE
+        SET procesado_hasta = EXCLUDED.procesado_hasta, ventana_hasta = EXCLUDED.ventana_hasta;
+
+    -- 2. UPP/PSG licenses expiring within _dias_vencimiento (to the owner)
+    SELECT procesado_hasta, ventana_hasta INTO _desde, _ventana
+    FROM recordatorio_cursores WHERE fuente = 'vencimiento_upp';
+    _desde := COALESCE(_desde, _hasta);
+    _ventana := GREATEST(COALESCE(_ventana, CURRENT_DATE - 1), CURRENT_DATE - 1);
+
+    INSERT INTO notificaciones (usuario_id, tipo, referencia_id, clave, titulo, mensaje, datos)
+    SELECT i.usuario_id, 'vencimiento_upp', i.id,
+           concat_ws(':', 'vencimiento_upp', i.id, i.fecha_vencimiento),
+           'Licencia por vencer',
+           format('La licencia %s de %s (%s) vence el %s', i.facility_type, i.nombre, i.license_number, i.fecha_vencimiento),
+           jsonb_build_object('instalacion_id', i.id, 'nombre', i.nombre, 'facility_type', i.facility_type,
+                              'license_number', i.license_number, 'fecha_vencimiento', i.fecha_vencimiento)
+    FROM instalaciones i
+    WHERE i.id IN (
+            SELECT id FROM instalaciones
+            WHERE fecha_vencimiento > _ventana AND fecha_vencimiento <= CURRENT_DATE + _dias_vencimiento
+            UNION
+            SELECT id FROM instalaciones
+            WHERE updated_at > _desde AND updated_at <= _hasta
+          )
+      AND i.fecha_vencimiento BETWEEN CURRENT_DATE AND CURRENT_DATE + _dias_vencimiento
+      AND i.facility_type IN ('UPP', 'PSG')
+      AND i.active
+    ON CONFLICT (clave) DO NOTHING;
+    GET DIAGNOSTICS _n = ROW_COUNT;
+    _total := _total + _n;
+
+    INSERT INTO recordatorio_cursores (fuente, procesado_hasta, ventana_hasta)
+    VALUES ('vencimiento_upp', _hasta, GREATEST(_ventana, CURRENT_DATE + _dias_vencimiento))
+    ON CONFLICT (fuente) DO UPDATE
+        SET procesado_hasta = EXCLUDED.procesado_hasta, ventana_hasta = EXCLUDED.ventana_hasta;
+
+    -- 3. New renewal requests waiting for review (to every administrator)
+    SELECT procesado_hasta INTO _desde FROM recordatorio_cursores WHERE fuente = 'renovacion_pendiente';
+    _desde := COALESCE(_desde, '-infinity'); -- first run: every renewal still pending
+
+    INSERT INTO notificaciones (usuario_id, tipo, referencia_id, clave, titulo, mensaje, datos)
+    SELECT u.id, 'renovacion_pendiente', r.id,
+           concat_ws(':', 'renovacion_pendiente', r.id, u.id),
+           'Renovación por revisar',
+           format('%s solicitó renovar la licencia de %s (%s)', s.curp, i.nombre, i.license_number),
+           jsonb_build_object('renovacion_id', r.id, 'instalacion_id', i.id, 'nombre', i.nombre,
+                              'solicitada_por', r.solicitada_por, 'fecha_solicitud', r.fecha_solicitud)
+    FROM renovaciones_upp r
+    JOIN instalaciones i ON i.id = r.instalacion_id
+    JOIN usuarios s ON s.id = r.solicitada_por
+    CROSS JOIN usuarios u
+    WHERE r.estado = 'pendiente'
+      AND r.fecha_solicitud > _desde AND r.fecha_solicitud <= _hasta
+      AND u.rol IN ('administrador', 'superadministrador')
+    ON CONFLICT (clave) DO NOTHING;
+    GET DIAGNOSTICS _n = ROW_COUNT;
+    _total := _total + _n;
+
+    INSERT INTO recordatorio_cursores (fuente, procesado_hasta) VALUES ('renovacion_pendiente', _hasta)
+    ON CONFLICT (fuente) DO UPDATE SET procesado_hasta = EXCLUDED.procesado_hasta;
+
+    -- 4. Rejected documents (to the document owner)
+    SELECT procesado_hasta INTO _desde FROM recordatorio_cursores WHERE fuente = 'documento_rechazado';
+    _desde := COALESCE(_desde, _hasta); -- past rejections are not announced on the first run
+
+    INSERT INTO notificaciones (usuario_id, tipo, referencia_id, clave, titulo, mensaje, datos)
+    SELECT d.usuario_id, 'documento_rechazado', d.id,
+           concat_ws(':', 'documento_rechazado', r.id),
+           'Documento rechazado',
+           format('Tu documento %s fue rechazado%s', COALESCE(d.original_filename, d.doc_type::TEXT), ': ' || r.comentario),
+           jsonb_build_object('documento_id', d.id, 'doc_type', d.doc_type, 'revision_id', r.id,
+                              'comentario', r.comentario, 'fecha', r.fecha)
+    FROM documento_revisiones r
+    JOIN documentos d ON d.id = r.documento_id
+    WHERE r.status = 'rechazado'
+      AND r.fecha > _desde AND r.fecha <= _hasta
+      AND d.usuario_id IS NOT NULL
+    ON CONFLICT (clave) DO NOTHING;
+    GET DIAGNOSTICS _n = ROW_COUNT;
+    _total := _total + _n;
+
+    INSERT INTO recordatorio_cursores (fuente, procesado_hasta) VALUES ('documento_rechazado', _hasta)
+    ON CONFLICT (fuente) DO UPDATE SET procesado_hasta = EXCLUDED.procesado_hasta;
+
+    RETURN _total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Deletes at most _limite delivered or failed notifications older than _retencion
+CREATE OR REPLACE FUNCTION purgar_notificaciones(_retencion INTERVAL, _limite INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    _borrados INTEGER;
+BEGIN
+    DELETE FROM notificaciones
+    WHERE id IN (
+        SELECT id FROM notificaciones
+        WHERE estado <> 'pendiente' AND creado_en < NOW() - _retencion
+        LIMIT _limite
+        FOR UPDATE SKIP LOCKED
+    );
+    GET DIAGNOSTICS _borrados = ROW_COUNT;
+    RETURN _borrados;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
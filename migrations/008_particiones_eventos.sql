@@ -0,0 +1,976 @@
+-- Migration 008: monthly partitions for eventos
+-- eventos and the high-volume detail tables (dietas, pesos, vacunaciones,
+-- desparasitaciones, laboratorios, compraventas, traslado) become range
+-- partitioned by month on the event date. The details carry the parent's
+-- fecha as evento_fecha (part of the key and of the foreign key) so joins and
+-- date filters prune to the same months. Tables are rebuilt and the rows
+-- copied, so run it in a maintenance window.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/008_particiones_eventos.sql
+
+-- Already applied: nothing to do
+SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'eventos'::REGCLASS) AS ya_particionada \gset
+\if :ya_particionada
+\echo 'eventos is already partitioned'
+\quit
+\endif
+
+BEGIN;
+
+-- The partition key cannot be NULL
+UPDATE eventos SET fecha = updated_at WHERE fecha IS NULL;
+
+-- Medical and campaign tables stay as they are but reference eventos by (id, fecha)
+ALTER TABLE enfermedades DROP CONSTRAINT IF EXISTS enfermedades_evento_id_fkey;
+ALTER TABLE tratamientos DROP CONSTRAINT IF EXISTS tratamientos_evento_id_fkey;
+ALTER TABLE remisiones DROP CONSTRAINT IF EXISTS remisiones_evento_id_fkey;
+ALTER TABLE campana_bovinos DROP CONSTRAINT IF EXISTS campana_bovinos_evento_id_fkey;
+
+ALTER TABLE enfermedades ADD COLUMN evento_fecha TIMESTAMPTZ;
+ALTER TABLE tratamientos ADD COLUMN evento_fecha TIMESTAMPTZ;
+ALTER TABLE remisiones ADD COLUMN evento_fecha TIMESTAMPTZ;
+ALTER TABLE campana_bovinos ADD COLUMN evento_fecha TIMESTAMPTZ;
+
+UPDATE enfermedades x SET evento_fecha = e.fecha FROM eventos e WHERE e.id = x.evento_id;
+UPDATE tratamientos x SET evento_fecha = e.fecha FROM eventos e WHERE e.id = x.evento_id;
+UPDATE remisiones x SET evento_fecha = e.fecha FROM eventos e WHERE e.id = x.evento_id;
+UPDATE campana_bovinos x SET evento_fecha = e.fecha FROM eventos e WHERE e.id = x.evento_id;
+
+ALTER TABLE enfermedades ALTER COLUMN evento_fecha SET NOT NULL;
+ALTER TABLE tratamientos ALTER COLUMN evento_fecha SET NOT NULL;
+ALTER TABLE remisiones ALTER COLUMN evento_fecha SET NOT NULL;
+ALTER TABLE campana_bovinos ALTER COLUMN evento_fecha SET NOT NULL;
+
+-- Move the old tables aside (their index names are reused below)
+DROP INDEX IF EXISTS idx_eventos_bovino, idx_eventos_fecha, idx_eventos_sync, idx_pesos_evento,
+    idx_vacunas_evento, idx_vacunas_vet, idx_vacunas_tipo, idx_vacunas_laboratorio,
+    idx_desparasitaciones_medicamento;
+
+DO $$
+DECLARE
+    _tabla TEXT;
+BEGIN
+    FOREACH _tabla IN ARRAY ARRAY['eventos', 'dietas', 'pesos', 'vacunaciones', 'desparasitaciones', 'laboratorios', 'compraventas', 'traslado'] LOOP
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', _tabla, _tabla || '_old');
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', _tabla || '_pkey', _tabla || '_old_pkey');
+    END LOOP;
+END $$;
+
+CREATE TABLE eventos (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    bovino_id UUID NOT NULL REFERENCES bovinos(id) ON DELETE CASCADE,
+    fecha TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- when it happened (may be client-supplied); partition key
+    observaciones TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- when the server stored/changed it
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
+
+-- 6. EVENT DETAILS
+-- ---------------------------------------------------------
+-- evento_fecha is the parent's fecha: it is part of the foreign key and the
+-- partition key, so a detail row always lives in the same month as its evento.
+
+CREATE TABLE dietas (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
+    alimento VARCHAR(100) NOT NULL,
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
+
+CREATE TABLE pesos (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
+    peso_actual DECIMAL(6, 2),
+    peso_nuevo DECIMAL(6, 2),
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
+
+CREATE TABLE vacunaciones (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
+    veterinario_id UUID REFERENCES veterinarios(id),
+    tipo VARCHAR(100),
+    tipo_id INTEGER REFERENCES catalogos(id),
+    lote VARCHAR(50),
+    laboratorio VARCHAR(100),
+    laboratorio_id INTEGER REFERENCES catalogos(id),
+    fecha_prox DATE,
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
+
+CREATE TABLE desparasitaciones (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
+    veterinario_id UUID REFERENCES veterinarios(id),
+    medicamento VARCHAR(100),
+    medicamento_id INTEGER REFERENCES catalogos(id),
+    dosis_admin VARCHAR(50),
+    fecha_prox DATE,
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
+
+CREATE TABLE laboratorios (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
+    veterinario_id UUID REFERENCES veterinarios(id),
+    tipo VARCHAR(100),
+    resultado TEXT,
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
+
+CREATE TABLE compraventas (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
+    comprador_curp VARCHAR(18) REFERENCES usuarios(curp),
+    vendedor_curp VARCHAR(18) REFERENCES usuarios(curp),
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
+
+CREATE TABLE traslado (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    evento_id UUID NOT NULL,
+    evento_fecha TIMESTAMPTZ NOT NULL,
+    predio_anterior_id UUID REFERENCES predios(id), -- NULL when bovino had no predio assigned at time of transfer
+    predio_nuevo_id UUID REFERENCES predios(id),
+    PRIMARY KEY (id, evento_fecha),
+    FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (evento_fecha);
+
+-- Tables partitioned by month on the event date. Partitions are named
+-- <table>_YYYY_MM (bounds in UTC) plus a <table>_default safety net.
+-- Detail tables come first so archival can detach them before eventos.
+CREATE OR REPLACE FUNCTION tablas_particionadas_eventos()
+RETURNS TEXT[] AS $$
+    SELECT ARRAY['dietas', 'pesos', 'vacunaciones', 'desparasitaciones', 'laboratorios', 'compraventas', 'traslado', 'eventos'];
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Creates the missing monthly partitions between _desde and _hasta (and the
+-- default partitions). A month that already has rows in eventos_default is
+-- skipped with a warning, since PostgreSQL cannot carve it out of the default
+-- partition. Returns how many partitions were created.
+CREATE OR REPLACE FUNCTION crear_particiones_eventos(_desde DATE, _hasta DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    _mes DATE := date_trunc('month', _desde);
+    _inicio TIMESTAMPTZ;
+    _fin TIMESTAMPTZ;
+    _tabla TEXT;
+    _creadas INTEGER := 0;
+BEGIN
+    -- Several API workers run this at startup
+    PERFORM pg_advisory_xact_lock(hashtext('crear_particiones_eventos'));
+
+    FOREACH _tabla IN ARRAY tablas_particionadas_eventos() LOOP
+        IF to_regclass(_tabla || '_default') IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', _tabla || '_default', _tabla);
+            _creadas := _creadas + 1;
+        END IF;
+    END LOOP;
+
+    WHILE _mes <= _hasta LOOP
+        _inicio := _mes::TIMESTAMP AT TIME ZONE 'UTC';
+        _fin := (_mes + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC';
+        IF EXISTS (SELECT 1 FROM eventos_default WHERE fecha >= _inicio AND fecha < _fin) THEN
+            RAISE WARNING 'eventos_default has rows for %, partition not created', to_char(_mes, 'YYYY-MM');
+        ELSE
+            FOREACH _tabla IN ARRAY tablas_particionadas_eventos() LOOP
+                CONTINUE WHEN to_regclass(_tabla || to_char(_mes, '_YYYY_MM')) IS NOT NULL;
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               _tabla || to_char(_mes, '_YYYY_MM'), _tabla, _inicio, _fin);
+                _creadas := _creadas + 1;
+            END LOOP;
+        END IF;
+        _mes := _mes + INTERVAL '1 month';
+    END LOOP;
+
+    RETURN _creadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detaches one month of eventos and its detail tables for archival (dump and
+-- drop the returned tables afterwards). The detached detail partitions lose
+-- their foreign key to eventos. Fails while non-partitioned rows (medical
+-- chain, campaign links) still reference eventos of that month.
+CREATE OR REPLACE FUNCTION archivar_particion_eventos(_mes DATE)
+RETURNS TEXT[] AS $$
+DECLARE
+    _tabla TEXT;
+    _particion TEXT;
+    _fk TEXT;
+    _archivadas TEXT[] := '{}';
+BEGIN
+    FOREACH _tabla IN ARRAY tablas_particionadas_eventos() LOOP
+        _particion := _tabla || to_char(_mes, '_YYYY_MM');
+        CONTINUE WHEN to_regclass(_particion) IS NULL;
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', _tabla, _particion);
+        FOR _fk IN
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = _particion::REGCLASS AND contype = 'f' AND confrelid = 'eventos'::REGCLASS
+        LOOP
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', _particion, _fk);
+        END LOOP;
+        _archivadas := _archivadas || _particion;
+    END LOOP;
+    RETURN _archivadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Months covering the existing history (at most 10 years back, older rows go
+-- to the default partitions) and the next 3
+SELECT crear_particiones_eventos(
+    GREATEST(
+        LEAST((SELECT min(fecha) FROM eventos_old), CURRENT_DATE - INTERVAL '12 months'),
+        CURRENT_DATE - INTERVAL '10 years'
+    )::DATE,
+    (CURRENT_DATE + INTERVAL '3 months')::DATE
+);
+
+-- Copy the data (triggers are created afterwards, so nothing fires)
+INSERT INTO eventos (id, bovino_id, fecha, observaciones, updated_at)
+SELECT id, bovino_id, fecha, observaciones, updated_at FROM eventos_old;
+
+INSERT INTO dietas (id, evento_id, evento_fecha, alimento)
+SELECT d.id, d.evento_id, e.fecha, d.alimento
+FROM dietas_old d JOIN eventos_old e ON e.id = d.evento_id;
+
+INSERT INTO pesos (id, evento_id, evento_fecha, peso_actual, peso_nuevo)
+SELECT d.id, d.evento_id, e.fecha, d.peso_actual, d.peso_nuevo
+FROM pesos_old d JOIN eventos_old e ON e.id = d.evento_id;
+
+INSERT INTO vacunaciones (id, evento_id, evento_fecha, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+SELECT d.id, d.evento_id, e.fecha, d.veterinario_id, d.tipo, d.tipo_id, d.lote, d.laboratorio, d.laboratorio_id, d.fecha_prox
+FROM vacunaciones_old d JOIN eventos_old e ON e.id = d.evento_id;
+
+INSERT INTO desparasitaciones (id, evento_id, evento_fecha, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+SELECT d.id, d.evento_id, e.fecha, d.veterinario_id, d.medicamento, d.medicamento_id, d.dosis_admin, d.fecha_prox
+FROM desparasitaciones_old d JOIN eventos_old e ON e.id = d.evento_id;
+
+INSERT INTO laboratorios (id, evento_id, evento_fecha, veterinario_id, tipo, resultado)
+SELECT d.id, d.evento_id, e.fecha, d.veterinario_id, d.tipo, d.resultado
+FROM laboratorios_old d JOIN eventos_old e ON e.id = d.evento_id;
+
+INSERT INTO compraventas (id, evento_id, evento_fecha, comprador_curp, vendedor_curp)
+SELECT d.id, d.evento_id, e.fecha, d.comprador_curp, d.vendedor_curp
+FROM compraventas_old d JOIN eventos_old e ON e.id = d.evento_id;
+
+INSERT INTO traslado (id, evento_id, evento_fecha, predio_anterior_id, predio_nuevo_id)
+SELECT d.id, d.evento_id, e.fecha, d.predio_anterior_id, d.predio_nuevo_id
+FROM traslado_old d JOIN eventos_old e ON e.id = d.evento_id;
+
+DROP TABLE dietas_old, pesos_old, vacunaciones_old, desparasitaciones_old, laboratorios_old,
+    compraventas_old, traslado_old, eventos_old;
+
+ALTER TABLE enfermedades ADD FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE;
+ALTER TABLE tratamientos ADD FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON UPDATE CASCADE;
+ALTER TABLE remisiones ADD FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON UPDATE CASCADE;
+ALTER TABLE campana_bovinos ADD FOREIGN KEY (evento_id, evento_fecha) REFERENCES eventos(id, fecha) ON DELETE CASCADE ON UPDATE CASCADE;
+
+CREATE INDEX idx_eventos_bovino ON eventos(bovino_id);
+CREATE INDEX idx_eventos_fecha ON eventos(fecha);
+CREATE INDEX idx_eventos_sync ON eventos(updated_at, id);
+CREATE INDEX idx_pesos_evento ON pesos(evento_id);
+CREATE INDEX idx_vacunas_evento ON vacunaciones(evento_id);
+CREATE INDEX idx_vacunas_vet ON vacunaciones(veterinario_id);
+CREATE INDEX idx_vacunas_tipo ON vacunaciones(tipo_id);
+CREATE INDEX idx_vacunas_laboratorio ON vacunaciones(laboratorio_id);
+CREATE INDEX idx_desparasitaciones_medicamento ON desparasitaciones(medicamento_id);
+
+CREATE TRIGGER trg_eventos_updated_at BEFORE UPDATE ON eventos
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER trg_eventos_tombstone AFTER DELETE ON eventos
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_tombstones_eventos();
+
+CREATE TRIGGER trg_vacunaciones_agenda_insert AFTER INSERT ON vacunaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_insertadas();
+CREATE TRIGGER trg_vacunaciones_agenda_delete AFTER DELETE ON vacunaciones
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_borradas();
+CREATE TRIGGER trg_vacunaciones_agenda_update AFTER UPDATE ON vacunaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_actualizadas();
+
+CREATE TRIGGER trg_desparasitaciones_agenda_insert AFTER INSERT ON desparasitaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_insertadas();
+CREATE TRIGGER trg_desparasitaciones_agenda_delete AFTER DELETE ON desparasitaciones
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_borradas();
+CREATE TRIGGER trg_desparasitaciones_agenda_update AFTER UPDATE ON desparasitaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION agenda_dosis_actualizadas();
+
+CREATE TRIGGER trg_auto_update_weight
+AFTER INSERT ON pesos
+FOR EACH ROW
+EXECUTE FUNCTION update_cow_current_weight();
+
+CREATE TRIGGER trg_transfer_ownership
+AFTER INSERT ON compraventas
+FOR EACH ROW
+EXECUTE FUNCTION handle_compraventa_transfer();
+
+-- Automatically updates the cow's current weight when a 'peso' event is added
+CREATE OR REPLACE FUNCTION update_cow_current_weight()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE bovinos
+    SET peso_actual = NEW.peso_nuevo
+    FROM eventos
+    WHERE bovinos.id = eventos.bovino_id
+    AND eventos.id = NEW.evento_id
+    AND eventos.fecha = NEW.evento_fecha;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Automatically changes owner and clears location when a 'compraventa' event is added
+CREATE OR REPLACE FUNCTION handle_compraventa_transfer()
+RETURNS TRIGGER AS $$
+DECLARE
+    _comprador_id UUID;
+BEGIN
+    -- Convert comprador CURP to UUID
+    SELECT id INTO _comprador_id FROM usuarios WHERE curp = NEW.comprador_curp;
+
+    -- Update the cow linked to this event:
+    -- 1. Set new owner (comprador_id from CURP)
+    -- 2. Clear the location (predio_id) so the new owner can assign one later
+    UPDATE bovinos
+    SET
+        usuario_id = _comprador_id,
+        predio_id = NULL
+    FROM eventos
+    WHERE bovinos.id = eventos.bovino_id
+    AND eventos.id = NEW.evento_id
+    AND eventos.fecha = NEW.evento_fecha;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rebuilds the agenda rows of some bovinos from their history (latest dose
+-- per product). Used when doses are deleted or re-pointed to another product.
+CREATE OR REPLACE FUNCTION refrescar_agenda_sanitaria(_tipo campana_tipo_enum, _bovino_ids UUID[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM agenda_sanitaria WHERE tipo = _tipo AND bovino_id = ANY(_bovino_ids);
+
+    IF _tipo = 'vacunacion' THEN
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, v.tipo_id)
+               e.bovino_id, _tipo, v.tipo_id, e.id, v.veterinario_id, e.fecha, v.fecha_prox
+        FROM eventos e JOIN vacunaciones v ON v.evento_id = e.id AND v.evento_fecha = e.fecha
+        WHERE e.bovino_id = ANY(_bovino_ids) AND v.tipo_id IS NOT NULL
+        ORDER BY e.bovino_id, v.tipo_id, e.fecha DESC, e.id DESC;
+    ELSE
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, d.medicamento_id)
+               e.bovino_id, _tipo, d.medicamento_id, e.id, d.veterinario_id, e.fecha, d.fecha_prox
+        FROM eventos e JOIN desparasitaciones d ON d.evento_id = e.id AND d.evento_fecha = e.fecha
+        WHERE e.bovino_id = ANY(_bovino_ids) AND d.medicamento_id IS NOT NULL
+        ORDER BY e.bovino_id, d.medicamento_id, e.fecha DESC, e.id DESC;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New doses: upsert only the inserted rows; an older dose (e.g. synced late
+-- from an offline device) never replaces a newer one
+CREATE OR REPLACE FUNCTION agenda_dosis_insertadas()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'vacunaciones' THEN
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, n.tipo_id)
+               e.bovino_id, 'vacunacion', n.tipo_id, e.id, n.veterinario_id, e.fecha, n.fecha_prox
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        WHERE n.tipo_id IS NOT NULL
+        ORDER BY e.bovino_id, n.tipo_id, e.fecha DESC, e.id DESC
+        ON CONFLICT (bovino_id, tipo, producto_id) DO UPDATE
+            SET evento_id = EXCLUDED.evento_id, veterinario_id = EXCLUDED.veterinario_id,
+                fecha_aplicacion = EXCLUDED.fecha_aplicacion, fecha_prox = EXCLUDED.fecha_prox,
+                actualizado_en = NOW()
+            WHERE EXCLUDED.fecha_aplicacion >= agenda_sanitaria.fecha_aplicacion;
+    ELSE
+        INSERT INTO agenda_sanitaria (bovino_id, tipo, producto_id, evento_id, veterinario_id, fecha_aplicacion, fecha_prox)
+        SELECT DISTINCT ON (e.bovino_id, n.medicamento_id)
+               e.bovino_id, 'desparasitacion', n.medicamento_id, e.id, n.veterinario_id, e.fecha, n.fecha_prox
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        WHERE n.medicamento_id IS NOT NULL
+        ORDER BY e.bovino_id, n.medicamento_id, e.fecha DESC, e.id DESC
+        ON CONFLICT (bovino_id, tipo, producto_id) DO UPDATE
+            SET evento_id = EXCLUDED.evento_id, veterinario_id = EXCLUDED.veterinario_id,
+                fecha_aplicacion = EXCLUDED.fecha_aplicacion, fecha_prox = EXCLUDED.fecha_prox,
+                actualizado_en = NOW()
+            WHERE EXCLUDED.fecha_aplicacion >= agenda_sanitaria.fecha_aplicacion;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updated doses (catalog alias merges re-point tipo_id/medicamento_id)
+CREATE OR REPLACE FUNCTION agenda_dosis_actualizadas()
+RETURNS TRIGGER AS $$
+DECLARE
+    _tipo campana_tipo_enum := CASE WHEN TG_TABLE_NAME = 'vacunaciones' THEN 'vacunacion' ELSE 'desparasitacion' END;
+BEGIN
+    PERFORM refrescar_agenda_sanitaria(_tipo, ARRAY(
+        SELECT DISTINCT e.bovino_id FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The registration functions write evento_fecha on the detail rows
+CREATE OR REPLACE FUNCTION registrar_peso(
+    _bovino_id UUID,
+    _peso_nuevo DECIMAL,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _peso_anterior DECIMAL;
+BEGIN
+    -- 1. Get current weight for history
+    SELECT peso_actual INTO _peso_anterior FROM bovinos WHERE id = _bovino_id;
+
+    -- 2. Create Event
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    -- 3. Create Detail
+    INSERT INTO pesos (evento_id, evento_fecha, peso_actual, peso_nuevo)
+    VALUES (_evento_id, _fecha, COALESCE(_peso_anterior, 0), _peso_nuevo);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_dieta(
+    _bovino_id UUID,
+    _alimento VARCHAR,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+BEGIN
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    INSERT INTO dietas (evento_id, evento_fecha, alimento)
+    VALUES (_evento_id, _fecha, _alimento);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_vacunacion(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _tipo VARCHAR, -- e.g. "Fiebre Aftosa"
+    _lote VARCHAR,
+    _laboratorio VARCHAR,
+    _fecha_prox DATE,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    INSERT INTO vacunaciones (evento_id, evento_fecha, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+    VALUES (_evento_id, _fecha, _vet_id, _tipo, resolver_catalogo('vacuna', _tipo), _lote,
+            _laboratorio, resolver_catalogo('laboratorio', _laboratorio), _fecha_prox);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_desparasitacion(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _medicamento VARCHAR,
+    _dosis VARCHAR,
+    _fecha_prox DATE,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    INSERT INTO desparasitaciones (evento_id, evento_fecha, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+    VALUES (_evento_id, _fecha, _vet_id, _medicamento, resolver_catalogo('medicamento', _medicamento), _dosis, _fecha_prox);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_laboratorio(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _tipo VARCHAR, -- e.g. "Sangre"
+    _resultado TEXT,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    INSERT INTO laboratorios (evento_id, evento_fecha, veterinario_id, tipo, resultado)
+    VALUES (_evento_id, _fecha, _vet_id, _tipo, _resultado);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_compraventa(
+    _bovino_id UUID,
+    _comprador_curp VARCHAR(18),
+    _vendedor_curp VARCHAR(18),
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _comprador_id UUID;
+BEGIN
+    -- Get comprador UUID from CURP
+    SELECT id INTO _comprador_id FROM usuarios WHERE curp = _comprador_curp;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    -- This INSERT will fire the 'trg_transfer_ownership' trigger
+    INSERT INTO compraventas (evento_id, evento_fecha, comprador_curp, vendedor_curp)
+    VALUES (_evento_id, _fecha, _comprador_curp, _vendedor_curp);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_traslado(
+    _bovino_id UUID,
+    _predio_nuevo_id UUID,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _predio_anterior_id UUID;
+BEGIN
+    -- 1. Get current location
+    SELECT predio_id INTO _predio_anterior_id FROM bovinos WHERE id = _bovino_id;
+
+    -- 2. Create Event
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    -- 3. Create Detail
+    INSERT INTO traslado (evento_id, evento_fecha, predio_anterior_id, predio_nuevo_id)
+    VALUES (_evento_id, _fecha, _predio_anterior_id, _predio_nuevo_id);
+
+    -- 4. Update the cow's location (Manual update required here, unlike Sales)
+    UPDATE bovinos SET predio_id = _predio_nuevo_id WHERE id = _bovino_id;
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_enfermedad(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _tipo VARCHAR, -- Diagnosis
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _enfermedad_id UUID;
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    INSERT INTO enfermedades (evento_id, evento_fecha, veterinario_id, tipo, tipo_id)
+    VALUES (_evento_id, _fecha, _vet_id, _tipo, resolver_catalogo('enfermedad', _tipo))
+    RETURNING id INTO _enfermedad_id;
+
+    UPDATE bovinos SET status = 'enfermo' WHERE id = _bovino_id;
+
+    -- Return Disease ID so the frontend can immediately link a treatment to it
+    RETURN _enfermedad_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_tratamiento(
+    _bovino_id UUID,
+    _enfermedad_id UUID, -- Must link to an existing disease case
+    _usuario_id UUID,
+    _medicamento VARCHAR,
+    _dosis VARCHAR,
+    _periodo VARCHAR,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    INSERT INTO tratamientos (evento_id, evento_fecha, enfermedad_id, veterinario_id, medicamento, medicamento_id, dosis, periodo)
+    VALUES (_evento_id, _fecha, _enfermedad_id, _vet_id, _medicamento, resolver_catalogo('medicamento', _medicamento), _dosis, _periodo);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_remision(
+    _bovino_id UUID,
+    _enfermedad_id UUID, -- Must link to an existing disease case
+    _usuario_id UUID,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    INSERT INTO remisiones (evento_id, evento_fecha, enfermedad_id, veterinario_id)
+    VALUES (_evento_id, _fecha, _enfermedad_id, _vet_id);
+
+    UPDATE bovinos SET status = 'activo' WHERE id = _bovino_id;
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_pesos_lote(
+    _bovino_ids UUID[],
+    _pesos DECIMAL[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+BEGIN
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.peso_nuevo, COALESCE(d.fecha, NOW()) AS fecha,
+               COALESCE(d.obs, '') AS obs, gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _pesos, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, peso_nuevo, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO pesos (evento_id, evento_fecha, peso_actual, peso_nuevo)
+        SELECT d.evento_id, d.fecha,
+               COALESCE(lag(d.peso_nuevo) OVER (PARTITION BY d.bovino_id ORDER BY d.fecha, d.ord), b.peso_actual, 0),
+               d.peso_nuevo
+        FROM datos d
+        JOIN bovinos b ON b.id = d.bovino_id
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_dietas_lote(
+    _bovino_ids UUID[],
+    _alimentos VARCHAR[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+BEGIN
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.alimento, COALESCE(d.fecha, NOW()) AS fecha,
+               COALESCE(d.obs, '') AS obs, gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _alimentos, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, alimento, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO dietas (evento_id, evento_fecha, alimento)
+        SELECT evento_id, fecha, alimento FROM datos
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_vacunaciones_lote(
+    _usuario_id UUID,
+    _bovino_ids UUID[],
+    _tipos VARCHAR[],
+    _lotes VARCHAR[],
+    _laboratorios VARCHAR[],
+    _fechas_prox DATE[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    PERFORM resolver_catalogo('vacuna', t) FROM (SELECT DISTINCT unnest(_tipos)) AS x(t);
+    PERFORM resolver_catalogo('laboratorio', l) FROM (SELECT DISTINCT unnest(_laboratorios)) AS x(l);
+
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.tipo, d.lote, d.laboratorio, d.fecha_prox,
+               COALESCE(d.fecha, NOW()) AS fecha, COALESCE(d.obs, '') AS obs,
+               gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _tipos, _lotes, _laboratorios, _fechas_prox, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, tipo, lote, laboratorio, fecha_prox, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO vacunaciones (evento_id, evento_fecha, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+        SELECT d.evento_id, d.fecha, _vet_id, d.tipo, at.catalogo_id, d.lote, d.laboratorio, al.catalogo_id, d.fecha_prox
+        FROM datos d
+        LEFT JOIN catalogo_alias at ON at.tipo = 'vacuna' AND at.alias = normalizar_catalogo(d.tipo)
+        LEFT JOIN catalogo_alias al ON al.tipo = 'laboratorio' AND al.alias = normalizar_catalogo(d.laboratorio)
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_desparasitaciones_lote(
+    _usuario_id UUID,
+    _bovino_ids UUID[],
+    _medicamentos VARCHAR[],
+    _dosis VARCHAR[],
+    _fechas_prox DATE[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    PERFORM resolver_catalogo('medicamento', m) FROM (SELECT DISTINCT unnest(_medicamentos)) AS x(m);
+
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.medicamento, d.dosis, d.fecha_prox,
+               COALESCE(d.fecha, NOW()) AS fecha, COALESCE(d.obs, '') AS obs,
+               gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _medicamentos, _dosis, _fechas_prox, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, medicamento, dosis, fecha_prox, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO desparasitaciones (evento_id, evento_fecha, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+        SELECT d.evento_id, d.fecha, _vet_id, d.medicamento, a.catalogo_id, d.dosis, d.fecha_prox
+        FROM datos d
+        LEFT JOIN catalogo_alias a ON a.tipo = 'medicamento' AND a.alias = normalizar_catalogo(d.medicamento)
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_laboratorios_lote(
+    _usuario_id UUID,
+    _bovino_ids UUID[],
+    _tipos VARCHAR[],
+    _resultados TEXT[],
+    _fechas TIMESTAMPTZ[],
+    _observaciones TEXT[]
+) RETURNS UUID[] AS $$
+DECLARE
+    _ids UUID[];
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    WITH datos AS MATERIALIZED (
+        SELECT d.ord, d.bovino_id, d.tipo, d.resultado,
+               COALESCE(d.fecha, NOW()) AS fecha, COALESCE(d.obs, '') AS obs,
+               gen_random_uuid() AS evento_id
+        FROM unnest(_bovino_ids, _tipos, _resultados, _fechas, _observaciones)
+             WITH ORDINALITY AS d(bovino_id, tipo, resultado, fecha, obs, ord)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, obs FROM datos
+    ), det AS (
+        INSERT INTO laboratorios (evento_id, evento_fecha, veterinario_id, tipo, resultado)
+        SELECT evento_id, fecha, _vet_id, tipo, resultado FROM datos
+    )
+    SELECT array_agg(evento_id ORDER BY ord) INTO _ids FROM datos;
+
+    RETURN _ids;
+END;
+$$ LANGUAGE plpgsql;
+
+-- detail rows and the campana_bovinos links. _bovino_ids limits the run to
+-- the animals handled today (NULL = every pending bovino).
+CREATE OR REPLACE FUNCTION aplicar_campana(
+    _campana_id UUID,
+    _bovino_ids UUID[] DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+    _c campanas%ROWTYPE;
+    _aplicados INTEGER;
+BEGIN
+    -- Row lock serializes concurrent runs of the same campaign
+    SELECT * INTO _c FROM campanas WHERE id = _campana_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Campaign % not found', _campana_id;
+    END IF;
+    IF _c.estado = 'cerrada' THEN
+        RAISE EXCEPTION 'Campaign % is closed', _campana_id;
+    END IF;
+
+    WITH objetivo AS MATERIALIZED (
+        SELECT p.bovino_id, gen_random_uuid() AS evento_id, NOW() AS fecha
+        FROM campana_pendientes(_campana_id) p
+        WHERE _bovino_ids IS NULL OR p.bovino_id = ANY(_bovino_ids)
+    ), ev AS (
+        INSERT INTO eventos (id, bovino_id, fecha, observaciones)
+        SELECT evento_id, bovino_id, fecha, COALESCE(_c.observaciones, '') FROM objetivo
+    ), vac AS (
+        INSERT INTO vacunaciones (evento_id, evento_fecha, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+        SELECT evento_id, fecha, _c.veterinario_id, _c.producto, _c.producto_id, _c.lote,
+               _c.laboratorio, _c.laboratorio_id, _c.fecha_prox
+        FROM objetivo WHERE _c.tipo = 'vacunacion'
+    ), desp AS (
+        INSERT INTO desparasitaciones (evento_id, evento_fecha, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+        SELECT evento_id, fecha, _c.veterinario_id, _c.producto, _c.producto_id, _c.dosis, _c.fecha_prox
+        FROM objetivo WHERE _c.tipo = 'desparasitacion'
+    ), links AS (
+        INSERT INTO campana_bovinos (campana_id, bovino_id, evento_id, evento_fecha)
+        SELECT _campana_id, bovino_id, evento_id, fecha FROM objetivo
+    )
+    SELECT count(*) INTO _aplicados FROM objetivo;
+
+    IF _aplicados > 0 THEN
+        UPDATE campanas
+        SET total_aplicados = total_aplicados + _aplicados,
+            estado = 'en_curso',
+            ultima_aplicacion = NOW()
+        WHERE id = _campana_id;
+    END IF;
+
+    RETURN _aplicados;
+END;
+$$ LANGUAGE plpgsql;
+
+-- detail rows and links go with them through ON DELETE CASCADE)
+CREATE OR REPLACE FUNCTION revertir_campana(
+    _campana_id UUID,
+    _ventana INTERVAL
+) RETURNS INTEGER AS $$
+DECLARE
+    _revertidos INTEGER;
+BEGIN
+    PERFORM 1 FROM campanas WHERE id = _campana_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Campaign % not found', _campana_id;
+    END IF;
+
+    WITH borrados AS (
+        DELETE FROM eventos
+        WHERE (id, fecha) IN (
+            SELECT evento_id, evento_fecha FROM campana_bovinos
+            WHERE campana_id = _campana_id AND aplicado_en >= NOW() - _ventana
+        )
+        RETURNING id
+    )
+    SELECT count(*) INTO _revertidos FROM borrados;
+
+    UPDATE campanas
+    SET total_aplicados = total_aplicados - _revertidos,
+        estado = CASE WHEN total_aplicados - _revertidos = 0 THEN 'programada'::campana_estado_enum ELSE estado END
+    WHERE id = _campana_id;
+
+    RETURN _revertidos;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
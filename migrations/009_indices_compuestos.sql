@@ -0,0 +1,41 @@
+-- Migration 009: composite and missing indexes for the hot queries
+-- Replaces eventos(bovino_id) with (bovino_id, fecha DESC) and indexes the
+-- event detail, document and movilización lookups that were scanning tables.
+-- `python -m app.planes` checks that every listed query can use an index.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/009_indices_compuestos.sql
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_eventos_bovino_fecha ON eventos(bovino_id, fecha DESC);
+DROP INDEX IF EXISTS idx_eventos_bovino;
+
+CREATE INDEX IF NOT EXISTS idx_dietas_evento ON dietas(evento_id);
+CREATE INDEX IF NOT EXISTS idx_desparasitaciones_evento ON desparasitaciones(evento_id);
+CREATE INDEX IF NOT EXISTS idx_laboratorios_evento ON laboratorios(evento_id);
+CREATE INDEX IF NOT EXISTS idx_compraventas_evento ON compraventas(evento_id);
+CREATE INDEX IF NOT EXISTS idx_compraventas_comprador ON compraventas(comprador_curp);
+CREATE INDEX IF NOT EXISTS idx_traslado_evento ON traslado(evento_id);
+CREATE INDEX IF NOT EXISTS idx_tratamientos_evento ON tratamientos(evento_id);
+CREATE INDEX IF NOT EXISTS idx_tratamientos_enfermedad ON tratamientos(enfermedad_id);
+CREATE INDEX IF NOT EXISTS idx_remisiones_evento ON remisiones(evento_id);
+CREATE INDEX IF NOT EXISTS idx_remisiones_enfermedad ON remisiones(enfermedad_id);
+
+CREATE INDEX IF NOT EXISTS idx_documentos_usuario_tipo ON documentos(usuario_id, doc_type);
+CREATE INDEX IF NOT EXISTS idx_documentos_usuario_creado ON documentos(usuario_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_documentos_pendientes ON documentos(created_at) WHERE authored = FALSE;
+-- text_pattern_ops lets LIKE 'prefix%' use the index under any collation
+CREATE INDEX IF NOT EXISTS idx_documentos_storage_key ON documentos(storage_key text_pattern_ops);
+
+-- Movilización tables are created by the API (create_all), which also
+-- creates these indexes when it creates the tables
+DO $$
+BEGIN
+    IF to_regclass('movilizaciones') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS idx_movilizaciones_solicitante ON movilizaciones(solicitante_id, fecha_solicitud);
+        CREATE INDEX IF NOT EXISTS idx_movilizacion_bovinos_bovino ON movilizacion_bovinos(bovino_id);
+        CREATE INDEX IF NOT EXISTS idx_movilizacion_eventos_movilizacion ON movilizacion_eventos(movilizacion_id);
+    END IF;
+END $$;
+
+COMMIT;
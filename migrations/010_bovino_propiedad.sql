@@ -0,0 +1,166 @@
+-- Migration 010: ownership history (bovino_propiedad)
+-- Ownership periods as tstzrange per bovino, kept by the compraventa and
+-- bovinos triggers, and backfilled from the compraventas on record. Per-owner
+-- event listings filter by range containment instead of a correlated
+-- acquisition-date subquery. Also fixes handle_compraventa_transfer, which
+-- cleared a predio_id column bovinos does not have.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/010_bovino_propiedad.sql
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- One row per period a user owned a bovino; the open period (no upper
+-- bound) is the current owner. The first owner's period starts at
+-- -infinity. Written by registrar_propiedad() from the compraventa and
+-- bovinos triggers, so listings filter events by range containment instead
+-- of looking up the acquisition date per row.
+CREATE TABLE IF NOT EXISTS bovino_propiedad (
+    id BIGSERIAL PRIMARY KEY,
+    bovino_id UUID NOT NULL REFERENCES bovinos(id) ON DELETE CASCADE,
+    usuario_id UUID NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    periodo TSTZRANGE NOT NULL,
+    evento_id UUID, -- compraventa that opened the period (NULL: first owner or a change outside compraventas)
+    EXCLUDE USING gist (bovino_id WITH =, periodo WITH &&)
+);
+
+CREATE INDEX IF NOT EXISTS idx_bovino_propiedad_usuario ON bovino_propiedad(usuario_id, bovino_id);
+
+-- B. Transfer Ownership Automation (NEW)
+-- Ownership periods (bovino_propiedad): closes each bovino's open period at
+-- _desde and opens one for its new owner (a NULL owner only closes it).
+-- Transfers to the current owner, or dated before the open period started
+-- (a sale synced late from an offline device), leave the history as is.
+CREATE OR REPLACE FUNCTION registrar_propiedad(
+    _bovino_ids UUID[],
+    _usuario_ids UUID[],
+    _desde TIMESTAMPTZ[],
+    _evento_ids UUID[] DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+    _b UUID[];
+    _u UUID[];
+    _d TIMESTAMPTZ[];
+    _e UUID[];
+    _abiertos BIGINT[];
+    _insertados INTEGER;
+BEGIN
+    SELECT array_agg(c.bovino_id), array_agg(c.usuario_id), array_agg(c.desde), array_agg(c.evento_id), array_agg(p.id)
+    INTO _b, _u, _d, _e, _abiertos
+    FROM (
+        SELECT DISTINCT ON (x.bovino_id) x.*
+        FROM unnest(_bovino_ids, _usuario_ids, _desde, COALESCE(_evento_ids, ARRAY[]::UUID[]))
+             AS x(bovino_id, usuario_id, desde, evento_id)
+        WHERE x.bovino_id IS NOT NULL
+        ORDER BY x.bovino_id, x.desde DESC
+    ) c
+    LEFT JOIN bovino_propiedad p ON p.bovino_id = c.bovino_id AND upper_inf(p.periodo)
+    WHERE p.id IS NULL
+       OR (p.usuario_id IS DISTINCT FROM c.usuario_id AND lower(p.periodo) < c.desde);
+
+    -- Close first: the new period would overlap the open one
+    UPDATE bovino_propiedad p
+    SET periodo = tstzrange(lower(p.periodo), x.desde)
+    FROM unnest(_abiertos, _d) AS x(id, desde)
+    WHERE p.id = x.id;
+
+    INSERT INTO bovino_propiedad (bovino_id, usuario_id, periodo, evento_id)
+    SELECT x.bovino_id, x.usuario_id, tstzrange(x.desde, NULL), x.evento_id
+    FROM unnest(_b, _u, _d, _e) AS x(bovino_id, usuario_id, desde, evento_id)
+    WHERE x.usuario_id IS NOT NULL;
+    GET DIAGNOSTICS _insertados = ROW_COUNT;
+
+    RETURN _insertados;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Automatically changes owner and clears location when a 'compraventa' event is added.
+-- The new ownership period starts at the sale's date.
+CREATE OR REPLACE FUNCTION handle_compraventa_transfer()
+RETURNS TRIGGER AS $$
+DECLARE
+    _comprador_id UUID;
+    _bovino_id UUID;
+BEGIN
+    -- Convert comprador CURP to UUID
+    SELECT id INTO _comprador_id FROM usuarios WHERE curp = NEW.comprador_curp;
+    SELECT bovino_id INTO _bovino_id FROM eventos WHERE id = NEW.evento_id AND fecha = NEW.evento_fecha;
+
+    -- Lock the bovino so concurrent sales of it record their periods one at a time
+    PERFORM 1 FROM bovinos WHERE id = _bovino_id FOR UPDATE;
+    PERFORM registrar_propiedad(ARRAY[_bovino_id], ARRAY[_comprador_id], ARRAY[NEW.evento_fecha], ARRAY[NEW.evento_id]);
+
+    -- Update the cow linked to this event:
+    -- 1. Set new owner (comprador_id from CURP)
+    -- 2. Clear the location (instalacion_id) so the new owner can assign one later
+    UPDATE bovinos
+    SET
+        usuario_id = _comprador_id,
+        instalacion_id = NULL
+    WHERE id = _bovino_id;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New bovinos open their first owner's period; owner changes made outside
+-- compraventas (movilización completion, admin edits) are recorded as of now.
+-- Changes already recorded by handle_compraventa_transfer are no-ops here.
+CREATE OR REPLACE FUNCTION propiedad_bovinos_nuevos()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM registrar_propiedad(array_agg(id), array_agg(usuario_id), array_agg('-infinity'::TIMESTAMPTZ))
+    FROM nuevos WHERE usuario_id IS NOT NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bovinos_propiedad_insert ON bovinos;
+CREATE TRIGGER trg_bovinos_propiedad_insert AFTER INSERT ON bovinos
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION propiedad_bovinos_nuevos();
+
+CREATE OR REPLACE FUNCTION propiedad_cambio_propietario()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM registrar_propiedad(array_agg(n.id), array_agg(n.usuario_id), array_agg(NOW()))
+    FROM viejos v
+    JOIN nuevos n ON n.id = v.id
+    WHERE v.usuario_id IS DISTINCT FROM n.usuario_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bovinos_propiedad_update ON bovinos;
+CREATE TRIGGER trg_bovinos_propiedad_update AFTER UPDATE ON bovinos
+REFERENCING OLD TABLE AS viejos NEW TABLE AS nuevos
+FOR EACH STATEMENT EXECUTE FUNCTION propiedad_cambio_propietario();
+
+-- Backfill: the first owner (usuario_original_id) from -infinity, then each
+-- buyer from the date of their compraventa until the next one
+INSERT INTO bovino_propiedad (bovino_id, usuario_id, periodo, evento_id)
+SELECT bovino_id, usuario_id, tstzrange(desde, hasta), evento_id
+FROM (
+    SELECT t.*, LEAD(t.desde) OVER (PARTITION BY t.bovino_id ORDER BY t.desde, t.orden) AS hasta
+    FROM (
+        SELECT b.id AS bovino_id, COALESCE(b.usuario_original_id, b.usuario_id) AS usuario_id,
+               '-infinity'::TIMESTAMPTZ AS desde, NULL::UUID AS evento_id, 0 AS orden
+        FROM bovinos b
+        UNION ALL
+        SELECT e.bovino_id, u.id, e.fecha, e.id, 1
+        FROM compraventas c
+        JOIN eventos e ON e.id = c.evento_id AND e.fecha = c.evento_fecha
+        JOIN usuarios u ON u.curp = c.comprador_curp
+    ) t
+) x
+WHERE usuario_id IS NOT NULL
+  AND (hasta IS NULL OR desde < hasta)
+  AND NOT EXISTS (SELECT 1 FROM bovino_propiedad);
+
+-- Owners changed outside compraventas get a period starting now
+SELECT registrar_propiedad(array_agg(b.id), array_agg(b.usuario_id), array_agg(NOW()))
+FROM bovinos b
+LEFT JOIN bovino_propiedad p ON p.bovino_id = b.id AND upper_inf(p.periodo)
+WHERE p.usuario_id IS DISTINCT FROM b.usuario_id;
+
+COMMIT;
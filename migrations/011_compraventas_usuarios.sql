@@ -0,0 +1,107 @@
+-- Migration 011: buyer and seller ids on compraventas
+-- Adds comprador_id / vendedor_id (UUID keys to usuarios), filled from the
+-- CURPs by a BEFORE INSERT trigger and backfilled here, with indexes for the
+-- per-user sale history and summary (/eventos/compraventas/historial and
+-- /resumen). The ownership transfer trigger reads comprador_id directly.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/011_compraventas_usuarios.sql
+
+BEGIN;
+
+ALTER TABLE compraventas ADD COLUMN IF NOT EXISTS comprador_id UUID REFERENCES usuarios(id);
+ALTER TABLE compraventas ADD COLUMN IF NOT EXISTS vendedor_id UUID REFERENCES usuarios(id);
+
+UPDATE compraventas c SET comprador_id = u.id
+FROM usuarios u
+WHERE c.comprador_id IS NULL AND u.curp = c.comprador_curp;
+
+UPDATE compraventas c SET vendedor_id = u.id
+FROM usuarios u
+WHERE c.vendedor_id IS NULL AND u.curp = c.vendedor_curp;
+
+-- Lookups go by id now; the CURP index from 009 is replaced
+DROP INDEX IF EXISTS idx_compraventas_comprador;
+CREATE INDEX idx_compraventas_comprador ON compraventas(comprador_id, evento_fecha DESC);
+CREATE INDEX IF NOT EXISTS idx_compraventas_vendedor ON compraventas(vendedor_id, evento_fecha DESC);
+
+-- Keeps the buyer/seller ids and CURPs of a compraventa in step, whichever
+-- of the two the insert provides, so reports join on the UUID keys.
+CREATE OR REPLACE FUNCTION compraventa_usuarios()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.comprador_id IS NULL THEN
+        SELECT id INTO NEW.comprador_id FROM usuarios WHERE curp = NEW.comprador_curp;
+    ELSIF NEW.comprador_curp IS NULL THEN
+        SELECT curp INTO NEW.comprador_curp FROM usuarios WHERE id = NEW.comprador_id;
+    END IF;
+    IF NEW.vendedor_id IS NULL THEN
+        SELECT id INTO NEW.vendedor_id FROM usuarios WHERE curp = NEW.vendedor_curp;
+    ELSIF NEW.vendedor_curp IS NULL THEN
+        SELECT curp INTO NEW.vendedor_curp FROM usuarios WHERE id = NEW.vendedor_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_compraventa_usuarios ON compraventas;
+CREATE TRIGGER trg_compraventa_usuarios
+BEFORE INSERT ON compraventas
+FOR EACH ROW
+EXECUTE FUNCTION compraventa_usuarios();
+
+-- Automatically changes owner and clears location when a 'compraventa' event is added.
+-- The new ownership period starts at the sale's date.
+CREATE OR REPLACE FUNCTION handle_compraventa_transfer()
+RETURNS TRIGGER AS $$
+DECLARE
+    _comprador_id UUID := NEW.comprador_id;
+    _bovino_id UUID;
+BEGIN
+    SELECT bovino_id INTO _bovino_id FROM eventos WHERE id = NEW.evento_id AND fecha = NEW.evento_fecha;
+
+    -- Lock the bovino so concurrent sales of it record their periods one at a time
+    PERFORM 1 FROM bovinos WHERE id = _bovino_id FOR UPDATE;
+    PERFORM registrar_propiedad(ARRAY[_bovino_id], ARRAY[_comprador_id], ARRAY[NEW.evento_fecha], ARRAY[NEW.evento_id]);
+
+    -- Update the cow linked to this event:
+    -- 1. Set new owner (comprador_id)
+    -- 2. Clear the location (instalacion_id) so the new owner can assign one later
+    UPDATE bovinos
+    SET
+        usuario_id = _comprador_id,
+        instalacion_id = NULL
+    WHERE id = _bovino_id;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_compraventa(
+    _bovino_id UUID,
+    _comprador_curp VARCHAR(18),
+    _vendedor_curp VARCHAR(18),
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT ''
+) RETURNS UUID AS $$
+DECLARE
+    _evento_id UUID;
+    _comprador_id UUID;
+    _vendedor_id UUID;
+BEGIN
+    -- Get comprador and vendedor UUIDs from CURP
+    SELECT id INTO _comprador_id FROM usuarios WHERE curp = _comprador_curp;
+    SELECT id INTO _vendedor_id FROM usuarios WHERE curp = _vendedor_curp;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING id, fecha INTO _evento_id, _fecha;
+
+    -- This INSERT will fire the 'trg_transfer_ownership' trigger
+    INSERT INTO compraventas (evento_id, evento_fecha, comprador_curp, vendedor_curp, comprador_id, vendedor_id)
+    VALUES (_evento_id, _fecha, _comprador_curp, _vendedor_curp, _comprador_id, _vendedor_id);
+
+    RETURN _evento_id;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,269 @@
+-- Migration 012: bovino_resumen read model
+-- Current state per bovino (last weight, last vaccination and next booster,
+-- open diseases, last movilización, current owner's start), maintained by
+-- statement-level triggers on the event tables and exposed with
+-- GET /bovinos/?resumen=true. Backfilled from the history below.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/012_bovino_resumen.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS bovino_resumen (
+    bovino_id UUID PRIMARY KEY REFERENCES bovinos(id) ON DELETE CASCADE,
+    ultimo_peso DECIMAL(6, 2),
+    ultimo_peso_fecha TIMESTAMPTZ,
+    ultima_vacunacion_tipo VARCHAR(100),
+    ultima_vacunacion_fecha TIMESTAMPTZ,
+    proxima_vacunacion DATE, -- earliest booster date in agenda_sanitaria
+    enfermedades_abiertas INTEGER NOT NULL DEFAULT 0, -- enfermedades without a remision
+    enfermedad_abierta_tipo VARCHAR(100), -- latest open one
+    enfermedad_abierta_fecha TIMESTAMPTZ,
+    ultima_movilizacion_id UUID,
+    ultima_movilizacion_estado VARCHAR(20),
+    ultima_movilizacion_fecha TIMESTAMPTZ, -- fecha_solicitud
+    propietario_desde TIMESTAMPTZ, -- start of the current owner's period (NULL: first owner)
+    actualizado_en TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION refrescar_bovino_resumen(_bovino_ids UUID[])
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO bovino_resumen (bovino_id, ultimo_peso, ultimo_peso_fecha, ultima_vacunacion_tipo, ultima_vacunacion_fecha,
+                                proxima_vacunacion, enfermedades_abiertas, enfermedad_abierta_tipo, enfermedad_abierta_fecha,
+                                propietario_desde)
+    SELECT b.id, p.peso_nuevo, p.fecha, v.tipo, v.fecha, a.fecha_prox,
+           COALESCE(enf.abiertas, 0), enf.tipo, enf.fecha, NULLIF(lower(bp.periodo), '-infinity')
+    FROM bovinos b
+    LEFT JOIN LATERAL (
+        SELECT p.peso_nuevo, e.fecha
+        FROM eventos e JOIN pesos p ON p.evento_id = e.id AND p.evento_fecha = e.fecha
+        WHERE e.bovino_id = b.id
+        ORDER BY e.fecha DESC, e.id DESC LIMIT 1
+    ) p ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT v.tipo, e.fecha
+        FROM eventos e JOIN vacunaciones v ON v.evento_id = e.id AND v.evento_fecha = e.fecha
+        WHERE e.bovino_id = b.id
+        ORDER BY e.fecha DESC, e.id DESC LIMIT 1
+    ) v ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT MIN(fecha_prox) AS fecha_prox FROM agenda_sanitaria
+        WHERE bovino_id = b.id AND tipo = 'vacunacion'
+    ) a ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT COUNT(*) OVER () AS abiertas, en.tipo, e.fecha
+        FROM eventos e JOIN enfermedades en ON en.evento_id = e.id AND en.evento_fecha = e.fecha
+        WHERE e.bovino_id = b.id
+          AND NOT EXISTS (SELECT 1 FROM remisiones r WHERE r.enfermedad_id = en.id)
+        ORDER BY e.fecha DESC, e.id DESC LIMIT 1
+    ) enf ON TRUE
+    LEFT JOIN bovino_propiedad bp ON bp.bovino_id = b.id AND upper_inf(bp.periodo)
+    WHERE b.id = ANY(_bovino_ids)
+    ON CONFLICT (bovino_id) DO UPDATE
+        SET ultimo_peso = EXCLUDED.ultimo_peso, ultimo_peso_fecha = EXCLUDED.ultimo_peso_fecha,
+            ultima_vacunacion_tipo = EXCLUDED.ultima_vacunacion_tipo, ultima_vacunacion_fecha = EXCLUDED.ultima_vacunacion_fecha,
+            proxima_vacunacion = EXCLUDED.proxima_vacunacion, enfermedades_abiertas = EXCLUDED.enfermedades_abiertas,
+            enfermedad_abierta_tipo = EXCLUDED.enfermedad_abierta_tipo, enfermedad_abierta_fecha = EXCLUDED.enfermedad_abierta_fecha,
+            propietario_desde = EXCLUDED.propietario_desde, actualizado_en = NOW();
+
+    IF to_regclass('movilizacion_bovinos') IS NOT NULL THEN
+        UPDATE bovino_resumen r
+        SET ultima_movilizacion_id = m.id, ultima_movilizacion_estado = m.estado,
+            ultima_movilizacion_fecha = m.fecha_solicitud, actualizado_en = NOW()
+        FROM unnest(_bovino_ids) AS b(id)
+        LEFT JOIN LATERAL (
+            SELECT m.id, m.estado::TEXT AS estado, m.fecha_solicitud
+            FROM movilizacion_bovinos mb JOIN movilizaciones m ON m.id = mb.movilizacion_id
+            WHERE mb.bovino_id = b.id
+            ORDER BY m.fecha_solicitud DESC, m.id DESC LIMIT 1
+        ) m ON TRUE
+        WHERE r.bovino_id = b.id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New bovinos start with an empty summary
+CREATE OR REPLACE FUNCTION resumen_bovinos_nuevos()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO bovino_resumen (bovino_id)
+    SELECT id FROM nuevos
+    ON CONFLICT (bovino_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New weights: the latest inserted weight per bovino, unless the summary
+-- already holds a later one (e.g. an older weighing synced late)
+CREATE OR REPLACE FUNCTION resumen_pesos_insertados()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO bovino_resumen (bovino_id, ultimo_peso, ultimo_peso_fecha)
+    SELECT DISTINCT ON (e.bovino_id) e.bovino_id, n.peso_nuevo, e.fecha
+    FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+    ORDER BY e.bovino_id, e.fecha DESC, e.id DESC
+    ON CONFLICT (bovino_id) DO UPDATE
+        SET ultimo_peso = EXCLUDED.ultimo_peso, ultimo_peso_fecha = EXCLUDED.ultimo_peso_fecha, actualizado_en = NOW()
+        WHERE bovino_resumen.ultimo_peso_fecha IS NULL OR EXCLUDED.ultimo_peso_fecha >= bovino_resumen.ultimo_peso_fecha;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New vaccinations: latest dose as above, and the next booster from the
+-- agenda (triggers fire in name order, so trg_vacunaciones_agenda_insert
+-- has already updated it)
+CREATE OR REPLACE FUNCTION resumen_vacunaciones_insertadas()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO bovino_resumen (bovino_id, ultima_vacunacion_tipo, ultima_vacunacion_fecha)
+    SELECT DISTINCT ON (e.bovino_id) e.bovino_id, n.tipo, e.fecha
+    FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+    ORDER BY e.bovino_id, e.fecha DESC, e.id DESC
+    ON CONFLICT (bovino_id) DO UPDATE
+        SET ultima_vacunacion_tipo = EXCLUDED.ultima_vacunacion_tipo,
+            ultima_vacunacion_fecha = EXCLUDED.ultima_vacunacion_fecha, actualizado_en = NOW()
+        WHERE bovino_resumen.ultima_vacunacion_fecha IS NULL
+           OR EXCLUDED.ultima_vacunacion_fecha >= bovino_resumen.ultima_vacunacion_fecha;
+
+    UPDATE bovino_resumen r
+    SET proxima_vacunacion = (SELECT MIN(a.fecha_prox) FROM agenda_sanitaria a
+                              WHERE a.bovino_id = r.bovino_id AND a.tipo = 'vacunacion')
+    WHERE r.bovino_id IN (SELECT e.bovino_id FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updated or deleted detail rows, and any change to enfermedades/remisiones:
+-- rebuild the bovinos they belong to. The transition table is named filas
+-- for both NEW (insert/update) and OLD (delete) rows.
+CREATE OR REPLACE FUNCTION resumen_detalles_cambiados()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refrescar_bovino_resumen(ARRAY(
+        SELECT DISTINCT e.bovino_id FROM filas f JOIN eventos e ON e.id = f.evento_id AND e.fecha = f.evento_fecha
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Deleted eventos: their detail rows are gone by now (the cascades run as
+-- row triggers, before statement triggers)
+CREATE OR REPLACE FUNCTION resumen_eventos_borrados()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refrescar_bovino_resumen(ARRAY(SELECT DISTINCT bovino_id FROM viejos WHERE bovino_id IS NOT NULL));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New open ownership periods (sales, owner changes)
+CREATE OR REPLACE FUNCTION resumen_propiedad_insertada()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO bovino_resumen (bovino_id, propietario_desde)
+    SELECT bovino_id, NULLIF(lower(periodo), '-infinity') FROM nuevos
+    WHERE upper_inf(periodo)
+    ON CONFLICT (bovino_id) DO UPDATE
+        SET propietario_desde = EXCLUDED.propietario_desde, actualizado_en = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Movilizaciones (triggers created with the tables, see models.py): a new
+-- request becomes the bovinos' last one; state changes update it in place
+CREATE OR REPLACE FUNCTION resumen_movilizacion_bovinos()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO bovino_resumen (bovino_id, ultima_movilizacion_id, ultima_movilizacion_estado, ultima_movilizacion_fecha)
+        SELECT DISTINCT ON (n.bovino_id) n.bovino_id, m.id, m.estado::TEXT, m.fecha_solicitud
+        FROM filas n JOIN movilizaciones m ON m.id = n.movilizacion_id
+        ORDER BY n.bovino_id, m.fecha_solicitud DESC, m.id DESC
+        ON CONFLICT (bovino_id) DO UPDATE
+            SET ultima_movilizacion_id = EXCLUDED.ultima_movilizacion_id,
+                ultima_movilizacion_estado = EXCLUDED.ultima_movilizacion_estado,
+                ultima_movilizacion_fecha = EXCLUDED.ultima_movilizacion_fecha, actualizado_en = NOW()
+            WHERE bovino_resumen.ultima_movilizacion_fecha IS NULL
+               OR EXCLUDED.ultima_movilizacion_fecha >= bovino_resumen.ultima_movilizacion_fecha;
+    ELSE
+        PERFORM refrescar_bovino_resumen(ARRAY(SELECT DISTINCT bovino_id FROM filas));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION resumen_movilizaciones_actualizadas()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE bovino_resumen r
+    SET ultima_movilizacion_estado = n.estado::TEXT, actualizado_en = NOW()
+    FROM nuevos n
+    WHERE r.ultima_movilizacion_id = n.id AND r.ultima_movilizacion_estado IS DISTINCT FROM n.estado::TEXT;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bovinos_resumen_insert ON bovinos;
+DROP TRIGGER IF EXISTS trg_eventos_resumen_delete ON eventos;
+DROP TRIGGER IF EXISTS trg_bovino_propiedad_resumen ON bovino_propiedad;
+DROP TRIGGER IF EXISTS trg_pesos_resumen_insert ON pesos;
+DROP TRIGGER IF EXISTS trg_pesos_resumen_update ON pesos;
+DROP TRIGGER IF EXISTS trg_pesos_resumen_delete ON pesos;
+DROP TRIGGER IF EXISTS trg_vacunaciones_resumen_insert ON vacunaciones;
+DROP TRIGGER IF EXISTS trg_vacunaciones_resumen_update ON vacunaciones;
+DROP TRIGGER IF EXISTS trg_vacunaciones_resumen_delete ON vacunaciones;
+DROP TRIGGER IF EXISTS trg_enfermedades_resumen_insert ON enfermedades;
+DROP TRIGGER IF EXISTS trg_enfermedades_resumen_delete ON enfermedades;
+DROP TRIGGER IF EXISTS trg_remisiones_resumen_insert ON remisiones;
+DROP TRIGGER IF EXISTS trg_remisiones_resumen_delete ON remisiones;
+
+CREATE TRIGGER trg_bovinos_resumen_insert AFTER INSERT ON bovinos
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION resumen_bovinos_nuevos();
+CREATE TRIGGER trg_eventos_resumen_delete AFTER DELETE ON eventos
+REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION resumen_eventos_borrados();
+CREATE TRIGGER trg_bovino_propiedad_resumen AFTER INSERT ON bovino_propiedad
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION resumen_propiedad_insertada();
+
+CREATE TRIGGER trg_pesos_resumen_insert AFTER INSERT ON pesos
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION resumen_pesos_insertados();
+CREATE TRIGGER trg_pesos_resumen_update AFTER UPDATE ON pesos
+REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+CREATE TRIGGER trg_pesos_resumen_delete AFTER DELETE ON pesos
+REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+
+CREATE TRIGGER trg_vacunaciones_resumen_insert AFTER INSERT ON vacunaciones
+REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION resumen_vacunaciones_insertadas();
+CREATE TRIGGER trg_vacunaciones_resumen_update AFTER UPDATE ON vacunaciones
+REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+CREATE TRIGGER trg_vacunaciones_resumen_delete AFTER DELETE ON vacunaciones
+REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+
+CREATE TRIGGER trg_enfermedades_resumen_insert AFTER INSERT ON enfermedades
+REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+CREATE TRIGGER trg_enfermedades_resumen_delete AFTER DELETE ON enfermedades
+REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+CREATE TRIGGER trg_remisiones_resumen_insert AFTER INSERT ON remisiones
+REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+CREATE TRIGGER trg_remisiones_resumen_delete AFTER DELETE ON remisiones
+REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_detalles_cambiados();
+
+-- Movilización tables are created by the API (create_all), which also
+-- creates these triggers when it creates the tables
+DO $$
+BEGIN
+    IF to_regclass('movilizaciones') IS NOT NULL THEN
+        DROP TRIGGER IF EXISTS trg_movilizacion_bovinos_resumen_insert ON movilizacion_bovinos;
+        DROP TRIGGER IF EXISTS trg_movilizacion_bovinos_resumen_delete ON movilizacion_bovinos;
+        DROP TRIGGER IF EXISTS trg_movilizaciones_resumen_update ON movilizaciones;
+        CREATE TRIGGER trg_movilizacion_bovinos_resumen_insert AFTER INSERT ON movilizacion_bovinos
+        REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_movilizacion_bovinos();
+        CREATE TRIGGER trg_movilizacion_bovinos_resumen_delete AFTER DELETE ON movilizacion_bovinos
+        REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION resumen_movilizacion_bovinos();
+        CREATE TRIGGER trg_movilizaciones_resumen_update AFTER UPDATE ON movilizaciones
+        REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION resumen_movilizaciones_actualizadas();
+    END IF;
+END $$;
+
+SELECT refrescar_bovino_resumen(ARRAY(SELECT id FROM bovinos));
+
+COMMIT;
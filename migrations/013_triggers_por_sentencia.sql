@@ -0,0 +1,119 @@
+-- Migration 013: statement-level weight, transfer and review triggers
+-- trg_auto_update_weight, trg_transfer_ownership and trg_sync_authored run
+-- once per statement over the inserted rows (transition tables) instead of
+-- one UPDATE per row, so bulk inserts pay a single UPDATE. peso_actual is now
+-- the latest weighing per bovino by date, not the last row inserted.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/013_triggers_por_sentencia.sql
+
+BEGIN;
+
+-- Syncs documentos.authored with the latest revision inserted per document
+CREATE OR REPLACE FUNCTION sync_documento_authored()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE documentos d
+    SET authored = (r.status = 'aprobado')
+    FROM (
+        SELECT DISTINCT ON (documento_id) documento_id, status
+        FROM nuevos
+        ORDER BY documento_id, fecha DESC
+    ) r
+    WHERE d.id = r.documento_id
+      AND d.authored IS DISTINCT FROM (r.status = 'aprobado');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_sync_authored ON documento_revisiones;
+CREATE TRIGGER trg_sync_authored
+AFTER INSERT ON documento_revisiones
+REFERENCING NEW TABLE AS nuevos
+FOR EACH STATEMENT
+EXECUTE FUNCTION sync_documento_authored();
+
+-- Sets each bovino's current weight to its latest weighing when 'peso'
+-- events are added: one UPDATE per statement, and an older weighing (e.g.
+-- synced late from an offline device) never replaces a newer one
+CREATE OR REPLACE FUNCTION update_cow_current_weight()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE bovinos b
+    SET peso_actual = u.peso_nuevo
+    FROM (
+        SELECT DISTINCT ON (e.bovino_id) e.bovino_id, e.fecha, n.peso_nuevo
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        ORDER BY e.bovino_id, e.fecha DESC, e.id DESC
+    ) u
+    WHERE b.id = u.bovino_id
+      AND b.peso_actual IS DISTINCT FROM u.peso_nuevo
+      AND NOT EXISTS (
+          SELECT 1 FROM eventos e JOIN pesos p ON p.evento_id = e.id AND p.evento_fecha = e.fecha
+          WHERE e.bovino_id = u.bovino_id AND e.fecha > u.fecha
+      );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_auto_update_weight ON pesos;
+CREATE TRIGGER trg_auto_update_weight
+AFTER INSERT ON pesos
+REFERENCING NEW TABLE AS nuevos
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_cow_current_weight();
+
+-- Automatically changes owner and clears location when 'compraventa' events
+-- are added (the latest sale per bovino when a statement has several).
+-- The new ownership period starts at the sale's date.
+CREATE OR REPLACE FUNCTION handle_compraventa_transfer()
+RETURNS TRIGGER AS $$
+DECLARE
+    _bovino_ids UUID[];
+    _comprador_ids UUID[];
+    _fechas TIMESTAMPTZ[];
+    _evento_ids UUID[];
+BEGIN
+    SELECT array_agg(bovino_id), array_agg(comprador_id), array_agg(evento_fecha), array_agg(evento_id)
+    INTO _bovino_ids, _comprador_ids, _fechas, _evento_ids
+    FROM (
+        SELECT DISTINCT ON (e.bovino_id) e.bovino_id, n.comprador_id, n.evento_fecha, n.evento_id
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        ORDER BY e.bovino_id, n.evento_fecha DESC, n.evento_id DESC
+    ) v;
+
+    -- Lock the bovinos so concurrent sales of them record their periods one at a time
+    PERFORM 1 FROM bovinos WHERE id = ANY(_bovino_ids) ORDER BY id FOR UPDATE;
+    PERFORM registrar_propiedad(_bovino_ids, _comprador_ids, _fechas, _evento_ids);
+
+    -- Update the cows linked to these events:
+    -- 1. Set new owner (comprador_id)
+    -- 2. Clear the location (instalacion_id) so the new owner can assign one later
+    UPDATE bovinos b
+    SET
+        usuario_id = v.comprador_id,
+        instalacion_id = NULL
+    FROM unnest(_bovino_ids, _comprador_ids) AS v(bovino_id, comprador_id)
+    WHERE b.id = v.bovino_id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transfer_ownership ON compraventas;
+CREATE TRIGGER trg_transfer_ownership
+AFTER INSERT ON compraventas
+REFERENCING NEW TABLE AS nuevos
+FOR EACH STATEMENT
+EXECUTE FUNCTION handle_compraventa_transfer();
+
+-- peso_actual of bovinos whose last inserted weight was not their latest
+UPDATE bovinos b
+SET peso_actual = u.peso_nuevo
+FROM (
+    SELECT DISTINCT ON (e.bovino_id) e.bovino_id, p.peso_nuevo
+    FROM eventos e JOIN pesos p ON p.evento_id = e.id AND p.evento_fecha = e.fecha
+    ORDER BY e.bovino_id, e.fecha DESC, e.id DESC
+) u
+WHERE b.id = u.bovino_id AND b.peso_actual IS DISTINCT FROM u.peso_nuevo;
+
+COMMIT;
@@ -0,0 +1,284 @@
+-- Migration 014: registrar_* return the new event with its detail columns
+-- POST /eventos/ now gets the whole row back from the function call and
+-- commits once, instead of reading the evento again. registrar_tratamiento and
+-- registrar_remision also check that the enfermedad belongs to the bovino.
+-- The return type changes, so the old functions are dropped first.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/014_registrar_eventos_filas.sql
+
+BEGIN;
+
+DROP FUNCTION IF EXISTS registrar_peso(UUID, DECIMAL, TIMESTAMPTZ, TEXT);
+DROP FUNCTION IF EXISTS registrar_dieta(UUID, VARCHAR, TIMESTAMPTZ, TEXT);
+DROP FUNCTION IF EXISTS registrar_vacunacion(UUID, UUID, VARCHAR, VARCHAR, VARCHAR, DATE, TIMESTAMPTZ, TEXT);
+DROP FUNCTION IF EXISTS registrar_desparasitacion(UUID, UUID, VARCHAR, VARCHAR, DATE, TIMESTAMPTZ, TEXT);
+DROP FUNCTION IF EXISTS registrar_laboratorio(UUID, UUID, VARCHAR, TEXT, TIMESTAMPTZ, TEXT);
+DROP FUNCTION IF EXISTS registrar_enfermedad(UUID, UUID, VARCHAR, TIMESTAMPTZ, TEXT);
+DROP FUNCTION IF EXISTS registrar_tratamiento(UUID, UUID, UUID, VARCHAR, VARCHAR, VARCHAR, TIMESTAMPTZ, TEXT);
+DROP FUNCTION IF EXISTS registrar_remision(UUID, UUID, UUID, TIMESTAMPTZ, TEXT);
+
+CREATE OR REPLACE FUNCTION registrar_peso(
+    _bovino_id UUID,
+    _peso_nuevo DECIMAL,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT peso_actual DECIMAL, OUT peso_nuevo DECIMAL
+) AS $$
+#variable_conflict use_column
+DECLARE
+    _peso_anterior DECIMAL;
+BEGIN
+    -- 1. Get current weight for history
+    SELECT peso_actual INTO _peso_anterior FROM bovinos WHERE id = _bovino_id;
+
+    -- 2. Create Event
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    -- 3. Create Detail
+    INSERT INTO pesos (evento_id, evento_fecha, peso_actual, peso_nuevo)
+    VALUES (id, fecha, COALESCE(_peso_anterior, 0), _peso_nuevo)
+    RETURNING pesos.peso_actual, pesos.peso_nuevo
+    INTO peso_actual, peso_nuevo;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_dieta(
+    _bovino_id UUID,
+    _alimento VARCHAR,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT alimento VARCHAR
+) AS $$
+#variable_conflict use_column
+BEGIN
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO dietas (evento_id, evento_fecha, alimento)
+    VALUES (id, fecha, _alimento)
+    RETURNING dietas.alimento
+    INTO alimento;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_vacunacion(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _tipo VARCHAR, -- e.g. "Fiebre Aftosa"
+    _lote VARCHAR,
+    _laboratorio VARCHAR,
+    _fecha_prox DATE,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT veterinario_id UUID, OUT tipo VARCHAR, OUT tipo_id INTEGER, OUT lote VARCHAR,
+    OUT laboratorio VARCHAR, OUT laboratorio_id INTEGER, OUT fecha_prox DATE
+) AS $$
+#variable_conflict use_column
+DECLARE
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO vacunaciones (evento_id, evento_fecha, veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox)
+    VALUES (id, fecha, _vet_id, _tipo, resolver_catalogo('vacuna', _tipo), _lote,
+            _laboratorio, resolver_catalogo('laboratorio', _laboratorio), _fecha_prox)
+    RETURNING vacunaciones.veterinario_id, vacunaciones.tipo, vacunaciones.tipo_id, vacunaciones.lote, vacunaciones.laboratorio, vacunaciones.laboratorio_id, vacunaciones.fecha_prox
+    INTO veterinario_id, tipo, tipo_id, lote, laboratorio, laboratorio_id, fecha_prox;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_desparasitacion(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _medicamento VARCHAR,
+    _dosis VARCHAR,
+    _fecha_prox DATE,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT veterinario_id UUID, OUT medicamento VARCHAR, OUT medicamento_id INTEGER,
+    OUT dosis_admin VARCHAR, OUT fecha_prox DATE
+) AS $$
+#variable_conflict use_column
+DECLARE
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO desparasitaciones (evento_id, evento_fecha, veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox)
+    VALUES (id, fecha, _vet_id, _medicamento, resolver_catalogo('medicamento', _medicamento), _dosis, _fecha_prox)
+    RETURNING desparasitaciones.veterinario_id, desparasitaciones.medicamento, desparasitaciones.medicamento_id, desparasitaciones.dosis_admin, desparasitaciones.fecha_prox
+    INTO veterinario_id, medicamento, medicamento_id, dosis_admin, fecha_prox;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_laboratorio(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _tipo VARCHAR, -- e.g. "Sangre"
+    _resultado TEXT,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT veterinario_id UUID, OUT tipo VARCHAR, OUT resultado TEXT
+) AS $$
+#variable_conflict use_column
+DECLARE
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO laboratorios (evento_id, evento_fecha, veterinario_id, tipo, resultado)
+    VALUES (id, fecha, _vet_id, _tipo, _resultado)
+    RETURNING laboratorios.veterinario_id, laboratorios.tipo, laboratorios.resultado
+    INTO veterinario_id, tipo, resultado;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_enfermedad(
+    _bovino_id UUID,
+    _usuario_id UUID,
+    _tipo VARCHAR, -- Diagnosis
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT enfermedad_id UUID, OUT veterinario_id UUID, OUT tipo VARCHAR, OUT tipo_id INTEGER
+) AS $$
+#variable_conflict use_column
+DECLARE
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO enfermedades (evento_id, evento_fecha, veterinario_id, tipo, tipo_id)
+    VALUES (id, fecha, _vet_id, _tipo, resolver_catalogo('enfermedad', _tipo))
+    RETURNING enfermedades.id, enfermedades.veterinario_id, enfermedades.tipo, enfermedades.tipo_id
+    INTO enfermedad_id, veterinario_id, tipo, tipo_id;
+
+    UPDATE bovinos SET status = 'enfermo' WHERE id = _bovino_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_tratamiento(
+    _bovino_id UUID,
+    _enfermedad_id UUID, -- Must link to an existing disease case
+    _usuario_id UUID,
+    _medicamento VARCHAR,
+    _dosis VARCHAR,
+    _periodo VARCHAR,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT enfermedad_id UUID, OUT veterinario_id UUID, OUT medicamento VARCHAR, OUT medicamento_id INTEGER,
+    OUT dosis VARCHAR, OUT periodo VARCHAR
+) AS $$
+#variable_conflict use_column
+DECLARE
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    -- The disease case must belong to the same bovino
+    IF EXISTS (
+        SELECT 1 FROM enfermedades n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        WHERE n.id = _enfermedad_id AND e.bovino_id <> _bovino_id
+    ) THEN
+        RAISE EXCEPTION 'La enfermedad no pertenece al mismo bovino' USING ERRCODE = 'check_violation';
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO tratamientos (evento_id, evento_fecha, enfermedad_id, veterinario_id, medicamento, medicamento_id, dosis, periodo)
+    VALUES (id, fecha, _enfermedad_id, _vet_id, _medicamento, resolver_catalogo('medicamento', _medicamento), _dosis, _periodo)
+    RETURNING tratamientos.enfermedad_id, tratamientos.veterinario_id, tratamientos.medicamento, tratamientos.medicamento_id, tratamientos.dosis, tratamientos.periodo
+    INTO enfermedad_id, veterinario_id, medicamento, medicamento_id, dosis, periodo;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_remision(
+    _bovino_id UUID,
+    _enfermedad_id UUID, -- Must link to an existing disease case
+    _usuario_id UUID,
+    _fecha TIMESTAMPTZ DEFAULT NOW(),
+    _observaciones TEXT DEFAULT '',
+    OUT id UUID, OUT bovino_id UUID, OUT fecha TIMESTAMPTZ, OUT observaciones TEXT,
+    OUT enfermedad_id UUID, OUT veterinario_id UUID
+) AS $$
+#variable_conflict use_column
+DECLARE
+    _vet_id UUID;
+BEGIN
+    SELECT id INTO _vet_id FROM veterinarios WHERE usuario_id = _usuario_id;
+    IF _vet_id IS NULL THEN
+        RAISE EXCEPTION 'No veterinarian profile found for usuario_id %', _usuario_id;
+    END IF;
+
+    -- The disease case must belong to the same bovino
+    IF EXISTS (
+        SELECT 1 FROM enfermedades n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        WHERE n.id = _enfermedad_id AND e.bovino_id <> _bovino_id
+    ) THEN
+        RAISE EXCEPTION 'La enfermedad no pertenece al mismo bovino' USING ERRCODE = 'check_violation';
+    END IF;
+
+    INSERT INTO eventos (bovino_id, fecha, observaciones)
+    VALUES (_bovino_id, COALESCE(_fecha, NOW()), _observaciones)
+    RETURNING eventos.id, eventos.bovino_id, eventos.fecha, eventos.observaciones
+    INTO id, bovino_id, fecha, observaciones;
+
+    INSERT INTO remisiones (evento_id, evento_fecha, enfermedad_id, veterinario_id)
+    VALUES (id, fecha, _enfermedad_id, _vet_id)
+    RETURNING remisiones.enfermedad_id, remisiones.veterinario_id
+    INTO enfermedad_id, veterinario_id;
+
+    UPDATE bovinos SET status = 'activo' WHERE id = _bovino_id;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,103 @@
+-- Migration 015: late-synced sales no longer take a bovino from its owner
+-- handle_compraventa_transfer set bovinos.usuario_id for every sale, also
+-- the ones registrar_propiedad leaves out of the history (older than the
+-- current owner's period, e.g. synced late from an offline device). The
+-- bovinos update trigger then closed the current owner's period as of now.
+-- registrar_propiedad now returns the bovinos it recorded and the transfer
+-- only updates those. The return type changes, so the old function is
+-- dropped first.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/015_compraventa_tardia.sql
+
+BEGIN;
+
+DROP FUNCTION IF EXISTS registrar_propiedad(UUID[], UUID[], TIMESTAMPTZ[], UUID[]);
+
+-- Ownership periods (bovino_propiedad): closes each bovino's open period at
+-- _desde and opens one for its new owner (a NULL owner only closes it).
+-- Transfers to the current owner, or dated before the open period started
+-- (a sale synced late from an offline device), leave the history as is.
+-- Returns the ids of the bovinos whose history changed, so callers apply the
+-- owner change only to those.
+CREATE OR REPLACE FUNCTION registrar_propiedad(
+    _bovino_ids UUID[],
+    _usuario_ids UUID[],
+    _desde TIMESTAMPTZ[],
+    _evento_ids UUID[] DEFAULT NULL
+) RETURNS UUID[] AS $$
+DECLARE
+    _b UUID[];
+    _u UUID[];
+    _d TIMESTAMPTZ[];
+    _e UUID[];
+    _abiertos BIGINT[];
+BEGIN
+    SELECT array_agg(c.bovino_id), array_agg(c.usuario_id), array_agg(c.desde), array_agg(c.evento_id), array_agg(p.id)
+    INTO _b, _u, _d, _e, _abiertos
+    FROM (
+        SELECT DISTINCT ON (x.bovino_id) x.*
+        FROM unnest(_bovino_ids, _usuario_ids, _desde, COALESCE(_evento_ids, ARRAY[]::UUID[]))
+             AS x(bovino_id, usuario_id, desde, evento_id)
+        WHERE x.bovino_id IS NOT NULL
+        ORDER BY x.bovino_id, x.desde DESC
+    ) c
+    LEFT JOIN bovino_propiedad p ON p.bovino_id = c.bovino_id AND upper_inf(p.periodo)
+    WHERE p.id IS NULL
+       OR (p.usuario_id IS DISTINCT FROM c.usuario_id AND lower(p.periodo) < c.desde);
+
+    -- Close first: the new period would overlap the open one
+    UPDATE bovino_propiedad p
+    SET periodo = tstzrange(lower(p.periodo), x.desde)
+    FROM unnest(_abiertos, _d) AS x(id, desde)
+    WHERE p.id = x.id;
+
+    INSERT INTO bovino_propiedad (bovino_id, usuario_id, periodo, evento_id)
+    SELECT x.bovino_id, x.usuario_id, tstzrange(x.desde, NULL), x.evento_id
+    FROM unnest(_b, _u, _d, _e) AS x(bovino_id, usuario_id, desde, evento_id)
+    WHERE x.usuario_id IS NOT NULL;
+
+    RETURN COALESCE(_b, ARRAY[]::UUID[]);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Automatically changes owner and clears location when 'compraventa' events
+-- are added (the latest sale per bovino when a statement has several).
+-- The new ownership period starts at the sale's date. Sales that
+-- registrar_propiedad leaves out (older than the current owner's period,
+-- e.g. synced late, or to the current owner) do not touch the bovino.
+CREATE OR REPLACE FUNCTION handle_compraventa_transfer()
+RETURNS TRIGGER AS $$
+DECLARE
+    _bovino_ids UUID[];
+    _comprador_ids UUID[];
+    _fechas TIMESTAMPTZ[];
+    _evento_ids UUID[];
+    _aplicados UUID[];
+BEGIN
+    SELECT array_agg(bovino_id), array_agg(comprador_id), array_agg(evento_fecha), array_agg(evento_id)
+    INTO _bovino_ids, _comprador_ids, _fechas, _evento_ids
+    FROM (
+        SELECT DISTINCT ON (e.bovino_id) e.bovino_id, n.comprador_id, n.evento_fecha, n.evento_id
+        FROM nuevos n JOIN eventos e ON e.id = n.evento_id AND e.fecha = n.evento_fecha
+        ORDER BY e.bovino_id, n.evento_fecha DESC, n.evento_id DESC
+    ) v;
+
+    -- Lock the bovinos so concurrent sales of them record their periods one at a time
+    PERFORM 1 FROM bovinos WHERE id = ANY(_bovino_ids) ORDER BY id FOR UPDATE;
+    _aplicados := registrar_propiedad(_bovino_ids, _comprador_ids, _fechas, _evento_ids);
+
+    -- Update the cows whose sale was recorded:
+    -- 1. Set new owner (comprador_id)
+    -- 2. Clear the location (instalacion_id) so the new owner can assign one later
+    UPDATE bovinos b
+    SET
+        usuario_id = v.comprador_id,
+        instalacion_id = NULL
+    FROM unnest(_bovino_ids, _comprador_ids) AS v(bovino_id, comprador_id)
+    WHERE b.id = v.bovino_id AND v.bovino_id = ANY(_aplicados);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,88 @@
+-- Migration 016: archivar_particion_eventos moves the month's medical and
+-- campaign rows with it
+-- enfermedades, tratamientos, remisiones and campana_bovinos are not
+-- partitioned but reference eventos(id, fecha), so any of their rows in the
+-- month made DETACH PARTITION fail. They are now moved into
+-- <tabla>_YYYY_MM tables returned with the detached partitions. A month
+-- whose disease cases continue in other months, or with applications of a
+-- campaign that is not cerrada, is refused with an error naming the tables.
+--
+--   docker exec -i union_ganadera_db psql -U postgres -d union_ganadera < migrations/016_archivar_particiones.sql
+
+BEGIN;
+
+-- Detaches one month of eventos and its detail tables for archival (dump and
+-- drop the returned tables afterwards). The detached detail partitions lose
+-- their foreign key to eventos. The non-partitioned rows of that month that
+-- reference eventos (enfermedades, tratamientos, remisiones, campana_bovinos)
+-- are moved with it into <tabla>_YYYY_MM tables, also returned. Raises
+-- before changing anything when a disease case of the month still has
+-- treatments or remissions in other months, or a campaign with applications
+-- in the month is not cerrada, naming the tables and counts.
+CREATE OR REPLACE FUNCTION archivar_particion_eventos(_mes DATE)
+RETURNS TEXT[] AS $$
+DECLARE
+    _inicio TIMESTAMPTZ := date_trunc('month', _mes)::TIMESTAMP AT TIME ZONE 'UTC';
+    _fin TIMESTAMPTZ := (date_trunc('month', _mes) + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC';
+    _tabla TEXT;
+    _particion TEXT;
+    _fk TEXT;
+    _filas BIGINT;
+    _bloqueos TEXT[] := '{}';
+    _archivadas TEXT[] := '{}';
+BEGIN
+    -- Cases opened this month and followed up later cannot be split
+    FOREACH _tabla IN ARRAY ARRAY['tratamientos', 'remisiones'] LOOP
+        EXECUTE format(
+            'SELECT count(*) FROM %I d JOIN enfermedades en ON en.id = d.enfermedad_id
+             WHERE en.evento_fecha >= $1 AND en.evento_fecha < $2
+               AND (d.evento_fecha < $1 OR d.evento_fecha >= $2)', _tabla
+        ) INTO _filas USING _inicio, _fin;
+        IF _filas > 0 THEN
+            _bloqueos := _bloqueos || format('%s in other months (%s)', _tabla, _filas);
+        END IF;
+    END LOOP;
+    -- Without its links an open campaign would count those bovinos as pending
+    -- again (campana_pendientes) and apply them twice
+    SELECT count(*) INTO _filas
+    FROM campana_bovinos cb JOIN campanas c ON c.id = cb.campana_id
+    WHERE cb.evento_fecha >= _inicio AND cb.evento_fecha < _fin AND c.estado <> 'cerrada';
+    IF _filas > 0 THEN
+        _bloqueos := _bloqueos || format('campana_bovinos of campaigns not cerrada (%s)', _filas);
+    END IF;
+    IF cardinality(_bloqueos) > 0 THEN
+        RAISE EXCEPTION 'Cannot archive %: rows still in use: %',
+            to_char(_mes, 'YYYY-MM'), array_to_string(_bloqueos, ', ');
+    END IF;
+
+    -- Dependants first: tratamientos and remisiones reference enfermedades
+    FOREACH _tabla IN ARRAY ARRAY['tratamientos', 'remisiones', 'enfermedades', 'campana_bovinos'] LOOP
+        _particion := _tabla || to_char(_mes, '_YYYY_MM');
+        EXECUTE format('SELECT count(*) FROM %I WHERE evento_fecha >= $1 AND evento_fecha < $2', _tabla)
+            INTO _filas USING _inicio, _fin;
+        CONTINUE WHEN _filas = 0;
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I (LIKE %I)', _particion, _tabla);
+        EXECUTE format('INSERT INTO %I SELECT * FROM %I WHERE evento_fecha >= $1 AND evento_fecha < $2', _particion, _tabla)
+            USING _inicio, _fin;
+        EXECUTE format('DELETE FROM %I WHERE evento_fecha >= $1 AND evento_fecha < $2', _tabla)
+            USING _inicio, _fin;
+        _archivadas := _archivadas || _particion;
+    END LOOP;
+
+    FOREACH _tabla IN ARRAY tablas_particionadas_eventos() LOOP
+        _particion := _tabla || to_char(_mes, '_YYYY_MM');
+        CONTINUE WHEN to_regclass(_particion) IS NULL;
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', _tabla, _particion);
+        FOR _fk IN
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = _particion::REGCLASS AND contype = 'f' AND confrelid = 'eventos'::REGCLASS
+        LOOP
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', _particion, _fk);
+        END LOOP;
+        _archivadas := _archivadas || _particion;
+    END LOOP;
+    RETURN _archivadas;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;